@@ -0,0 +1,304 @@
+"""
+FAQ 답변 캐시 모듈
+
+자주 묻는 질문(출결 규정, 데일리 미션 마감, 수료 기준 등)은 Assistant Run 없이 바로 답변하도록
+질문을 정규화한 키로 답변을 캐시합니다.
+- 정확히 같은 질문: 한국어 어미/조사/띄어쓰기 차이를 정규화한 키로 조회
+- 비슷한 질문: 문자 n-gram 역색인으로 후보를 찾고 유사도가 기준 이상이면 hit
+이전 대화 맥락에 의존하는 후속 질문("그럼 지각은요?")은 캐시를 사용하지 않습니다.
+메모리에 없는 질문은 사전 계산 저장소(answer_store.py, precompute_answers.py로 생성)에서 찾습니다.
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from metrics import ANSWER_CACHE_ENTRIES, ANSWER_CACHE_LOOKUPS, ANSWER_CACHE_UPDATES
+
+logger = logging.getLogger(__name__)
+
+# 캐시 설정 (환경변수로 조정 가능)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(6 * 60 * 60)))  # 답변 유효 시간(초)
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.8"))  # 유사 질문 판단 기준 (0~1)
+NGRAM_SIZE = 2
+
+# 정규화 시 제거할 질문 끝 표현 (긴 것부터 검사)
+QUESTION_ENDINGS = sorted([
+    '인가요', '인지요', '나요', '까요', '습니까', '입니까', '합니까', '을까요', 'ㄹ까요',
+    '알려주세요', '알려줘', '알려주실수있나요', '궁금합니다', '궁금해요', '궁금해',
+    '해주세요', '주세요', '어떻게되나요', '어떻게돼', '어떻게되죠', '뭔가요', '뭐예요', '뭐에요',
+    '이에요', '예요', '에요', '이죠', '죠', '요',
+], key=len, reverse=True)
+
+# 이전 대화 맥락에 의존하는 후속 질문 표현
+FOLLOW_UP_MARKERS = [
+    '그럼', '그러면', '그렇다면', '그건', '그거', '그게', '그것', '이건', '이거',
+    '위에', '위의', '방금', '아까', '앞에서', '이전', '추가로', '더 자세히', '다시 설명',
+]
+
+# 캐시를 사용할 최소 질문 길이 (정규화 후, 이보다 짧으면 후속 질문으로 간주)
+MIN_CACHEABLE_LENGTH = 4
+
+_MENTION_PATTERN = re.compile(r'<@[A-Z0-9]+>')
+_NON_WORD_PATTERN = re.compile(r'[^0-9a-z가-힣ㄱ-ㅎ\s]')
+_SPACE_PATTERN = re.compile(r'\s+')
+
+def normalize_question(question):
+    """질문을 캐시 키로 정규화 (대소문자, 기호, 띄어쓰기, 질문 어미 차이 제거)"""
+    text = unicodedata.normalize("NFKC", question)
+    text = _MENTION_PATTERN.sub(" ", text).lower()
+    text = _NON_WORD_PATTERN.sub(" ", text)
+    text = _SPACE_PATTERN.sub("", text)
+    
+    # 질문 끝 표현 제거 (예: "출결규정이어떻게되나요" -> "출결규정이")
+    for ending in QUESTION_ENDINGS:
+        if text.endswith(ending) and len(text) > len(ending) + 1:
+            text = text[:-len(ending)]
+            break
+    
+    return text
+
+def is_follow_up_question(question):
+    """이전 대화 맥락에 의존하는 후속 질문인지 판단"""
+    if any(marker in question for marker in FOLLOW_UP_MARKERS):
+        return True
+    return len(normalize_question(question)) < MIN_CACHEABLE_LENGTH
+
+def char_ngrams(text, size=NGRAM_SIZE):
+    """문자 n-gram 집합"""
+    if len(text) < size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def find_similar_key(key, ngram_index, ngram_count, threshold):
+    """n-gram 역색인으로 가장 비슷한 키 찾기 (Dice 계수 기준 이상일 때만, 메모리 캐시와 사전 계산 저장소 공용)
+    
+    Args:
+        key: 정규화된 질문 키
+        ngram_index: ngram -> set(key) 역색인
+        ngram_count: 후보 키의 n-gram 수를 돌려주는 함수
+        threshold: 최소 Dice 계수
+    """
+    query_ngrams = char_ngrams(key)
+    if not query_ngrams:
+        return None
+    
+    shared_counts = {}
+    for ngram in query_ngrams:
+        for candidate in ngram_index.get(ngram, ()):
+            shared_counts[candidate] = shared_counts.get(candidate, 0) + 1
+    
+    best_key = None
+    best_score = 0.0
+    for candidate, shared in shared_counts.items():
+        score = 2 * shared / (len(query_ngrams) + ngram_count(candidate))
+        if score > best_score:
+            best_key, best_score = candidate, score
+    
+    if best_score >= threshold:
+        return best_key
+    return None
+
+class AnswerCacheStats:
+    """캐시 hit/miss 통계"""
+    
+    def __init__(self):
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.bypassed = 0  # 후속 질문 등으로 캐시를 사용하지 않은 횟수
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.store_hits = 0  # 사전 계산 저장소에서 찾은 횟수
+    
+    def as_dict(self):
+        """통계를 딕셔너리로 반환"""
+        hits = self.exact_hits + self.similar_hits + self.store_hits
+        lookups = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+class AnswerCache:
+    """TTL + LRU 기반 FAQ 답변 캐시 (정확 일치 + n-gram 유사도 조회)
+    
+    store(AnswerStore)를 주면 메모리에 없는 질문은 사전 계산 답변으로 응답합니다.
+    저장소는 읽기 전용이라 TTL/LRU/invalidate의 영향을 받지 않습니다.
+    """
+    
+    def __init__(self, ttl_seconds=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 similarity_threshold=ANSWER_CACHE_SIMILARITY, enabled=ANSWER_CACHE_ENABLED, store=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.enabled = enabled
+        self.store = store
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (answer, stored_at, ngrams)
+        self._ngram_index = {}  # ngram -> set(key)
+        self._stale = OrderedDict()  # 만료된 답변 key -> answer (OpenAI 장애 시 대체 답변용, 최대 max_entries개)
+        self.stats = AnswerCacheStats()
+    
+    def get(self, question, allow_stale=False):
+        """캐시된 답변 반환 (없으면 None)
+        
+        allow_stale이면 TTL이 지났지만 아직 지워지지 않은 답변도 반환 (OpenAI 장애 시 대체 답변용, 통계에는 넣지 않음)
+        """
+        if not self.enabled:
+            return None
+        if is_follow_up_question(question):
+            if not allow_stale:
+                with self._lock:
+                    self.stats.bypassed += 1
+                ANSWER_CACHE_LOOKUPS.inc(result="bypassed")
+            return None
+        
+        key = normalize_question(question)
+        if allow_stale:
+            return self._get_stale(key)
+        
+        with self._lock:
+            answer = self._get_exact(key)
+            if answer is not None:
+                self.stats.exact_hits += 1
+                ANSWER_CACHE_LOOKUPS.inc(result="exact_hit")
+                return answer
+            
+            similar_key = self._find_similar(key)
+            if similar_key is not None:
+                answer = self._get_exact(similar_key)
+                if answer is not None:
+                    self.stats.similar_hits += 1
+                    ANSWER_CACHE_LOOKUPS.inc(result="similar_hit")
+                    logger.info(f"유사 질문 캐시 hit: '{key}' ≈ '{similar_key}'")
+                    return answer
+            
+            stored = self.store.get_key(key) if self.store is not None else None
+            if stored is not None:
+                self.stats.store_hits += 1
+                ANSWER_CACHE_LOOKUPS.inc(result="store_hit")
+                return stored[0]
+            
+            self.stats.misses += 1
+            ANSWER_CACHE_LOOKUPS.inc(result="miss")
+            return None
+    
+    def put(self, question, answer):
+        """답변 저장 (후속 질문은 저장하지 않음)"""
+        if not self.enabled or is_follow_up_question(question):
+            return
+        
+        key = normalize_question(question)
+        ngrams = char_ngrams(key)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (answer, time.monotonic(), ngrams)
+            for ngram in ngrams:
+                self._ngram_index.setdefault(ngram, set()).add(key)
+            self.stats.stores += 1
+            ANSWER_CACHE_UPDATES.inc(event="store")
+            
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.stats.evictions += 1
+                ANSWER_CACHE_UPDATES.inc(event="eviction")
+            ANSWER_CACHE_ENTRIES.set(len(self._entries))
+    
+    def invalidate(self, question=None):
+        """특정 질문(및 유사 질문)의 답변 삭제, question이 없으면 전체 삭제
+        
+        Returns:
+            삭제한 항목 수
+        """
+        with self._lock:
+            if question is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._ngram_index.clear()
+                self._stale.clear()
+                ANSWER_CACHE_ENTRIES.set(0)
+                return removed
+            
+            key = normalize_question(question)
+            targets = {key} if key in self._entries else set()
+            similar_key = self._find_similar(key)
+            if similar_key is not None:
+                targets.add(similar_key)
+            for target in targets:
+                self._remove(target)
+            self._stale.pop(key, None)
+            ANSWER_CACHE_ENTRIES.set(len(self._entries))
+            return len(targets)
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+    
+    def _get_exact(self, key):
+        """정확히 일치하는 키의 답변 (만료 시 삭제 후 None)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        answer, stored_at, _ = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            self._remove(key)
+            self.stats.expirations += 1
+            ANSWER_CACHE_UPDATES.inc(event="expiration")
+            ANSWER_CACHE_ENTRIES.set(len(self._entries))
+            self._stale[key] = answer
+            while len(self._stale) > self.max_entries:
+                self._stale.popitem(last=False)
+            return None
+        
+        self._entries.move_to_end(key)
+        return answer
+    
+    def _get_stale(self, key):
+        """만료 여부와 관계없이 정확히 일치하거나 비슷한 질문의 답변"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0]
+            if key in self._stale:
+                return self._stale[key]
+            similar_key = self._find_similar(key)
+            if similar_key is not None:
+                return self._entries[similar_key][0]
+        
+        stored = self.store.get_key(key) if self.store is not None else None
+        return stored[0] if stored is not None else None
+    
+    def _find_similar(self, key):
+        """가장 비슷한 캐시 키 (Dice 계수 기준 이상일 때만)"""
+        return find_similar_key(key, self._ngram_index, lambda candidate: len(self._entries[candidate][2]),
+                                self.similarity_threshold)
+    
+    def _remove(self, key):
+        """항목과 역색인 정리"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for ngram in entry[2]:
+            keys = self._ngram_index.get(ngram)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._ngram_index[ngram]
@@ -0,0 +1,261 @@
+"""
+사전 계산 FAQ 답변 저장소 모듈
+
+기수 시작 직후처럼 같은 질문이 한꺼번에 몰릴 때 첫 질문부터 Run 없이 답변하도록,
+precompute_answers.py가 미리 만든 답변을 파일 하나에 저장하고 봇은 시작할 때 이 파일을 mmap으로 엽니다.
+- 파일 구조: MAGIC(8바이트) + 헤더 길이(4바이트) + 헤더 JSON + 답변 본문(UTF-8)
+- 헤더에는 형식 버전, 지식 베이스/프롬프트 버전, 질문별 답변 위치(offset, length)를 기록
+- 메모리에는 질문 키와 n-gram 역색인만 두고, 답변 본문은 조회할 때 mmap에서 읽음
+- 지식 베이스 버전(KB_VERSION)이나 프롬프트 버전이 현재 봇과 다르면 저장소를 사용하지 않음
+  (현재 지식 베이스 버전을 알 수 없으면 확인할 수 없으므로 역시 사용하지 않음)
+- 쓰기는 임시 파일에 쓴 뒤 os.replace로 교체하므로 실행 중인 봇은 이전 파일을 그대로 읽음
+"""
+
+import os
+import json
+import mmap
+import time
+import struct
+import logging
+import tempfile
+
+from answer_cache import ANSWER_CACHE_SIMILARITY, char_ngrams, find_similar_key, normalize_question
+
+logger = logging.getLogger(__name__)
+
+# 저장소 설정 (환경변수로 조정 가능)
+ANSWER_STORE_PATH = os.getenv("ANSWER_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "answer_store.bin"))
+ANSWER_STORE_ENABLED = os.getenv("ANSWER_STORE_ENABLED", "true").lower() == "true"
+KB_VERSION = os.getenv("KB_VERSION")  # 지식 베이스 버전 (저장소의 버전과 같을 때만 사용)
+
+MAGIC = b"FAQSTORE"
+FORMAT_VERSION = 1
+_HEADER_LENGTH = struct.Struct("<I")
+
+class AnswerStoreError(Exception):
+    """저장소 파일 형식이 올바르지 않음"""
+
+class StoredAnswer:
+    """저장소의 답변 하나 (본문은 mmap의 위치만 기억)"""
+    
+    __slots__ = ("key", "question", "offset", "length", "generated_at")
+    
+    def __init__(self, key, question, offset, length, generated_at):
+        self.key = key
+        self.question = question
+        self.offset = offset
+        self.length = length
+        self.generated_at = generated_at
+
+class AnswerStore:
+    """읽기 전용 사전 계산 답변 저장소 (정확 일치 + n-gram 유사도 조회)"""
+    
+    def __init__(self, path, meta, entries, data, file=None, similarity_threshold=ANSWER_CACHE_SIMILARITY):
+        self.path = path
+        self.meta = meta
+        self.similarity_threshold = similarity_threshold
+        self._entries = {entry.key: entry for entry in entries}
+        self._data = data  # mmap (또는 bytes)
+        self._file = file
+        self._ngram_counts = {}  # key -> n-gram 수 (Dice 계수 계산용)
+        self._ngram_index = {}  # ngram -> set(key)
+        for key in self._entries:
+            ngrams = char_ngrams(key)
+            self._ngram_counts[key] = len(ngrams)
+            for ngram in ngrams:
+                self._ngram_index.setdefault(ngram, set()).add(key)
+    
+    @classmethod
+    def open(cls, path=ANSWER_STORE_PATH, similarity_threshold=ANSWER_CACHE_SIMILARITY):
+        """저장소 파일을 mmap으로 열기
+        
+        Raises:
+            FileNotFoundError: 파일이 없음
+            AnswerStoreError: 형식이 올바르지 않음
+        """
+        file = open(path, "rb")
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 빈 파일은 mmap할 수 없음
+            file.close()
+            raise AnswerStoreError(f"빈 저장소 파일: {path}")
+        
+        try:
+            meta, entries = _parse_header(data)
+        except Exception:
+            data.close()
+            file.close()
+            raise
+        return cls(path, meta, entries, data, file=file, similarity_threshold=similarity_threshold)
+    
+    @property
+    def kb_version(self):
+        return self.meta.get("kb_version")
+    
+    @property
+    def prompt_version(self):
+        return self.meta.get("prompt_version")
+    
+    def mismatch(self, prompt_version=None, kb_version=None, assistant_id=None):
+        """현재 봇과 다른 버전 항목 설명 (모두 같으면 None, 지정하지 않은 항목은 비교하지 않음)"""
+        for field, expected in (("prompt_version", prompt_version), ("kb_version", kb_version),
+                                ("assistant_id", assistant_id)):
+            if expected is not None and self.meta.get(field) != expected:
+                return f"{field}: 저장소 {self.meta.get(field)!r} / 현재 {expected!r}"
+        return None
+    
+    def get(self, question):
+        """질문에 맞는 저장된 답변 (없으면 None)"""
+        return self.get_key(normalize_question(question))
+    
+    def get_key(self, key):
+        """정규화된 키로 답변 조회 (정확히 일치하는 키가 없으면 가장 비슷한 키)
+        
+        Returns:
+            (답변, 일치한 키) 또는 None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            similar_key = self._find_similar(key)
+            if similar_key is None:
+                return None
+            entry = self._entries[similar_key]
+        return self._read(entry), entry.key
+    
+    def items(self):
+        """(질문 키, 원문 질문, 답변, 생성 시각) 목록 (저장소 갱신 시 기존 답변 재사용용)"""
+        return [(entry.key, entry.question, self._read(entry), entry.generated_at)
+                for entry in self._entries.values()]
+    
+    def keys(self):
+        """저장된 질문 키 집합"""
+        return set(self._entries)
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def close(self):
+        if self._file is not None:
+            self._data.close()
+            self._file.close()
+            self._file = None
+    
+    def _read(self, entry):
+        """mmap에서 답변 본문 읽기"""
+        return self._data[entry.offset:entry.offset + entry.length].decode("utf-8")
+    
+    def _find_similar(self, key):
+        """가장 비슷한 저장소 키 (메모리 캐시와 같은 Dice 계수 기준)"""
+        return find_similar_key(key, self._ngram_index, self._ngram_counts.get, self.similarity_threshold)
+
+def _parse_header(data):
+    """MAGIC과 헤더 JSON을 읽어 (meta, StoredAnswer 목록) 반환 (offset은 파일 시작 기준으로 변환)"""
+    prefix_size = len(MAGIC) + _HEADER_LENGTH.size
+    if len(data) < prefix_size or data[:len(MAGIC)] != MAGIC:
+        raise AnswerStoreError("답변 저장소 파일이 아닙니다")
+    
+    (header_length,) = _HEADER_LENGTH.unpack_from(data, len(MAGIC))
+    body_start = prefix_size + header_length
+    if len(data) < body_start:
+        raise AnswerStoreError("헤더가 잘린 저장소 파일입니다")
+    
+    meta = json.loads(data[prefix_size:body_start].decode("utf-8"))
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise AnswerStoreError(f"지원하지 않는 저장소 형식 버전: {meta.get('format_version')}")
+    
+    entries = []
+    for key, question, offset, length, generated_at in meta.pop("entries"):
+        if body_start + offset + length > len(data):
+            raise AnswerStoreError(f"답변 위치가 파일 범위를 벗어났습니다: {key}")
+        entries.append(StoredAnswer(key, question, body_start + offset, length, generated_at))
+    return meta, entries
+
+def write_store(path, answers, kb_version, prompt_version, assistant_id=None, skipped_keys=()):
+    """답변 저장소 파일 쓰기 (임시 파일에 쓴 뒤 원자적으로 교체)
+    
+    Args:
+        answers: (원문 질문, 답변, 생성 시각) 목록, 정규화 키가 같으면 먼저 나온 것만 저장
+        skipped_keys: 필터에 걸려 답변을 저장하지 않은 질문 키 (버전이 같으면 다시 생성하지 않도록 기록)
+    
+    Returns:
+        저장한 답변 수
+    """
+    entries = []
+    chunks = []
+    offset = 0
+    seen = set()
+    for question, answer, generated_at in answers:
+        key = normalize_question(question)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        encoded = answer.encode("utf-8")
+        entries.append([key, question, offset, len(encoded), generated_at])
+        chunks.append(encoded)
+        offset += len(encoded)
+    
+    header = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "kb_version": kb_version,
+        "prompt_version": prompt_version,
+        "assistant_id": assistant_id,
+        "created_at": time.time(),
+        "skipped": sorted(skipped_keys),
+        "entries": entries,
+    }, ensure_ascii=False).encode("utf-8")
+    
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".answer_store.", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(_HEADER_LENGTH.pack(len(header)))
+            f.write(header)
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(entries)
+
+def load_answer_store(prompt_version, assistant_id=None, path=ANSWER_STORE_PATH,
+                      kb_version=KB_VERSION, enabled=ANSWER_STORE_ENABLED):
+    """봇 시작 시 사전 계산 저장소 열기 (없거나 버전이 현재 봇과 다르면 None)
+    
+    kb_version은 값 또는 값을 돌려주는 함수 (저장소 파일이 있을 때만 호출).
+    현재 지식 베이스 버전을 알 수 없으면 저장소 답변이 최신인지 확인할 수 없으므로 사용하지 않습니다.
+    """
+    if not enabled:
+        return None
+    try:
+        store = AnswerStore.open(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, AnswerStoreError) as e:
+        logger.warning(f"답변 저장소를 열지 못해 사용하지 않음 ({path}): {e}")
+        return None
+    
+    if callable(kb_version):
+        try:
+            kb_version = kb_version()
+        except Exception as e:
+            logger.warning(f"지식 베이스 버전을 계산하지 못해 답변 저장소를 사용하지 않음 ({path}): {e}")
+            store.close()
+            return None
+    if not kb_version:
+        logger.warning(f"지식 베이스 버전을 알 수 없어 답변 저장소를 사용하지 않음 ({path})")
+        store.close()
+        return None
+    
+    mismatch = store.mismatch(prompt_version=prompt_version, kb_version=kb_version, assistant_id=assistant_id)
+    if mismatch:
+        logger.warning(f"답변 저장소 버전이 달라 사용하지 않음 ({path}) - {mismatch}")
+        store.close()
+        return None
+    
+    logger.info(f"답변 저장소 로드: {len(store)}개 (KB {store.kb_version}, 프롬프트 {store.prompt_version})")
+    return store
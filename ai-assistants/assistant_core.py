@@ -0,0 +1,201 @@
+"""
+Assistant 공통 구성 모듈
+
+Slack 봇(slack_bot.py, slack_bot_async.py)과 답변 사전 계산 작업(precompute_answers.py)이 함께 쓰는
+OpenAI 클라이언트/호출 스케줄러, 지침 프롬프트, 질문/응답 필터, Run 관련 도우미를 모아 둡니다.
+Slack 앱을 만들지 않으므로 Slack 토큰 없이도 import할 수 있습니다.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from openai import OpenAI
+from dotenv import load_dotenv
+from thread_pool import ThreadPool
+from message_mirror import MessageMirror
+from keyword_matcher import KeywordConfig
+from prompt_templates import load_prompt
+from token_ledger import TokenLedger
+from openai_scheduler import OpenAICallScheduler, scheduled_client
+from metrics import GUARD_REJECTIONS
+
+# 환경변수 로드
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# OpenAI 호출 스케줄러 (RPM/TPM 한도, 재시도, circuit breaker, 비동기 클라이언트와 공유)
+openai_scheduler = OpenAICallScheduler()
+
+# OpenAI 클라이언트 초기화 (모든 호출이 스케줄러를 거침)
+openai_client = scheduled_client(OpenAI(api_key=os.getenv("OPENAI_API_KEY")), openai_scheduler)
+
+# Assistant ID
+ASSISTANT_ID = os.getenv("ASSISTANT_ID", "asst_dhCyBhWrMBqjd83HnjEbWUY5")
+
+# 새 대화는 create_and_run 한 번으로 시작 (Slack은 질문과 함께 Thread를 만들므로 빈 Thread를 미리 만들지 않음)
+thread_pool = ThreadPool(openai_client, target_size=0)
+
+# Thread별 최근 메시지 미러 (Run이 만든 메시지만 증분 조회)
+message_mirror = MessageMirror()
+
+# 엄격한 모드 지침 (prompts/ 폴더의 버전별 파일, 지정하지 않으면 최신 버전)
+STRICT_PROMPT = load_prompt("strict_mode", os.getenv("STRICT_PROMPT_VERSION") or None)
+
+# 지침 전달 방식: run(Run 지침으로 한 번 전달) 또는 message(이전 방식, 질문마다 메시지 본문에 포함)
+PROMPT_DELIVERY = os.getenv("PROMPT_DELIVERY", "run").lower()
+
+# Assistant 기본 지침 캐시 (create_and_run에 지침을 덧붙일 때 사용)
+assistant_instructions = None
+
+# Run별 토큰 사용량 기록 (사용자 / Thread / 프롬프트 버전별 집계)
+token_ledger = TokenLedger()
+
+# 지식 베이스 버전 (지정하지 않으면 Assistant 설정으로 계산, 답변 저장소 버전 비교에 사용)
+KB_VERSION = os.getenv("KB_VERSION")
+
+# 부트캠프 관련성 판단 키워드 (keywords.json, 파일이 바뀌면 자동으로 다시 로드)
+keyword_config = KeywordConfig()
+
+# 답변 길이 제한 (부트캠프 키워드 없이 이 길이를 넘으면 필터링)
+MAX_UNRELATED_RESPONSE_LENGTH = 500
+
+def remove_annotations(message_content):
+    """OpenAI 메시지에서 annotations(주석)을 제거하는 함수"""
+    if not message_content or not hasattr(message_content, 'text'):
+        return ""
+    
+    text_content = message_content.text
+    if not hasattr(text_content, 'value') or not hasattr(text_content, 'annotations'):
+        return text_content.value if hasattr(text_content, 'value') else str(text_content)
+    
+    # 원본 텍스트
+    full_text = text_content.value
+    
+    # annotations가 없으면 원본 반환
+    if not text_content.annotations:
+        return full_text
+    
+    # annotations를 뒤에서부터 제거 (인덱스 변화 방지)
+    annotations_sorted = sorted(text_content.annotations, 
+                               key=lambda x: x.start_index, reverse=True)
+    
+    clean_text = full_text
+    for annotation in annotations_sorted:
+        start = annotation.start_index
+        end = annotation.end_index
+        # annotation 부분을 제거
+        clean_text = clean_text[:start] + clean_text[end:]
+    
+    return clean_text.strip()
+
+def delete_remote_thread(thread_id):
+    """OpenAI 서버의 Thread 삭제"""
+    openai_client.beta.threads.delete(thread_id)
+    logger.info(f"Thread 삭제됨 - Thread: {thread_id}")
+
+def is_bootcamp_related(message):
+    """부트캠프 관련 질문인지 빠르게 판단하는 함수"""
+    matched = keyword_config.match_question(message)
+    if not matched:
+        logger.info(f"부트캠프 무관 질문으로 판단 (매칭된 키워드 없음): {message[:50]}")
+        GUARD_REJECTIONS.inc(stage="question", reason="no_keywords")
+    return bool(matched)
+
+def post_process_response(response, original_question):
+    """Assistant 응답을 후처리하여 부트캠프 관련성 확인"""
+    
+    # 응답을 한 번만 훑어 카테고리별 키워드 확인
+    matched = keyword_config.match_response(response)
+    
+    # 이미 운영진 문의 안내가 포함된 경우 그대로 반환
+    if "staff_notice" in matched:
+        return response
+    
+    # 부트캠프 관련 키워드가 전혀 없고, 무관한 키워드가 있다면 필터링
+    has_bootcamp_keywords = "bootcamp" in matched
+    has_non_bootcamp_keywords = "non_bootcamp" in matched
+    
+    if not has_bootcamp_keywords and has_non_bootcamp_keywords:
+        logger.info(f"부트캠프 무관 응답으로 필터링 - 무관 키워드: {sorted(matched['non_bootcamp'])}")
+        GUARD_REJECTIONS.inc(stage="response", reason="non_bootcamp_keywords")
+        return """죄송합니다. 해당 질문은 *AI 부트캠프와 직접적인 관련이 없는 것*으로 판단됩니다. 🤖
+
+*저에게 문의하실 수 있는 주제:*
+• 출결 관리 (출석, 결석, 지각, 조퇴)
+• 데일리 미션 및 과제 제출
+• 캡스톤 프로젝트 진행 방식
+• 피어세션 운영 방법
+• 커리큘럼 및 세션 일정
+• 수료 기준 및 평가
+• LMS 사용법
+
+*부트캠프 외의 질문*은 운영진에게 직접 문의해주시기 바랍니다.
+도움이 필요하면 언제든지 물어보세요! 😊"""
+
+    # 응답이 너무 길고 부트캠프 관련성이 의심스러운 경우
+    if len(response) > MAX_UNRELATED_RESPONSE_LENGTH and not has_bootcamp_keywords:
+        logger.info(f"부트캠프 키워드 없는 긴 응답으로 필터링 - 길이: {len(response)}")
+        GUARD_REJECTIONS.inc(stage="response", reason="long_unrelated")
+        return """답변이 너무 길어 *부트캠프와 관련이 없는 내용*일 가능성이 높습니다. 🤖
+
+정확한 답변을 위해 *운영진에게 직접 문의*해주시거나, 
+*부트캠프 관련 구체적인 키워드*를 포함하여 다시 질문해주세요.
+
+*예시:* "출결 규정", "데일리 미션 제출", "캡스톤 프로젝트 일정" 등
+
+도움이 필요하면 언제든지 물어보세요! 😊"""
+
+    # 정상적인 부트캠프 관련 응답으로 판단되면 그대로 반환
+    return response
+
+def build_user_message(message):
+    """Thread에 추가할 사용자 메시지 (지침은 run 단위로 전달하므로 질문만)
+    
+    PROMPT_DELIVERY=message면 이전처럼 지침 문구를 질문 앞에 붙입니다 (비교 측정용).
+    """
+    if PROMPT_DELIVERY == "message":
+        return f"{STRICT_PROMPT.text}\n\n📝 **사용자 질문:** {message}"
+    return message
+
+def load_assistant_instructions():
+    """Assistant 기본 지침 (처음 한 번만 조회하고 캐시)"""
+    global assistant_instructions
+    if assistant_instructions is None:
+        assistant_instructions = openai_client.beta.assistants.retrieve(assistant_id=ASSISTANT_ID).instructions or ""
+    return assistant_instructions
+
+def run_prompt_kwargs(new_thread=False):
+    """Run 생성 시 함께 보낼 지침 파라미터 및 프롬프트 버전 metadata
+    
+    runs.create는 additional_instructions로 지침을 덧붙이고, create_and_run은
+    additional_instructions를 지원하지 않으므로 Assistant 기본 지침 + 지침 문구를 instructions로 보냅니다.
+    """
+    kwargs = {"metadata": {"prompt_version": STRICT_PROMPT.label, "prompt_delivery": PROMPT_DELIVERY}}
+    if PROMPT_DELIVERY != "run":
+        return kwargs
+    if new_thread:
+        kwargs["instructions"] = f"{load_assistant_instructions()}\n\n{STRICT_PROMPT.text}".strip()
+    else:
+        kwargs["additional_instructions"] = STRICT_PROMPT.text
+    return kwargs
+
+def assistant_kb_version():
+    """Assistant 설정(모델, 지침, 도구, 연결된 파일)으로 계산한 지식 베이스 버전"""
+    assistant = openai_client.beta.assistants.retrieve(assistant_id=ASSISTANT_ID)
+    tool_resources = getattr(assistant, "tool_resources", None)
+    fingerprint = json.dumps({
+        "model": assistant.model,
+        "instructions": assistant.instructions,
+        "tools": [tool.model_dump() for tool in assistant.tools or []],
+        "tool_resources": tool_resources.model_dump() if tool_resources else None,
+    }, sort_keys=True, ensure_ascii=False)
+    return "assistant-" + hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:12]
+
+def current_kb_version():
+    """현재 지식 베이스 버전 (KB_VERSION, 없으면 Assistant 설정으로 계산)
+    
+    사전 계산 작업이 저장소에 쓰는 버전과 봇이 저장소를 열 때 비교하는 버전을 같은 방법으로 구합니다.
+    """
+    return KB_VERSION or assistant_kb_version()
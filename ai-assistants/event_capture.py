@@ -0,0 +1,119 @@
+"""
+Slack 이벤트 캡처 모듈
+
+부하 테스트 재생(replay_events.py)용으로 실제 `app_mention`, `message.im` 이벤트를 JSONL로 남깁니다.
+사용자/채널/팀 ID는 salt를 넣은 해시로 바꾸고, 본문의 사용자 멘션도 같은 방식으로 치환합니다.
+봇 멘션은 `<@BOT_USER>`로 바꿔 두어 재생할 때 대상 봇의 ID로 다시 채웁니다.
+blocks, 첨부 파일 등 원문이 남을 수 있는 필드는 저장하지 않습니다.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import secrets
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 캡처 설정 (환경변수로 조정 가능, 경로가 없으면 캡처하지 않음)
+SLACK_EVENT_CAPTURE_PATH = os.getenv("SLACK_EVENT_CAPTURE_PATH")
+# 같은 salt면 재시작 후에도 같은 사용자가 같은 익명 ID를 받음 (기본은 프로세스마다 새로 생성)
+SLACK_EVENT_CAPTURE_SALT = os.getenv("SLACK_EVENT_CAPTURE_SALT") or secrets.token_hex(16)
+
+BOT_USER_PLACEHOLDER = "BOT_USER"
+
+# 저장할 이벤트 필드 (나머지는 버림)
+EVENT_FIELDS = ("type", "subtype", "user", "bot_id", "text", "channel", "channel_type", "ts", "thread_ts", "event_ts")
+
+USER_MENTION_PATTERN = re.compile(r"<@([A-Z0-9]+)(\|[^>]*)?>")
+
+def anonymize_id(value, salt=SLACK_EVENT_CAPTURE_SALT):
+    """Slack ID를 같은 종류 접두어(U/C/D/T...)를 가진 해시 ID로 치환"""
+    if not value:
+        return value
+    digest = hashlib.sha256(f"{salt}:{value}".encode("utf-8")).hexdigest()[:10].upper()
+    return f"{value[0]}X{digest}"
+
+def anonymize_text(text, bot_user_id=None, salt=SLACK_EVENT_CAPTURE_SALT):
+    """본문의 사용자 멘션 치환 (봇 멘션은 자리표시자로)"""
+    def replace(match):
+        user_id = match.group(1)
+        if bot_user_id and user_id == bot_user_id:
+            return f"<@{BOT_USER_PLACEHOLDER}>"
+        return f"<@{anonymize_id(user_id, salt)}>"
+    
+    return USER_MENTION_PATTERN.sub(replace, text or "")
+
+def is_capturable(event):
+    """캡처 대상 이벤트인지 (봇 멘션, DM)"""
+    if event.get("bot_id") or event.get("subtype"):
+        return False
+    if event.get("type") == "app_mention":
+        return True
+    return event.get("type") == "message" and event.get("channel_type") == "im"
+
+def anonymize_body(body, bot_user_id=None, salt=SLACK_EVENT_CAPTURE_SALT):
+    """이벤트 envelope에서 필요한 필드만 남기고 ID/본문 익명화"""
+    event = {key: body["event"][key] for key in EVENT_FIELDS if key in body["event"]}
+    for key in ("user", "channel"):
+        event[key] = anonymize_id(event.get(key), salt)
+    event["text"] = anonymize_text(event.get("text"), bot_user_id, salt)
+    return {
+        "type": body.get("type", "event_callback"),
+        "team_id": anonymize_id(body.get("team_id"), salt),
+        "event_id": body.get("event_id"),
+        "event_time": body.get("event_time"),
+        "event": event,
+    }
+
+class EventCapture:
+    """익명화한 이벤트를 JSONL로 추가 기록"""
+    
+    def __init__(self, path=SLACK_EVENT_CAPTURE_PATH, salt=SLACK_EVENT_CAPTURE_SALT):
+        self.path = path
+        self.salt = salt
+        self.enabled = bool(path)
+        self.captured = 0
+        self._lock = threading.Lock()
+        self._file = None
+    
+    def record(self, body, bot_user_id=None):
+        """이벤트 요청 본문 하나 기록 (캡처 대상이 아니면 무시, 실패해도 봇 동작에는 영향 없음)"""
+        if not self.enabled or not isinstance(body, dict) or body.get("type") != "event_callback":
+            return
+        event = body.get("event") or {}
+        if not is_capturable(event):
+            return
+        
+        try:
+            line = json.dumps(
+                {"received_at": time.time(), "body": anonymize_body(body, bot_user_id, self.salt)},
+                ensure_ascii=False
+            )
+            with self._lock:
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._file.write(line + "\n")
+                self.captured += 1
+        except Exception as e:
+            logger.warning(f"이벤트 캡처 실패: {e}")
+    
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def load_events(path):
+    """캡처 파일 읽기 (received_at 순 정렬)"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    records.sort(key=lambda record: record["received_at"])
+    return records
@@ -0,0 +1,197 @@
+"""
+Slack 이벤트 중복 처리 방지 모듈
+
+Slack은 3초 안에 ack를 받지 못한 이벤트를 같은 `event_id`로 최대 3번 다시 보내고(X-Slack-Retry-Num),
+DM에서 봇을 멘션하면 하나의 메시지가 `app_mention`과 `message` 이벤트로 각각 도착합니다.
+중복 이벤트마다 질문이 다시 대기열에 들어가 messages.create + runs.create가 반복되므로,
+답변을 시작하기 전에 이벤트 키를 선점(claim)하고 이미 처리한 키면 건너뜁니다.
+
+- 이벤트 키: `event:{event_id}` (재전송), `msg:{client_msg_id}`, `ts:{channel}:{ts}` (같은 메시지의 다른 이벤트)
+- 기본은 프로세스 메모리 TTL + LRU 캐시
+- EVENT_DEDUP_DB_PATH를 지정하면 SQLite 파일을 공유하여 여러 프로세스(HTTP worker)가 함께 중복을 걸러냄
+"""
+
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+from metrics import DUPLICATE_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# 중복 방지 설정 (환경변수로 조정 가능)
+EVENT_DEDUP_ENABLED = os.getenv("EVENT_DEDUP_ENABLED", "true").lower() == "true"
+EVENT_DEDUP_TTL = float(os.getenv("EVENT_DEDUP_TTL", "900"))  # 처리한 키를 기억하는 시간(초, Slack 재전송은 약 5분 안에 끝남)
+EVENT_DEDUP_MAX_ENTRIES = int(os.getenv("EVENT_DEDUP_MAX_ENTRIES", "20000"))  # 메모리 캐시 최대 키 수
+EVENT_DEDUP_DB_PATH = os.getenv("EVENT_DEDUP_DB_PATH")  # 지정 시 SQLite 백엔드 (멀티 프로세스 배포용)
+PURGE_INTERVAL = 60  # SQLite에서 만료 키를 지우는 최소 간격(초)
+
+def event_keys(event, body=None):
+    """이벤트를 식별하는 키 목록 (하나라도 이미 처리했으면 중복)"""
+    keys = []
+    event_id = (body or {}).get("event_id")
+    if event_id:
+        keys.append(f"event:{event_id}")
+    if event.get("client_msg_id"):
+        keys.append(f"msg:{event['client_msg_id']}")
+    if event.get("channel") and event.get("ts"):
+        keys.append(f"ts:{event['channel']}:{event['ts']}")
+    return keys
+
+def duplicate_reason(key):
+    """중복으로 판정된 키의 사유 (retry: 같은 이벤트 재전송, delivery: 같은 메시지의 다른 이벤트)"""
+    return "retry" if key.startswith("event:") else "delivery"
+
+class EventDedupStats:
+    """중복 이벤트 통계"""
+    
+    def __init__(self):
+        self.checked = 0
+        self.claimed = 0
+        self.suppressed_retries = 0
+        self.suppressed_deliveries = 0
+        self.errors = 0  # 저장소 오류로 확인하지 못하고 처리한 횟수
+    
+    def as_dict(self):
+        """통계를 딕셔너리로 반환"""
+        return {
+            "checked": self.checked,
+            "claimed": self.claimed,
+            "suppressed_retries": self.suppressed_retries,
+            "suppressed_deliveries": self.suppressed_deliveries,
+            "errors": self.errors,
+        }
+
+class EventDeduplicator:
+    """TTL 기반 이벤트 키 저장소 (메모리 LRU 또는 공유 SQLite)"""
+    
+    def __init__(self, ttl_seconds=EVENT_DEDUP_TTL, max_entries=EVENT_DEDUP_MAX_ENTRIES,
+                 db_path=EVENT_DEDUP_DB_PATH, enabled=EVENT_DEDUP_ENABLED):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.enabled = enabled
+        self.stats = EventDedupStats()
+        self._lock = threading.Lock()
+        self._seen = OrderedDict()  # key -> 처리 시각 (메모리 백엔드)
+        self._conn = None
+        self._purged_at = 0.0
+        
+        if enabled and db_path:
+            # 다른 프로세스가 쓰는 중이면 잠시 기다림 (autocommit 모드에서 BEGIN IMMEDIATE로 직접 트랜잭션 관리)
+            self._conn = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS processed_events (
+                    event_key TEXT PRIMARY KEY,
+                    processed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_processed_events_at ON processed_events(processed_at)")
+    
+    def claim(self, keys):
+        """처음 보는 이벤트면 키를 기록하고 True, 이미 처리한 이벤트면 False
+        
+        저장소 오류 시에는 답변이 빠지는 것보다 중복 답변이 낫다고 보고 True를 반환합니다.
+        """
+        if not self.enabled or not keys:
+            return True
+        
+        with self._lock:
+            self.stats.checked += 1
+            try:
+                duplicate = self._claim_sqlite(keys) if self._conn else self._claim_memory(keys)
+            except sqlite3.Error as e:
+                self.stats.errors += 1
+                logger.warning(f"이벤트 중복 확인 실패 (그대로 처리): {e}")
+                return True
+            
+            if duplicate is None:
+                self.stats.claimed += 1
+                return True
+            
+            reason = duplicate_reason(duplicate)
+            if reason == "retry":
+                self.stats.suppressed_retries += 1
+            else:
+                self.stats.suppressed_deliveries += 1
+        
+        DUPLICATE_EVENTS.inc(reason=reason)
+        logger.info(f"중복 이벤트 무시 - 키: {duplicate} ({reason})")
+        return False
+    
+    async def async_claim(self, keys):
+        """claim의 비동기 버전 (SQLite 백엔드는 잠금 대기가 있을 수 있어 스레드에서 실행)"""
+        if self._conn is None:
+            return self.claim(keys)
+        return await asyncio.to_thread(self.claim, keys)
+    
+    def _claim_memory(self, keys):
+        """메모리 캐시에서 확인 후 기록, 이미 있던 키 반환 (없으면 None)"""
+        now = time.time()
+        cutoff = now - self.ttl_seconds
+        
+        # 오래된 것부터 만료 키 제거
+        while self._seen:
+            oldest_key, processed_at = next(iter(self._seen.items()))
+            if processed_at >= cutoff:
+                break
+            del self._seen[oldest_key]
+        
+        for key in keys:
+            if key in self._seen:
+                return key
+        
+        for key in keys:
+            self._seen[key] = now
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        return None
+    
+    def _claim_sqlite(self, keys):
+        """SQLite에서 확인 후 기록 (여러 프로세스가 같은 키를 동시에 선점하지 않도록 쓰기 잠금 안에서)"""
+        now = time.time()
+        cutoff = now - self.ttl_seconds
+        placeholders = ", ".join("?" * len(keys))
+        
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                f"SELECT event_key FROM processed_events WHERE event_key IN ({placeholders}) AND processed_at >= ? LIMIT 1",
+                (*keys, cutoff)
+            ).fetchone()
+            if row is None:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO processed_events (event_key, processed_at) VALUES (?, ?)",
+                    [(key, now) for key in keys]
+                )
+                if now - self._purged_at >= PURGE_INTERVAL:
+                    self._conn.execute("DELETE FROM processed_events WHERE processed_at < ?", (cutoff,))
+                    self._purged_at = now
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        
+        return row[0] if row else None
+    
+    def size(self):
+        """기억하고 있는 키 수"""
+        with self._lock:
+            if self._conn:
+                return self._conn.execute(
+                    "SELECT COUNT(*) FROM processed_events WHERE processed_at >= ?",
+                    (time.time() - self.ttl_seconds,)
+                ).fetchone()[0]
+            return len(self._seen)
+    
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
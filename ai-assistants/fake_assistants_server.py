@@ -0,0 +1,568 @@
+"""
+로컬 Assistants API / Slack Web API 대체 서버
+
+실제 OpenAI 키나 Slack 워크스페이스 없이 봇을 실행하고 성능을 측정할 수 있도록
+봇이 사용하는 Assistants 엔드포인트(assistants.retrieve, threads, messages, runs, 스트리밍)와
+Slack Web API 메서드(auth.test, chat.postMessage, chat.update, views.publish, users.info)를 흉내 냅니다.
+
+Run은 생성 시각 기준으로 queued → in_progress → completed(또는 failed) 상태를 거치며,
+각 구간 지연 시간, 실패 비율, "already has an active run" 충돌 비율, 오래 걸리는 Run 비율을 설정할 수 있습니다.
+runs.cancel을 받으면 cancelling을 거쳐 cancelled가 되고, 그 사이에 끝날 예정이던 Run은 그대로 완료됩니다.
+엔드포인트별 호출 수를 세어 답변 하나당 API 호출 수를 계산할 수 있습니다.
+
+사용법:
+    python fake_assistants_server.py --port 8765 --queue-latency 0.5 --progress-latency 1.5
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 SLACK_API_URL=http://127.0.0.1:8765/slack/api/ python slack_bot.py
+"""
+
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import parse_qsl
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STREAM_CANCEL_POLL = 0.05  # 스트리밍 중 취소 요청 확인 간격(초)
+
+DEFAULT_REPLY = (
+    "출결은 LMS 출석 체크로 관리되며, 지각·조퇴는 3회 누적 시 결석 1회로 처리됩니다. "
+    "자세한 사항은 운영진에게 문의해주세요."
+)
+
+class FakeServerConfig:
+    """대체 서버 동작 설정"""
+    
+    def __init__(self, queue_latency=0.3, progress_latency=1.0, jitter=0.2, failure_rate=0.0,
+                 conflict_rate=0.0, http_error_rate=0.0, slow_rate=0.0, slow_latency=60.0, cancel_latency=0.5,
+                 reply_text=DEFAULT_REPLY, stream_chunks=8, prompt_tokens=900, completion_tokens=120, seed=None):
+        """
+        Args:
+            queue_latency: Run이 queued 상태로 머무는 시간(초)
+            progress_latency: Run이 in_progress 상태로 머무는 시간(초)
+            jitter: 지연 시간 변동 비율 (0.2면 ±20%)
+            failure_rate: Run이 failed로 끝나는 비율
+            conflict_rate: 활성 Run이 없어도 "already has an active run"으로 거절하는 비율
+            http_error_rate: Run 생성 요청에 500 오류를 돌려주는 비율
+            slow_rate: in_progress 구간이 slow_latency초로 길어지는 Run 비율
+            cancel_latency: runs.cancel 후 cancelled가 되기까지 걸리는 시간(초)
+        """
+        self.queue_latency = queue_latency
+        self.progress_latency = progress_latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.conflict_rate = conflict_rate
+        self.http_error_rate = http_error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.cancel_latency = cancel_latency
+        self.reply_text = reply_text
+        self.stream_chunks = stream_chunks
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.random = random.Random(seed)
+    
+    def sample(self, latency):
+        """변동 비율을 적용한 지연 시간"""
+        if latency <= 0:
+            return 0.0
+        return max(latency * (1 + self.random.uniform(-self.jitter, self.jitter)), 0.0)
+
+class FakeAssistantsState:
+    """Thread / Message / Run 저장소와 호출 통계"""
+    
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.threads = {}  # thread_id -> {"messages": [...], "runs": [...], "created_at": ...}
+        self.runs = {}  # run_id -> run dict
+        self.schedules = {}  # run_id -> {"queued_until", "done_at", "fail"}
+        self.calls = Counter()  # "openai.runs.create" 같은 엔드포인트별 호출 수
+        self.slack_messages = {}  # (channel, ts) -> {"text", "thread_ts", "updates", "posted_at", ...}
+        self.slack_threads = {}  # (channel, thread_ts) -> [ts, ...]
+        self.slack_changed = threading.Condition(self.lock)
+        self._ids = Counter()
+    
+    def new_id(self, prefix):
+        """접두어별 일련번호 ID"""
+        with self.lock:
+            self._ids[prefix] += 1
+            return f"{prefix}_fake{self._ids[prefix]:08d}"
+    
+    def count(self, name):
+        with self.lock:
+            self.calls[name] += 1
+    
+    def reset_calls(self):
+        """호출 통계 초기화 (벤치마크 구간 시작 시)"""
+        with self.lock:
+            self.calls.clear()
+    
+    # ----- Assistants -----
+    
+    def create_thread(self, messages=()):
+        thread_id = self.new_id("thread")
+        with self.lock:
+            self.threads[thread_id] = {"messages": [], "runs": [], "created_at": int(time.time())}
+        for message in messages:
+            self.add_message(thread_id, message.get("role", "user"), message.get("content", ""))
+        return {"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}, "tool_resources": None}
+    
+    def add_message(self, thread_id, role, content, run_id=None):
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        message = {
+            "id": self.new_id("msg"),
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "role": role,
+            "content": [{"type": "text", "text": {"value": content, "annotations": []}}],
+            "run_id": run_id,
+            "assistant_id": None,
+            "attachments": [],
+            "metadata": {},
+            "status": "completed",
+            "incomplete_details": None,
+            "completed_at": int(time.time()),
+            "incomplete_at": None,
+        }
+        with self.lock:
+            self.threads[thread_id]["messages"].append(message)
+        return message
+    
+    def active_run(self, thread_id):
+        """Thread의 진행 중인 Run (없으면 None)"""
+        with self.lock:
+            run_ids = list(self.threads[thread_id]["runs"])
+        for run_id in reversed(run_ids):
+            run = self.advance(run_id)
+            if run["status"] in ("queued", "in_progress", "cancelling"):
+                return run
+        return None
+    
+    def create_run(self, thread_id, assistant_id, body):
+        """Run 생성 (상태 전환 시각을 미리 정해 둠)"""
+        config = self.config
+        now = time.time()
+        queued_until = now + config.sample(config.queue_latency)
+        progress_latency = config.slow_latency if config.random.random() < config.slow_rate else config.progress_latency
+        run = {
+            "id": self.new_id("run"),
+            "object": "thread.run",
+            "created_at": int(now),
+            "assistant_id": assistant_id,
+            "thread_id": thread_id,
+            "status": "queued",
+            "started_at": None,
+            "expires_at": int(now) + 600,
+            "cancelled_at": None,
+            "failed_at": None,
+            "completed_at": None,
+            "expired_at": None,
+            "incomplete_details": None,
+            "last_error": None,
+            "model": "gpt-4o-mini",
+            "instructions": body.get("instructions") or "",
+            "tools": [],
+            "metadata": body.get("metadata") or {},
+            "usage": None,
+            "required_action": None,
+            "response_format": "auto",
+            "tool_choice": "auto",
+            "parallel_tool_calls": True,
+            "truncation_strategy": {"type": "auto", "last_messages": None},
+            "max_prompt_tokens": None,
+            "max_completion_tokens": None,
+            "temperature": 1.0,
+            "top_p": 1.0,
+        }
+        with self.lock:
+            self.runs[run["id"]] = run
+            self.threads[thread_id]["runs"].append(run["id"])
+            self.schedules[run["id"]] = {
+                "queued_until": queued_until,
+                "done_at": queued_until + config.sample(progress_latency),
+                "fail": config.random.random() < config.failure_rate,
+                "cancel_at": None,
+            }
+        return dict(run)
+    
+    def advance(self, run_id, now=None):
+        """현재 시각 기준으로 Run 상태 갱신 후 복사본 반환 (완료 시 답변 메시지 추가)"""
+        now = now or time.time()
+        finished_message = None
+        with self.lock:
+            run = self.runs[run_id]
+            schedule = self.schedules[run_id]
+            if run["status"] == "queued" and now >= schedule["queued_until"]:
+                run["status"] = "in_progress"
+                run["started_at"] = int(schedule["queued_until"])
+            # 취소 요청 전에 끝날 예정이던 Run은 cancelling 중이어도 그대로 끝남
+            cancel_at = schedule["cancel_at"]
+            finishes = now >= schedule["done_at"] and (cancel_at is None or schedule["done_at"] <= cancel_at)
+            if run["status"] in ("in_progress", "cancelling") and finishes:
+                if schedule["fail"]:
+                    run["status"] = "failed"
+                    run["failed_at"] = int(schedule["done_at"])
+                    run["last_error"] = {"code": "server_error", "message": "Injected failure from fake server"}
+                else:
+                    run["status"] = "completed"
+                    run["completed_at"] = int(schedule["done_at"])
+                    finished_message = run["id"]
+                run["usage"] = {
+                    "prompt_tokens": self.config.prompt_tokens,
+                    "completion_tokens": self.config.completion_tokens if not schedule["fail"] else 0,
+                    "total_tokens": self.config.prompt_tokens + (self.config.completion_tokens if not schedule["fail"] else 0),
+                }
+            if run["status"] == "cancelling" and now >= cancel_at:
+                run["status"] = "cancelled"
+                run["cancelled_at"] = int(cancel_at)
+            snapshot = dict(run)
+        if finished_message:
+            self.add_message(snapshot["thread_id"], "assistant", self.config.reply_text, run_id=snapshot["id"])
+        return snapshot
+    
+    def cancel_run(self, run_id):
+        """취소 요청 (cancel_latency 뒤 cancelled), 이미 끝난 Run이면 None"""
+        run = self.advance(run_id)
+        if run["status"] not in ("queued", "in_progress"):
+            return None if run["status"] != "cancelling" else run
+        with self.lock:
+            run = self.runs[run_id]
+            run["status"] = "cancelling"
+            self.schedules[run_id]["cancel_at"] = time.time() + self.config.cancel_latency
+            return dict(run)
+    
+    def list_messages(self, thread_id, params):
+        with self.lock:
+            messages = list(self.threads[thread_id]["messages"])
+        if params.get("order", "desc") == "desc":
+            messages.reverse()
+        return _page(messages, params, run_id=params.get("run_id"))
+    
+    def list_runs(self, thread_id, params):
+        with self.lock:
+            run_ids = list(self.threads[thread_id]["runs"])
+        runs = [self.advance(run_id) for run_id in run_ids]
+        if params.get("order", "desc") == "desc":
+            runs.reverse()
+        return _page(runs, params)
+    
+    # ----- Slack -----
+    
+    def slack_post(self, channel, text, thread_ts=None):
+        with self.lock:
+            self._ids["slack_ts"] += 1
+            ts = f"{int(time.time())}.{self._ids['slack_ts']:06d}"
+            self.slack_messages[(channel, ts)] = {
+                "ts": ts, "text": text, "thread_ts": thread_ts, "updates": 0,
+                "posted_at": time.monotonic(), "first_updated_at": None, "updated_at": None,
+            }
+            self.slack_threads.setdefault((channel, thread_ts or ts), []).append(ts)
+            if not thread_ts:
+                # 스레드 밖 메시지는 (channel, None)으로도 찾을 수 있게 (DM 답변)
+                self.slack_threads.setdefault((channel, None), []).append(ts)
+            self.slack_changed.notify_all()
+        return ts
+    
+    def slack_update(self, channel, ts, text):
+        with self.lock:
+            message = self.slack_messages.get((channel, ts))
+            if message is None:
+                return False
+            message["text"] = text
+            message["updates"] += 1
+            message["updated_at"] = time.monotonic()
+            message["first_updated_at"] = message["first_updated_at"] or message["updated_at"]
+            self.slack_changed.notify_all()
+        return True
+    
+    def slack_thread_messages(self, channel, thread_ts):
+        """스레드(channel, thread_ts)의 메시지 복사본 목록 (thread_ts가 None이면 채널 메시지)"""
+        with self.lock:
+            return [dict(self.slack_messages[(channel, ts)]) for ts in self.slack_threads.get((channel, thread_ts), ())]
+    
+    def wait_for_slack_reply(self, channel, thread_ts, predicate, timeout=120):
+        """스레드(channel, thread_ts)의 메시지 중 predicate를 만족하는 것이 생길 때까지 대기 (thread_ts가 None이면 채널 메시지)
+        
+        Returns:
+            조건을 만족한 메시지 복사본 (시간 초과 시 None)
+        """
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while True:
+                for ts in self.slack_threads.get((channel, thread_ts), ()):
+                    message = self.slack_messages[(channel, ts)]
+                    if predicate(message):
+                        return dict(message)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.slack_changed.wait(remaining)
+
+def _page(items, params, run_id=None):
+    """cursor 페이지 응답 (after는 전체 목록 기준 위치, run_id 필터는 그 뒤에 적용)"""
+    after = params.get("after")
+    if after:
+        ids = [item["id"] for item in items]
+        items = items[ids.index(after) + 1:] if after in ids else []
+    if run_id:
+        items = [item for item in items if item["run_id"] == run_id]
+    limit = int(params.get("limit", 20))
+    page = items[:limit]
+    return {
+        "object": "list",
+        "data": page,
+        "first_id": page[0]["id"] if page else None,
+        "last_id": page[-1]["id"] if page else None,
+        "has_more": len(items) > limit,
+    }
+
+def _error(status_code, message, error_type="invalid_request_error"):
+    return JSONResponse(status_code=status_code, content={"error": {"message": message, "type": error_type, "code": None, "param": None}})
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _sleep_unless_cancelled(schedule, seconds):
+    """seconds초 대기 (취소 요청이 들어오면 바로 False)"""
+    wake_at = time.time() + max(seconds, 0)
+    while schedule["cancel_at"] is None:
+        remaining = wake_at - time.time()
+        if remaining <= 0:
+            return True
+        await asyncio.sleep(min(remaining, STREAM_CANCEL_POLL))
+    return False
+
+async def _run_events(state, run_id, thread=None):
+    """스트리밍 Run 이벤트 (상태 전환 시각에 맞춰 전송)"""
+    schedule = state.schedules[run_id]
+    if thread is not None:
+        yield _sse("thread.created", thread)
+    yield _sse("thread.run.created", state.advance(run_id))
+    yield _sse("thread.run.queued", state.advance(run_id))
+    
+    # sleep이 예정 시각보다 조금 일찍 깰 수 있으므로 상태 전환 시각을 기준으로 갱신
+    await asyncio.sleep(max(schedule["queued_until"] - time.time(), 0))
+    yield _sse("thread.run.in_progress", state.advance(run_id, now=max(time.time(), schedule["queued_until"])))
+    
+    # 답변 텍스트를 in_progress 구간에 나눠서 전송
+    text = state.config.reply_text
+    chunks = max(state.config.stream_chunks, 1)
+    size = max(len(text) // chunks, 1)
+    pieces = [text[index:index + size] for index in range(0, len(text), size)]
+    message_id = state.new_id("msg")
+    step = max(schedule["done_at"] - time.time(), 0) / (len(pieces) + 1)
+    if not schedule["fail"]:
+        for piece in pieces:
+            if not await _sleep_unless_cancelled(schedule, step):
+                break
+            yield _sse("thread.message.delta", {
+                "id": message_id,
+                "object": "thread.message.delta",
+                "delta": {"content": [{"index": 0, "type": "text", "text": {"value": piece, "annotations": []}}]},
+            })
+    
+    if await _sleep_unless_cancelled(schedule, schedule["done_at"] - time.time()):
+        run = state.advance(run_id, now=max(time.time(), schedule["done_at"]))
+    else:
+        # 취소 요청을 받으면 cancelling 이벤트 후 Run이 끝날 때까지 대기
+        yield _sse("thread.run.cancelling", state.advance(run_id))
+        run = state.advance(run_id)
+        while run["status"] == "cancelling":
+            await asyncio.sleep(STREAM_CANCEL_POLL)
+            run = state.advance(run_id)
+    if run["status"] == "completed":
+        message = state.list_messages(run["thread_id"], {"run_id": run_id, "order": "asc"})["data"][0]
+        yield _sse("thread.message.completed", message)
+    yield _sse(f"thread.run.{run['status']}", run)
+    yield "event: done\ndata: [DONE]\n\n"
+
+async def _body(request):
+    """JSON 또는 form 본문"""
+    raw = await request.body()
+    if not raw:
+        return {}
+    if request.headers.get("content-type", "").startswith("application/json"):
+        return json.loads(raw)
+    return dict(parse_qsl(raw.decode("utf-8")))
+
+def create_app(state):
+    """대체 서버 FastAPI 앱"""
+    app = FastAPI(title="Fake Assistants API", docs_url=None, redoc_url=None, openapi_url=None)
+    config = state.config
+    
+    def start_run(thread_id, assistant_id, body, thread=None):
+        """Run 생성 공통 처리 (오류/충돌 주입, 스트리밍 여부)"""
+        if config.random.random() < config.http_error_rate:
+            return _error(500, "Injected server error from fake server", "server_error")
+        active = state.active_run(thread_id) if thread is None else None
+        if active or (thread is None and config.random.random() < config.conflict_rate):
+            run_id = active["id"] if active else "run_injected"
+            return _error(400, f"Thread {thread_id} already has an active run {run_id}.")
+        run = state.create_run(thread_id, assistant_id, body)
+        if body.get("stream"):
+            return StreamingResponse(_run_events(state, run["id"], thread), media_type="text/event-stream")
+        return run
+    
+    @app.get("/v1/assistants/{assistant_id}")
+    def retrieve_assistant(assistant_id: str):
+        state.count("openai.assistants.retrieve")
+        return {
+            "id": assistant_id, "object": "assistant", "created_at": 0, "name": "Fake Assistant",
+            "description": None, "model": "gpt-4o-mini", "instructions": "AI 부트캠프 FAQ 봇입니다.",
+            "tools": [], "metadata": {}, "response_format": "auto", "temperature": 1.0, "top_p": 1.0,
+        }
+    
+    @app.post("/v1/threads")
+    async def create_thread(request: Request):
+        state.count("openai.threads.create")
+        body = await _body(request)
+        return state.create_thread(body.get("messages") or ())
+    
+    @app.post("/v1/threads/runs")
+    async def create_and_run(request: Request):
+        state.count("openai.threads.create_and_run")
+        body = await _body(request)
+        thread = state.create_thread((body.get("thread") or {}).get("messages") or ())
+        return start_run(thread["id"], body.get("assistant_id"), body, thread=thread)
+    
+    @app.delete("/v1/threads/{thread_id}")
+    def delete_thread(thread_id: str):
+        state.count("openai.threads.delete")
+        with state.lock:
+            state.threads.pop(thread_id, None)
+        return {"id": thread_id, "object": "thread.deleted", "deleted": True}
+    
+    @app.post("/v1/threads/{thread_id}/messages")
+    async def create_message(thread_id: str, request: Request):
+        state.count("openai.messages.create")
+        if thread_id not in state.threads:
+            return _error(404, f"No thread found with id '{thread_id}'.")
+        body = await _body(request)
+        if state.active_run(thread_id):
+            return _error(400, f"Can't add messages to {thread_id} while a run is active.")
+        return state.add_message(thread_id, body.get("role", "user"), body.get("content", ""))
+    
+    @app.get("/v1/threads/{thread_id}/messages")
+    def list_messages(thread_id: str, request: Request):
+        state.count("openai.messages.list")
+        if thread_id not in state.threads:
+            return _error(404, f"No thread found with id '{thread_id}'.")
+        return state.list_messages(thread_id, dict(request.query_params))
+    
+    @app.post("/v1/threads/{thread_id}/runs")
+    async def create_run(thread_id: str, request: Request):
+        state.count("openai.runs.create")
+        if thread_id not in state.threads:
+            return _error(404, f"No thread found with id '{thread_id}'.")
+        body = await _body(request)
+        return start_run(thread_id, body.get("assistant_id"), body)
+    
+    @app.get("/v1/threads/{thread_id}/runs")
+    def list_runs(thread_id: str, request: Request):
+        state.count("openai.runs.list")
+        if thread_id not in state.threads:
+            return _error(404, f"No thread found with id '{thread_id}'.")
+        return state.list_runs(thread_id, dict(request.query_params))
+    
+    @app.get("/v1/threads/{thread_id}/runs/{run_id}")
+    def retrieve_run(thread_id: str, run_id: str):
+        state.count("openai.runs.retrieve")
+        if run_id not in state.runs:
+            return _error(404, f"No run found with id '{run_id}'.")
+        return state.advance(run_id)
+    
+    @app.post("/v1/threads/{thread_id}/runs/{run_id}/cancel")
+    def cancel_run(thread_id: str, run_id: str):
+        state.count("openai.runs.cancel")
+        if run_id not in state.runs:
+            return _error(404, f"No run found with id '{run_id}'.")
+        run = state.cancel_run(run_id)
+        if run is None:
+            return _error(400, f"Cannot cancel run with status '{state.advance(run_id)['status']}'.")
+        return run
+    
+    @app.post("/v1/chat/completions")
+    def chat_completion():
+        state.count("openai.chat.completions")
+        return {
+            "id": state.new_id("chatcmpl"), "object": "chat.completion", "created": int(time.time()), "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "이전 대화 요약"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110},
+        }
+    
+    @app.post("/slack/api/{method}")
+    async def slack_method(method: str, request: Request):
+        state.count(f"slack.{method}")
+        body = await _body(request)
+        if method == "auth.test":
+            return {"ok": True, "user_id": "UFAKEBOT", "bot_id": "BFAKEBOT", "team_id": "TFAKE", "user": "fake-bot"}
+        if method == "chat.postMessage":
+            ts = state.slack_post(body.get("channel"), body.get("text"), body.get("thread_ts"))
+            return {"ok": True, "channel": body.get("channel"), "ts": ts, "message": {"text": body.get("text"), "ts": ts}}
+        if method == "chat.update":
+            if not state.slack_update(body.get("channel"), body.get("ts"), body.get("text")):
+                return {"ok": False, "error": "message_not_found"}
+            return {"ok": True, "channel": body.get("channel"), "ts": body.get("ts"), "text": body.get("text")}
+        if method == "users.info":
+            return {"ok": True, "user": {"id": body.get("user"), "name": "fake-user", "real_name": "Fake User"}}
+        return {"ok": True}
+    
+    return app
+
+def start_fake_server(config=None, host="127.0.0.1", port=8765):
+    """대체 서버를 백그라운드 스레드에서 실행하고 시작될 때까지 대기
+    
+    Returns:
+        (uvicorn.Server, FakeAssistantsState)
+    """
+    state = FakeAssistantsState(config or FakeServerConfig())
+    server = uvicorn.Server(uvicorn.Config(create_app(state), host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="fake-assistants-server", daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return server, state
+
+def add_config_arguments(parser):
+    """대체 서버 설정 옵션 (벤치마크 스크립트와 공유)"""
+    parser.add_argument("--queue-latency", type=float, default=0.3, help="Run queued 구간(초)")
+    parser.add_argument("--progress-latency", type=float, default=1.0, help="Run in_progress 구간(초)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="지연 시간 변동 비율")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Run 실패 비율")
+    parser.add_argument("--conflict-rate", type=float, default=0.0, help="active run 충돌 주입 비율")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="Run 생성 500 오류 비율")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="in_progress가 --slow-latency초로 길어지는 Run 비율")
+    parser.add_argument("--slow-latency", type=float, default=60.0, help="오래 걸리는 Run의 in_progress 구간(초)")
+    parser.add_argument("--seed", type=int, default=None)
+
+def config_from_args(args):
+    return FakeServerConfig(
+        queue_latency=args.queue_latency,
+        progress_latency=args.progress_latency,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        conflict_rate=args.conflict_rate,
+        http_error_rate=args.http_error_rate,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        seed=args.seed,
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="로컬 Assistants API / Slack Web API 대체 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    
+    state = FakeAssistantsState(config_from_args(args))
+    print(f"🧪 대체 서버: OPENAI_BASE_URL=http://{args.host}:{args.port}/v1  SLACK_API_URL=http://{args.host}:{args.port}/slack/api/")
+    uvicorn.run(create_app(state), host=args.host, port=args.port, log_level="warning")
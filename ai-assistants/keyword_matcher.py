@@ -0,0 +1,167 @@
+"""
+다중 키워드 매칭 모듈
+
+부트캠프 관련성 판단(is_bootcamp_related)과 응답 후처리(post_process_response)에서 쓰는
+키워드들을 Aho-Corasick 오토마톤으로 한 번에 컴파일해 두고, 텍스트를 한 번만 훑어
+어떤 카테고리의 어떤 키워드가 등장했는지 반환합니다.
+키워드는 keywords.json에서 읽으며, 파일이 바뀌면 재시작 없이 다시 로드합니다.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# 키워드 설정 파일 경로
+KEYWORDS_PATH = os.getenv("KEYWORDS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "keywords.json"))
+KEYWORDS_RELOAD_CHECK_INTERVAL = float(os.getenv("KEYWORDS_RELOAD_CHECK_INTERVAL", "5"))  # 파일 변경 확인 간격(초)
+
+class KeywordMatcher:
+    """카테고리별 키워드를 한 번에 찾는 Aho-Corasick 오토마톤 (대소문자 무시, 겹치는 키워드도 모두 탐지)"""
+    
+    def __init__(self, categories):
+        """
+        Args:
+            categories: {카테고리 이름: [키워드, ...]}
+        """
+        self.categories = {name: list(keywords) for name, keywords in categories.items()}
+        self.max_keyword_length = 0
+        
+        # 상태별 전이표, 실패 링크, 출력(해당 상태에서 끝나는 (카테고리, 키워드) 목록)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        
+        for category, keywords in self.categories.items():
+            for keyword in keywords:
+                self._add(keyword.lower(), (category, keyword))
+                self.max_keyword_length = max(self.max_keyword_length, len(keyword))
+        
+        self._build_failure_links()
+    
+    def _add(self, keyword, payload):
+        """키워드를 trie에 추가"""
+        if not keyword:
+            return
+        
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(payload)
+    
+    def _build_failure_links(self):
+        """BFS로 실패 링크를 만들고 출력 목록을 합침"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+    
+    def feed(self, text, state=0):
+        """텍스트를 이어서 훑기 (스트리밍용)
+        
+        Returns:
+            ({카테고리: {키워드, ...}}, 다음 호출에 넘길 state)
+        """
+        matches = {}
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for category, keyword in output[state]:
+                matches.setdefault(category, set()).add(keyword)
+        
+        return matches, state
+    
+    def match(self, text):
+        """텍스트에 등장한 카테고리별 키워드 ({카테고리: {키워드, ...}}, 없으면 빈 딕셔너리)"""
+        matches, _ = self.feed(text)
+        return matches
+
+class KeywordConfig:
+    """keywords.json을 읽어 질문용/응답용 매처를 만들고, 파일이 바뀌면 다시 로드"""
+    
+    def __init__(self, path=KEYWORDS_PATH, check_interval=KEYWORDS_RELOAD_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._last_checked = 0.0
+        self.question_matcher = None
+        self.response_matcher = None
+        self.reload()
+    
+    def reload(self):
+        """설정 파일을 읽어 매처를 새로 만들기 (실패하면 기존 매처 유지)
+        
+        Returns:
+            다시 로드했으면 True
+        """
+        with self._lock:
+            mtime = None
+            try:
+                mtime = os.path.getmtime(self.path)
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+                
+                question_matcher = KeywordMatcher(config["question"])
+                response_matcher = KeywordMatcher(config["response"])
+            except Exception as e:
+                if self.question_matcher is None:
+                    raise
+                logger.error(f"키워드 설정 로드 실패 (기존 설정 유지): {str(e)}")
+                # 같은 파일로 다시 시도하지 않도록 수정 시각은 기록
+                self._mtime = mtime
+                return False
+            
+            # 두 매처를 함께 교체
+            self.question_matcher, self.response_matcher = question_matcher, response_matcher
+            self._mtime = mtime
+            self._last_checked = time.monotonic()
+        
+        logger.info(f"키워드 설정 로드됨: {self.path}")
+        return True
+    
+    def reload_if_changed(self):
+        """일정 간격마다 파일 수정 시각을 확인해 바뀌었으면 다시 로드"""
+        now = time.monotonic()
+        if now - self._last_checked < self.check_interval:
+            return False
+        
+        self._last_checked = now
+        try:
+            changed = os.path.getmtime(self.path) != self._mtime
+        except OSError:
+            return False
+        return self.reload() if changed else False
+    
+    def match_question(self, text):
+        """질문에 등장한 부트캠프 주제 카테고리별 키워드"""
+        self.reload_if_changed()
+        return self.question_matcher.match(text)
+    
+    def match_response(self, text):
+        """응답에 등장한 카테고리(staff_notice, bootcamp, non_bootcamp)별 키워드"""
+        self.reload_if_changed()
+        return self.response_matcher.match(text)
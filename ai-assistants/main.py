@@ -1,18 +1,40 @@
 import os
-import time
+import uvicorn
 import gradio as gr
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+from run_waiter import async_wait_for_run
+from thread_pool import AsyncThreadPool
+from message_mirror import MessageMirror
+from metrics import create_metrics_app
+from openai_scheduler import OpenAICallScheduler, OpenAIUnavailable, scheduled_client
 
-# OpenAI 클라이언트 초기화
-client = OpenAI(
+# OpenAI 호출 스케줄러 (RPM/TPM 한도, 재시도, circuit breaker)
+openai_scheduler = OpenAICallScheduler()
+
+# OpenAI 클라이언트 초기화 (시작 시 Assistant 확인용 동기 클라이언트, 채팅 핸들러용 비동기 클라이언트)
+client = scheduled_client(OpenAI(
     api_key=os.getenv("OPENAI_API_KEY")  # 환경변수에서 API 키 가져오기
-)
+), openai_scheduler)
+async_client = scheduled_client(AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")), openai_scheduler)
 
 # Assistant ID (이미 만든 Assistant)
 ASSISTANT_ID = "asst_dhCyBhWrMBqjd83HnjEbWUY5"
 
-# 전역 변수로 thread와 assistant 정보 저장
-current_thread = None
+# 미리 만들어 둔 빈 Thread 풀 (세션 시작, 새 대화 시 threads.create 왕복 생략)
+thread_pool = AsyncThreadPool(async_client)
+
+# 세션 Thread별 최근 메시지 미러 (Run이 만든 메시지만 증분 조회)
+message_mirror = MessageMirror()
+
+# 웹 서버 주소 (Gradio UI와 /metrics를 같은 포트로 제공)
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "7860"))
+
+# Gradio 큐 설정 (동시에 처리할 채팅 요청 수, 대기열 최대 길이)
+GRADIO_CONCURRENCY_LIMIT = int(os.getenv("GRADIO_CONCURRENCY_LIMIT", "32"))
+GRADIO_QUEUE_MAX_SIZE = int(os.getenv("GRADIO_QUEUE_MAX_SIZE", "256"))
+
+# Assistant 정보 (모든 세션이 공유, Thread는 세션별로 gr.State에 저장)
 assistant_info = None
 
 def remove_annotations(message_content):
@@ -45,100 +67,179 @@ def remove_annotations(message_content):
     return clean_text.strip()
 
 def initialize_assistant():
-    """Assistant와 Thread 초기화"""
-    global current_thread, assistant_info
+    """Assistant 정보 확인 (Thread는 브라우저 세션마다 따로 생성)"""
+    global assistant_info
     
     try:
         # Assistant 정보 가져오기
         assistant_info = client.beta.assistants.retrieve(assistant_id=ASSISTANT_ID)
         
-        # 새로운 Thread 생성
-        current_thread = client.beta.threads.create()
-        
-        return f"✅ Assistant '{assistant_info.name}' 연결됨\n📝 {assistant_info.description}\n🆔 Thread ID: {current_thread.id}"
+        return f"✅ Assistant '{assistant_info.name}' 연결됨\n📝 {assistant_info.description}"
     
     except Exception as e:
         return f"❌ 초기화 오류: {str(e)}\nAPI 키가 올바르게 설정되어 있는지 확인해주세요."
 
-def chat_with_assistant(message, history):
-    """Assistant와 채팅하는 함수"""
-    global current_thread
+async def start_session(init_message):
+    """브라우저 세션이 열릴 때 해당 세션 전용 Thread 생성
+    
+    Returns:
+        (Thread ID, 연결 상태 메시지)
+    """
+    if init_message.startswith("❌"):
+        return None, init_message
+    
+    try:
+        thread_id = await thread_pool.acquire()
+        return thread_id, f"{init_message}\n🆔 Thread ID: {thread_id}"
+    except Exception as e:
+        return None, f"❌ Thread 생성 오류: {str(e)}"
+
+def strip_streaming_annotations(text, annotation_texts):
+    """스트리밍 중 누적된 텍스트에서 annotations(주석)을 제거하는 함수"""
+    for annotation_text in annotation_texts:
+        text = text.replace(annotation_text, "")
+    
+    # 아직 닫히지 않은 인용 표시(【...)는 보류
+    open_index = text.rfind("【")
+    if open_index != -1 and "】" not in text[open_index:]:
+        text = text[:open_index]
     
-    if not current_thread:
-        return history + [("시스템 오류", "❌ Thread가 초기화되지 않았습니다. 페이지를 새로고침해주세요.")]
+    return text.strip()
+
+async def chat_with_assistant(message, history, thread_id):
+    """Assistant와 채팅하는 함수 (텍스트 델타가 도착할 때마다 history를 yield)"""
+    if not thread_id:
+        yield history + [("시스템 오류", "❌ Thread가 초기화되지 않았습니다. 페이지를 새로고침해주세요.")]
+        return
     
     if not message.strip():
-        return history
+        yield history
+        return
     
     try:
         # 사용자 메시지를 history에 추가
         history = history + [(message, None)]
+        yield history
         
         # Thread에 메시지 추가
-        client.beta.threads.messages.create(
-            thread_id=current_thread.id,
+        user_message = await async_client.beta.threads.messages.create(
+            thread_id=thread_id,
             role="user",
             content=message
         )
+        message_mirror.record(thread_id, user_message)
         
-        # Run 생성 및 실행
-        run = client.beta.threads.runs.create(
-            thread_id=current_thread.id,
-            assistant_id=ASSISTANT_ID
+        # Run 생성 및 스트리밍 실행
+        stream = await async_client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=ASSISTANT_ID,
+            stream=True
         )
         
-        # Run 완료 대기
-        while run.status in ['queued', 'in_progress', 'cancelling']:
-            time.sleep(1)
-            run = client.beta.threads.runs.retrieve(
-                thread_id=current_thread.id,
-                run_id=run.id
-            )
+        raw_text = ""
+        annotation_texts = set()
+        run = None
+        run_finished = False
         
-        if run.status == 'completed':
-            # 최신 메시지들 가져오기
-            messages = client.beta.threads.messages.list(
-                thread_id=current_thread.id
-            )
-            
-            # Assistant의 응답 찾기 (가장 최근 메시지)
-            for msg in messages.data:
-                if msg.role == "assistant":
-                    # annotations(주석) 제거한 깔끔한 응답 생성
-                    clean_response = remove_annotations(msg.content[0])
+        async with stream:
+            async for event in stream:
+                if event.event == "thread.run.created":
+                    run = event.data
+                
+                elif event.event == "thread.message.delta":
+                    for content in event.data.delta.content or []:
+                        if content.type == "text" and content.text:
+                            raw_text += content.text.value or ""
+                            for annotation in content.text.annotations or []:
+                                if annotation.text:
+                                    annotation_texts.add(annotation.text)
+                    
                     # history 업데이트 (마지막 메시지의 응답 부분)
-                    history[-1] = (message, clean_response)
+                    partial_response = strip_streaming_annotations(raw_text, annotation_texts)
+                    if partial_response:
+                        history[-1] = (message, partial_response)
+                        yield history
+                
+                elif event.event == "thread.message.completed":
+                    # 완성된 답변은 다시 조회하지 않도록 미러에 기록
+                    message_mirror.record(thread_id, event.data, from_stream=True)
+                
+                elif event.event == "thread.run.completed":
+                    run_finished = True
+                    # annotations(주석) 제거한 깔끔한 응답 생성
+                    clean_response = strip_streaming_annotations(raw_text, annotation_texts)
+                    history[-1] = (message, clean_response or "❌ 응답을 받지 못했습니다.")
+                
+                elif event.event == "thread.run.failed":
+                    error_msg = f"❌ 오류 발생: {event.data.last_error}"
+                    history[-1] = (message, error_msg)
+                    run_finished = True
+                    break
+                
+                elif event.event == "thread.run.requires_action":
+                    action_msg = "⚠️ 추가 작업이 필요합니다. (Function calling 등)"
+                    history[-1] = (message, action_msg)
+                    run_finished = True
+                    break
+                
+                elif event.event in ("thread.run.cancelled", "thread.run.expired", "thread.run.incomplete"):
+                    status_msg = f"⚠️ 예상치 못한 상태: {event.data.status}"
+                    history[-1] = (message, status_msg)
+                    run_finished = True
+                    break
+                
+                elif event.event == "error":
+                    error_msg = f"❌ 오류 발생: {event.data}"
+                    history[-1] = (message, error_msg)
+                    run_finished = True
                     break
         
-        elif run.status == 'failed':
-            error_msg = f"❌ 오류 발생: {run.last_error}"
-            history[-1] = (message, error_msg)
-        
-        elif run.status == 'requires_action':
-            action_msg = "⚠️ 추가 작업이 필요합니다. (Function calling 등)"
-            history[-1] = (message, action_msg)
+        # 스트림이 종료 이벤트 없이 끊긴 경우 Run 상태를 polling으로 확인
+        if not run_finished and run:
+            run, _ = await async_wait_for_run(async_client, thread_id, run, timeout=60)
+            if run.status == 'completed':
+                # 이번 Run이 만든 응답만 가져오기
+                msg = await message_mirror.async_fetch_run_reply(async_client, thread_id, run.id)
+                if msg:
+                    history[-1] = (message, remove_annotations(msg.content[0]))
+            else:
+                history[-1] = (message, f"⚠️ 예상치 못한 상태: {run.status}")
         
-        else:
-            status_msg = f"⚠️ 예상치 못한 상태: {run.status}"
-            history[-1] = (message, status_msg)
+        if history[-1][1] is None:
+            history[-1] = (message, "⚠️ 스트림이 예상치 못하게 종료되었습니다.")
     
     except Exception as e:
-        error_msg = f"❌ 오류가 발생했습니다: {str(e)}"
-        if history and history[-1][1] is None:
+        if isinstance(e, OpenAIUnavailable):
+            error_msg = f"⚠️ AI 답변 서버가 일시적으로 불안정합니다. {e.retry_after:.0f}초 뒤 다시 시도해주세요."
+        else:
+            error_msg = f"❌ 오류가 발생했습니다: {str(e)}"
+        if history and history[-1][0] == message:
             history[-1] = (message, error_msg)
         else:
             history = history + [(message, error_msg)]
     
-    return history
+    yield history
 
-def clear_chat():
-    """새로운 대화 시작"""
-    global current_thread
+async def clear_chat(thread_id):
+    """새로운 대화 시작 (이 세션의 Thread만 교체)
+    
+    Returns:
+        (빈 history, 상태 메시지, 새 Thread ID)
+    """
     try:
-        current_thread = client.beta.threads.create()
-        return [], f"🔄 새로운 대화가 시작되었습니다.\n🆔 Thread ID: {current_thread.id}"
+        new_thread_id = await thread_pool.acquire()
     except Exception as e:
-        return [], f"❌ 새 대화 생성 오류: {str(e)}"
+        return [], f"❌ 새 대화 생성 오류: {str(e)}", thread_id
+    
+    # 이전 Thread는 서버에서 삭제 (실패해도 새 대화는 계속 진행)
+    if thread_id:
+        message_mirror.forget(thread_id)
+        try:
+            await async_client.beta.threads.delete(thread_id)
+        except Exception:
+            pass
+    
+    return [], f"🔄 새로운 대화가 시작되었습니다.\n🆔 Thread ID: {new_thread_id}", new_thread_id
 
 # Gradio 인터페이스 생성
 def create_gradio_app():
@@ -170,7 +271,7 @@ def create_gradio_app():
         }
         """
     ) as app:
-        
+    
         gr.Markdown(
             """
             # 🤖 OpenAI Assistant 채팅봇
@@ -179,6 +280,9 @@ def create_gradio_app():
             """
         )
         
+        # 세션별 Thread ID (브라우저 탭마다 별도의 대화)
+        thread_state = gr.State(None)
+        
         # 초기화 상태 표시
         status_box = gr.Textbox(
             value=init_message,
@@ -208,34 +312,44 @@ def create_gradio_app():
         
         with gr.Row():
             clear_btn = gr.Button("🔄 새 대화", variant="secondary")
-            
+        
         # 이벤트 핸들러
-        def submit_message(message, history):
-            new_history = chat_with_assistant(message, history)
-            return new_history, ""
+        async def submit_message(message, history, thread_id):
+            async for new_history in chat_with_assistant(message, history, thread_id):
+                yield new_history, ""
         
-        def handle_clear():
-            new_history, status = clear_chat()
-            return new_history, status
+        async def handle_session_start():
+            return await start_session(init_message)
+        
+        # 페이지가 열릴 때 세션 전용 Thread 생성
+        app.load(
+            fn=handle_session_start,
+            outputs=[thread_state, status_box]
+        )
         
-        # 전송 버튼 클릭 시
+        # 전송 버튼 클릭 시 (전송/엔터는 같은 동시 처리 한도를 공유)
         send_btn.click(
             fn=submit_message,
-            inputs=[msg_input, chatbot],
-            outputs=[chatbot, msg_input]
+            inputs=[msg_input, chatbot, thread_state],
+            outputs=[chatbot, msg_input],
+            concurrency_id="chat",
+            concurrency_limit=GRADIO_CONCURRENCY_LIMIT
         )
         
         # 엔터 키 입력 시
         msg_input.submit(
             fn=submit_message,
-            inputs=[msg_input, chatbot],
-            outputs=[chatbot, msg_input]
+            inputs=[msg_input, chatbot, thread_state],
+            outputs=[chatbot, msg_input],
+            concurrency_id="chat",
+            concurrency_limit=GRADIO_CONCURRENCY_LIMIT
         )
         
         # 새 대화 버튼 클릭 시
         clear_btn.click(
-            fn=handle_clear,
-            outputs=[chatbot, status_box]
+            fn=clear_chat,
+            inputs=[thread_state],
+            outputs=[chatbot, status_box, thread_state]
         )
         
         # 사용법 안내
@@ -245,19 +359,36 @@ def create_gradio_app():
             - 메시지를 입력하고 전송 버튼을 클릭하거나 Enter 키를 눌러 대화하세요
             - "🔄 새 대화" 버튼으로 대화 내역을 초기화할 수 있습니다
             - 대화 내역은 자동으로 저장되며, Assistant가 컨텍스트를 기억합니다
+            - 브라우저 탭마다 별도의 대화로 관리되어 다른 사용자와 섞이지 않습니다
             
             ### ⚙️ 설정 필요사항
             - 환경변수 `OPENAI_API_KEY`가 설정되어 있어야 합니다
             """
         )
     
+    # 여러 사용자의 요청이 한 줄로 밀리지 않도록 동시 처리 한도 설정
+    app.queue(
+        default_concurrency_limit=GRADIO_CONCURRENCY_LIMIT,
+        max_size=GRADIO_QUEUE_MAX_SIZE
+    )
+    
     return app
 
+def create_server(gradio_app):
+    """/metrics와 Gradio UI를 함께 제공하는 FastAPI 앱
+    
+    서버가 시작될 때(요청을 받기 전에) Thread 풀을 미리 채워, 부팅 직후의 첫 세션도
+    threads.create 왕복을 기다리지 않게 합니다. 풀은 Gradio 핸들러와 같은 이벤트 루프에서 채웁니다.
+    """
+    server = create_metrics_app()
+    
+    @server.on_event("startup")
+    async def prefill_thread_pool():
+        await thread_pool.prefill()
+        print(f"🧵 Thread 풀 준비: {thread_pool.size()}/{thread_pool.target_size}개")
+    
+    return gr.mount_gradio_app(server, gradio_app, path="/")
+
 if __name__ == "__main__":
     app = create_gradio_app()
-    app.launch(
-        server_name="0.0.0.0",
-        server_port=7860,
-        share=False,
-        debug=True
-    )
\ No newline at end of file
+    uvicorn.run(create_server(app), host=SERVER_HOST, port=SERVER_PORT)
\ No newline at end of file
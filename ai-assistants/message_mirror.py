@@ -0,0 +1,151 @@
+"""
+Thread 메시지 로컬 미러 모듈
+
+Run이 끝난 뒤 messages.list(thread_id)로 Thread 전체를 내려받아 assistant 메시지를 찾는 대신,
+현재 Run이 만든 메시지만(run_id 필터, limit, after 커서) 가져옵니다.
+한 번 본 메시지(보낸 질문, 받은 답변, 스트리밍으로 완성된 답변)는 Thread별로 간단한 형태로 보관하여
+이전 대화를 다시 내려받지 않습니다. Thread가 길어져도 답변 한 번에 가져오는 양은 일정합니다.
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+# 미러 설정 (환경변수로 조정 가능)
+MIRROR_MAX_THREADS = int(os.getenv("MIRROR_MAX_THREADS", "1000"))  # 메모리에 보관할 최대 Thread 수 (LRU)
+MIRROR_MAX_MESSAGES = int(os.getenv("MIRROR_MAX_MESSAGES", "20"))  # Thread별 보관할 최근 메시지 수
+RUN_MESSAGES_PAGE_SIZE = 5  # Run 하나가 만드는 메시지는 보통 1개
+
+def _message_text(message):
+    """Message 객체의 텍스트 내용 (text 블록만 이어붙임)"""
+    parts = []
+    for content in getattr(message, "content", None) or []:
+        text = getattr(content, "text", None)
+        if text is not None and getattr(text, "value", None):
+            parts.append(text.value)
+    return "\n".join(parts)
+
+class MessageMirrorStats:
+    """메시지 조회량 통계"""
+    
+    def __init__(self):
+        self.fetch_calls = 0  # messages.list 호출 수
+        self.messages_fetched = 0  # 내려받은 메시지 수
+        self.replies = 0  # 조회 또는 스트림으로 얻은 답변 수
+        self.recorded_from_stream = 0  # 조회 없이 스트림 이벤트로 기록한 메시지 수
+    
+    def as_dict(self):
+        """통계를 딕셔너리로 반환"""
+        return {
+            "fetch_calls": self.fetch_calls,
+            "messages_fetched": self.messages_fetched,
+            "replies": self.replies,
+            "recorded_from_stream": self.recorded_from_stream,
+            "messages_per_reply": self.messages_fetched / self.replies if self.replies else 0.0,
+        }
+
+class MessageMirror:
+    """Thread별 최근 메시지 미러 + Run 단위 증분 조회"""
+    
+    def __init__(self, max_threads=MIRROR_MAX_THREADS, max_messages=MIRROR_MAX_MESSAGES):
+        self.max_threads = max_threads
+        self.max_messages = max_messages
+        self._lock = threading.Lock()
+        self._threads = OrderedDict()  # thread_id -> deque[{id, role, run_id, text, created_at}]
+        self.stats = MessageMirrorStats()
+    
+    def record(self, thread_id, message, from_stream=False):
+        """본 메시지(Message 객체)를 미러에 추가 (이미 있으면 무시)"""
+        entry = {
+            "id": message.id,
+            "role": message.role,
+            "run_id": getattr(message, "run_id", None),
+            "text": _message_text(message),
+            "created_at": getattr(message, "created_at", None),
+        }
+        with self._lock:
+            messages = self._threads.get(thread_id)
+            if messages is None:
+                messages = deque(maxlen=self.max_messages)
+                self._threads[thread_id] = messages
+                while len(self._threads) > self.max_threads:
+                    self._threads.popitem(last=False)
+            self._threads.move_to_end(thread_id)
+            
+            if any(existing["id"] == entry["id"] for existing in messages):
+                return
+            messages.append(entry)
+            if from_stream:
+                self.stats.recorded_from_stream += 1
+                if entry["role"] == "assistant":
+                    self.stats.replies += 1
+    
+    def history(self, thread_id):
+        """미러에 있는 최근 메시지 목록 (오래된 것부터)"""
+        with self._lock:
+            return list(self._threads.get(thread_id, ()))
+    
+    def cursor(self, thread_id):
+        """증분 조회에 쓸 after 커서 (미러의 마지막 메시지 ID)"""
+        with self._lock:
+            messages = self._threads.get(thread_id)
+            return messages[-1]["id"] if messages else None
+    
+    def forget(self, thread_id):
+        """Thread 미러 삭제 (/reset_chat 등)"""
+        with self._lock:
+            self._threads.pop(thread_id, None)
+    
+    def _list_params(self, thread_id, run_id, after):
+        """messages.list 파라미터 (현재 Run의 메시지만, 오래된 것부터)"""
+        params = {"thread_id": thread_id, "run_id": run_id, "order": "asc", "limit": RUN_MESSAGES_PAGE_SIZE}
+        if after:
+            params["after"] = after
+        return params
+    
+    def _collect(self, thread_id, page):
+        """조회 결과를 미러에 기록하고 assistant 메시지 목록 반환"""
+        replies = [message for message in page.data if message.role == "assistant"]
+        with self._lock:
+            self.stats.fetch_calls += 1
+            self.stats.messages_fetched += len(page.data)
+        for message in page.data:
+            self.record(thread_id, message)
+        return replies
+    
+    def fetch_run_reply(self, client, thread_id, run_id):
+        """Run이 만든 assistant 메시지 중 첫 번째 (없으면 None)"""
+        after = self.cursor(thread_id)
+        replies = []
+        while True:
+            page = client.beta.threads.messages.list(**self._list_params(thread_id, run_id, after))
+            replies.extend(self._collect(thread_id, page))
+            if replies or not page.data or not getattr(page, "has_more", False):
+                break
+            after = page.data[-1].id
+        
+        if replies:
+            with self._lock:
+                self.stats.replies += 1
+            return replies[0]
+        return None
+    
+    async def async_fetch_run_reply(self, client, thread_id, run_id):
+        """fetch_run_reply의 비동기 버전 (AsyncOpenAI 클라이언트 사용)"""
+        after = self.cursor(thread_id)
+        replies = []
+        while True:
+            page = await client.beta.threads.messages.list(**self._list_params(thread_id, run_id, after))
+            replies.extend(self._collect(thread_id, page))
+            if replies or not page.data or not getattr(page, "has_more", False):
+                break
+            after = page.data[-1].id
+        
+        if replies:
+            with self._lock:
+                self.stats.replies += 1
+            return replies[0]
+        return None
@@ -0,0 +1,379 @@
+"""
+Prometheus 형식 메트릭 모듈
+
+답변 한 번이 어느 구간에서 시간을 쓰는지(Thread 준비, 메시지 추가, Run 대기열/실행, 답변 조회,
+후처리, Slack 업데이트) 구간별 히스토그램으로 기록하고, Run 상태/필터링/재시도 횟수를 카운터로 셉니다.
+FastAPI 앱의 `/metrics`로 Prometheus 텍스트 형식(0.0.4)을 내보내며, 봇과 같은 프로세스에서 uvicorn으로 실행합니다.
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+logger = logging.getLogger(__name__)
+
+# 메트릭 서버 설정 (환경변수로 조정 가능)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 구간 시간 버킷(초) - Slack/OpenAI 호출(수십 ms)부터 Run 실행(수십 초)까지
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+def _escape(value):
+    """라벨 값 이스케이프 (역슬래시, 따옴표, 줄바꿈)"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames, values, extra=()):
+    """{name="value",...} 형식 라벨 문자열"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(labelnames, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    """메트릭 값 표기 (정수는 소수점 없이)"""
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Counter:
+    """단조 증가 카운터"""
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # 라벨 값 튜플 -> 누적 값
+    
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    def inc(self, amount=1, **labels):
+        """카운터 증가"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels):
+        """현재 값 (테스트/디버깅용)"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+    
+    def collect(self):
+        """텍스트 형식 줄 목록"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Gauge:
+    """현재 값을 그대로 보고하는 게이지"""
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # 라벨 값 튜플 -> 현재 값
+    
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    def set(self, value, **labels):
+        """값 설정"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def value(self, **labels):
+        """현재 값 (테스트/디버깅용)"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+    
+    def collect(self):
+        """텍스트 형식 줄 목록"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """누적 버킷 히스토그램"""
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._lock = threading.Lock()
+        self._series = {}  # 라벨 값 튜플 -> [버킷별 개수, 합계, 개수]
+    
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    def observe(self, value, **labels):
+        """값 하나 기록"""
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [[0] * len(self.buckets), 0.0, 0]
+                self._series[key] = series
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        """with 블록 실행 시간 기록 (예외가 나도 기록)"""
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started_at, **labels)
+    
+    def count(self, **labels):
+        """기록된 값 개수 (테스트/디버깅용)"""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[2] if series else 0
+    
+    def collect(self):
+        """텍스트 형식 줄 목록"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    """메트릭 모음 (등록 순서대로 출력)"""
+    
+    def __init__(self):
+        self._metrics = []
+    
+    def register(self, metric):
+        """메트릭 등록 후 그대로 반환"""
+        self._metrics.append(metric)
+        return metric
+    
+    def render(self):
+        """Prometheus 텍스트 형식 전체 출력"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# 답변 구간별 소요 시간
+# thread_acquire, message_create, run_create, run_queued, run_in_progress, messages_fetch, post_process, slack_update
+PHASE_SECONDS = REGISTRY.register(Histogram(
+    "assistant_phase_seconds",
+    "Time spent in each phase of answering a question",
+    ("phase",)
+))
+
+RUN_STATUS = REGISTRY.register(Counter(
+    "assistant_run_status_total",
+    "Final status of assistant runs",
+    ("status",)
+))
+
+# stage: question(is_bootcamp_related), response(post_process_response)
+GUARD_REJECTIONS = REGISTRY.register(Counter(
+    "assistant_guard_rejections_total",
+    "Questions or responses rejected by the bootcamp relevance guard",
+    ("stage", "reason")
+))
+
+ACTIVE_RUN_RETRIES = REGISTRY.register(Counter(
+    "assistant_active_run_retries_total",
+    "Run creation retries caused by 'already has an active run'"
+))
+
+# kind: dm, mention / result: accepted, busy(대기 순번 안내), shed(대기열 초과로 거절)
+QUEUE_ADMISSIONS = REGISTRY.register(Counter(
+    "assistant_queue_admissions_total",
+    "Questions admitted to or shed by the request queue",
+    ("kind", "result")
+))
+
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "assistant_queue_depth",
+    "Questions waiting in the request queue for a free worker"
+))
+
+RUN_DEADLINE_CANCELS = REGISTRY.register(Counter(
+    "assistant_run_deadline_cancels_total",
+    "Runs cancelled because they overran the end-to-end answer deadline"
+))
+
+# outcome: completed(취소 전에 끝나 늦은 답변 반영), cancelled, failed, expired, incomplete, timeout(종료 확인 못 함), error
+RUN_RECONCILED = REGISTRY.register(Counter(
+    "assistant_run_reconciled_total",
+    "Final outcome of runs cancelled for overrunning the deadline",
+    ("outcome",)
+))
+
+# reason: retry(같은 event_id 재전송), delivery(같은 메시지가 app_mention/message로 각각 도착)
+DUPLICATE_EVENTS = REGISTRY.register(Counter(
+    "assistant_duplicate_events_total",
+    "Slack events skipped because they were already processed",
+    ("reason",)
+))
+
+# result: acquired, contended(다른 인스턴스 대기), timeout, lost(갱신 실패), fenced(잃은 lease의 쓰기 거절)
+USER_LEASES = REGISTRY.register(Counter(
+    "assistant_user_lease_total",
+    "Per-user processing lease outcomes across bot instances",
+    ("result",)
+))
+
+# reason: rate_limited(429), server_error(5xx), timeout, connection
+OPENAI_RETRIES = REGISTRY.register(Counter(
+    "assistant_openai_retries_total",
+    "OpenAI API call retries by the call scheduler",
+    ("operation", "reason")
+))
+
+# bucket: requests(RPM), tokens(TPM)
+OPENAI_THROTTLE_SECONDS = REGISTRY.register(Counter(
+    "assistant_openai_throttle_seconds_total",
+    "Time spent waiting for the client-side OpenAI rate limit buckets",
+    ("bucket",)
+))
+
+# 0: closed(정상), 1: half_open(시험 호출 중), 2: open(호출 차단)
+OPENAI_CIRCUIT_STATE = REGISTRY.register(Gauge(
+    "assistant_openai_circuit_state",
+    "OpenAI circuit breaker state (0=closed, 1=half_open, 2=open)"
+))
+
+OPENAI_SHORT_CIRCUITS = REGISTRY.register(Counter(
+    "assistant_openai_short_circuited_total",
+    "OpenAI calls rejected immediately because the circuit breaker was open",
+    ("operation",)
+))
+
+# result: exact_hit, similar_hit, store_hit(사전 계산 저장소), miss, bypassed(후속 질문이라 캐시 사용 안 함)
+ANSWER_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "assistant_answer_cache_lookups_total",
+    "FAQ answer cache lookups by result",
+    ("result",)
+))
+
+# event: store, eviction(LRU), expiration(TTL)
+ANSWER_CACHE_UPDATES = REGISTRY.register(Counter(
+    "assistant_answer_cache_updates_total",
+    "FAQ answer cache stores, evictions and expirations",
+    ("event",)
+))
+
+ANSWER_CACHE_ENTRIES = REGISTRY.register(Gauge(
+    "assistant_answer_cache_entries",
+    "Answers currently held in the in-memory FAQ answer cache"
+))
+
+# 웹 UI(main.py)의 빈 Thread 풀
+THREAD_POOL_SIZE = REGISTRY.register(Gauge(
+    "assistant_thread_pool_size",
+    "Empty threads currently waiting in the pre-created thread pool"
+))
+
+# result: hit(풀에서 꺼냄), exhausted(풀이 비어 요청 중에 직접 생성)
+THREAD_POOL_ACQUIRES = REGISTRY.register(Counter(
+    "assistant_thread_pool_acquires_total",
+    "Thread acquisitions from the pre-created thread pool by result",
+    ("result",)
+))
+
+THREAD_POOL_ACQUIRE_SECONDS = REGISTRY.register(Histogram(
+    "assistant_thread_pool_acquire_seconds",
+    "Time taken to hand out a thread from the pre-created thread pool",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+))
+
+THREAD_POOL_CREATE_ERRORS = REGISTRY.register(Counter(
+    "assistant_thread_pool_create_errors_total",
+    "Failed thread creations while refilling the pre-created thread pool"
+))
+
+# source: run(Assistant Run), cache(답변 캐시), filtered(무관 질문 빠른 응답), fallback(OpenAI 차단 중 대체 답변)
+ANSWERS = REGISTRY.register(Counter(
+    "assistant_answers_total",
+    "Answers by source",
+    ("source",)
+))
+
+class RunPhaseTimer:
+    """Run 상태 전환 시각으로 대기열(queued)과 실행(in_progress) 구간 측정
+    
+    polling(on_poll)이나 스트림 이벤트(on_status)로 처음 in_progress를 본 시각을 기준으로 나누고,
+    한 번도 보지 못했으면(polling 사이에 끝난 경우) Run의 서버 시각(started_at)으로 나눕니다.
+    """
+    
+    def __init__(self):
+        self.created_at = time.monotonic()
+        self.in_progress_at = None
+    
+    def on_status(self, status):
+        """Run 상태 확인 시 호출"""
+        if self.in_progress_at is None and status == "in_progress":
+            self.in_progress_at = time.monotonic()
+    
+    def on_poll(self, run, stats=None):
+        """wait_for_run의 on_poll 콜백"""
+        self.on_status(run.status)
+    
+    def finish(self, run=None):
+        """Run 종료 시 호출하여 두 구간 기록"""
+        finished_at = time.monotonic()
+        total = finished_at - self.created_at
+        if self.in_progress_at is not None:
+            queued = self.in_progress_at - self.created_at
+        else:
+            server_created = getattr(run, "created_at", None)
+            server_started = getattr(run, "started_at", None)
+            queued = server_started - server_created if server_created and server_started else 0.0
+            queued = min(max(queued, 0.0), total)
+        
+        PHASE_SECONDS.observe(queued, phase="run_queued")
+        PHASE_SECONDS.observe(total - queued, phase="run_in_progress")
+
+def create_metrics_app(registry=REGISTRY):
+    """/metrics 엔드포인트를 가진 FastAPI 앱"""
+    app = FastAPI(title="AI Assistant metrics", docs_url=None, redoc_url=None, openapi_url=None)
+    
+    @app.get("/metrics")
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+    
+    return app
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """uvicorn으로 메트릭 서버를 백그라운드 스레드에서 실행"""
+    server = uvicorn.Server(uvicorn.Config(create_metrics_app(), host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="metrics-server", daemon=True).start()
+    logger.info(f"📈 메트릭 서버 시작: http://{host}:{port}/metrics")
+    return server
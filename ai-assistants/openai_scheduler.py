@@ -0,0 +1,479 @@
+"""
+OpenAI API 호출 스케줄러 모듈
+
+모든 Assistants API 호출을 한 곳에서 관리합니다 (slack_api.py의 SlackAccess와 같은 역할).
+- 분당 요청 수(RPM), 분당 토큰 수(TPM) 한도에 맞춘 토큰 버킷 (한도를 넘기 전에 클라이언트에서 기다림)
+- 429 / 5xx / 타임아웃 / 연결 오류는 지터를 넣은 지수 백오프로 재시도 (429의 Retry-After 준수)
+- 실패가 이어지면 circuit breaker를 열어 일정 시간 호출하지 않고 바로 OpenAIUnavailable 발생
+  (장애 중에 모든 핸들러가 API를 계속 두드리지 않도록, 호출한 쪽은 캐시/안내 답변으로 대체)
+
+OpenAI SDK 자체 재시도와 겹치지 않도록 클라이언트는 max_retries=0으로 만들고 scheduled_client로 감쌉니다.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+import openai
+
+from metrics import OPENAI_CIRCUIT_STATE, OPENAI_RETRIES, OPENAI_SHORT_CIRCUITS, OPENAI_THROTTLE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# 호출 한도 (조직의 RPM/TPM 한도보다 조금 낮게, 0이면 제한 없음)
+OPENAI_RPM_LIMIT = float(os.getenv("OPENAI_RPM_LIMIT", "3000"))
+OPENAI_TPM_LIMIT = float(os.getenv("OPENAI_TPM_LIMIT", "450000"))
+OPENAI_RUN_TOKEN_ESTIMATE = int(os.getenv("OPENAI_RUN_TOKEN_ESTIMATE", "3000"))  # Run 시작 시 미리 차감할 토큰 수 (완료 후 실제 사용량으로 정산)
+
+# 재시도 설정
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))  # 첫 재시도 최대 대기(초), 이후 2배씩
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "8"))
+OPENAI_MAX_RETRY_AFTER = float(os.getenv("OPENAI_MAX_RETRY_AFTER", "20"))  # 이보다 긴 Retry-After는 기다리지 않고 실패 처리
+
+# circuit breaker 설정
+OPENAI_BREAKER_FAILURES = int(os.getenv("OPENAI_BREAKER_FAILURES", "5"))  # 연속 실패 몇 번에 차단할지
+OPENAI_BREAKER_COOLDOWN = float(os.getenv("OPENAI_BREAKER_COOLDOWN", "30"))  # 차단 후 시험 호출까지 시간(초)
+
+# 토큰 한도에 포함되는 호출 (모델이 실행되는 호출)
+TOKEN_OPERATIONS = {"threads.runs.create", "threads.create_and_run", "chat.completions.create"}
+
+class OpenAIUnavailable(Exception):
+    """circuit breaker가 열려 있어 OpenAI를 호출하지 않음"""
+    
+    def __init__(self, operation, retry_after):
+        super().__init__(f"OpenAI 호출 일시 중단 ({operation}) - {retry_after:.0f}초 후 다시 시도")
+        self.operation = operation
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """분당 한도 토큰 버킷 (부족하면 잔액이 음수가 되고, 그만큼 채워질 때까지 기다림)"""
+    
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self._lock = threading.Lock()
+        self._tokens = per_minute
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+    
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+    
+    def reserve(self, amount=1):
+        """amount만큼 차감하고 호출 전에 기다려야 하는 시간(초) 반환"""
+        if not self.capacity:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= amount
+            wait_seconds = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait_seconds, self._blocked_until - now)
+    
+    def refund(self, amount):
+        """미리 차감한 양 정산 (음수면 추가 차감)"""
+        if not self.capacity:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+    
+    def block(self, seconds):
+        """429 Retry-After 동안 새 호출 중지"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+class CircuitBreaker:
+    """연속 실패 시 호출을 차단하고, cooldown 뒤 시험 호출 하나로 복구 여부 확인"""
+    
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    
+    def __init__(self, failure_threshold=OPENAI_BREAKER_FAILURES, cooldown=OPENAI_BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened_count = 0
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe = None  # 진행 중인 시험 호출 번호 (없으면 None)
+        self._probe_seq = 0
+        OPENAI_CIRCUIT_STATE.set(0)
+    
+    def _transition(self, state):
+        if state == self.state:
+            return
+        logger.warning(f"OpenAI circuit breaker: {self.state} -> {state}")
+        self.state = state
+        OPENAI_CIRCUIT_STATE.set(self.STATE_VALUES[state])
+        if state == self.OPEN:
+            self.opened_count += 1
+            self._opened_at = time.monotonic()
+    
+    def acquire(self):
+        """호출해도 되는지 확인 (open이면 거절, cooldown이 지났으면 시험 호출 하나만 허용)
+        
+        Returns:
+            (허용 여부, 시험 호출 번호 - 시험 호출이 아니면 None)
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False, None
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._probe is not None:
+                    return False, None
+                self._probe_seq += 1
+                self._probe = self._probe_seq
+                return True, self._probe
+            return True, None
+    
+    def allow(self):
+        """호출해도 되는지 (acquire에서 허용 여부만)"""
+        return self.acquire()[0]
+    
+    def release_probe(self, probe):
+        """결과를 기록하지 못하고 끝난 시험 호출(취소, 인터럽트)의 슬롯 반납 (half_open에 갇히지 않도록)"""
+        with self._lock:
+            if probe is not None and self._probe == probe:
+                self._probe = None
+    
+    def retry_after(self):
+        """다시 호출을 시도할 수 있을 때까지 남은 시간(초)"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe = None
+            self._transition(self.CLOSED)
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe = None
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._transition(self.OPEN)
+
+def _retry_after_seconds(error):
+    """429/503 응답의 Retry-After(초) (헤더가 없으면 None)"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def classify_error(error):
+    """재시도 사유 (재시도하지 않을 오류면 None)"""
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code == 429:
+            # 요금 한도 초과는 기다려도 풀리지 않음
+            return None if getattr(error, "code", None) == "insufficient_quota" else "rate_limited"
+        # 409(활성 Run 충돌 등)는 클라이언트 상태 오류라 호출한 쪽의 충돌 처리에 맡김
+        if error.status_code == 408 or error.status_code >= 500:
+            return "server_error"
+    return None
+
+def is_outage_error(error):
+    """circuit breaker 실패로 셀 오류인지 (잘못된 요청, 활성 Run 충돌 같은 4xx는 제외)"""
+    if classify_error(error) is not None:
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code == 429
+
+class SchedulerStats:
+    """호출 스케줄러 통계"""
+    
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.throttled = 0
+        self.throttle_seconds = 0.0
+    
+    def as_dict(self):
+        """통계를 딕셔너리로 반환"""
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+            "throttled": self.throttled,
+            "throttle_seconds": round(self.throttle_seconds, 3),
+        }
+
+class RunTokenReservation:
+    """Run 하나가 시작할 때 미리 차감한 토큰 추정치 (어느 경로로 끝나든 한 번만 정산)
+    
+    완료 이벤트, 취소한 Run의 정리 작업, 오류 처리 등 여러 곳에서 settle을 불러도 처음 한 번만 반영합니다.
+    """
+    
+    def __init__(self, scheduler):
+        self._scheduler = scheduler
+        self._lock = threading.Lock()
+        self.settled = False
+    
+    def settle(self, usage=None):
+        """Run 사용량으로 정산 (사용량이 없으면 추정치 전부 환불, 이미 정산했으면 무시)
+        
+        Returns:
+            이번 호출로 정산했으면 True
+        """
+        with self._lock:
+            if self.settled:
+                return False
+            self.settled = True
+        self._scheduler.settle_run_tokens(usage.total_tokens if usage else None)
+        return True
+
+class OpenAICallScheduler:
+    """RPM/TPM 토큰 버킷 + 재시도 + circuit breaker"""
+    
+    def __init__(self, rpm_limit=OPENAI_RPM_LIMIT, tpm_limit=OPENAI_TPM_LIMIT, run_token_estimate=OPENAI_RUN_TOKEN_ESTIMATE,
+                 max_retries=OPENAI_MAX_RETRIES, backoff_base=OPENAI_BACKOFF_BASE, backoff_max=OPENAI_BACKOFF_MAX,
+                 max_retry_after=OPENAI_MAX_RETRY_AFTER, breaker=None):
+        self.requests = TokenBucket(rpm_limit)
+        self.tokens = TokenBucket(tpm_limit)
+        self.run_token_estimate = run_token_estimate
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = SchedulerStats()
+        self._lock = threading.Lock()
+    
+    def _admit(self, operation):
+        """circuit breaker 확인 후 버킷에서 차감
+        
+        Returns:
+            (호출 전 대기 시간, 시험 호출 번호)
+        """
+        allowed, probe = self.breaker.acquire()
+        if not allowed:
+            with self._lock:
+                self.stats.short_circuited += 1
+            OPENAI_SHORT_CIRCUITS.inc(operation=operation)
+            raise OpenAIUnavailable(operation, self.breaker.retry_after())
+        
+        wait_seconds = self.requests.reserve(1)
+        bucket = "requests"
+        if operation in TOKEN_OPERATIONS:
+            token_wait = self.tokens.reserve(self.run_token_estimate)
+            if token_wait > wait_seconds:
+                wait_seconds, bucket = token_wait, "tokens"
+        
+        with self._lock:
+            self.stats.calls += 1
+            if wait_seconds > 0:
+                self.stats.throttled += 1
+                self.stats.throttle_seconds += wait_seconds
+        if wait_seconds > 0:
+            OPENAI_THROTTLE_SECONDS.inc(wait_seconds, bucket=bucket)
+        return wait_seconds, probe
+    
+    def _retry_delay(self, operation, error, attempt):
+        """실패한 호출을 다시 시도하기 전 대기 시간 (재시도하지 않으면 None)"""
+        if is_outage_error(error):
+            self.breaker.record_failure()
+        else:
+            # 서버가 응답은 했으므로(잘못된 요청 등) 장애로 보지 않음
+            self.breaker.record_success()
+        
+        reason = classify_error(error)
+        if reason is not None and self.breaker.state == CircuitBreaker.OPEN:
+            # 이번 실패로 차단되었으면 남은 재시도 없이 바로 대체 답변으로
+            raise OpenAIUnavailable(operation, self.breaker.retry_after()) from error
+        if reason is None or attempt >= self.max_retries:
+            if reason is not None:
+                with self._lock:
+                    self.stats.failures += 1
+            return None
+        
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            if reason == "rate_limited":
+                self.requests.block(retry_after)
+            delay = retry_after + random.uniform(0, self.backoff_base)
+        else:
+            # full jitter: 0 ~ base * 2^attempt
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        
+        with self._lock:
+            self.stats.retries += 1
+        OPENAI_RETRIES.inc(operation=operation, reason=reason)
+        logger.warning(f"OpenAI {operation} {reason} - {delay:.2f}초 후 재시도 {attempt + 1}/{self.max_retries}: {error}")
+        return delay
+    
+    def call(self, operation, func, *args, **kwargs):
+        """func(*args, **kwargs)를 한도 안에서 호출 (재시도 가능한 오류는 백오프 후 재시도)"""
+        attempt = 0
+        while True:
+            wait_seconds, probe = self._admit(operation)
+            finished = False
+            try:
+                if wait_seconds > 0:
+                    time.sleep(wait_seconds)
+                result = func(*args, **kwargs)
+                finished = True
+            except Exception as e:
+                finished = True
+                self._refund_failed_call(operation)
+                delay = self._retry_delay(operation, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            finally:
+                if not finished:
+                    # KeyboardInterrupt 등으로 결과 없이 끝남
+                    self.breaker.release_probe(probe)
+                    self._refund_failed_call(operation)
+            
+            self.breaker.record_success()
+            self._settle_completion(operation, result)
+            return result
+    
+    async def async_call(self, operation, func, *args, **kwargs):
+        """call의 비동기 버전 (func는 awaitable을 반환)"""
+        attempt = 0
+        while True:
+            wait_seconds, probe = self._admit(operation)
+            finished = False
+            try:
+                if wait_seconds > 0:
+                    await asyncio.sleep(wait_seconds)
+                result = await func(*args, **kwargs)
+                finished = True
+            except Exception as e:
+                finished = True
+                self._refund_failed_call(operation)
+                delay = self._retry_delay(operation, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            finally:
+                if not finished:
+                    # 핸들러 취소(CancelledError) 등으로 결과 없이 끝남
+                    self.breaker.release_probe(probe)
+                    self._refund_failed_call(operation)
+            
+            self.breaker.record_success()
+            self._settle_completion(operation, result)
+            return result
+    
+    def run_reservation(self):
+        """Run을 만든 호출(runs.create / create_and_run)이 차감한 추정치를 정산할 객체"""
+        return RunTokenReservation(self)
+    
+    def settle_run_tokens(self, total_tokens=None):
+        """Run(또는 chat.completions)의 실제 토큰 사용량으로 미리 차감한 추정치 정산
+        
+        사용량을 모르면(취소/실패/스트림 오류) 추정치를 전부 돌려주고, 추정치보다 많이 쓴 경우에도
+        추가로 차감하지는 않습니다 (늦게 도착한 정산이 이미 다 찬 버킷을 음수로 만들지 않도록).
+        """
+        used = min(max(total_tokens or 0, 0), self.run_token_estimate)
+        self.tokens.refund(self.run_token_estimate - used)
+    
+    def _refund_failed_call(self, operation):
+        """실패한 호출이 차감한 토큰 추정치 환불 (Run이 만들어지지 않았으므로 재시도마다 다시 차감됨)"""
+        if operation in TOKEN_OPERATIONS:
+            self.tokens.refund(self.run_token_estimate)
+    
+    def _settle_completion(self, operation, result):
+        """chat.completions는 응답에 사용량이 바로 있으므로 호출이 끝나면 바로 정산"""
+        if operation == "chat.completions.create":
+            usage = getattr(result, "usage", None)
+            self.settle_run_tokens(usage.total_tokens if usage else None)
+
+class _ScheduledAsyncCall:
+    """비동기 호출 결과 (await하면 스케줄러를 거치고, async for는 SDK 자동 페이지 순회를 그대로 사용)"""
+    
+    def __init__(self, scheduler, operation, func, args, kwargs):
+        self._scheduler = scheduler
+        self._operation = operation
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+    
+    def __await__(self):
+        return self._scheduler.async_call(self._operation, self._func, *self._args, **self._kwargs).__await__()
+    
+    def __aiter__(self):
+        return self._func(*self._args, **self._kwargs).__aiter__()
+
+class ScheduledClient:
+    """OpenAI 클라이언트 프록시 (리소스 메서드 호출을 스케줄러로 감쌈)
+    
+    client.beta.threads.runs.create(...) 같은 호출은 "threads.runs.create" 작업으로 스케줄링하고,
+    with_options 같은 클라이언트 메서드나 일반 속성은 그대로 반환합니다.
+    """
+    
+    def __init__(self, target, scheduler, is_async=False, path=""):
+        self._target = target
+        self._scheduler = scheduler
+        self._is_async = is_async
+        self._path = path
+    
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not getattr(attr, "__module__", "").startswith("openai.resources"):
+            return attr
+        
+        path = f"{self._path}.{name}" if self._path else name
+        if not callable(attr):
+            return ScheduledClient(attr, self._scheduler, self._is_async, path)
+        
+        operation = path.removeprefix("beta.")
+        scheduler = self._scheduler
+        if self._is_async:
+            def scheduled_call(*args, **kwargs):
+                return _ScheduledAsyncCall(scheduler, operation, attr, args, kwargs)
+        else:
+            def scheduled_call(*args, **kwargs):
+                return scheduler.call(operation, attr, *args, **kwargs)
+        return scheduled_call
+
+def scheduled_client(client, scheduler):
+    """OpenAI/AsyncOpenAI 클라이언트를 스케줄러를 거치도록 감싸기 (SDK 자체 재시도는 끔)"""
+    client = client.with_options(max_retries=0)
+    return ScheduledClient(client, scheduler, is_async=isinstance(client, openai.AsyncOpenAI))
@@ -0,0 +1,251 @@
+"""
+FAQ 답변 사전 계산 배치 작업
+
+운영진이 관리하는 질문 목록(faq_questions.txt)과 이벤트 캡처 로그(event_capture.py)에서 자주 나온 질문을 모아
+봇과 같은 경로로 답변을 만들고, 봇이 시작할 때 mmap으로 여는 답변 저장소(answer_store.py)에 씁니다.
+- 질문 필터(is_bootcamp_related) → 새 Thread로 Run(create_and_run, 봇과 같은 지침) → 주석 제거 → 응답 후처리(post_process_response)
+- 질문/응답 필터에 걸린 질문은 답변을 저장하지 않고 건너뛴 질문으로만 기록, 답변에 쓴 임시 Thread는 바로 삭제
+- 동시에 만드는 답변 수는 --concurrency로 제한 (OpenAI 호출은 봇과 같은 스케줄러의 rate limit을 따름)
+- 저장소의 지식 베이스/프롬프트 버전이 지금과 같으면 기존 답변(과 건너뛴 질문)은 그대로 두고 새 질문만 생성,
+  버전이 바뀌었거나 --force면 전부 다시 생성
+
+지식 베이스 버전은 --kb-version, KB_VERSION 환경변수 순으로 쓰고, 둘 다 없으면 Assistant의
+모델/지침/도구/연결된 파일 설정으로 계산합니다 (assistant_core.current_kb_version, 봇도 시작할 때 같은 방법으로
+계산해 저장소 버전과 비교). 벡터 스토어 안의 파일만 바꾼 경우에는 설정이 그대로이므로 KB_VERSION을 올려 주세요.
+
+사용법:
+    python precompute_answers.py
+    python precompute_answers.py --logs captured.jsonl --top 30 --concurrency 4
+    python precompute_answers.py --dry-run
+    KB_VERSION=2024-09 python precompute_answers.py --force
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from answer_cache import is_follow_up_question, normalize_question
+from answer_store import ANSWER_STORE_PATH, AnswerStore, AnswerStoreError, write_store
+from event_capture import load_events
+from run_waiter import wait_for_run
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUESTIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "faq_questions.txt")
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", "4"))  # 동시에 만드는 답변 수
+PRECOMPUTE_RUN_TIMEOUT = float(os.getenv("PRECOMPUTE_RUN_TIMEOUT", "120"))  # 답변 하나를 기다리는 최대 시간(초)
+PRECOMPUTE_USER_ID = "precompute"  # 토큰 사용량 기록용 사용자 ID
+
+MENTION_PATTERN = re.compile(r"<@[^>]+>")
+
+def read_question_list(path):
+    """질문 목록 파일 읽기 (빈 줄과 #으로 시작하는 줄 제외)"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+def frequent_logged_questions(paths, top, min_count):
+    """캡처 로그에서 자주 나온 질문 (정규화 키 기준으로 세고, 키마다 처음 나온 표현을 대표로 사용)
+    
+    Returns:
+        [(질문, 횟수)] 많이 나온 순
+    """
+    counts = Counter()
+    representatives = {}
+    for path in paths:
+        for record in load_events(path):
+            event = record["body"].get("event", {})
+            if event.get("bot_id") or event.get("subtype"):
+                continue
+            text = MENTION_PATTERN.sub(" ", event.get("text") or "").strip()
+            if not text or is_follow_up_question(text):
+                continue
+            key = normalize_question(text)
+            counts[key] += 1
+            representatives.setdefault(key, text)
+    
+    return [(representatives[key], count) for key, count in counts.most_common(top) if count >= min_count]
+
+def collect_questions(args):
+    """질문 목록 + 로그 상위 질문 (정규화 키가 같으면 질문 목록 쪽을 남김)
+    
+    Returns:
+        [(질문, 출처)]
+    """
+    questions = []
+    seen = set()
+    
+    def add(question, source):
+        key = normalize_question(question)
+        if key and key not in seen:
+            seen.add(key)
+            questions.append((question, source))
+    
+    if args.questions:
+        for question in read_question_list(args.questions):
+            add(question, "list")
+    for question, count in frequent_logged_questions(args.logs, args.top, args.min_count):
+        add(question, f"logs x{count}")
+    return questions
+
+def generate_answer(bot, question, timeout=PRECOMPUTE_RUN_TIMEOUT):
+    """봇과 같은 경로로 질문 하나의 답변 생성
+    
+    Returns:
+        (답변 또는 None, 결과: completed | filtered | rejected | no_reply | Run 상태)
+    """
+    if not bot.is_bootcamp_related(question):
+        return None, "filtered"
+    
+    run = bot.thread_pool.create_and_run(
+        bot.ASSISTANT_ID,
+        bot.build_user_message(question),
+        **bot.run_prompt_kwargs(new_thread=True)
+    )
+    tokens = bot.openai_scheduler.run_reservation()
+    try:
+        run, _ = wait_for_run(bot.openai_client, run.thread_id, run, timeout=timeout)
+        tokens.settle(run.usage)
+        bot.token_ledger.record(PRECOMPUTE_USER_ID, run.thread_id, run, bot.STRICT_PROMPT.label, bot.PROMPT_DELIVERY)
+        if run.status != "completed":
+            return None, run.status
+        
+        msg = bot.message_mirror.fetch_run_reply(bot.openai_client, run.thread_id, run.id)
+        if not msg:
+            return None, "no_reply"
+        
+        clean_response = bot.remove_annotations(msg.content[0])
+        processed_response = bot.post_process_response(clean_response, question)
+        if processed_response != clean_response:
+            # 필터링 안내 문구는 저장하지 않음
+            return None, "rejected"
+        return processed_response, "completed"
+    finally:
+        # 대기 중 오류로 사용량을 모르면 추정치 전부 환불 (이미 정산했으면 무시)
+        tokens.settle()
+        try:
+            bot.delete_remote_thread(run.thread_id)
+        except Exception as e:
+            logger.warning(f"임시 Thread 삭제 실패 - Thread: {run.thread_id}: {e}")
+
+def open_existing_store(path):
+    """기존 저장소 (없거나 읽을 수 없으면 None)"""
+    try:
+        return AnswerStore.open(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, AnswerStoreError) as e:
+        print(f"⚠️ 기존 저장소를 읽지 못해 새로 만듭니다: {e}")
+        return None
+
+def precompute(args, bot):
+    """질문을 모아 필요한 답변만 생성하고 저장소 갱신
+    
+    Returns:
+        실패한 질문 수
+    """
+    questions = collect_questions(args)
+    if not questions:
+        print("❌ 답변할 질문이 없습니다 (--questions / --logs 확인)")
+        return 0
+    
+    prompt_version = bot.STRICT_PROMPT.label
+    kb_version = args.kb_version or bot.current_kb_version()
+    print(f"📚 질문 {len(questions)}개, 지식 베이스 {kb_version}, 프롬프트 {prompt_version}")
+    
+    # 버전이 같으면 기존 답변과 건너뛴 질문 재사용
+    reusable = {}
+    skipped = set()
+    existing = open_existing_store(args.out)
+    if existing is not None:
+        mismatch = existing.mismatch(prompt_version=prompt_version, kb_version=kb_version,
+                                     assistant_id=bot.ASSISTANT_ID)
+        if args.force:
+            print(f"♻️ --force: 기존 답변 {len(existing)}개를 모두 다시 생성합니다")
+        elif mismatch:
+            print(f"♻️ 버전이 바뀌어 모두 다시 생성합니다 ({mismatch})")
+        else:
+            reusable = {key: (answer, generated_at) for key, _, answer, generated_at in existing.items()}
+            skipped = set(existing.meta.get("skipped", ()))
+        existing.close()
+    
+    known_keys = set(reusable) | skipped
+    pending = [question for question, _ in questions if normalize_question(question) not in known_keys]
+    if args.dry_run:
+        for question, source in questions:
+            key = normalize_question(question)
+            mark = "재사용" if key in reusable else "건너뜀" if key in skipped else "생성"
+            print(f"  [{mark}] {question} ({source})")
+        return 0
+    
+    wanted_keys = {normalize_question(question) for question, _ in questions}
+    if not pending and wanted_keys == known_keys:
+        print(f"✅ 변경 없음 - 저장소 답변 {len(reusable)}개를 그대로 사용합니다: {args.out}")
+        return 0
+    skipped &= wanted_keys
+    
+    # 제한된 동시성으로 답변 생성
+    generated = {}
+    outcomes = Counter()
+    started_at = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="precompute") as executor:
+        futures = {executor.submit(generate_answer, bot, question, args.timeout): question for question in pending}
+        for future in as_completed(futures):
+            question = futures[future]
+            try:
+                answer, outcome = future.result()
+            except Exception as e:
+                answer, outcome = None, "error"
+                logger.error(f"답변 생성 실패 - {question}: {e}")
+            outcomes[outcome] += 1
+            if answer is not None:
+                generated[normalize_question(question)] = (answer, time.time())
+            elif outcome in ("filtered", "rejected"):
+                skipped.add(normalize_question(question))
+                if args.verbose:
+                    print(f"  ⏭️ {outcome}: {question}")
+            else:
+                # 일시적인 실패는 기록하지 않아 다음 실행에서 다시 시도
+                print(f"  ⚠️ {outcome}: {question}")
+    
+    answers = []
+    for question, _ in questions:
+        key = normalize_question(question)
+        entry = generated.get(key) or reusable.get(key)
+        if entry is not None:
+            answers.append((question, entry[0], entry[1]))
+    
+    stored = write_store(args.out, answers, kb_version, prompt_version,
+                         assistant_id=bot.ASSISTANT_ID, skipped_keys=skipped)
+    failed = sum(count for outcome, count in outcomes.items() if outcome not in ("completed", "filtered", "rejected"))
+    print(f"✅ 저장소 갱신: {args.out} - 답변 {stored}개 (생성 {len(generated)}, 재사용 {stored - len(generated)}, "
+          f"질문 필터 {outcomes['filtered']}, 응답 필터 {outcomes['rejected']}, 실패 {failed}), "
+          f"{time.monotonic() - started_at:.1f}초")
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FAQ 답변 사전 계산")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS_PATH, help="질문 목록 파일 (빈 문자열이면 사용하지 않음)")
+    parser.add_argument("--logs", nargs="*", default=[path for path in [os.getenv("SLACK_EVENT_CAPTURE_PATH")] if path],
+                        help="이벤트 캡처 JSONL 파일 (기본값: SLACK_EVENT_CAPTURE_PATH)")
+    parser.add_argument("--top", type=int, default=20, help="로그에서 가져올 상위 질문 수")
+    parser.add_argument("--min-count", type=int, default=2, help="로그 질문으로 넣을 최소 등장 횟수")
+    parser.add_argument("--concurrency", type=int, default=PRECOMPUTE_CONCURRENCY, help="동시에 만드는 답변 수")
+    parser.add_argument("--timeout", type=float, default=PRECOMPUTE_RUN_TIMEOUT, help="답변 하나를 기다리는 최대 시간(초)")
+    parser.add_argument("--kb-version", help="지식 베이스 버전 (기본값: KB_VERSION 또는 Assistant 설정으로 계산)")
+    parser.add_argument("--out", default=ANSWER_STORE_PATH, help="답변 저장소 파일")
+    parser.add_argument("--force", action="store_true", help="버전이 같아도 모두 다시 생성")
+    parser.add_argument("--dry-run", action="store_true", help="질문 목록과 생성/재사용 여부만 출력")
+    parser.add_argument("--verbose", action="store_true", help="봇 로그와 필터링된 질문 출력")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    
+    # 봇과 같은 클라이언트/지침/필터 사용 (Slack 앱은 만들지 않으므로 Slack 토큰 없이 실행, .env도 여기서 로드)
+    import assistant_core
+    
+    sys.exit(1 if precompute(args, assistant_core) else 0)
@@ -0,0 +1,55 @@
+"""
+버전별 프롬프트 템플릿 모듈
+
+Run 지침으로 전달하는 프롬프트는 prompts/ 폴더에 `{이름}.v{버전}.txt` 파일로 관리합니다.
+버전을 지정하지 않으면 가장 높은 버전을 사용하며, 사용한 버전은 토큰 집계에 함께 기록됩니다.
+"""
+
+import os
+import re
+
+# 프롬프트 파일 폴더
+PROMPTS_DIR = os.getenv("PROMPTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts"))
+
+_FILENAME_PATTERN = re.compile(r'^(?P<name>[\w-]+)\.v(?P<version>\d+)\.txt$')
+
+class PromptTemplate:
+    """프롬프트 파일 하나 (이름, 버전, 내용)"""
+    
+    def __init__(self, name, version, text):
+        self.name = name
+        self.version = version
+        self.text = text
+    
+    @property
+    def label(self):
+        """집계/로그용 버전 표기 (예: strict_mode.v1)"""
+        return f"{self.name}.v{self.version}"
+    
+    def __repr__(self):
+        return f"PromptTemplate({self.label}, {len(self.text)}자)"
+
+def available_versions(name, prompts_dir=PROMPTS_DIR):
+    """해당 이름의 프롬프트 버전 목록 (오름차순)"""
+    versions = []
+    for filename in os.listdir(prompts_dir):
+        match = _FILENAME_PATTERN.match(filename)
+        if match and match.group("name") == name:
+            versions.append(int(match.group("version")))
+    return sorted(versions)
+
+def load_prompt(name, version=None, prompts_dir=PROMPTS_DIR):
+    """프롬프트 파일 로드 (version이 없으면 최신 버전)
+    
+    Raises:
+        FileNotFoundError: 해당 이름/버전의 파일이 없는 경우
+    """
+    if version is None:
+        versions = available_versions(name, prompts_dir)
+        if not versions:
+            raise FileNotFoundError(f"프롬프트 파일이 없습니다: {name} ({prompts_dir})")
+        version = versions[-1]
+    
+    path = os.path.join(prompts_dir, f"{name}.v{int(version)}.txt")
+    with open(path, 'r', encoding='utf-8') as f:
+        return PromptTemplate(name, int(version), f.read().strip())
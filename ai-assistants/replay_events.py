@@ -0,0 +1,332 @@
+"""
+Slack 이벤트 재생 부하 테스트
+
+캡처한 이벤트(event_capture.py, SLACK_EVENT_CAPTURE_PATH)나 합성한 이벤트를 원래 시간 간격의 1배/10배/100배 속도로
+Bolt 앱의 dispatch에 넣습니다. Slack Web API와 OpenAI는 로컬 대체 서버(fake_assistants_server.py)가 받습니다.
+
+핸들러 지연 시간(dispatch ~ ack), 답변 지연 시간, 누락/중복 답변, 대기 안내 비율, 최대 스레드 수를 출력합니다.
+예전 `user_processing` 방식은 처리 중인 사용자의 질문을 거절했지만, 지금은 사용자별 대기열에 넣고
+"⏳ 앞선 질문..." 안내를 보내므로 이 안내 비율을 거절률 대신 보고합니다.
+
+사용법:
+    # 수강 시작 첫 5분에 200명이 출결을 묻는 상황 합성
+    python replay_events.py synth --users 200 --window 300 --out cohort_start.jsonl
+    
+    # 10배 속도로 재생 (5분 → 30초)
+    python replay_events.py replay cohort_start.jsonl --speed 10
+    python replay_events.py replay captured.jsonl --speed 100 --target slack-async --progress-latency 3
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+from benchmark import configure_environment, percentile
+from event_capture import BOT_USER_PLACEHOLDER, load_events
+from fake_assistants_server import add_config_arguments, config_from_args, start_fake_server
+
+# 합성 이벤트 질문 (수강 시작 직후 몰리는 출결 문의)
+SYNTH_QUESTIONS = [
+    "출결 체크는 어디서 하나요?",
+    "오늘 출석 처리 됐는지 어떻게 확인하나요?",
+    "지각 기준 시간이 몇 시인가요?",
+    "병원 때문에 조퇴하면 결석인가요?",
+    "외출은 몇 시간까지 가능한가요?",
+    "출결 정정 신청은 어떻게 하나요?",
+    "결석 3번이면 수료 못 하나요?",
+    "QR 출석이 안 찍히는데 어떻게 하나요?",
+]
+
+# 대체 서버 내부 스레드 (최대 스레드 수 집계에서 제외)
+SERVER_THREAD_PREFIXES = ("AnyIO worker", "fake-assistants-server", "replay-")
+
+def reply_key(event):
+    """답변이 올라올 (channel, thread_ts) - 멘션은 원본 메시지 스레드, DM은 채널"""
+    if event.get("channel_type") == "im":
+        return event["channel"], None
+    return event["channel"], event["ts"]
+
+def is_answer(message, cursor):
+    """로딩/대기 안내가 아닌 최종 답변(또는 과부하 거절) 메시지인지 (스트리밍 중간 업데이트 제외)"""
+    text = message["text"] or ""
+    if message["updates"]:
+        return not text.endswith(cursor)
+    return not text.startswith(("🤔", "⏳", "🚦"))
+
+def prepare_body(record, bot_user_id):
+    """캡처 envelope 복사본 (봇 멘션 자리표시자를 대상 봇 ID로)"""
+    body = json.loads(json.dumps(record["body"]))
+    event = body["event"]
+    event["text"] = (event.get("text") or "").replace(f"<@{BOT_USER_PLACEHOLDER}>", f"<@{bot_user_id}>")
+    return body
+
+class ReplayStats:
+    """재생 측정값"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.handler_seconds = []  # dispatch ~ ack
+        self.dispatch_lag_seconds = []  # 예정 시각 대비 dispatch 지연
+        self.dispatched = {}  # reply_key -> [dispatch 시각(monotonic), ...]
+        self.event_ids = defaultdict(set)  # reply_key -> event_id 집합 (Slack 재전송 중복 판별)
+        self.failed_dispatches = 0
+        self.peak_threads = 0
+        self.peak_queue_depth = 0
+        self.peak_tasks = 0
+    
+    def add_dispatch(self, event_body, started_at, finished_at, scheduled_at, ok):
+        key = reply_key(event_body["event"])
+        with self._lock:
+            self.handler_seconds.append(finished_at - started_at)
+            self.dispatch_lag_seconds.append(max(started_at - scheduled_at, 0.0))
+            self.dispatched.setdefault(key, []).append(started_at)
+            self.event_ids[key].add(event_body.get("event_id") or f"{key}:{len(self.dispatched[key])}")
+            if not ok:
+                self.failed_dispatches += 1
+    
+    def sample(self, queue_depth=0, tasks=0):
+        """스레드 수 / 대기열 깊이 최대값 갱신"""
+        threads = sum(1 for thread in threading.enumerate() if not thread.name.startswith(SERVER_THREAD_PREFIXES))
+        with self._lock:
+            self.peak_threads = max(self.peak_threads, threads)
+            self.peak_queue_depth = max(self.peak_queue_depth, queue_depth)
+            self.peak_tasks = max(self.peak_tasks, tasks)
+
+def collect_replies(stats, state, cursor, timeout, settle):
+    """모든 스레드에 기대한 수만큼 답변이 올 때까지(또는 timeout) 기다린 뒤 스레드별 메시지 수집
+    
+    기대한 수가 채워진 뒤에도 settle초 더 기다려 늦게 올라오는 중복 답변까지 셉니다.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        pending = 0
+        for key, event_ids in stats.event_ids.items():
+            answers = [message for message in state.slack_thread_messages(*key) if is_answer(message, cursor)]
+            pending += max(len(event_ids) - len(answers), 0)
+        if not pending or time.monotonic() >= deadline:
+            break
+        time.sleep(0.2)
+    if not pending:
+        time.sleep(settle)
+    return {key: state.slack_thread_messages(*key) for key in stats.dispatched}
+
+def build_report(stats, replies, cursor, elapsed):
+    """누락/중복/지연 시간 집계"""
+    answer_latencies = []
+    dropped = duplicated = queued_notices = shed = errors = answers_total = 0
+    for key, dispatch_times in stats.dispatched.items():
+        messages = replies[key]
+        answers = sorted((message for message in messages if is_answer(message, cursor)),
+                         key=lambda message: message["updated_at"] or message["posted_at"])
+        expected = len(stats.event_ids[key])
+        answers_total += len(answers)
+        dropped += max(expected - len(answers), 0)
+        duplicated += max(len(answers) - expected, 0)
+        queued_notices += sum(1 for message in messages if (message["text"] or "").startswith(("⏳", "🚦")))
+        shed += sum(1 for message in messages if (message["text"] or "").startswith("🙏"))
+        errors += sum(1 for message in answers if "❌" in (message["text"] or "") or "⚠️" in (message["text"] or ""))
+        # 같은 스레드 안에서는 먼저 들어온 질문이 먼저 답변된다고 보고 순서대로 짝지음
+        for started_at, message in zip(sorted(dispatch_times), answers):
+            answer_latencies.append((message["updated_at"] or message["posted_at"]) - started_at)
+    
+    events = sum(len(times) for times in stats.dispatched.values())
+    
+    def summary(values):
+        return {"p50": percentile(values, 0.50), "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99), "max": max(values) if values else None}
+    
+    return {
+        "events": events,
+        "answers": answers_total,
+        "dropped_replies": dropped,
+        "duplicated_replies": duplicated,
+        "error_replies": errors,
+        "shed_replies": shed,
+        "failed_dispatches": stats.failed_dispatches,
+        "queued_notice_rate": queued_notices / events if events else 0.0,
+        "elapsed_seconds": elapsed,
+        "handler_seconds": summary(stats.handler_seconds),
+        "dispatch_lag_seconds": summary(stats.dispatch_lag_seconds),
+        "answer_seconds": summary(answer_latencies),
+        "peak_threads": stats.peak_threads,
+        "peak_queue_depth": stats.peak_queue_depth,
+        "peak_tasks": stats.peak_tasks,
+    }
+
+def replay_sync(args, records, state, stats):
+    """slack_bot.app.dispatch로 재생"""
+    import slack_bot
+    from slack_bolt.request import BoltRequest
+    
+    slack_bot.event_capture.enabled = False  # 재생한 이벤트를 다시 캡처하지 않음
+    bot_user_id = slack_bot.slack_access.bot_user_id
+    slack_bot.load_assistant_instructions()
+    stop = threading.Event()
+    
+    def sampler():
+        while not stop.is_set():
+            stats.sample(queue_depth=slack_bot.request_queue.depth())
+            stop.wait(0.05)
+    
+    threading.Thread(target=sampler, name="replay-sampler", daemon=True).start()
+    first_received_at = records[0]["received_at"]
+    started_at = time.monotonic()
+    for record in records:
+        scheduled_at = started_at + (record["received_at"] - first_received_at) / args.speed
+        delay = scheduled_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        body = prepare_body(record, bot_user_id)
+        dispatch_started_at = time.monotonic()
+        response = slack_bot.app.dispatch(BoltRequest(body=body, mode="socket_mode"))
+        stats.add_dispatch(body, dispatch_started_at, time.monotonic(), scheduled_at, response.status == 200)
+    
+    replies = collect_replies(stats, state, slack_bot.STREAMING_CURSOR, args.timeout, args.settle)
+    stop.set()
+    return replies, time.monotonic() - started_at, slack_bot.STREAMING_CURSOR
+
+async def replay_async(args, records, state, stats):
+    """slack_bot_async.async_app.async_dispatch로 재생"""
+    import slack_bot
+    import slack_bot_async
+    from slack_bolt.request.async_request import AsyncBoltRequest
+    
+    slack_bot.event_capture.enabled = False
+    bot_user_id = await slack_bot_async.slack_access.get_bot_user_id()
+    await asyncio.to_thread(slack_bot.load_assistant_instructions)
+    stop = asyncio.Event()
+    
+    async def sampler():
+        while not stop.is_set():
+            stats.sample(queue_depth=slack_bot_async.request_queue.depth(), tasks=len(asyncio.all_tasks()))
+            await asyncio.sleep(0.05)
+    
+    sampler_task = asyncio.create_task(sampler())
+    first_received_at = records[0]["received_at"]
+    started_at = time.monotonic()
+    for record in records:
+        scheduled_at = started_at + (record["received_at"] - first_received_at) / args.speed
+        delay = scheduled_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        body = prepare_body(record, bot_user_id)
+        dispatch_started_at = time.monotonic()
+        response = await slack_bot_async.async_app.async_dispatch(AsyncBoltRequest(body=body, mode="socket_mode"))
+        stats.add_dispatch(body, dispatch_started_at, time.monotonic(), scheduled_at, response.status == 200)
+    
+    # 답변 수집(blocking 대기)은 이벤트 루프를 막지 않도록 별도 스레드에서
+    loop = asyncio.get_running_loop()
+    replies = await loop.run_in_executor(
+        None, collect_replies, stats, state, slack_bot_async.STREAMING_CURSOR, args.timeout, args.settle
+    )
+    stop.set()
+    await sampler_task
+    return replies, time.monotonic() - started_at, slack_bot_async.STREAMING_CURSOR
+
+def synthesize(args):
+    """수강 시작 직후 몰림 상황 합성: --users명이 --window초 안에 질문"""
+    rng = random.Random(args.seed)
+    now = time.time()
+    records = []
+    for index in range(args.users):
+        user_id = f"UXSYNTH{index:05d}"
+        for question_index in range(args.questions_per_user):
+            received_at = now + rng.uniform(0, args.window)
+            ts = f"{received_at:.6f}"
+            question = rng.choice(SYNTH_QUESTIONS)
+            if rng.random() < args.dm_ratio:
+                event = {"type": "message", "channel_type": "im", "user": user_id, "text": question,
+                         "channel": f"DXSYNTH{index:05d}", "ts": ts, "event_ts": ts}
+            else:
+                event = {"type": "app_mention", "user": user_id, "text": f"<@{BOT_USER_PLACEHOLDER}> {question}",
+                         "channel": f"CXSYNTH{rng.randrange(args.channels):03d}", "ts": ts, "event_ts": ts}
+            records.append({
+                "received_at": received_at,
+                "body": {"type": "event_callback", "team_id": "TXSYNTH", "event_id": f"EvSYNTH{index:05d}{question_index:02d}",
+                         "event_time": int(received_at), "event": event},
+            })
+    records.sort(key=lambda record: record["received_at"])
+    with open(args.out, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    print(f"✅ 이벤트 {len(records)}개 생성: {args.out} (사용자 {args.users}명, {args.window:.0f}초)")
+
+def print_report(args, report):
+    """결과 출력"""
+    def seconds(stats):
+        values = [f"{stats[key]:.3f}" if stats[key] is not None else "-" for key in ("p50", "p95", "p99", "max")]
+        return "p50 {}초 / p95 {}초 / p99 {}초 / max {}초".format(*values)
+    
+    print(f"\n📊 재생 결과 - {args.events}, target={args.target}, speed={args.speed}x, streaming={args.streaming}")
+    print(f"  이벤트 {report['events']}개 → 답변 {report['answers']}개 "
+          f"(누락 {report['dropped_replies']}, 중복 {report['duplicated_replies']}, 오류 {report['error_replies']}, "
+          f"dispatch 실패 {report['failed_dispatches']}, 과부하 거절 {report['shed_replies']}), {report['elapsed_seconds']:.1f}초")
+    print(f"  대기 안내 비율: {report['queued_notice_rate']:.1%}")
+    print(f"  핸들러(ack): {seconds(report['handler_seconds'])}")
+    print(f"  dispatch 지연: {seconds(report['dispatch_lag_seconds'])}")
+    print(f"  답변: {seconds(report['answer_seconds'])}")
+    print(f"  최대 스레드 수: {report['peak_threads']}, 최대 대기열 깊이: {report['peak_queue_depth']}"
+          + (f", 최대 asyncio task 수: {report['peak_tasks']}" if args.target == "slack-async" else ""))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Slack 이벤트 재생 부하 테스트")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    synth_parser = subparsers.add_parser("synth", help="몰림 상황 이벤트 합성")
+    synth_parser.add_argument("--users", type=int, default=200)
+    synth_parser.add_argument("--window", type=float, default=300.0, help="질문이 몰리는 구간(초)")
+    synth_parser.add_argument("--questions-per-user", type=int, default=1)
+    synth_parser.add_argument("--dm-ratio", type=float, default=0.3, help="DM으로 묻는 비율")
+    synth_parser.add_argument("--channels", type=int, default=5, help="멘션이 올라오는 채널 수")
+    synth_parser.add_argument("--seed", type=int, default=None)
+    synth_parser.add_argument("--out", default="cohort_start.jsonl")
+    
+    replay_parser = subparsers.add_parser("replay", help="캡처/합성 이벤트 재생")
+    replay_parser.add_argument("events", help="이벤트 JSONL 파일")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="재생 배속 (10이면 10배 빠르게)")
+    replay_parser.add_argument("--target", choices=("slack", "slack-async"), default="slack")
+    replay_parser.add_argument("--streaming", action=argparse.BooleanOptionalAction, default=True, help="Slack 스트리밍 모드")
+    replay_parser.add_argument("--cache", action="store_true", help="답변 캐시 사용")
+    replay_parser.add_argument("--timeout", type=float, default=300.0, help="마지막 이벤트 이후 답변을 기다릴 최대 시간(초)")
+    replay_parser.add_argument("--settle", type=float, default=5.0, help="답변이 다 온 뒤 중복 답변을 기다릴 시간(초)")
+    replay_parser.add_argument("--port", type=int, default=8765, help="대체 서버 포트")
+    replay_parser.add_argument("--json", dest="json_path", help="결과를 JSON 파일로 저장")
+    replay_parser.add_argument("--verbose", action="store_true", help="봇 로그 출력")
+    add_config_arguments(replay_parser)
+    args = parser.parse_args()
+    
+    if args.command == "synth":
+        synthesize(args)
+        sys.exit(0)
+    
+    records = load_events(args.events)
+    if not records:
+        sys.exit(f"❌ 재생할 이벤트가 없습니다: {args.events}")
+    
+    server, state = start_fake_server(config_from_args(args), port=args.port)
+    if not server.started:
+        sys.exit(f"❌ 대체 서버를 시작하지 못했습니다 (포트 {args.port})")
+    configure_environment(args, f"http://127.0.0.1:{args.port}", tempfile.mkdtemp(prefix="assistant-replay-"))
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    
+    stats = ReplayStats()
+    if args.target == "slack":
+        replies, elapsed, cursor = replay_sync(args, records, state, stats)
+    else:
+        replies, elapsed, cursor = asyncio.run(replay_async(args, records, state, stats))
+    
+    report = build_report(stats, replies, cursor, elapsed)
+    print_report(args, report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    server.should_exit = True
@@ -0,0 +1,405 @@
+"""
+Assistant Run 수명 관리 모듈
+
+질문 하나에 종단 간 시한(deadline) 하나를 두고, 이전 Run 대기 → Run 생성 → 완료 대기까지
+모두 남은 시간 안에서만 기다립니다. 시한을 넘긴 Run은 Thread에 활성 상태로 남겨두지 않고
+취소 요청(runs.cancel)을 보낸 뒤, 백그라운드에서 Run이 끝나는 것을 확인하고 정리(reconcile)합니다.
+
+- Thread별 활성 Run을 프로세스 안에서 추적하므로 Run 생성 전 runs.list 사전 확인이 필요 없음
+  (다음 질문은 남은 Run이 끝나기를 이벤트로 기다리고, 추적하지 못한 Run과의 충돌만 runs.list로 확인)
+- 취소 요청이 닿기 전에 완료된 Run(늦은 답변)은 on_late 콜백으로 넘겨 답변을 반영
+- 스트리밍 Run은 시한이 되면 타이머가 취소 요청을 보내고(정리는 polling과 같은 on_late 콜백), 스트림이 cancelled 이벤트로 끝남
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+
+from run_waiter import ACTIVE_RUN_STATUSES, async_wait_for_run, wait_for_run
+from metrics import RUN_DEADLINE_CANCELS, RUN_RECONCILED
+
+logger = logging.getLogger(__name__)
+
+# Run 수명 설정 (환경변수로 조정 가능)
+RUN_DEADLINE = float(os.getenv("RUN_DEADLINE", "40"))  # 질문 하나의 전체 시한(초, 이전 Run 대기부터 Run 완료까지)
+RUN_RECONCILE_TIMEOUT = float(os.getenv("RUN_RECONCILE_TIMEOUT", "120"))  # 취소한 Run의 종료를 지켜보는 최대 시간(초)
+
+class RunDeadlineExceeded(Exception):
+    """시한 안에 Run을 시작하지 못함 (이전 Run이 끝나지 않음 등)"""
+    
+    def __init__(self, stage):
+        super().__init__(f"run deadline exceeded during {stage}")
+        self.stage = stage
+
+class Deadline:
+    """질문 하나의 종단 간 시한"""
+    
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+    
+    def remaining(self):
+        """남은 시간(초, 0 이상)"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+    
+    def expired(self):
+        return self.remaining() <= 0
+    
+    def check(self, stage):
+        """시한이 지났으면 RunDeadlineExceeded"""
+        if self.expired():
+            raise RunDeadlineExceeded(stage)
+
+class TrackedRun:
+    """추적 중인 활성 Run 하나"""
+    
+    __slots__ = ("thread_id", "run_id", "user_id", "started_at", "abandoned", "done", "timer", "tokens")
+    
+    def __init__(self, thread_id, run_id, user_id, done, tokens=None):
+        self.thread_id = thread_id
+        self.run_id = run_id
+        self.user_id = user_id
+        self.started_at = time.monotonic()
+        self.abandoned = False  # 시한 초과로 취소 요청을 보냄 (정리 작업이 추적 해제)
+        self.done = done  # 추적 해제 시 set (threading.Event 또는 asyncio.Event)
+        self.timer = None  # 스트리밍 Run의 시한 타이머
+        self.tokens = tokens  # Run 시작 시 차감한 토큰 추정치 (RunTokenReservation, 취소한 Run은 정리 작업이 정산)
+
+class RunManagerStats:
+    """Run 수명 관리 통계"""
+    
+    def __init__(self):
+        self.tracked = 0
+        self.precheck_waits = 0  # 이전 Run이 끝나기를 기다린 횟수
+        self.precheck_timeouts = 0  # 기다리다 시한을 넘긴 횟수
+        self.conflicts = 0  # 추적하지 못한 활성 Run과 충돌해 runs.list로 확인한 횟수
+        self.deadline_cancels = 0
+        self.late_completed = 0  # 취소 요청 전에 완료되어 늦게 반영한 답변 수
+        self.reconcile_timeouts = 0  # 취소한 Run의 종료를 확인하지 못한 횟수
+    
+    def as_dict(self):
+        """통계를 딕셔너리로 반환"""
+        return {
+            "tracked": self.tracked,
+            "precheck_waits": self.precheck_waits,
+            "precheck_timeouts": self.precheck_timeouts,
+            "conflicts": self.conflicts,
+            "deadline_cancels": self.deadline_cancels,
+            "late_completed": self.late_completed,
+            "reconcile_timeouts": self.reconcile_timeouts,
+        }
+
+def _reconcile_outcome(run):
+    """정리 작업이 마지막으로 확인한 Run 상태 (아직 활성이면 timeout)"""
+    return "timeout" if run.status in ACTIVE_RUN_STATUSES else run.status
+
+def _settle_abandoned(entry, run):
+    """취소한 Run의 토큰 추정치 정산 (on_late가 이미 정산했으면 무시, 사용량을 모르면 전부 환불)"""
+    if entry.tokens is not None:
+        entry.tokens.settle(getattr(run, "usage", None))
+
+class RunScope:
+    """질문 하나에서 만든 Run의 추적 범위 (with 블록을 나가면 추적 해제)
+    
+    Run ID는 생성 후에야(스트리밍이면 thread.run.created 이벤트에서) 알 수 있으므로
+    범위를 먼저 열고 track()으로 등록합니다.
+    tokens(RunTokenReservation)를 주면 범위를 나갈 때 마지막으로 확인한 Run의 사용량으로 정산하고
+    (실패/스트림 오류 등 사용량을 모르면 전부 환불), 취소한 Run은 정리 작업이 끝날 때 정산합니다.
+    """
+    
+    def __init__(self, manager, user_id, deadline, tokens=None):
+        self.manager = manager
+        self.user_id = user_id
+        self.deadline = deadline
+        self.tokens = tokens
+        self.entry = None
+        self.last_run = None  # 마지막으로 확인한 Run (토큰 정산용)
+    
+    def track(self, thread_id, run_id, watch=False, on_late=None):
+        """Run 등록 (watch=True면 시한에 자동으로 취소하고 끝나면 on_late(run) 호출 - 스트리밍용)"""
+        self.entry = self.manager.track(thread_id, run_id, self.user_id,
+                                        deadline=self.deadline if watch else None, on_late=on_late,
+                                        tokens=self.tokens)
+        return self.entry
+    
+    def wait(self, run, on_poll=None, on_late=None):
+        """등록한 Run을 남은 시한 안에서 기다림 (시한을 넘기면 취소 후 정리 작업에 넘김)"""
+        run, wait_stats = self.manager.wait(self.entry, run, self.deadline, on_poll=on_poll, on_late=on_late)
+        self.last_run = run
+        return run, wait_stats
+    
+    def finished(self, run):
+        """스트림 이벤트로 받은 Run의 마지막 상태 기록 (범위를 나갈 때 사용량으로 토큰 정산)"""
+        self.last_run = run
+    
+    @property
+    def abandoned(self):
+        """시한을 넘겨 취소한 Run인지"""
+        return self.entry is not None and self.entry.abandoned
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if self.entry is not None:
+            self.manager.finish(self.entry)
+        if self.tokens is not None and not self.abandoned:
+            self.tokens.settle(getattr(self.last_run, "usage", None))
+        return False
+
+class AsyncRunScope(RunScope):
+    """RunScope의 비동기 버전 (with 블록은 그대로, wait만 코루틴)"""
+    
+    async def wait(self, run, on_poll=None, on_late=None):
+        run, wait_stats = await self.manager.wait(self.entry, run, self.deadline, on_poll=on_poll, on_late=on_late)
+        self.last_run = run
+        return run, wait_stats
+
+class RunManager:
+    """Thread별 활성 Run 추적 + 시한 초과 Run 취소/정리"""
+    
+    def __init__(self, client, deadline_seconds=RUN_DEADLINE, reconcile_timeout=RUN_RECONCILE_TIMEOUT):
+        self.client = client
+        self.deadline_seconds = deadline_seconds
+        self.reconcile_timeout = reconcile_timeout
+        self.stats = RunManagerStats()
+        self._lock = threading.Lock()
+        self._active = {}  # thread_id -> TrackedRun
+    
+    def deadline(self):
+        """새 질문의 시한"""
+        return Deadline(self.deadline_seconds)
+    
+    def scope(self, user_id, deadline, tokens=None):
+        return RunScope(self, user_id, deadline, tokens)
+    
+    def wait_idle(self, thread_id, deadline):
+        """이 프로세스가 Thread에 만든 Run이 아직 활성이면 끝날 때까지 남은 시한 안에서 대기
+        
+        Raises:
+            RunDeadlineExceeded: 시한 안에 끝나지 않았을 때
+        """
+        with self._lock:
+            entry = self._active.get(thread_id)
+            if entry is None:
+                return
+            self.stats.precheck_waits += 1
+        
+        logger.info(f"이전 Run 종료 대기: {entry.run_id}")
+        if not entry.done.wait(deadline.remaining()):
+            with self._lock:
+                self.stats.precheck_timeouts += 1
+            raise RunDeadlineExceeded("precheck")
+    
+    def wait_conflict(self, thread_id, deadline):
+        """Thread에 활성 Run이 있어 요청이 거절됐을 때 그 Run이 끝날 때까지 대기
+        
+        추적 중인 Run이면 이벤트로 기다리고, 다른 인스턴스가 만든 Run처럼 추적하지 못한 Run은
+        runs.list로 찾아 polling합니다.
+        """
+        self.wait_idle(thread_id, deadline)
+        with self._lock:
+            self.stats.conflicts += 1
+        existing_runs = self.client.beta.threads.runs.list(thread_id=thread_id, limit=1)
+        if existing_runs.data and existing_runs.data[0].status in ACTIVE_RUN_STATUSES:
+            logger.info(f"추적하지 않은 활성 Run 대기: {existing_runs.data[0].id}")
+            wait_for_run(self.client, thread_id, existing_runs.data[0], timeout=deadline.remaining())
+        deadline.check("conflict")
+    
+    def track(self, thread_id, run_id, user_id=None, deadline=None, on_late=None, tokens=None):
+        """새 Run을 Thread의 활성 Run으로 등록 (deadline을 주면 시한에 자동 취소 후 on_late로 정리)"""
+        entry = TrackedRun(thread_id, run_id, user_id, threading.Event(), tokens)
+        with self._lock:
+            self._active[thread_id] = entry
+            self.stats.tracked += 1
+        if deadline is not None:
+            entry.timer = threading.Timer(deadline.remaining(), self.abandon, (entry, on_late))
+            entry.timer.daemon = True
+            entry.timer.start()
+        return entry
+    
+    def finish(self, entry):
+        """Run을 더 기다리지 않을 때 호출 (취소한 Run은 정리 작업이 끝날 때 해제)"""
+        if entry.timer is not None:
+            entry.timer.cancel()
+        with self._lock:
+            if entry.abandoned:
+                return
+        self._release(entry)
+    
+    def _release(self, entry):
+        """추적 해제 후 기다리던 다음 질문을 깨움"""
+        with self._lock:
+            if self._active.get(entry.thread_id) is entry:
+                del self._active[entry.thread_id]
+            entry.done.set()
+    
+    def wait(self, entry, run, deadline, on_poll=None, on_late=None):
+        """남은 시한 안에서 Run 완료 대기 (시한을 넘기면 취소 후 정리 작업에 넘김)
+        
+        Returns:
+            (마지막으로 확인한 run, RunWaitStats)
+        """
+        run, wait_stats = wait_for_run(self.client, entry.thread_id, run, timeout=deadline.remaining(), on_poll=on_poll)
+        if run.status in ACTIVE_RUN_STATUSES:
+            self.abandon(entry, on_late)
+        return run, wait_stats
+    
+    def _mark_abandoned(self, entry):
+        """처음 포기하는 Run이면 표시 후 True (이미 포기했거나 해제된 Run은 False)"""
+        with self._lock:
+            if entry.abandoned or entry.done.is_set():
+                return False
+            entry.abandoned = True
+            self.stats.deadline_cancels += 1
+        RUN_DEADLINE_CANCELS.inc()
+        logger.warning(f"Run 시한 초과로 취소 - Run: {entry.run_id}, {time.monotonic() - entry.started_at:.1f}초 경과")
+        return True
+    
+    def abandon(self, entry, on_late=None):
+        """시한을 넘긴 Run 취소 요청 후 백그라운드에서 종료 확인 (여러 번 불러도 한 번만)
+        
+        Args:
+            on_late: Run이 끝나면 마지막 run으로 호출 (사용량 기록, 늦게 완료된 답변 반영)
+        """
+        if not self._mark_abandoned(entry):
+            return
+        try:
+            self.client.beta.threads.runs.cancel(thread_id=entry.thread_id, run_id=entry.run_id)
+        except Exception as e:
+            # 이미 끝난 Run이면 취소가 거절됨 - 정리 작업이 상태를 확인
+            logger.info(f"Run 취소 요청 실패 - Run: {entry.run_id}: {e}")
+        threading.Thread(target=self._reconcile, args=(entry, on_late), name="run-reconcile", daemon=True).start()
+    
+    def _reconcile(self, entry, on_late):
+        """취소한 Run이 끝날 때까지 기다렸다가 추적 해제 후 결과 정리"""
+        run = None
+        try:
+            run = self.client.beta.threads.runs.retrieve(thread_id=entry.thread_id, run_id=entry.run_id)
+            run, _ = wait_for_run(self.client, entry.thread_id, run, timeout=self.reconcile_timeout)
+            outcome = _reconcile_outcome(run)
+        except Exception as e:
+            logger.warning(f"취소한 Run 상태 확인 실패 - Run: {entry.run_id}: {e}")
+            outcome = "error"
+        finally:
+            # 종료를 확인하지 못해도 다음 질문이 무한정 기다리지 않도록 해제 (남은 Run은 충돌 시 wait_conflict가 처리)
+            self._release(entry)
+        
+        self._record_outcome(entry, outcome)
+        if on_late is not None and outcome not in ("timeout", "error"):
+            try:
+                on_late(run)
+            except Exception as e:
+                logger.error(f"늦은 Run 결과 반영 오류 - Run: {entry.run_id}: {e}")
+        _settle_abandoned(entry, run)
+    
+    def _record_outcome(self, entry, outcome):
+        with self._lock:
+            if outcome == "completed":
+                self.stats.late_completed += 1
+            elif outcome == "timeout":
+                self.stats.reconcile_timeouts += 1
+        RUN_RECONCILED.inc(outcome=outcome)
+        logger.info(f"취소한 Run 정리 - Run: {entry.run_id}, 결과: {outcome}")
+    
+    def active_count(self):
+        """추적 중인 활성 Run 수"""
+        with self._lock:
+            return len(self._active)
+
+class AsyncRunManager(RunManager):
+    """RunManager의 asyncio 버전 (AsyncOpenAI 클라이언트, 이벤트 루프 안에서 사용)"""
+    
+    def __init__(self, client, deadline_seconds=RUN_DEADLINE, reconcile_timeout=RUN_RECONCILE_TIMEOUT):
+        super().__init__(client, deadline_seconds, reconcile_timeout)
+        self._tasks = set()
+    
+    def scope(self, user_id, deadline, tokens=None):
+        return AsyncRunScope(self, user_id, deadline, tokens)
+    
+    async def wait_idle(self, thread_id, deadline):
+        """RunManager.wait_idle의 비동기 버전"""
+        with self._lock:
+            entry = self._active.get(thread_id)
+            if entry is None:
+                return
+            self.stats.precheck_waits += 1
+        
+        logger.info(f"이전 Run 종료 대기: {entry.run_id}")
+        try:
+            await asyncio.wait_for(entry.done.wait(), deadline.remaining())
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.stats.precheck_timeouts += 1
+            raise RunDeadlineExceeded("precheck")
+    
+    async def wait_conflict(self, thread_id, deadline):
+        """RunManager.wait_conflict의 비동기 버전"""
+        await self.wait_idle(thread_id, deadline)
+        with self._lock:
+            self.stats.conflicts += 1
+        existing_runs = await self.client.beta.threads.runs.list(thread_id=thread_id, limit=1)
+        if existing_runs.data and existing_runs.data[0].status in ACTIVE_RUN_STATUSES:
+            logger.info(f"추적하지 않은 활성 Run 대기: {existing_runs.data[0].id}")
+            await async_wait_for_run(self.client, thread_id, existing_runs.data[0], timeout=deadline.remaining())
+        deadline.check("conflict")
+    
+    def track(self, thread_id, run_id, user_id=None, deadline=None, on_late=None, tokens=None):
+        """RunManager.track의 비동기 버전 (시한 타이머는 이벤트 루프의 call_later, on_late는 코루틴 함수)"""
+        entry = TrackedRun(thread_id, run_id, user_id, asyncio.Event(), tokens)
+        with self._lock:
+            self._active[thread_id] = entry
+            self.stats.tracked += 1
+        if deadline is not None:
+            entry.timer = asyncio.get_running_loop().call_later(deadline.remaining(), self._abandon_soon, entry, on_late)
+        return entry
+    
+    def _abandon_soon(self, entry, on_late):
+        """시한 타이머 콜백"""
+        self._spawn(self.abandon(entry, on_late))
+    
+    def _spawn(self, coro):
+        """백그라운드 task 실행 (완료 전에 GC되지 않도록 보관)"""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def wait(self, entry, run, deadline, on_poll=None, on_late=None):
+        """RunManager.wait의 비동기 버전"""
+        run, wait_stats = await async_wait_for_run(self.client, entry.thread_id, run, timeout=deadline.remaining(), on_poll=on_poll)
+        if run.status in ACTIVE_RUN_STATUSES:
+            await self.abandon(entry, on_late)
+        return run, wait_stats
+    
+    async def abandon(self, entry, on_late=None):
+        """RunManager.abandon의 비동기 버전 (on_late는 코루틴 함수)"""
+        if not self._mark_abandoned(entry):
+            return
+        try:
+            await self.client.beta.threads.runs.cancel(thread_id=entry.thread_id, run_id=entry.run_id)
+        except Exception as e:
+            logger.info(f"Run 취소 요청 실패 - Run: {entry.run_id}: {e}")
+        self._spawn(self._reconcile(entry, on_late))
+    
+    async def _reconcile(self, entry, on_late):
+        """RunManager._reconcile의 비동기 버전"""
+        run = None
+        try:
+            run = await self.client.beta.threads.runs.retrieve(thread_id=entry.thread_id, run_id=entry.run_id)
+            run, _ = await async_wait_for_run(self.client, entry.thread_id, run, timeout=self.reconcile_timeout)
+            outcome = _reconcile_outcome(run)
+        except Exception as e:
+            logger.warning(f"취소한 Run 상태 확인 실패 - Run: {entry.run_id}: {e}")
+            outcome = "error"
+        finally:
+            self._release(entry)
+        
+        self._record_outcome(entry, outcome)
+        if on_late is not None and outcome not in ("timeout", "error"):
+            try:
+                await on_late(run)
+            except Exception as e:
+                logger.error(f"늦은 Run 결과 반영 오류 - Run: {entry.run_id}: {e}")
+        _settle_abandoned(entry, run)
@@ -0,0 +1,137 @@
+"""
+OpenAI Assistant Run 완료 대기 모듈
+
+고정 1초 간격 polling 대신 처음 몇 번은 짧은 간격으로 빠르게 확인하고,
+이후 간격을 지수적으로 늘리되 상한을 두는 적응형 backoff로 Run 상태를 확인합니다.
+main.py, slack_bot.py, test_assistant.py에서 공통으로 사용하며,
+비동기 클라이언트(AsyncOpenAI)용 async_wait_for_run도 제공합니다.
+"""
+
+import os
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 아직 끝나지 않은 Run 상태
+ACTIVE_RUN_STATUSES = ('queued', 'in_progress', 'cancelling')
+
+# Polling 설정 (환경변수로 조정 가능)
+RUN_POLL_INITIAL_INTERVAL = float(os.getenv("RUN_POLL_INITIAL_INTERVAL", "0.2"))  # 첫 probe 간격(초)
+RUN_POLL_FAST_PROBES = int(os.getenv("RUN_POLL_FAST_PROBES", "3"))  # 짧은 간격으로 확인할 횟수
+RUN_POLL_MULTIPLIER = float(os.getenv("RUN_POLL_MULTIPLIER", "1.6"))  # 이후 간격 증가 배수
+RUN_POLL_MAX_INTERVAL = float(os.getenv("RUN_POLL_MAX_INTERVAL", "2.0"))  # 최대 간격(초)
+RUN_WAIT_TIMEOUT = float(os.getenv("RUN_WAIT_TIMEOUT", "30"))  # 기본 대기 시한(초)
+
+class RunWaitStats:
+    """Run 하나를 기다리는 동안의 polling 통계"""
+    
+    def __init__(self, run_id=None):
+        self.run_id = run_id
+        self.polls = 0  # runs.retrieve 호출 횟수
+        self.elapsed = 0.0  # 전체 대기 시간(초)
+        self.slept = 0.0  # sleep으로 보낸 시간(초)
+        self.last_interval = 0.0  # 마지막 sleep 간격(초)
+        self.wasted_wait = 0.0  # Run이 끝난 뒤 확인하기까지 낭비된 시간 추정치(초)
+        self.timed_out = False
+        self.final_status = None
+    
+    def summary(self):
+        """로그용 요약 문자열"""
+        return (
+            f"Run {self.run_id}: {self.final_status} - polls {self.polls}회, "
+            f"대기 {self.elapsed:.2f}초, 낭비 추정 {self.wasted_wait:.2f}초"
+            + (" (타임아웃)" if self.timed_out else "")
+        )
+
+def poll_interval(poll_index):
+    """poll_index번째 확인 전에 쉴 간격 계산 (0부터 시작)"""
+    if poll_index < RUN_POLL_FAST_PROBES:
+        return RUN_POLL_INITIAL_INTERVAL
+    
+    backoff_step = poll_index - RUN_POLL_FAST_PROBES + 1
+    return min(RUN_POLL_INITIAL_INTERVAL * (RUN_POLL_MULTIPLIER ** backoff_step), RUN_POLL_MAX_INTERVAL)
+
+def _finished_at(run):
+    """Run이 끝난 시각(unix time) - 없으면 None"""
+    for field in ('completed_at', 'failed_at', 'cancelled_at', 'expired_at'):
+        value = getattr(run, field, None)
+        if value:
+            return value
+    return None
+
+def _finalize_stats(stats, run, started_at):
+    """대기 종료 시점의 통계 정리"""
+    stats.elapsed = time.monotonic() - started_at
+    stats.final_status = run.status
+    
+    # Run 종료 시각(초 단위)과 확인 시각의 차이로 낭비된 대기 시간 추정 (마지막 간격을 넘지 않음)
+    finished_at = _finished_at(run)
+    if finished_at and stats.polls:
+        stats.wasted_wait = min(max(time.time() - finished_at, 0.0), stats.last_interval)
+    
+    logger.info(stats.summary())
+    return stats
+
+def wait_for_run(client, thread_id, run, timeout=RUN_WAIT_TIMEOUT, on_poll=None):
+    """Run이 끝나거나 시한(timeout초)이 지날 때까지 적응형 간격으로 대기
+    
+    Returns:
+        (마지막으로 확인한 run, RunWaitStats)
+    """
+    stats = RunWaitStats(run.id)
+    started_at = time.monotonic()
+    deadline = started_at + timeout
+    
+    while run.status in ACTIVE_RUN_STATUSES:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            stats.timed_out = True
+            break
+        
+        interval = min(poll_interval(stats.polls), remaining)
+        time.sleep(interval)
+        stats.slept += interval
+        stats.last_interval = interval
+        stats.polls += 1
+        
+        run = client.beta.threads.runs.retrieve(
+            thread_id=thread_id,
+            run_id=run.id
+        )
+        if on_poll:
+            on_poll(run, stats)
+    
+    return run, _finalize_stats(stats, run, started_at)
+
+async def async_wait_for_run(client, thread_id, run, timeout=RUN_WAIT_TIMEOUT, on_poll=None):
+    """wait_for_run의 비동기 버전 (AsyncOpenAI 클라이언트, asyncio.sleep 사용)
+    
+    Returns:
+        (마지막으로 확인한 run, RunWaitStats)
+    """
+    stats = RunWaitStats(run.id)
+    started_at = time.monotonic()
+    deadline = started_at + timeout
+    
+    while run.status in ACTIVE_RUN_STATUSES:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            stats.timed_out = True
+            break
+        
+        interval = min(poll_interval(stats.polls), remaining)
+        await asyncio.sleep(interval)
+        stats.slept += interval
+        stats.last_interval = interval
+        stats.polls += 1
+        
+        run = await client.beta.threads.runs.retrieve(
+            thread_id=thread_id,
+            run_id=run.id
+        )
+        if on_poll:
+            on_poll(run, stats)
+    
+    return run, _finalize_stats(stats, run, started_at)
@@ -0,0 +1,286 @@
+"""
+Slack Web API 접근 모듈
+
+- 봇 자신의 user ID는 시작 시 한 번만 auth.test로 확인하고, 인증 오류가 났을 때만 다시 확인
+- 사용자/채널 정보는 TTL 캐시에 저장
+- chat.postMessage / chat.update / views.publish 호출은 메서드별 Slack tier 한도에 맞춰 간격을 두고,
+  429 응답의 Retry-After를 한 곳에서 처리
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from slack_sdk.errors import SlackApiError
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# 메서드별 분당 호출 한도 (Slack tier 기준, 안전하게 조금 낮춤)
+# chat.postMessage는 채널당 초당 1건이 기준이라 채널별로 따로 제한
+SLACK_METHOD_LIMITS = {
+    "chat.postMessage": 60,  # 채널당
+    "chat.update": 50,  # Tier 3
+    "views.publish": 100,  # Tier 4
+    "users.info": 100,  # Tier 4
+    "conversations.info": 50,  # Tier 3
+    "auth.test": 100,  # Tier 4
+}
+PER_CHANNEL_METHODS = {"chat.postMessage", "chat.update"}
+
+# 다시 인증 정보를 확인해야 하는 오류
+AUTH_ERRORS = {"invalid_auth", "not_authed", "token_revoked", "token_expired", "account_inactive"}
+
+SLACK_METADATA_TTL = float(os.getenv("SLACK_METADATA_TTL", "600"))  # 사용자/채널 정보 캐시 유지 시간(초)
+SLACK_MAX_RATE_LIMIT_RETRIES = 3
+
+class SlackRateLimited(Exception):
+    """Rate limit 때문에 지금은 호출할 수 없음 (wait=False로 호출한 경우)"""
+    
+    def __init__(self, method, retry_after):
+        super().__init__(f"{method} rate limited - {retry_after:.1f}초 후 재시도 가능")
+        self.method = method
+        self.retry_after = retry_after
+
+class SlackRateLimiter:
+    """메서드(및 채널)별 최소 호출 간격과 Retry-After 차단 시각 관리"""
+    
+    def __init__(self, limits=SLACK_METHOD_LIMITS):
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._next_free = {}  # key -> 다음 호출 가능 시각(monotonic)
+        self.rate_limited_count = 0
+    
+    @staticmethod
+    def key_for(method, kwargs):
+        """제한 단위 키 (채널 단위 메서드는 채널까지 포함)"""
+        if method in PER_CHANNEL_METHODS and kwargs.get("channel"):
+            return f"{method}:{kwargs['channel']}"
+        return method
+    
+    def reserve(self, key, method, wait=True):
+        """다음 호출 슬롯 예약
+        
+        Returns:
+            호출 전에 기다려야 하는 시간(초)
+        """
+        limit = self.limits.get(method)
+        interval = 60.0 / limit if limit else 0.0
+        with self._lock:
+            now = time.monotonic()
+            next_free = self._next_free.get(key, now)
+            wait_seconds = max(0.0, next_free - now)
+            if wait_seconds and not wait:
+                raise SlackRateLimited(method, wait_seconds)
+            self._next_free[key] = max(now, next_free) + interval
+            return wait_seconds
+    
+    def block(self, key, seconds):
+        """429 응답을 받은 키는 Retry-After 동안 호출 중지"""
+        with self._lock:
+            self.rate_limited_count += 1
+            self._next_free[key] = max(self._next_free.get(key, 0.0), time.monotonic() + seconds)
+
+def _retry_after_seconds(error):
+    """SlackApiError에서 Retry-After(초) 추출 (429가 아니면 None)"""
+    response = getattr(error, "response", None)
+    if response is None or getattr(response, "status_code", None) != 429:
+        return None
+    return float(response.headers.get("Retry-After", 1))
+
+def _error_code(error):
+    """SlackApiError의 error 코드"""
+    response = getattr(error, "response", None)
+    try:
+        return response["error"] if response is not None else None
+    except (KeyError, TypeError):
+        return None
+
+class TTLCache:
+    """단순 TTL 캐시"""
+    
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._items = {}
+    
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, stored_at = item
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._items[key]
+                return None
+            return value
+    
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (value, time.monotonic())
+
+class SlackAccess:
+    """Slack WebClient 접근 계층 (봇 정보 캐시, 메타데이터 캐시, rate limit 처리)"""
+    
+    def __init__(self, client, metadata_ttl=SLACK_METADATA_TTL):
+        self.client = client
+        self.limiter = SlackRateLimiter()
+        self.users = TTLCache(metadata_ttl)
+        self.channels = TTLCache(metadata_ttl)
+        self._identity = None  # auth.test 결과 (user_id, bot_id, team_id)
+    
+    @property
+    def bot_user_id(self):
+        """봇 자신의 user ID (캐시, 없으면 auth.test로 확인)"""
+        if self._identity is None:
+            try:
+                self.resolve_identity()
+            except Exception as e:
+                logger.warning(f"봇 인증 확인 오류: {e}")
+                return None
+        return self._identity["user_id"]
+    
+    def resolve_identity(self):
+        """auth.test로 봇 정보 확인 (시작 시 또는 인증 오류 후 1회)"""
+        response = self.call("auth.test")
+        self._identity = {
+            "user_id": response["user_id"],
+            "bot_id": response.get("bot_id"),
+            "team_id": response.get("team_id"),
+        }
+        logger.info(f"봇 정보 확인: {self._identity['user_id']}")
+        return self._identity
+    
+    def call(self, method, wait=True, **kwargs):
+        """Slack API 호출 (tier 간격 유지, 429 Retry-After 처리, 인증 오류 시 봇 정보 초기화)
+        
+        wait=False이면 rate limit 상태일 때 기다리지 않고 SlackRateLimited를 발생시킵니다.
+        """
+        with tracer.span(f"slack.{method}") as span:
+            key = self.limiter.key_for(method, kwargs)
+            for attempt in range(SLACK_MAX_RATE_LIMIT_RETRIES + 1):
+                wait_seconds = self.limiter.reserve(key, method, wait=wait)
+                if wait_seconds:
+                    span.set_attributes(rate_limit_wait=round(wait_seconds, 3))
+                    time.sleep(wait_seconds)
+                
+                try:
+                    return getattr(self.client, method.replace(".", "_"))(**kwargs)
+                except SlackApiError as e:
+                    retry_after = _retry_after_seconds(e)
+                    if retry_after is not None:
+                        logger.warning(f"{method} rate limit - {retry_after}초 후 재시도")
+                        span.set_attributes(rate_limited=attempt + 1)
+                        self.limiter.block(key, retry_after)
+                        if wait and attempt < SLACK_MAX_RATE_LIMIT_RETRIES:
+                            continue
+                        raise SlackRateLimited(method, retry_after) from e
+                    if _error_code(e) in AUTH_ERRORS:
+                        self._identity = None
+                    raise
+    
+    def post_message(self, wait=True, **kwargs):
+        """chat.postMessage"""
+        return self.call("chat.postMessage", wait=wait, **kwargs)
+    
+    def update_message(self, wait=True, **kwargs):
+        """chat.update"""
+        return self.call("chat.update", wait=wait, **kwargs)
+    
+    def publish_view(self, **kwargs):
+        """views.publish"""
+        return self.call("views.publish", **kwargs)
+    
+    def get_user(self, user_id):
+        """사용자 정보 (TTL 캐시)"""
+        user = self.users.get(user_id)
+        if user is None:
+            user = self.call("users.info", user=user_id)["user"]
+            self.users.set(user_id, user)
+        return user
+    
+    def get_channel(self, channel_id):
+        """채널 정보 (TTL 캐시)"""
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            channel = self.call("conversations.info", channel=channel_id)["channel"]
+            self.channels.set(channel_id, channel)
+        return channel
+
+class AsyncSlackAccess(SlackAccess):
+    """SlackAccess의 비동기 버전 (AsyncWebClient 사용)"""
+    
+    async def get_bot_user_id(self):
+        """봇 자신의 user ID (캐시, 없으면 auth.test로 확인)"""
+        if self._identity is None:
+            try:
+                await self.resolve_identity()
+            except Exception as e:
+                logger.warning(f"봇 인증 확인 오류: {e}")
+                return None
+        return self._identity["user_id"]
+    
+    async def resolve_identity(self):
+        """auth.test로 봇 정보 확인 (시작 시 또는 인증 오류 후 1회)"""
+        response = await self.call("auth.test")
+        self._identity = {
+            "user_id": response["user_id"],
+            "bot_id": response.get("bot_id"),
+            "team_id": response.get("team_id"),
+        }
+        logger.info(f"봇 정보 확인: {self._identity['user_id']}")
+        return self._identity
+    
+    async def call(self, method, wait=True, **kwargs):
+        """Slack API 호출 (비동기 버전, 동작은 SlackAccess.call과 같음)"""
+        with tracer.span(f"slack.{method}") as span:
+            key = self.limiter.key_for(method, kwargs)
+            for attempt in range(SLACK_MAX_RATE_LIMIT_RETRIES + 1):
+                wait_seconds = self.limiter.reserve(key, method, wait=wait)
+                if wait_seconds:
+                    span.set_attributes(rate_limit_wait=round(wait_seconds, 3))
+                    await asyncio.sleep(wait_seconds)
+                
+                try:
+                    return await getattr(self.client, method.replace(".", "_"))(**kwargs)
+                except SlackApiError as e:
+                    retry_after = _retry_after_seconds(e)
+                    if retry_after is not None:
+                        logger.warning(f"{method} rate limit - {retry_after}초 후 재시도")
+                        span.set_attributes(rate_limited=attempt + 1)
+                        self.limiter.block(key, retry_after)
+                        if wait and attempt < SLACK_MAX_RATE_LIMIT_RETRIES:
+                            continue
+                        raise SlackRateLimited(method, retry_after) from e
+                    if _error_code(e) in AUTH_ERRORS:
+                        self._identity = None
+                    raise
+    
+    async def post_message(self, wait=True, **kwargs):
+        """chat.postMessage"""
+        return await self.call("chat.postMessage", wait=wait, **kwargs)
+    
+    async def update_message(self, wait=True, **kwargs):
+        """chat.update"""
+        return await self.call("chat.update", wait=wait, **kwargs)
+    
+    async def publish_view(self, **kwargs):
+        """views.publish"""
+        return await self.call("views.publish", **kwargs)
+    
+    async def get_user(self, user_id):
+        """사용자 정보 (TTL 캐시)"""
+        user = self.users.get(user_id)
+        if user is None:
+            user = (await self.call("users.info", user=user_id))["user"]
+            self.users.set(user_id, user)
+        return user
+    
+    async def get_channel(self, channel_id):
+        """채널 정보 (TTL 캐시)"""
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            channel = (await self.call("conversations.info", channel=channel_id))["channel"]
+            self.channels.set(channel_id, channel)
+        return channel
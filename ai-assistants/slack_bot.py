@@ -1,10 +1,53 @@
 import os
+import re
+import sys
 import time
 import logging
 from slack_bolt import App
+from slack_sdk import WebClient
 from slack_bolt.adapter.socket_mode import SocketModeHandler
-from openai import OpenAI
 from dotenv import load_dotenv
+from run_manager import RunDeadlineExceeded, RunManager
+from user_queue import KIND_DM, KIND_MENTION, QueueFull, UserRequestQueue
+from thread_registry import create_thread_registry
+from thread_compactor import ThreadCompactor
+from answer_cache import AnswerCache
+from answer_store import load_answer_store
+from event_capture import EventCapture
+from event_dedup import EventDeduplicator, event_keys
+from user_lease import UserLeaseManager, create_lease_store
+from slack_api import SlackAccess, SlackRateLimited
+from tracing import tracer
+from openai_scheduler import OpenAIUnavailable
+import assistant_core
+from assistant_core import (
+    ASSISTANT_ID,
+    MAX_UNRELATED_RESPONSE_LENGTH,
+    PROMPT_DELIVERY,
+    STRICT_PROMPT,
+    build_user_message,
+    delete_remote_thread,
+    is_bootcamp_related,
+    keyword_config,
+    load_assistant_instructions,
+    message_mirror,
+    openai_client,
+    openai_scheduler,
+    post_process_response,
+    remove_annotations,
+    run_prompt_kwargs,
+    thread_pool,
+    token_ledger,
+)
+from metrics import (
+    ACTIVE_RUN_RETRIES,
+    ANSWERS,
+    METRICS_ENABLED,
+    PHASE_SECONDS,
+    RUN_STATUS,
+    RunPhaseTimer,
+    start_metrics_server,
+)
 
 # 환경변수 로드
 load_dotenv()
@@ -13,69 +56,72 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# OpenAI 클라이언트 초기화
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# Assistant ID
-ASSISTANT_ID = os.getenv("ASSISTANT_ID", "asst_dhCyBhWrMBqjd83HnjEbWUY5")
+# Slack Web API 주소 (로컬 대체 서버로 성능 측정 시 지정, 기본은 slack.com)
+SLACK_API_URL = os.getenv("SLACK_API_URL")
 
 # Slack 앱 초기화
-app = App(token=os.getenv("SLACK_BOT_TOKEN"))
+if SLACK_API_URL:
+    app = App(client=WebClient(token=os.getenv("SLACK_BOT_TOKEN"), base_url=SLACK_API_URL))
+else:
+    app = App(token=os.getenv("SLACK_BOT_TOKEN"))
 
-# 각 사용자별 Thread 관리를 위한 딕셔너리
-user_threads = {}
+# Slack API 접근 계층 (봇 정보/메타데이터 캐시, rate limit 및 Retry-After 처리)
+slack_access = SlackAccess(app.client)
 
-# 사용자별 처리 상태 관리 (중복 요청 방지)
-user_processing = {}
+# 봇 멘션 패턴
+BOT_MENTION_PATTERN = re.compile(r'<@[A-Z0-9]+>')
 
-def remove_annotations(message_content):
-    """OpenAI 메시지에서 annotations(주석)을 제거하는 함수"""
-    if not message_content or not hasattr(message_content, 'text'):
-        return ""
-    
-    text_content = message_content.text
-    if not hasattr(text_content, 'value') or not hasattr(text_content, 'annotations'):
-        return text_content.value if hasattr(text_content, 'value') else str(text_content)
-    
-    # 원본 텍스트
-    full_text = text_content.value
-    
-    # annotations가 없으면 원본 반환
-    if not text_content.annotations:
-        return full_text
-    
-    # annotations를 뒤에서부터 제거 (인덱스 변화 방지)
-    annotations_sorted = sorted(text_content.annotations, 
-                               key=lambda x: x.start_index, reverse=True)
-    
-    clean_text = full_text
-    for annotation in annotations_sorted:
-        start = annotation.start_index
-        end = annotation.end_index
-        # annotation 부분을 제거
-        clean_text = clean_text[:start] + clean_text[end:]
-    
-    return clean_text.strip()
+# 각 사용자별 Thread 관리 (SQLite 저장 + 메모리 LRU 또는 여러 서버가 공유하는 key-value 저장소, 재시작 후에도 유지)
+thread_registry = create_thread_registry()
 
-def get_or_create_thread(user_id):
-    """사용자별 Thread 생성 또는 가져오기"""
-    if user_id not in user_threads:
-        try:
-            thread = openai_client.beta.threads.create()
-            user_threads[user_id] = thread.id
-            logger.info(f"새 Thread 생성됨 - User: {user_id}, Thread: {thread.id}")
-        except Exception as e:
-            logger.error(f"Thread 생성 오류: {str(e)}")
-            return None
-    
-    return user_threads[user_id]
+# Thread별 활성 Run 추적 + 질문별 종단 간 시한 (시한을 넘긴 Run은 취소 후 정리)
+run_manager = RunManager(openai_client)
 
-async def get_assistant_response(message, user_id):
-    """OpenAI Assistant로부터 응답 받기"""
-    try:
-        # 부트캠프 관련 질문이 아닌 경우 빠른 응답
-        if not is_bootcamp_related(message):
-            return """안녕하세요! 저는 *AI 부트캠프 전용 FAQ 봇* 입니다. 🤖
+# 자주 묻는 질문 답변 캐시 (정규화 + 유사 질문 조회, 메모리에 없으면 precompute_answers.py로 만든 저장소 조회)
+# (지식 베이스 버전은 사전 계산 작업과 같은 방법으로 구해 비교, 구할 수 없으면 저장소를 사용하지 않음)
+answer_cache = AnswerCache(store=load_answer_store(
+    STRICT_PROMPT.label, assistant_id=ASSISTANT_ID, kb_version=assistant_core.current_kb_version
+))
+
+# 사용자별 순차 처리 큐 (같은 사용자의 질문은 순서대로, 전체 동시 처리 수는 제한)
+request_queue = UserRequestQueue()
+
+# 여러 봇 인스턴스 사이의 사용자별 처리 lease (USER_LEASE_BACKEND 지정 시, 기본은 사용하지 않음)
+user_leases = UserLeaseManager(create_lease_store())
+
+# 부하 테스트 재생용 이벤트 캡처 (SLACK_EVENT_CAPTURE_PATH 지정 시, 익명화하여 JSONL로 기록)
+event_capture = EventCapture()
+
+# Slack 재전송/중복 이벤트 걸러내기 (EVENT_DEDUP_DB_PATH 지정 시 여러 프로세스가 SQLite로 공유)
+event_deduplicator = EventDeduplicator()
+
+# 스트리밍 모드 설정 (부분 답변을 로딩 메시지에 점진적으로 반영)
+STREAMING_MODE = os.getenv("SLACK_STREAMING", "true").lower() == "true"
+STREAM_UPDATE_INTERVAL = float(os.getenv("SLACK_STREAM_UPDATE_INTERVAL", "1.0"))  # chat_update 최소 간격(초)
+STREAMING_CURSOR = " ▌"
+
+# 비동기 런타임 사용 여부 (AsyncApp + AsyncOpenAI, slack_bot_async.py)
+ASYNC_MODE = os.getenv("SLACK_ASYNC_MODE", "false").lower() == "true" or "--async" in sys.argv
+
+def lease_lost(user_id, action):
+    """처리 중 사용자 lease를 잃었으면 기록 후 True (다른 인스턴스가 이어받았을 수 있으므로 부수 효과를 건너뜀)"""
+    if not user_leases.is_lost(user_id):
+        return False
+    user_leases.record_fenced(user_id, action)
+    return True
+
+def register_new_thread(user_id, thread_id):
+    """create_and_run으로 새로 만들어진 사용자 Thread 저장 (lease를 잃은 뒤라 거절되면 False)"""
+    if lease_lost(user_id, "Thread 매핑 저장"):
+        return False
+    if not thread_registry.set(user_id, thread_id, fence_token=user_leases.fence_token(user_id)):
+        user_leases.record_fenced(user_id)
+        return False
+    logger.info(f"새 Thread 생성됨 - User: {user_id}, Thread: {thread_id}")
+    return True
+
+# 부트캠프 무관 질문에 대한 빠른 응답
+NON_BOOTCAMP_QUESTION_REPLY = """안녕하세요! 저는 AI 부트캠프 전용 FAQ 봇입니다. 🤖
 
 현재 질문해주신 내용은 부트캠프와 직접적인 관련이 없는 것 같습니다.
 
@@ -88,273 +134,610 @@ async def get_assistant_response(message, user_id):
 • 수료 기준 및 평가 방식
 • LMS 사용법 및 행정 처리
 
-*부트캠프 관련 질문* 이 있으시면 언제든지 물어보세요! 
+부트캠프 관련 질문이 있으시면 언제든지 물어보세요! 
 그 외의 질문은 운영진에게 직접 문의해주시기 바랍니다. 😊"""
-        
-        # 사용자별 Thread 가져오기 또는 생성
-        thread_id = get_or_create_thread(user_id)
-        if not thread_id:
-            return "❌ Thread 생성에 실패했습니다."
-        
-        # System instructions 강화된 메시지 생성
-        enhanced_message = f"""[AI 부트캠프 FAQ 봇 - 엄격한 모드]
 
-🎯 **중요:** 반드시 다음 지침을 준수하세요:
-1. AI 부트캠프 관련 질문만 답변 (출결, 과제, 캡스톤, 피어세션, 커리큘럼, 수료기준 등)
-2. 부트캠프와 무관한 질문은 즉시 "운영진에게 문의해주세요"로 안내
-3. 불확실한 정보는 추측하지 말고 운영진 문의 안내
-4. 간결하고 정확한 답변 (2문단 이내)
+# OpenAI 장애로 호출이 차단되었을 때의 안내 (캐시된 답변도 없을 때)
+OPENAI_UNAVAILABLE_REPLY = """⚠️ 지금 AI 답변 서버가 일시적으로 불안정해서 바로 답변드리기 어려워요.
 
-📝 **사용자 질문:** {message}
+잠시 후 같은 질문을 다시 보내주시거나, 급한 문의는 운영진에게 직접 연락해주세요. 🙏"""
 
-위 질문이 AI 부트캠프(출결, 데일리미션, 캡스톤, 피어세션, 커리큘럼, 수료기준, 과제제출, LMS, 행정처리)와 관련이 없다면, 바로 "해당 질문은 AI 부트캠프와 관련이 없어 답변드릴 수 없습니다. 운영진에게 문의해주세요."라고 응답하세요."""
-        
-        # Thread에 강화된 메시지 추가
-        openai_client.beta.threads.messages.create(
+# 대기열이 가득 차 질문을 받지 못할 때 (30초 넘게 기다리게 하지 않고 바로 안내)
+OVERLOADED_REPLY = "🙏 지금 질문이 너무 많이 몰려 있어서 새 질문을 받지 못했어요. 1~2분 뒤에 다시 보내주세요."
+
+# 답변이 시한(RUN_DEADLINE)을 넘겨 Run을 취소했을 때 (취소 전에 완료된 답변은 나중에 이 메시지를 대체)
+DEADLINE_EXCEEDED_REPLY = "⌛ 답변 생성이 제한 시간을 넘겨 중단했어요. 잠시 후 다시 질문해주세요."
+DEADLINE_PARTIAL_SUFFIX = "\n\n_⌛ 제한 시간을 넘겨 답변이 중간에 끊겼어요._"
+
+def cache_answer(message, clean_response, processed_response):
+    """후처리를 통과한 실제 답변만 캐시 (필터링 안내 문구로 바뀐 답변은 비슷한 질문에 재사용하지 않음)"""
+    if processed_response == clean_response:
+        answer_cache.put(message, processed_response)
+
+def fallback_answer(message, error):
+    """circuit breaker가 열려 있을 때의 답변 (만료된 캐시 답변이라도 있으면 사용, 없으면 안내 문구)"""
+    logger.warning(f"OpenAI 호출 차단 중 대체 답변: {error}")
+    ANSWERS.inc(source="fallback")
+    return answer_cache.get(message, allow_stale=True) or OPENAI_UNAVAILABLE_REPLY
+
+def record_run_usage(user_id, thread_id, run):
+    """완료된 Run의 토큰 사용량 기록 (Thread 압축 판단 + 프롬프트 버전별 집계)
+    
+    호출 스케줄러의 토큰 추정치 정산은 RunScope(취소한 Run은 정리 작업)가 Run이 어떻게 끝나든 한 번 처리합니다.
+    """
+    thread_compactor.record_usage(user_id, thread_id, run.usage)
+    token_ledger.record(user_id, thread_id, run, STRICT_PROMPT.label, PROMPT_DELIVERY)
+
+def extract_user_question(text):
+    """지침 문구가 붙은 메시지에서 사용자 질문만 추출 (Thread 요약용, 이전 형식 메시지 포함)"""
+    marker = "📝 **사용자 질문:** "
+    if marker not in text:
+        return text
+    question = text.split(marker, 1)[1]
+    return question.split("\n\n위 질문이", 1)[0].strip()
+
+# 토큰 예산을 넘은 Thread는 요약된 새 Thread로 교체
+thread_compactor = ThreadCompactor(
+    openai_client,
+    thread_registry,
+    delete_remote=delete_remote_thread,
+    clean_user_text=extract_user_question,
+    leases=user_leases
+)
+
+def compact_user_thread(user_id):
+    """큐에서 실행되는 Thread 압축 작업 (다른 인스턴스의 Run과 겹치지 않도록 lease 안에서)"""
+    with user_leases.hold(user_id):
+        thread_compactor.compact(user_id)
+
+def schedule_compaction(user_id):
+    """Thread가 토큰 예산을 넘었으면 같은 사용자 큐 뒤에 압축 작업 추가 (다음 Run과 겹치지 않음)"""
+    if thread_compactor.try_schedule(user_id):
+        logger.info(f"Thread 압축 예약 - User: {user_id}")
+        request_queue.submit(user_id, tracer.bind(compact_user_thread, "thread.compact", user_id=user_id), user_id)
+
+def create_run_with_retry(thread_id, deadline, **run_kwargs):
+    """Run 생성 및 실행 (활성 Run 충돌 시 그 Run이 끝나기를 시한 안에서 기다렸다가 재시도)"""
+    max_run_attempts = 3
+    
+    for attempt in range(max_run_attempts):
+        try:
+            tracer.annotate(attempts=attempt + 1)
+            return openai_client.beta.threads.runs.create(
+                thread_id=thread_id,
+                assistant_id=ASSISTANT_ID,
+                **run_kwargs
+            )
+        except Exception as run_error:
+            if "already has an active run" in str(run_error) and attempt < max_run_attempts - 1:
+                logger.warning(f"Active run 충돌, 재시도 {attempt + 1}/{max_run_attempts}")
+                ACTIVE_RUN_RETRIES.inc()
+                run_manager.wait_conflict(thread_id, deadline)
+                continue
+            else:
+                raise run_error
+    
+    return None
+
+def add_question_message(thread_id, message, deadline):
+    """Thread에 질문 추가 (추적하지 못한 활성 Run 때문에 거절되면 한 번 기다렸다가 재시도)"""
+    try:
+        return openai_client.beta.threads.messages.create(
             thread_id=thread_id,
             role="user",
-            content=enhanced_message
+            content=build_user_message(message)
         )
-        
-        # Run 생성 및 실행
-        run = openai_client.beta.threads.runs.create(
+    except Exception as message_error:
+        if "while a run is active" not in str(message_error):
+            raise
+        run_manager.wait_conflict(thread_id, deadline)
+        return openai_client.beta.threads.messages.create(
             thread_id=thread_id,
-            assistant_id=ASSISTANT_ID
+            role="user",
+            content=build_user_message(message)
         )
+
+def start_run(message, user_id, deadline, **run_kwargs):
+    """질문을 Thread에 보내고 Run 시작
+    
+    기존 Thread가 있으면 메시지 추가 후 Run을 만들고, 새 사용자는
+    Thread 생성 + 메시지 추가 + Run 시작을 create_and_run 한 번으로 처리합니다.
+    (스트리밍이면 새 Thread ID는 thread.created 이벤트에서 저장)
+    """
+    with PHASE_SECONDS.time(phase="thread_acquire"):
+        # lease를 쓰면 다른 인스턴스가 매핑을 바꿨을 수 있으므로 DB에서 다시 읽음
+        thread_id = thread_registry.get(user_id, fresh=user_leases.enabled)
+        if thread_id:
+            # 이 프로세스가 만든 Run이 아직 끝나지 않았으면 대기 (runs.list 사전 확인 없음)
+            run_manager.wait_idle(thread_id, deadline)
+    
+    if not thread_id:
+        with tracer.span("openai.threads.create_and_run"), PHASE_SECONDS.time(phase="run_create"):
+            result = thread_pool.create_and_run(
+                ASSISTANT_ID,
+                build_user_message(message),
+                **run_prompt_kwargs(new_thread=True),
+                **run_kwargs
+            )
+        if not run_kwargs.get("stream"):
+            register_new_thread(user_id, result.thread_id)
+        return result
+    
+    # Thread에 질문 추가
+    with tracer.span("openai.messages.create"), PHASE_SECONDS.time(phase="message_create"):
+        user_message = add_question_message(thread_id, message, deadline)
+    message_mirror.record(thread_id, user_message)
+    
+    # Run 생성 및 실행 (지침은 run 단위로 전달, 재시도 로직 포함)
+    with tracer.span("openai.runs.create"), PHASE_SECONDS.time(phase="run_create"):
+        return create_run_with_retry(thread_id, deadline, **run_prompt_kwargs(), **run_kwargs)
+
+def late_run_handler(message, user_id, on_late_answer=None):
+    """시한을 넘겨 취소한 Run이 끝났을 때의 정리 콜백 (사용량 기록, 취소 전에 완료된 답변 반영)"""
+    def reconcile(run):
+        record_run_usage(user_id, run.thread_id, run)
+        if run.status != "completed":
+            return
+        msg = message_mirror.fetch_run_reply(openai_client, run.thread_id, run.id)
+        if not msg:
+            return
+        clean_response = remove_annotations(msg.content[0])
+        answer = post_process_response(clean_response, message)
+        cache_answer(message, clean_response, answer)
+        logger.info(f"늦게 완료된 답변 반영 - User: {user_id}, Run: {run.id}")
+        if on_late_answer:
+            on_late_answer(answer)
+    return reconcile
+
+def get_assistant_response_sync(message, user_id, on_late_answer=None):
+    """OpenAI Assistant로부터 응답 받기 (동기 버전)
+    
+    Run이 시한을 넘기면 취소하고 DEADLINE_EXCEEDED_REPLY를 반환하며,
+    취소 전에 완료되었던 답변은 나중에 on_late_answer(답변)로 전달합니다.
+    """
+    try:
+        # 부트캠프 관련 질문이 아닌 경우 빠른 응답
+        if not is_bootcamp_related(message):
+            ANSWERS.inc(source="filtered")
+            return NON_BOOTCAMP_QUESTION_REPLY
         
-        # Run 완료 대기
-        max_attempts = 30  # 30초 타임아웃
-        attempts = 0
+        # 자주 묻는 질문은 캐시된 답변으로 바로 응답 (후속 질문은 제외)
+        cached_answer = answer_cache.get(message)
+        if cached_answer:
+            logger.info(f"답변 캐시 hit - User: {user_id}")
+            ANSWERS.inc(source="cache")
+            return cached_answer
         
-        while run.status in ['queued', 'in_progress', 'cancelling'] and attempts < max_attempts:
-            time.sleep(1)
-            attempts += 1
-            run = openai_client.beta.threads.runs.retrieve(
-                thread_id=thread_id,
-                run_id=run.id
+        # 질문 추가 및 Run 생성 (새 사용자는 Thread 생성까지 한 번에), 이후 단계는 모두 같은 시한 안에서
+        deadline = run_manager.deadline()
+        run = start_run(message, user_id, deadline)
+        
+        if not run:
+            return "❌ Run 생성에 실패했습니다."
+        thread_id = run.thread_id
+        
+        # Run 완료 대기 (적응형 polling, 남은 시한까지, 대기열/실행 구간 측정)
+        phase_timer = RunPhaseTimer()
+        tokens = openai_scheduler.run_reservation()
+        with tracer.span("openai.run.wait", run_id=run.id) as span, run_manager.scope(user_id, deadline, tokens) as run_scope:
+            run_scope.track(thread_id, run.id)
+            run, wait_stats = run_scope.wait(
+                run,
+                on_poll=phase_timer.on_poll,
+                on_late=late_run_handler(message, user_id, on_late_answer)
             )
+            span.set_attributes(run_status=run.status, polls=wait_stats.polls)
+        phase_timer.finish(run)
+        RUN_STATUS.inc(status=run.status)
+        ANSWERS.inc(source="run")
+        if run_scope.abandoned:
+            # 사용량 기록과 늦은 답변은 Run이 끝난 뒤 정리 작업이 처리
+            return DEADLINE_EXCEEDED_REPLY
+        record_run_usage(user_id, thread_id, run)
         
         if run.status == 'completed':
-            # 최신 메시지들 가져오기
-            messages = openai_client.beta.threads.messages.list(thread_id=thread_id)
-            
-            # Assistant의 응답 찾기 (가장 최근 메시지)
-            for msg in messages.data:
-                if msg.role == "assistant":
+            # 이번 Run이 만든 Assistant 응답만 가져오기 (Thread 전체를 다시 받지 않음)
+            with tracer.span("openai.messages.list", run_id=run.id), PHASE_SECONDS.time(phase="messages_fetch"):
+                msg = message_mirror.fetch_run_reply(openai_client, thread_id, run.id)
+            if msg:
+                with tracer.span("post_process"), PHASE_SECONDS.time(phase="post_process"):
                     clean_response = remove_annotations(msg.content[0])
                     
                     # 응답 후처리: 부트캠프 무관한 내용이 포함된 경우 필터링
                     processed_response = post_process_response(clean_response, message)
-                    return processed_response
-                    
+                    cache_answer(message, clean_response, processed_response)
+                return processed_response
+        
         elif run.status == 'failed':
             return f"❌ 처리 중 오류가 발생했습니다: {run.last_error}"
         elif run.status == 'requires_action':
             return "⚠️ 추가 작업이 필요합니다."
         else:
             return f"⚠️ 타임아웃 또는 예상치 못한 상태: {run.status}"
-            
+    
+    except OpenAIUnavailable as e:
+        return fallback_answer(message, e)
+    except RunDeadlineExceeded as e:
+        logger.warning(f"Run 시작 전 시한 초과 - User: {user_id}: {e}")
+        return DEADLINE_EXCEEDED_REPLY
     except Exception as e:
         logger.error(f"Assistant 응답 오류: {str(e)}")
         return f"❌ 오류가 발생했습니다: {str(e)}"
-
+    
     return "❌ 응답을 받지 못했습니다."
 
-def is_bootcamp_related(message):
-    """부트캠프 관련 질문인지 빠르게 판단하는 함수"""
-    bootcamp_keywords = [
-        '부트캠프', '출결', '출석', '결석', '지각', '조퇴', '외출',
-        '데일리', '미션', '캡스톤', '프로젝트', '피어세션', '피어', 
-        '커리큘럼', '세션', '과제', '제출', 'LMS', '수료', '수강',
-        '행정', '운영', '마감', '평가', '점수', '감점', '가점',
-        '일정', '시간표', '휴강', '보강', '멘토', '튜터', '강의',
-        '실습', '과정', '교육', '학습', '진도', '복습', '예습'
-    ]
-    
-    message_lower = message.lower()
-    return any(keyword in message_lower for keyword in bootcamp_keywords)
-
-def post_process_response(response, original_question):
-    """Assistant 응답을 후처리하여 부트캠프 관련성 확인"""
-    
-    # 이미 운영진 문의 안내가 포함된 경우 그대로 반환
-    if "운영진에게 문의" in response or "부트캠프와 관련이 없" in response:
-        return response
+class ChatUpdateThrottler:
+    """chat_update 호출을 일정 간격으로 묶어주는 클래스 (Slack rate limit 대응)
     
-    # 부트캠프 무관한 답변을 나타내는 키워드들
-    non_bootcamp_indicators = [
-        '일반적으로', '보통', '대부분', '일반적인 경우',
-        '프로그래밍 언어', '개발 도구', '기술 스택',
-        '날씨', '음식', '여행', '게임', '영화', '음악',
-        '건강', '운동', '취미', '스포츠', '뉴스'
-    ]
+    스트리밍 중 들어오는 부분 답변은 마지막 내용만 남기고 합쳐서
+    최소 `min_interval`초마다 한 번씩만 메시지를 수정합니다.
+    부분 답변은 rate limit 상태면 기다리지 않고 Retry-After 만큼 다음 수정을 미루며,
+    최종 답변은 SlackAccess가 Retry-After를 기다렸다가 반영합니다.
+    """
     
-    # 부트캠프 관련 키워드가 응답에 포함되어 있는지 확인
-    bootcamp_response_keywords = [
-        '출결', '데일리', '캡스톤', '피어세션', '수료', '과제',
-        'LMS', '부트캠프', '운영진', '멘토', '튜터', '세션'
-    ]
+    def __init__(self, slack, channel, ts, formatter=None, min_interval=STREAM_UPDATE_INTERVAL):
+        self.slack = slack
+        self.channel = channel
+        self.ts = ts
+        self.formatter = formatter or (lambda text: text)
+        self.min_interval = min_interval
+        self.next_allowed_at = 0.0
+        self.pending_text = None
+        self.last_sent_text = None
+        self.update_count = 0
     
-    response_lower = response.lower()
+    def update(self, partial_text):
+        """부분 답변 반영 (간격이 지나지 않았으면 보류)"""
+        self.pending_text = partial_text
+        if time.monotonic() >= self.next_allowed_at:
+            self._send(self.formatter(partial_text) + STREAMING_CURSOR, wait=False)
     
-    # 부트캠프 관련 키워드가 전혀 없고, 무관한 키워드가 있다면 필터링
-    has_bootcamp_keywords = any(keyword in response_lower for keyword in bootcamp_response_keywords)
-    has_non_bootcamp_keywords = any(keyword in response_lower for keyword in non_bootcamp_indicators)
+    def flush(self, final_text):
+        """최종 답변은 rate limit 대기 후 반드시 반영"""
+        self.pending_text = final_text
+        return self._send(self.formatter(final_text), wait=True)
     
-    if not has_bootcamp_keywords and has_non_bootcamp_keywords:
-        return """죄송합니다. 해당 질문은 *AI 부트캠프와 직접적인 관련이 없는 것*으로 판단됩니다. 🤖
-
-*저에게 문의하실 수 있는 주제:*
-• 출결 관리 (출석, 결석, 지각, 조퇴)
-• 데일리 미션 및 과제 제출
-• 캡스톤 프로젝트 진행 방식
-• 피어세션 운영 방법
-• 커리큘럼 및 세션 일정
-• 수료 기준 및 평가
-• LMS 사용법
+    def _send(self, text, wait):
+        """chat_update 실제 호출"""
+        if text == self.last_sent_text:
+            self.pending_text = None
+            return True
+        
+        try:
+            self.slack.update_message(
+                wait=wait,
+                channel=self.channel,
+                ts=self.ts,
+                text=text,
+                mrkdwn=True
+            )
+        except SlackRateLimited as e:
+            self.next_allowed_at = time.monotonic() + e.retry_after
+            return False
+        
+        self.last_sent_text = text
+        self.pending_text = None
+        self.update_count += 1
+        self.next_allowed_at = time.monotonic() + self.min_interval
+        return True
 
-*부트캠프 외의 질문*은 운영진에게 직접 문의해주시기 바랍니다.
-도움이 필요하면 언제든지 물어보세요! 😊"""
+class StreamingTextCleaner:
+    """스트리밍 델타에서 annotations(주석)을 점진적으로 제거하는 클래스
     
-    # 응답이 너무 길고 부트캠프 관련성이 의심스러운 경우
-    if len(response) > 500 and not has_bootcamp_keywords:
-        return """답변이 너무 길어 *부트캠프와 관련이 없는 내용*일 가능성이 높습니다. 🤖
-
-정확한 답변을 위해 *운영진에게 직접 문의*해주시거나, 
-*부트캠프 관련 구체적인 키워드*를 포함하여 다시 질문해주세요.
-
-*예시:* "출결 규정", "데일리 미션 제출", "캡스톤 프로젝트 일정" 등
+    remove_annotations의 스트리밍 버전입니다. 델타로 전달된 annotation 텍스트를
+    누적 텍스트에서 제거하고, 아직 닫히지 않은 인용 표시(【...)는 화면에 보이지 않게 보류합니다.
+    """
+    
+    def __init__(self):
+        self.raw_text = ""
+        self.annotation_texts = set()
+    
+    def feed(self, text_delta):
+        """TextDelta(value, annotations)를 누적"""
+        if getattr(text_delta, 'value', None):
+            self.raw_text += text_delta.value
+        for annotation in getattr(text_delta, 'annotations', None) or []:
+            if getattr(annotation, 'text', None):
+                self.annotation_texts.add(annotation.text)
+    
+    def visible_text(self):
+        """현재까지 화면에 보여줄 수 있는 텍스트"""
+        clean_text = self.raw_text
+        for annotation_text in self.annotation_texts:
+            clean_text = clean_text.replace(annotation_text, "")
+        
+        # 아직 닫히지 않은 인용 표시는 보류
+        open_index = clean_text.rfind("【")
+        if open_index != -1 and "】" not in clean_text[open_index:]:
+            clean_text = clean_text[:open_index]
+        
+        return clean_text.strip()
 
-도움이 필요하면 언제든지 물어보세요! 😊"""
+class StreamingResponseGuard:
+    """post_process_response의 점진적 버전
     
-    # 정상적인 부트캠프 관련 응답으로 판단되면 그대로 반환
-    return response
+    키워드 매처의 상태를 이어가며 새로 들어온 부분만 검사하고,
+    최종 후처리에서 걸러질 가능성이 있는 부분 답변은 화면에 보여주지 않습니다.
+    """
+    
+    def __init__(self):
+        self.matcher = keyword_config.response_matcher
+        self.matcher_state = 0
+        self.scanned_length = 0
+        self.matched_categories = set()
+        self.text_length = 0
+    
+    def update(self, partial_text):
+        """새로 추가된 구간만 검사"""
+        if len(partial_text) < self.scanned_length:
+            # 텍스트가 줄어든 경우(주석 정리 등) 처음부터 다시 검사
+            self.matcher_state = 0
+            self.scanned_length = 0
+            self.matched_categories = set()
+        
+        matched, self.matcher_state = self.matcher.feed(partial_text[self.scanned_length:], self.matcher_state)
+        self.matched_categories.update(matched)
+        self.scanned_length = len(partial_text)
+        self.text_length = len(partial_text)
+    
+    def is_displayable(self):
+        """현재 부분 답변을 화면에 보여줘도 되는지 여부"""
+        if "staff_notice" in self.matched_categories or "bootcamp" in self.matched_categories:
+            return True
+        if "non_bootcamp" in self.matched_categories:
+            return False
+        return self.text_length <= MAX_UNRELATED_RESPONSE_LENGTH
 
-def get_assistant_response_sync(message, user_id):
-    """OpenAI Assistant로부터 응답 받기 (동기 버전)"""
+def get_assistant_response_stream(message, user_id, on_partial=None, on_late_answer=None):
+    """OpenAI Assistant로부터 응답 받기 (스트리밍 버전)
+    
+    Run 이벤트 스트림의 텍스트 델타를 받을 때마다 on_partial(부분 답변)을 호출하고,
+    최종적으로 post_process_response를 거친 전체 답변을 반환합니다.
+    시한을 넘겨 취소한 Run은 polling 경로와 같이 정리 작업이 사용량을 기록하고 늦은 답변을 on_late_answer로 전달합니다.
+    """
     try:
         # 부트캠프 관련 질문이 아닌 경우 빠른 응답
         if not is_bootcamp_related(message):
-            return """안녕하세요! 저는 AI 부트캠프 전용 FAQ 봇입니다. 🤖
-
-현재 질문해주신 내용은 부트캠프와 직접적인 관련이 없는 것 같습니다.
-
-*저에게 물어보실 수 있는 주제들:*
-• 출결 관리 (출석, 결석, 지각, 조퇴)
-• 데일리 미션 및 과제 제출
-• 캡스톤 프로젝트 관련
-• 피어세션 운영 방식
-• 커리큘럼 및 세션 일정
-• 수료 기준 및 평가 방식
-• LMS 사용법 및 행정 처리
-
-부트캠프 관련 질문이 있으시면 언제든지 물어보세요! 
-그 외의 질문은 운영진에게 직접 문의해주시기 바랍니다. 😊"""
-        
-        # 사용자별 Thread 가져오기 또는 생성
-        thread_id = get_or_create_thread(user_id)
-        if not thread_id:
-            return "❌ Thread 생성에 실패했습니다."
-        
-        # 기존 활성 Run이 있는지 확인하고 대기
-        try:
-            existing_runs = openai_client.beta.threads.runs.list(thread_id=thread_id, limit=1)
-            if existing_runs.data and existing_runs.data[0].status in ['queued', 'in_progress', 'cancelling']:
-                logger.info(f"기존 활성 Run 대기 중: {existing_runs.data[0].id}")
-                # 기존 Run이 완료될 때까지 대기
-                for _ in range(30):  # 30초 대기
-                    time.sleep(1)
-                    existing_run = openai_client.beta.threads.runs.retrieve(
-                        thread_id=thread_id,
-                        run_id=existing_runs.data[0].id
-                    )
-                    if existing_run.status not in ['queued', 'in_progress', 'cancelling']:
-                        break
-        except Exception as wait_error:
-            logger.warning(f"기존 Run 확인 중 오류: {wait_error}")
-        
-        # System instructions 강화된 메시지 생성
-        enhanced_message = f"""[AI 부트캠프 FAQ 봇 - 엄격한 모드]
-
-🎯 **중요:** 반드시 다음 지침을 준수하세요:
-1. AI 부트캠프 관련 질문만 답변 (출결, 과제, 캡스톤, 피어세션, 커리큘럼, 수료기준 등)
-2. 부트캠프와 무관한 질문은 즉시 "운영진에게 문의해주세요"로 안내
-3. 불확실한 정보는 추측하지 말고 운영진 문의 안내
-4. 간결하고 정확한 답변 (2문단 이내)
-
-📝 **사용자 질문:** {message}
-
-위 질문이 AI 부트캠프(출결, 데일리미션, 캡스톤, 피어세션, 커리큘럼, 수료기준, 과제제출, LMS, 행정처리)와 관련이 없다면, 바로 "해당 질문은 AI 부트캠프와 관련이 없어 답변드릴 수 없습니다. 운영진에게 문의해주세요."라고 응답하세요."""
-        
-        # Thread에 강화된 메시지 추가
-        openai_client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=enhanced_message
-        )
-        
-        # Run 생성 및 실행 (재시도 로직 추가)
-        max_run_attempts = 3
-        run = None
+            ANSWERS.inc(source="filtered")
+            return NON_BOOTCAMP_QUESTION_REPLY
         
-        for attempt in range(max_run_attempts):
-            try:
-                run = openai_client.beta.threads.runs.create(
-                    thread_id=thread_id,
-                    assistant_id=ASSISTANT_ID
-                )
-                break
-            except Exception as run_error:
-                if "already has an active run" in str(run_error) and attempt < max_run_attempts - 1:
-                    logger.warning(f"Active run 충돌, 재시도 {attempt + 1}/{max_run_attempts}")
-                    time.sleep(2)  # 2초 대기 후 재시도
-                    continue
-                else:
-                    raise run_error
+        # 자주 묻는 질문은 캐시된 답변으로 바로 응답 (후속 질문은 제외)
+        cached_answer = answer_cache.get(message)
+        if cached_answer:
+            logger.info(f"답변 캐시 hit - User: {user_id}")
+            ANSWERS.inc(source="cache")
+            return cached_answer
         
-        if not run:
+        # 질문 추가 및 스트리밍 Run 생성 (새 사용자는 Thread 생성까지 한 번에)
+        deadline = run_manager.deadline()
+        stream = start_run(message, user_id, deadline, stream=True)
+        if not stream:
             return "❌ Run 생성에 실패했습니다."
         
-        # Run 완료 대기
-        max_attempts = 30  # 30초 타임아웃
-        attempts = 0
+        cleaner = StreamingTextCleaner()
+        guard = StreamingResponseGuard()
+        phase_timer = RunPhaseTimer()
+        started_at = time.monotonic()
+        first_token_logged = False
+        final_status = None
+        last_error = None
+        late_handler = late_run_handler(message, user_id, on_late_answer)
         
-        while run.status in ['queued', 'in_progress', 'cancelling'] and attempts < max_attempts:
-            time.sleep(1)
-            attempts += 1
-            run = openai_client.beta.threads.runs.retrieve(
-                thread_id=thread_id,
-                run_id=run.id
-            )
+        def on_late(run):
+            # 스트림이 완료 이벤트를 받았으면 사용량과 답변은 스트림 쪽에서 이미 처리함
+            if final_status != "completed":
+                late_handler(run)
         
-        if run.status == 'completed':
-            # 최신 메시지들 가져오기
-            messages = openai_client.beta.threads.messages.list(thread_id=thread_id)
-            
-            # Assistant의 응답 찾기 (가장 최근 메시지)
-            for msg in messages.data:
-                if msg.role == "assistant":
-                    clean_response = remove_annotations(msg.content[0])
+        # 시한이 되면 타이머가 Run을 취소하고, 스트림은 cancelled 이벤트로 끝남
+        tokens = openai_scheduler.run_reservation()
+        with tracer.span("openai.run.stream") as stream_span, run_manager.scope(user_id, deadline, tokens) as run_scope:
+            with stream:
+                for event in stream:
+                    if event.event == "thread.created":
+                        register_new_thread(user_id, event.data.id)
                     
-                    # 응답 후처리: 부트캠프 무관한 내용이 포함된 경우 필터링
-                    processed_response = post_process_response(clean_response, message)
-                    return processed_response
+                    elif event.event == "thread.run.created":
+                        stream_span.set_attributes(run_id=event.data.id)
+                        run_scope.track(event.data.thread_id, event.data.id, watch=True, on_late=on_late)
                     
-        elif run.status == 'failed':
-            return f"❌ 처리 중 오류가 발생했습니다: {run.last_error}"
-        elif run.status == 'requires_action':
+                    elif event.event == "thread.run.in_progress":
+                        phase_timer.on_status("in_progress")
+                    
+                    elif event.event == "thread.message.delta":
+                        for content in event.data.delta.content or []:
+                            if content.type == "text" and content.text:
+                                cleaner.feed(content.text)
+                        
+                        partial_text = cleaner.visible_text()
+                        if not partial_text:
+                            continue
+                        
+                        guard.update(partial_text)
+                        if on_partial and guard.is_displayable():
+                            if not first_token_logged:
+                                logger.info(f"첫 토큰 표시까지 {time.monotonic() - started_at:.2f}초 - User: {user_id}")
+                                stream_span.set_attributes(first_token_seconds=round(time.monotonic() - started_at, 3))
+                                first_token_logged = True
+                            on_partial(partial_text)
+                    
+                    elif event.event == "thread.message.completed":
+                        # 완성된 답변은 다시 조회하지 않도록 미러에 기록
+                        message_mirror.record(event.data.thread_id, event.data, from_stream=True)
+                    
+                    elif event.event == "thread.run.completed":
+                        final_status = "completed"
+                        phase_timer.finish(event.data)
+                        run_scope.finished(event.data)
+                        record_run_usage(user_id, event.data.thread_id, event.data)
+                    elif event.event == "thread.run.failed":
+                        final_status = "failed"
+                        last_error = event.data.last_error
+                        run_scope.finished(event.data)
+                    elif event.event == "thread.run.requires_action":
+                        final_status = "requires_action"
+                    elif event.event in ("thread.run.cancelled", "thread.run.expired", "thread.run.incomplete"):
+                        final_status = event.data.status
+                        run_scope.finished(event.data)
+                    elif event.event == "error":
+                        final_status = "error"
+                        last_error = event.data
+            stream_span.set_attributes(run_status=final_status or "unknown")
+        
+        RUN_STATUS.inc(status=final_status or "unknown")
+        ANSWERS.inc(source="run")
+        
+        if final_status == "completed":
+            clean_response = cleaner.visible_text()
+            if not clean_response:
+                return "❌ 응답을 받지 못했습니다."
+            
+            # 응답 후처리: 부트캠프 무관한 내용이 포함된 경우 필터링
+            with tracer.span("post_process"), PHASE_SECONDS.time(phase="post_process"):
+                processed_response = post_process_response(clean_response, message)
+                cache_answer(message, clean_response, processed_response)
+            return processed_response
+        elif run_scope.abandoned:
+            # 시한 초과로 취소 - 이미 보여준 부분 답변은 남김 (캐시하지 않음)
+            partial_text = cleaner.visible_text()
+            if partial_text and guard.is_displayable():
+                return partial_text + DEADLINE_PARTIAL_SUFFIX
+            return DEADLINE_EXCEEDED_REPLY
+        elif final_status in ("failed", "error"):
+            return f"❌ 처리 중 오류가 발생했습니다: {last_error}"
+        elif final_status == "requires_action":
             return "⚠️ 추가 작업이 필요합니다."
         else:
-            return f"⚠️ 타임아웃 또는 예상치 못한 상태: {run.status}"
-            
+            return f"⚠️ 타임아웃 또는 예상치 못한 상태: {final_status}"
+    
+    except OpenAIUnavailable as e:
+        return fallback_answer(message, e)
+    except RunDeadlineExceeded as e:
+        logger.warning(f"Run 시작 전 시한 초과 - User: {user_id}: {e}")
+        return DEADLINE_EXCEEDED_REPLY
     except Exception as e:
-        logger.error(f"Assistant 응답 오류: {str(e)}")
+        logger.error(f"Assistant 스트리밍 응답 오류: {str(e)}")
         return f"❌ 오류가 발생했습니다: {str(e)}"
 
-    return "❌ 응답을 받지 못했습니다."
+def respond_into_message(message, user_id, channel, ts, formatter):
+    """로딩 메시지(ts)를 답변으로 채우기 (다른 봇 인스턴스와 겹치지 않도록 사용자 lease 안에서 처리)"""
+    with user_leases.hold(user_id):
+        return respond_with_assistant(message, user_id, channel, ts, formatter)
+
+def respond_with_assistant(message, user_id, channel, ts, formatter):
+    """Assistant 답변으로 로딩 메시지 채우기 (스트리밍 모드면 점진적으로 업데이트)"""
+    def on_late_answer(answer):
+        # 시한 초과 안내를 늦게 완료된 답변으로 교체
+        slack_access.update_message(channel=channel, ts=ts, text=formatter(answer), mrkdwn=True)
+    
+    if not STREAMING_MODE:
+        # Assistant로부터 응답 받기 (동기 버전 사용)
+        response = get_assistant_response_sync(message, user_id, on_late_answer=on_late_answer)
+        if lease_lost(user_id, "Slack 답변 게시"):
+            return response
+        
+        # 로딩 메시지를 최종 답변으로 업데이트 (mrkdwn 형식 사용)
+        with PHASE_SECONDS.time(phase="slack_update"):
+            slack_access.update_message(
+                channel=channel,
+                ts=ts,
+                text=formatter(response),
+                mrkdwn=True
+            )
+        return response
+    
+    throttler = ChatUpdateThrottler(slack_access, channel, ts, formatter=formatter)
+    
+    def on_partial(partial_text):
+        # lease를 잃은 뒤에는 부분 답변도 게시하지 않음
+        if not user_leases.is_lost(user_id):
+            throttler.update(partial_text)
+    
+    response = get_assistant_response_stream(message, user_id, on_partial=on_partial, on_late_answer=on_late_answer)
+    if lease_lost(user_id, "Slack 답변 게시"):
+        return response
+    with PHASE_SECONDS.time(phase="slack_update"):
+        throttler.flush(response)
+    logger.info(f"스트리밍 완료 - User: {user_id}, chat_update {throttler.update_count}회")
+    return response
+
+def answer_mention(clean_text, user_id, channel, thread_ts):
+    """큐에서 꺼낸 멘션 질문 처리"""
+    try:
+        # 스레드에 로딩 메시지 먼저 보내기
+        loading_msg = slack_access.post_message(
+            channel=channel,
+            text="🤔 AI가 답변을 생성하고 있습니다...",
+            thread_ts=thread_ts
+        )
+        
+        # Assistant로부터 응답 받아 로딩 메시지를 답변으로 업데이트
+        respond_into_message(
+            clean_text,
+            user_id,
+            channel,
+            loading_msg["ts"],
+            formatter=lambda answer: f"🤖 {answer}"
+        )
+        schedule_compaction(user_id)
+    
+    except Exception as e:
+        logger.error(f"멘션 처리 오류: {str(e)}")
+        slack_access.post_message(
+            channel=channel,
+            text=f"❌ 오류가 발생했습니다: {str(e)}",
+            thread_ts=thread_ts
+        )
+
+def answer_direct_message(text, user_id, channel):
+    """큐에서 꺼낸 DM 질문 처리"""
+    try:
+        # 로딩 메시지
+        loading_msg = slack_access.post_message(channel=channel, text="🤔 생각 중입니다...")
+        
+        # Assistant로부터 응답 받아 로딩 메시지를 답변으로 업데이트
+        respond_into_message(
+            text,
+            user_id,
+            channel,
+            loading_msg["ts"],
+            formatter=lambda answer: f"💬 *질문:* {text}\n\n🤖 *답변:*\n{answer}"
+        )
+        schedule_compaction(user_id)
+    
+    except Exception as e:
+        logger.error(f"DM 처리 오류: {str(e)}")
+        slack_access.post_message(channel=channel, text=f"❌ 오류가 발생했습니다: {str(e)}")
+
+def queued_notice(position):
+    """앞선 질문이 있을 때 보내는 안내 문구"""
+    return f"⏳ 앞선 질문 {position}개를 처리한 뒤 순서대로 답변드릴게요."
+
+def busy_notice(waiting):
+    """전체 대기 질문이 많을 때 보내는 안내 문구 (공정 큐라 실제 차례는 대기 수와 다르므로 순번은 알리지 않음)"""
+    return f"🚦 지금 질문이 몰려 있어요 (대기 중인 질문 {waiting}개). 접수했으니 차례가 오면 답변드릴게요."
+
+def admission_notice(position, waiting):
+    """대기열 추가 후 보낼 안내 문구 (바로 처리되면 None)
+    
+    Args:
+        position: 앞선 같은 사용자의 질문 수
+        waiting: 접수 시점의 전체 대기 질문 수 (안내 기준 미만이면 0)
+    """
+    if position:
+        return queued_notice(position)
+    if waiting:
+        return busy_notice(waiting)
+    return None
+
+@app.middleware
+def capture_events(body, next):
+    """수신한 멘션/DM 이벤트를 캡처 파일에 기록"""
+    if event_capture.enabled:
+        event_capture.record(body, slack_access.bot_user_id)
+    next()
 
 @app.event("app_mention")
-def handle_mention(event, say, logger):
+def handle_mention(event, say, logger, body=None):
     """봇이 멘션되었을 때 처리"""
     try:
         user_id = event["user"]
@@ -366,38 +749,20 @@ def handle_mention(event, say, logger):
         if event.get("bot_id") or event.get("subtype") == "bot_message":
             return
         
-        # 현재 봇이 멘션되었는지 확인
-        import re
-        bot_user_pattern = r'<@[A-Z0-9]+>'
-        mentioned_users = re.findall(bot_user_pattern, text)
+        # 현재 봇이 멘션되었는지 확인 (봇 ID는 캐시된 값 사용, 확인 실패 시 기본 로직 수행)
+        bot_user_id = slack_access.bot_user_id
+        if bot_user_id and f"<@{bot_user_id}>" not in text:
+            return
         
-        # 봇의 실제 사용자 ID 가져오기
-        try:
-            bot_info = app.client.auth_test()
-            bot_user_id = bot_info["user_id"]
-            
-            # 현재 봇이 멘션되었는지 확인
-            is_bot_mentioned = any(f"<@{bot_user_id}>" in mention for mention in mentioned_users)
-            if not is_bot_mentioned:
-                return
-                
-        except Exception as auth_error:
-            logger.warning(f"봇 인증 확인 오류: {auth_error}")
-            # 인증 확인 실패 시 기본 로직 수행
+        # 재전송되었거나 DM 메시지 이벤트로 이미 처리한 메시지는 무시
+        if not event_deduplicator.claim(event_keys(event, body)):
+            return
         
         # 봇 멘션 제거하고 실제 메시지만 추출
-        clean_text = re.sub(bot_user_pattern, '', text).strip()
+        clean_text = BOT_MENTION_PATTERN.sub('', text).strip()
         
         logger.info(f"멘션 처리 시작 - 사용자: {user_id}, 메시지: {clean_text}")
         
-        # 이미 처리 중인 요청이 있는지 확인
-        if user_id in user_processing and user_processing[user_id]:
-            say(
-                text="⚠️ 이전 질문을 처리하고 있습니다. 잠시만 기다려주세요.",
-                thread_ts=thread_ts
-            )
-            return
-        
         if not clean_text:
             say(
                 text="안녕하세요! 🤖 무엇을 도와드릴까요?",
@@ -405,54 +770,49 @@ def handle_mention(event, say, logger):
             )
             return
         
-        # 처리 상태 설정
-        user_processing[user_id] = True
-        
+        # 사용자 큐에 추가 (이전 질문이 처리 중이면 순서대로 대기)
+        # 이벤트 수신 시점부터 답변까지 하나의 trace로 기록
+        traced_answer = tracer.bind(answer_mention, "slack.app_mention", user_id=user_id, channel=channel)
         try:
-            # 스레드에 로딩 메시지 먼저 보내기
-            loading_msg = say(
-                text="🤔 AI가 답변을 생성하고 있습니다...",
-                thread_ts=thread_ts
+            position, waiting = request_queue.submit(
+                user_id, traced_answer, clean_text, user_id, channel, thread_ts,
+                channel=channel, kind=KIND_MENTION
             )
-            
-            # Assistant로부터 응답 받기 (동기 버전 사용)
-            response = get_assistant_response_sync(clean_text, user_id)
-            
-            # 로딩 메시지를 최종 답변으로 업데이트 (mrkdwn 형식 사용)
-            app.client.chat_update(
+        except QueueFull:
+            slack_access.post_message(channel=channel, text=OVERLOADED_REPLY, thread_ts=thread_ts)
+            return
+        notice = admission_notice(position, waiting)
+        if notice:
+            logger.info(f"질문 대기열 추가 - User: {user_id}, 앞선 질문: {position}개, 전체 대기: {request_queue.depth()}개")
+            slack_access.post_message(
                 channel=channel,
-                ts=loading_msg["ts"],
-                text=f"🤖 {response}",
-                mrkdwn=True
+                text=notice,
+                thread_ts=thread_ts
             )
-            
-        finally:
-            # 처리 완료 후 상태 해제
-            user_processing[user_id] = False
-        
+    
     except Exception as e:
         logger.error(f"멘션 처리 오류: {str(e)}")
-        # 처리 상태 해제
-        if user_id in user_processing:
-            user_processing[user_id] = False
-        
         say(
             text=f"❌ 오류가 발생했습니다: {str(e)}",
             thread_ts=event.get("ts")
         )
 
 @app.event("message")
-def handle_direct_message(event, say, logger):
+def handle_direct_message(event, say, logger, body=None):
     """DM으로 메시지가 왔을 때 처리"""
     # 봇이 보낸 메시지나 멘션 이벤트는 제외
     if event.get("bot_id") or event.get("subtype") == "bot_message":
         return
-        
+    
     # DM 채널 확인 (채널 타입이 'im'인 경우)
     channel_type = event.get("channel_type")
     if channel_type != "im":
         return
     
+    # 재전송되었거나 멘션 이벤트로 이미 처리한 메시지는 무시
+    if not event_deduplicator.claim(event_keys(event, body)):
+        return
+    
     try:
         user_id = event["user"]
         text = event["text"]
@@ -461,50 +821,27 @@ def handle_direct_message(event, say, logger):
             say("안녕하세요! 🤖 무엇을 도와드릴까요?")
             return
         
-        # 로딩 메시지
-        loading_msg = say("🤔 생각 중입니다...")
-        
-        # Assistant로부터 응답 받기 (동기 버전 사용)
-        response = get_assistant_response_sync(text, user_id)
-        
-        # 메시지 업데이트 (mrkdwn 형식 사용)
-        app.client.chat_update(
-            channel=event["channel"],
-            ts=loading_msg["ts"],
-            text=f"💬 *질문:* {text}\n\n🤖 *답변:*\n{response}",
-            mrkdwn=True
-        )
-        
+        # 사용자 큐에 추가 (이전 질문이 처리 중이면 순서대로 대기)
+        traced_answer = tracer.bind(answer_direct_message, "slack.message.im", user_id=user_id, channel=event["channel"])
+        try:
+            position, waiting = request_queue.submit(
+                user_id, traced_answer, text, user_id, event["channel"],
+                channel=event["channel"], kind=KIND_DM
+            )
+        except QueueFull:
+            slack_access.post_message(channel=event["channel"], text=OVERLOADED_REPLY)
+            return
+        notice = admission_notice(position, waiting)
+        if notice:
+            logger.info(f"질문 대기열 추가 - User: {user_id}, 앞선 질문: {position}개, 전체 대기: {request_queue.depth()}개")
+            slack_access.post_message(channel=event["channel"], text=notice)
+    
     except Exception as e:
         logger.error(f"DM 처리 오류: {str(e)}")
         say(f"❌ 오류가 발생했습니다: {str(e)}")
 
-@app.command("/reset_chat")
-def handle_reset_command(ack, respond, command):
-    """채팅 히스토리 리셋 명령어"""
-    ack()
-    
-    try:
-        user_id = command["user_id"]
-        
-        # 해당 사용자의 Thread 삭제
-        if user_id in user_threads:
-            del user_threads[user_id]
-            respond("🔄 채팅 히스토리가 리셋되었습니다!")
-            logger.info(f"Thread 리셋됨 - User: {user_id}")
-        else:
-            respond("ℹ️ 리셋할 채팅 히스토리가 없습니다.")
-            
-    except Exception as e:
-        logger.error(f"리셋 명령어 오류: {str(e)}")
-        respond(f"❌ 리셋 중 오류가 발생했습니다: {str(e)}")
-
-@app.command("/help")
-def handle_help_command(ack, respond):
-    """도움말 명령어"""
-    ack()
-    
-    help_text = """
+# 도움말 텍스트 (/help)
+HELP_TEXT = """
 🤖 *AI 부트캠프 FAQ 봇 사용법*
 
 *📚 전용 질문 주제:*
@@ -535,24 +872,17 @@ def handle_help_command(ack, respond):
 
 *부트캠프 관련 질문*이 있으시면 언제든 멘션해주세요! 😊
     """
-    
-    respond(help_text)
 
-# 앱 시작 이벤트
-@app.event("app_home_opened")
-def update_home_tab(client, event, logger):
-    """앱 홈 탭이 열렸을 때"""
-    try:
-        client.views_publish(
-            user_id=event["user"],
-            view={
-                "type": "home",
-                "blocks": [
-                    {
-                        "type": "section",
-                        "text": {
-                            "type": "mrkdwn",
-                            "text": """
+def build_home_view():
+    """앱 홈 탭 view 생성"""
+    return {
+        "type": "home",
+        "blocks": [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": """
 🤖 *AI 부트캠프 FAQ 봇에 오신 것을 환영합니다!*
 
 이 봇은 *AI 부트캠프 전용 FAQ 봇*입니다.
@@ -577,11 +907,73 @@ def update_home_tab(client, event, logger):
 • 불확실한 정보는 운영진 문의 안내
 
 *부트캠프 관련 질문*이 있으면 언제든 물어보세요! 😊
-                            """
-                        }
-                    }
-                ]
+                    """
+                }
             }
+        ]
+    }
+
+# 리셋 중 lease를 잃었을 때 (다른 인스턴스가 이 사용자의 질문을 이어받음)
+RESET_FENCED_REPLY = "⚠️ 다른 서버가 질문을 처리하고 있어 리셋하지 못했어요. 잠시 후 다시 시도해주세요."
+
+def reset_user_thread(user_id, respond):
+    """큐에서 실행되는 채팅 히스토리 리셋 (앞선 질문이 끝난 뒤, 다른 인스턴스의 Run과 겹치지 않도록 lease 안에서)"""
+    try:
+        with user_leases.hold(user_id):
+            if lease_lost(user_id, "Thread 리셋"):
+                respond(RESET_FENCED_REPLY)
+                return
+            
+            # 해당 사용자의 Thread 삭제 (서버의 Thread도 함께 삭제)
+            thread_id = thread_registry.pop(user_id, fence_token=user_leases.fence_token(user_id))
+            if not thread_id:
+                respond("ℹ️ 리셋할 채팅 히스토리가 없습니다.")
+                return
+            
+            message_mirror.forget(thread_id)
+            try:
+                # 시한을 넘겨 정리 중인 Run이 있으면 끝난 뒤 삭제
+                run_manager.wait_idle(thread_id, run_manager.deadline())
+            except RunDeadlineExceeded:
+                logger.warning(f"이전 Run이 끝나지 않은 채 Thread 삭제 - Thread: {thread_id}")
+            try:
+                delete_remote_thread(thread_id)
+            except Exception as delete_error:
+                logger.warning(f"Thread 삭제 실패 - Thread: {thread_id}: {delete_error}")
+            respond("🔄 채팅 히스토리가 리셋되었습니다!")
+            logger.info(f"Thread 리셋됨 - User: {user_id}")
+    
+    except Exception as e:
+        logger.error(f"리셋 명령어 오류: {str(e)}")
+        respond(f"❌ 리셋 중 오류가 발생했습니다: {str(e)}")
+
+@app.command("/reset_chat")
+def handle_reset_command(ack, respond, command):
+    """채팅 히스토리 리셋 명령어 (진행 중인 질문과 겹치지 않도록 사용자 큐에서 처리)"""
+    ack()
+    
+    user_id = command["user_id"]
+    position, _ = request_queue.submit(
+        user_id, tracer.bind(reset_user_thread, "thread.reset", user_id=user_id), user_id, respond
+    )
+    if position:
+        respond(f"⏳ 앞선 질문 {position}개를 처리한 뒤 채팅 히스토리를 리셋할게요.")
+
+@app.command("/help")
+def handle_help_command(ack, respond):
+    """도움말 명령어"""
+    ack()
+    
+    respond(HELP_TEXT)
+
+# 앱 시작 이벤트
+@app.event("app_home_opened")
+def update_home_tab(event, logger):
+    """앱 홈 탭이 열렸을 때"""
+    try:
+        slack_access.publish_view(
+            user_id=event["user"],
+            view=build_home_view()
         )
     except Exception as e:
         logger.error(f"홈 탭 업데이트 오류: {str(e)}")
@@ -622,17 +1014,42 @@ if __name__ == "__main__":
         # OpenAI API 키 테스트
         assistant_info = openai_client.beta.assistants.retrieve(assistant_id=ASSISTANT_ID)
         print(f"✅ OpenAI Assistant 연결 확인: {assistant_info.name}")
+        # create_and_run에 지침을 덧붙일 때 쓰도록 기본 지침 캐시
+        assistant_core.assistant_instructions = assistant_info.instructions or ""
+        print(f"✅ 지침 프롬프트: {STRICT_PROMPT.label} ({PROMPT_DELIVERY})")
     except Exception as e:
         print(f"❌ OpenAI Assistant 연결 실패: {str(e)}")
         print("💡 OPENAI_API_KEY와 ASSISTANT_ID를 확인해주세요.")
         exit(1)
     
+    try:
+        # 봇 정보는 시작 시 한 번만 확인 (멘션마다 auth.test를 호출하지 않음)
+        slack_access.resolve_identity()
+        print(f"✅ 슬랙 봇 정보 확인: {slack_access.bot_user_id}")
+    except Exception as e:
+        print(f"⚠️ 슬랙 봇 정보 확인 실패 (첫 멘션 때 다시 확인): {str(e)}")
+    
     logger.info("🚀 AI Assistant 슬랙 봇을 시작합니다...")
     
+    # 만료된 Thread 정리 작업 시작 (서버 Thread 삭제)
+    thread_registry.start_cleanup(delete_remote_thread)
+    
+    # /metrics 엔드포인트 (구간별 지연 시간, Run 상태, 필터링/재시도 횟수)
+    if METRICS_ENABLED:
+        start_metrics_server()
+    
     try:
-        # Socket Mode로 앱 실행
-        handler = SocketModeHandler(app, os.getenv("SLACK_APP_TOKEN"))
-        handler.start()
+        if ASYNC_MODE:
+            # 이 스크립트를 slack_bot 모듈로 재사용 (비동기 모듈에서 다시 초기화되지 않도록)
+            sys.modules.setdefault("slack_bot", sys.modules[__name__])
+            from slack_bot_async import run_async_bot
+            
+            # Async Socket Mode로 앱 실행
+            run_async_bot()
+        else:
+            # Socket Mode로 앱 실행
+            handler = SocketModeHandler(app, os.getenv("SLACK_APP_TOKEN"))
+            handler.start()
     except Exception as e:
         print(f"❌ 슬랙 봇 시작 실패: {str(e)}")
         print("💡 슬랙 토큰들이 올바른지 확인해주세요.")
@@ -0,0 +1,708 @@
+"""
+AI 부트캠프 FAQ 슬랙 봇 - 비동기 런타임
+
+Bolt AsyncApp + AsyncSocketModeHandler + AsyncOpenAI로 동작하여
+질문마다 worker 스레드를 점유하지 않고 하나의 이벤트 루프에서 동시에 처리합니다.
+`python slack_bot.py --async` 또는 SLACK_ASYNC_MODE=true 로 실행합니다.
+질문 필터링, 후처리, 도움말 등은 slack_bot.py의 함수를 그대로 사용합니다.
+Thread 매핑, 토큰 사용량 기록처럼 SQLite(또는 네트워크 key-value 저장소)에 접근하는 동기 함수는
+이벤트 루프를 막지 않도록 asyncio.to_thread로 실행합니다 (lease의 fencing 토큰 등 contextvar는 그대로 전달됨).
+"""
+
+import os
+import time
+import asyncio
+import logging
+from slack_bolt.async_app import AsyncApp
+from slack_sdk.web.async_client import AsyncWebClient
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+from openai import AsyncOpenAI
+
+from run_manager import AsyncRunManager, RunDeadlineExceeded
+from user_queue import KIND_DM, KIND_MENTION, QueueFull, AsyncUserRequestQueue
+from thread_pool import AsyncThreadPool
+from thread_compactor import AsyncThreadCompactor
+from slack_api import AsyncSlackAccess, SlackRateLimited
+from tracing import tracer
+from event_dedup import event_keys
+from openai_scheduler import OpenAIUnavailable, scheduled_client
+from metrics import ACTIVE_RUN_RETRIES, ANSWERS, PHASE_SECONDS, RUN_STATUS, RunPhaseTimer
+from slack_bot import (
+    ASSISTANT_ID,
+    BOT_MENTION_PATTERN,
+    DEADLINE_EXCEEDED_REPLY,
+    DEADLINE_PARTIAL_SUFFIX,
+    HELP_TEXT,
+    NON_BOOTCAMP_QUESTION_REPLY,
+    OVERLOADED_REPLY,
+    RESET_FENCED_REPLY,
+    SLACK_API_URL,
+    STREAMING_CURSOR,
+    STREAMING_MODE,
+    admission_notice,
+    answer_cache,
+    cache_answer,
+    ChatUpdateThrottler,
+    StreamingResponseGuard,
+    StreamingTextCleaner,
+    build_user_message,
+    build_home_view,
+    event_capture,
+    event_deduplicator,
+    extract_user_question,
+    fallback_answer,
+    is_bootcamp_related,
+    lease_lost,
+    message_mirror,
+    openai_scheduler,
+    post_process_response,
+    register_new_thread,
+    remove_annotations,
+    record_run_usage,
+    run_prompt_kwargs,
+    thread_registry,
+    user_leases,
+)
+
+logger = logging.getLogger(__name__)
+
+# 비동기 OpenAI 클라이언트 초기화 (동기 클라이언트와 같은 호출 스케줄러 사용)
+async_openai_client = scheduled_client(AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")), openai_scheduler)
+
+# 비동기 Slack 앱 초기화 (SLACK_API_URL이 있으면 로컬 대체 서버 사용)
+if SLACK_API_URL:
+    async_app = AsyncApp(client=AsyncWebClient(token=os.getenv("SLACK_BOT_TOKEN"), base_url=SLACK_API_URL))
+else:
+    async_app = AsyncApp(token=os.getenv("SLACK_BOT_TOKEN"))
+
+# Slack API 접근 계층 (비동기 버전)
+slack_access = AsyncSlackAccess(async_app.client)
+
+# 새 대화는 create_and_run 한 번으로 시작 (빈 Thread는 미리 만들지 않음)
+thread_pool = AsyncThreadPool(async_openai_client, target_size=0)
+
+# Thread별 활성 Run 추적 + 질문별 종단 간 시한 (asyncio 버전)
+run_manager = AsyncRunManager(async_openai_client)
+
+# 사용자별 순차 처리 큐 (asyncio 버전)
+request_queue = AsyncUserRequestQueue()
+
+async def delete_remote_thread(thread_id):
+    """OpenAI 서버의 Thread 삭제 (비동기 버전)"""
+    await async_openai_client.beta.threads.delete(thread_id)
+    logger.info(f"Thread 삭제됨 - Thread: {thread_id}")
+
+# 토큰 예산을 넘은 Thread는 요약된 새 Thread로 교체
+thread_compactor = AsyncThreadCompactor(
+    async_openai_client,
+    thread_registry,
+    delete_remote=delete_remote_thread,
+    clean_user_text=extract_user_question,
+    leases=user_leases
+)
+
+async def compact_user_thread(user_id):
+    """큐에서 실행되는 Thread 압축 작업 (다른 인스턴스의 Run과 겹치지 않도록 lease 안에서)"""
+    async with user_leases.async_hold(user_id):
+        await thread_compactor.compact(user_id)
+
+async def schedule_compaction(user_id):
+    """Thread가 토큰 예산을 넘었으면 같은 사용자 큐 뒤에 압축 작업 추가 (다음 Run과 겹치지 않음)"""
+    if await asyncio.to_thread(thread_compactor.try_schedule, user_id):
+        logger.info(f"Thread 압축 예약 - User: {user_id}")
+        request_queue.submit(user_id, tracer.bind(compact_user_thread, "thread.compact", user_id=user_id), user_id)
+
+async def create_run_with_retry(thread_id, deadline, **run_kwargs):
+    """Run 생성 및 실행 (활성 Run 충돌 시 시한 안에서 기다렸다가 재시도, 비동기 버전)"""
+    max_run_attempts = 3
+    
+    for attempt in range(max_run_attempts):
+        try:
+            tracer.annotate(attempts=attempt + 1)
+            return await async_openai_client.beta.threads.runs.create(
+                thread_id=thread_id,
+                assistant_id=ASSISTANT_ID,
+                **run_kwargs
+            )
+        except Exception as run_error:
+            if "already has an active run" in str(run_error) and attempt < max_run_attempts - 1:
+                logger.warning(f"Active run 충돌, 재시도 {attempt + 1}/{max_run_attempts}")
+                ACTIVE_RUN_RETRIES.inc()
+                await run_manager.wait_conflict(thread_id, deadline)
+                continue
+            else:
+                raise run_error
+    
+    return None
+
+async def add_question_message(thread_id, message, deadline):
+    """Thread에 질문 추가 (추적하지 못한 활성 Run 때문에 거절되면 한 번 기다렸다가 재시도, 비동기 버전)"""
+    try:
+        return await async_openai_client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="user",
+            content=build_user_message(message)
+        )
+    except Exception as message_error:
+        if "while a run is active" not in str(message_error):
+            raise
+        await run_manager.wait_conflict(thread_id, deadline)
+        return await async_openai_client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="user",
+            content=build_user_message(message)
+        )
+
+def early_response(message, user_id):
+    """Run 없이 바로 보낼 수 있는 답변 (부트캠프 무관 질문, 캐시된 답변), 없으면 None"""
+    # 부트캠프 관련 질문이 아닌 경우 빠른 응답
+    if not is_bootcamp_related(message):
+        ANSWERS.inc(source="filtered")
+        return NON_BOOTCAMP_QUESTION_REPLY
+    
+    # 자주 묻는 질문은 캐시된 답변으로 바로 응답 (후속 질문은 제외)
+    cached_answer = answer_cache.get(message)
+    if cached_answer:
+        logger.info(f"답변 캐시 hit - User: {user_id}")
+        ANSWERS.inc(source="cache")
+        return cached_answer
+    
+    return None
+
+async def start_run(message, user_id, deadline, **run_kwargs):
+    """질문을 Thread에 보내고 Run 시작 (비동기 버전, 새 사용자는 create_and_run 한 번으로 처리)"""
+    with PHASE_SECONDS.time(phase="thread_acquire"):
+        # lease를 쓰면 다른 인스턴스가 매핑을 바꿨을 수 있으므로 DB에서 다시 읽음
+        thread_id = await asyncio.to_thread(thread_registry.get, user_id, fresh=user_leases.enabled)
+        if thread_id:
+            # 이 프로세스가 만든 Run이 아직 끝나지 않았으면 대기 (runs.list 사전 확인 없음)
+            await run_manager.wait_idle(thread_id, deadline)
+    
+    if not thread_id:
+        with tracer.span("openai.threads.create_and_run"), PHASE_SECONDS.time(phase="run_create"):
+            result = await thread_pool.create_and_run(
+                ASSISTANT_ID,
+                build_user_message(message),
+                **run_prompt_kwargs(new_thread=True),
+                **run_kwargs
+            )
+        if not run_kwargs.get("stream"):
+            await asyncio.to_thread(register_new_thread, user_id, result.thread_id)
+        return result
+    
+    # Thread에 질문 추가
+    with tracer.span("openai.messages.create"), PHASE_SECONDS.time(phase="message_create"):
+        user_message = await add_question_message(thread_id, message, deadline)
+    message_mirror.record(thread_id, user_message)
+    
+    # 지침은 run 단위로 전달
+    with tracer.span("openai.runs.create"), PHASE_SECONDS.time(phase="run_create"):
+        return await create_run_with_retry(thread_id, deadline, **run_prompt_kwargs(), **run_kwargs)
+
+def late_run_handler(message, user_id, on_late_answer=None):
+    """시한을 넘겨 취소한 Run이 끝났을 때의 정리 콜백 (비동기 버전)"""
+    async def reconcile(run):
+        await asyncio.to_thread(record_run_usage, user_id, run.thread_id, run)
+        if run.status != "completed":
+            return
+        msg = await message_mirror.async_fetch_run_reply(async_openai_client, run.thread_id, run.id)
+        if not msg:
+            return
+        clean_response = remove_annotations(msg.content[0])
+        answer = post_process_response(clean_response, message)
+        cache_answer(message, clean_response, answer)
+        logger.info(f"늦게 완료된 답변 반영 - User: {user_id}, Run: {run.id}")
+        if on_late_answer:
+            await on_late_answer(answer)
+    return reconcile
+
+async def get_assistant_response(message, user_id, on_late_answer=None):
+    """OpenAI Assistant로부터 응답 받기 (비동기 버전, 시한 초과 처리는 동기 버전과 같음)"""
+    try:
+        quick_response = early_response(message, user_id)
+        if quick_response:
+            return quick_response
+        
+        deadline = run_manager.deadline()
+        run = await start_run(message, user_id, deadline)
+        if not run:
+            return "❌ Run 생성에 실패했습니다."
+        thread_id = run.thread_id
+        
+        # Run 완료 대기 (asyncio.sleep 기반 적응형 polling, 남은 시한까지, 대기열/실행 구간 측정)
+        phase_timer = RunPhaseTimer()
+        tokens = openai_scheduler.run_reservation()
+        with tracer.span("openai.run.wait", run_id=run.id) as span, run_manager.scope(user_id, deadline, tokens) as run_scope:
+            run_scope.track(thread_id, run.id)
+            run, wait_stats = await run_scope.wait(
+                run,
+                on_poll=phase_timer.on_poll,
+                on_late=late_run_handler(message, user_id, on_late_answer)
+            )
+            span.set_attributes(run_status=run.status, polls=wait_stats.polls)
+        phase_timer.finish(run)
+        RUN_STATUS.inc(status=run.status)
+        ANSWERS.inc(source="run")
+        if run_scope.abandoned:
+            return DEADLINE_EXCEEDED_REPLY
+        await asyncio.to_thread(record_run_usage, user_id, thread_id, run)
+        
+        if run.status == 'completed':
+            # 이번 Run이 만든 Assistant 응답만 가져오기 (Thread 전체를 다시 받지 않음)
+            with tracer.span("openai.messages.list", run_id=run.id), PHASE_SECONDS.time(phase="messages_fetch"):
+                msg = await message_mirror.async_fetch_run_reply(async_openai_client, thread_id, run.id)
+            if msg:
+                with tracer.span("post_process"), PHASE_SECONDS.time(phase="post_process"):
+                    clean_response = remove_annotations(msg.content[0])
+                    
+                    # 응답 후처리: 부트캠프 무관한 내용이 포함된 경우 필터링
+                    processed_response = post_process_response(clean_response, message)
+                    cache_answer(message, clean_response, processed_response)
+                return processed_response
+        
+        elif run.status == 'failed':
+            return f"❌ 처리 중 오류가 발생했습니다: {run.last_error}"
+        elif run.status == 'requires_action':
+            return "⚠️ 추가 작업이 필요합니다."
+        else:
+            return f"⚠️ 타임아웃 또는 예상치 못한 상태: {run.status}"
+    
+    except OpenAIUnavailable as e:
+        return fallback_answer(message, e)
+    except RunDeadlineExceeded as e:
+        logger.warning(f"Run 시작 전 시한 초과 - User: {user_id}: {e}")
+        return DEADLINE_EXCEEDED_REPLY
+    except Exception as e:
+        logger.error(f"Assistant 응답 오류: {str(e)}")
+        return f"❌ 오류가 발생했습니다: {str(e)}"
+    
+    return "❌ 응답을 받지 못했습니다."
+
+async def get_assistant_response_stream(message, user_id, on_partial=None, on_late_answer=None):
+    """OpenAI Assistant로부터 응답 받기 (비동기 스트리밍 버전)"""
+    try:
+        quick_response = early_response(message, user_id)
+        if quick_response:
+            return quick_response
+        
+        deadline = run_manager.deadline()
+        stream = await start_run(message, user_id, deadline, stream=True)
+        if not stream:
+            return "❌ Run 생성에 실패했습니다."
+        
+        cleaner = StreamingTextCleaner()
+        guard = StreamingResponseGuard()
+        phase_timer = RunPhaseTimer()
+        started_at = time.monotonic()
+        first_token_logged = False
+        final_status = None
+        last_error = None
+        late_handler = late_run_handler(message, user_id, on_late_answer)
+        
+        async def on_late(run):
+            # 스트림이 완료 이벤트를 받았으면 사용량과 답변은 스트림 쪽에서 이미 처리함
+            if final_status != "completed":
+                await late_handler(run)
+        
+        # 시한이 되면 타이머가 Run을 취소하고, 스트림은 cancelled 이벤트로 끝남
+        tokens = openai_scheduler.run_reservation()
+        with tracer.span("openai.run.stream") as stream_span, run_manager.scope(user_id, deadline, tokens) as run_scope:
+            async with stream:
+                async for event in stream:
+                    if event.event == "thread.created":
+                        await asyncio.to_thread(register_new_thread, user_id, event.data.id)
+                    
+                    elif event.event == "thread.run.created":
+                        stream_span.set_attributes(run_id=event.data.id)
+                        run_scope.track(event.data.thread_id, event.data.id, watch=True, on_late=on_late)
+                    
+                    elif event.event == "thread.run.in_progress":
+                        phase_timer.on_status("in_progress")
+                    
+                    elif event.event == "thread.message.delta":
+                        for content in event.data.delta.content or []:
+                            if content.type == "text" and content.text:
+                                cleaner.feed(content.text)
+                        
+                        partial_text = cleaner.visible_text()
+                        if not partial_text:
+                            continue
+                        
+                        guard.update(partial_text)
+                        if on_partial and guard.is_displayable():
+                            if not first_token_logged:
+                                logger.info(f"첫 토큰 표시까지 {time.monotonic() - started_at:.2f}초 - User: {user_id}")
+                                stream_span.set_attributes(first_token_seconds=round(time.monotonic() - started_at, 3))
+                                first_token_logged = True
+                            await on_partial(partial_text)
+                    
+                    elif event.event == "thread.message.completed":
+                        # 완성된 답변은 다시 조회하지 않도록 미러에 기록
+                        message_mirror.record(event.data.thread_id, event.data, from_stream=True)
+                    
+                    elif event.event == "thread.run.completed":
+                        final_status = "completed"
+                        phase_timer.finish(event.data)
+                        run_scope.finished(event.data)
+                        await asyncio.to_thread(record_run_usage, user_id, event.data.thread_id, event.data)
+                    elif event.event == "thread.run.failed":
+                        final_status = "failed"
+                        last_error = event.data.last_error
+                        run_scope.finished(event.data)
+                    elif event.event == "thread.run.requires_action":
+                        final_status = "requires_action"
+                    elif event.event in ("thread.run.cancelled", "thread.run.expired", "thread.run.incomplete"):
+                        final_status = event.data.status
+                        run_scope.finished(event.data)
+                    elif event.event == "error":
+                        final_status = "error"
+                        last_error = event.data
+            stream_span.set_attributes(run_status=final_status or "unknown")
+        
+        RUN_STATUS.inc(status=final_status or "unknown")
+        ANSWERS.inc(source="run")
+        
+        if final_status == "completed":
+            clean_response = cleaner.visible_text()
+            if not clean_response:
+                return "❌ 응답을 받지 못했습니다."
+            
+            # 응답 후처리: 부트캠프 무관한 내용이 포함된 경우 필터링
+            with tracer.span("post_process"), PHASE_SECONDS.time(phase="post_process"):
+                processed_response = post_process_response(clean_response, message)
+                cache_answer(message, clean_response, processed_response)
+            return processed_response
+        elif run_scope.abandoned:
+            # 시한 초과로 취소 - 이미 보여준 부분 답변은 남김 (캐시하지 않음)
+            partial_text = cleaner.visible_text()
+            if partial_text and guard.is_displayable():
+                return partial_text + DEADLINE_PARTIAL_SUFFIX
+            return DEADLINE_EXCEEDED_REPLY
+        elif final_status in ("failed", "error"):
+            return f"❌ 처리 중 오류가 발생했습니다: {last_error}"
+        elif final_status == "requires_action":
+            return "⚠️ 추가 작업이 필요합니다."
+        else:
+            return f"⚠️ 타임아웃 또는 예상치 못한 상태: {final_status}"
+    
+    except OpenAIUnavailable as e:
+        return fallback_answer(message, e)
+    except RunDeadlineExceeded as e:
+        logger.warning(f"Run 시작 전 시한 초과 - User: {user_id}: {e}")
+        return DEADLINE_EXCEEDED_REPLY
+    except Exception as e:
+        logger.error(f"Assistant 스트리밍 응답 오류: {str(e)}")
+        return f"❌ 오류가 발생했습니다: {str(e)}"
+
+class AsyncChatUpdateThrottler(ChatUpdateThrottler):
+    """ChatUpdateThrottler의 비동기 버전 (AsyncSlackAccess 사용)"""
+    
+    async def update(self, partial_text):
+        """부분 답변 반영 (간격이 지나지 않았으면 보류)"""
+        self.pending_text = partial_text
+        if time.monotonic() >= self.next_allowed_at:
+            await self._send(self.formatter(partial_text) + STREAMING_CURSOR, wait=False)
+    
+    async def flush(self, final_text):
+        """최종 답변은 rate limit 대기 후 반드시 반영"""
+        self.pending_text = final_text
+        return await self._send(self.formatter(final_text), wait=True)
+    
+    async def _send(self, text, wait):
+        """chat_update 실제 호출"""
+        if text == self.last_sent_text:
+            self.pending_text = None
+            return True
+        
+        try:
+            await self.slack.update_message(
+                wait=wait,
+                channel=self.channel,
+                ts=self.ts,
+                text=text,
+                mrkdwn=True
+            )
+        except SlackRateLimited as e:
+            self.next_allowed_at = time.monotonic() + e.retry_after
+            return False
+        
+        self.last_sent_text = text
+        self.pending_text = None
+        self.update_count += 1
+        self.next_allowed_at = time.monotonic() + self.min_interval
+        return True
+
+async def respond_into_message(message, user_id, channel, ts, formatter):
+    """로딩 메시지(ts)를 답변으로 채우기 (다른 봇 인스턴스와 겹치지 않도록 사용자 lease 안에서 처리)"""
+    async with user_leases.async_hold(user_id):
+        return await respond_with_assistant(message, user_id, channel, ts, formatter)
+
+async def respond_with_assistant(message, user_id, channel, ts, formatter):
+    """Assistant 답변으로 로딩 메시지 채우기 (스트리밍 모드면 점진적으로 업데이트)"""
+    async def on_late_answer(answer):
+        # 시한 초과 안내를 늦게 완료된 답변으로 교체
+        await slack_access.update_message(channel=channel, ts=ts, text=formatter(answer), mrkdwn=True)
+    
+    if not STREAMING_MODE:
+        response = await get_assistant_response(message, user_id, on_late_answer=on_late_answer)
+        if lease_lost(user_id, "Slack 답변 게시"):
+            return response
+        
+        # 로딩 메시지를 최종 답변으로 업데이트 (mrkdwn 형식 사용)
+        with PHASE_SECONDS.time(phase="slack_update"):
+            await slack_access.update_message(
+                channel=channel,
+                ts=ts,
+                text=formatter(response),
+                mrkdwn=True
+            )
+        return response
+    
+    throttler = AsyncChatUpdateThrottler(slack_access, channel, ts, formatter=formatter)
+    
+    async def on_partial(partial_text):
+        # lease를 잃은 뒤에는 부분 답변도 게시하지 않음
+        if not user_leases.is_lost(user_id):
+            await throttler.update(partial_text)
+    
+    response = await get_assistant_response_stream(message, user_id, on_partial=on_partial, on_late_answer=on_late_answer)
+    if lease_lost(user_id, "Slack 답변 게시"):
+        return response
+    with PHASE_SECONDS.time(phase="slack_update"):
+        await throttler.flush(response)
+    logger.info(f"스트리밍 완료 - User: {user_id}, chat_update {throttler.update_count}회")
+    return response
+
+async def answer_mention(clean_text, user_id, channel, thread_ts):
+    """큐에서 꺼낸 멘션 질문 처리"""
+    try:
+        # 스레드에 로딩 메시지 먼저 보내기
+        loading_msg = await slack_access.post_message(
+            channel=channel,
+            text="🤔 AI가 답변을 생성하고 있습니다...",
+            thread_ts=thread_ts
+        )
+        
+        # Assistant로부터 응답 받아 로딩 메시지를 답변으로 업데이트
+        await respond_into_message(
+            clean_text,
+            user_id,
+            channel,
+            loading_msg["ts"],
+            formatter=lambda answer: f"🤖 {answer}"
+        )
+        await schedule_compaction(user_id)
+    
+    except Exception as e:
+        logger.error(f"멘션 처리 오류: {str(e)}")
+        await slack_access.post_message(
+            channel=channel,
+            text=f"❌ 오류가 발생했습니다: {str(e)}",
+            thread_ts=thread_ts
+        )
+
+async def answer_direct_message(text, user_id, channel):
+    """큐에서 꺼낸 DM 질문 처리"""
+    try:
+        # 로딩 메시지
+        loading_msg = await slack_access.post_message(channel=channel, text="🤔 생각 중입니다...")
+        
+        # Assistant로부터 응답 받아 로딩 메시지를 답변으로 업데이트
+        await respond_into_message(
+            text,
+            user_id,
+            channel,
+            loading_msg["ts"],
+            formatter=lambda answer: f"💬 *질문:* {text}\n\n🤖 *답변:*\n{answer}"
+        )
+        await schedule_compaction(user_id)
+    
+    except Exception as e:
+        logger.error(f"DM 처리 오류: {str(e)}")
+        await slack_access.post_message(channel=channel, text=f"❌ 오류가 발생했습니다: {str(e)}")
+
+@async_app.middleware
+async def capture_events(body, next):
+    """수신한 멘션/DM 이벤트를 캡처 파일에 기록"""
+    if event_capture.enabled:
+        event_capture.record(body, await slack_access.get_bot_user_id())
+    await next()
+
+@async_app.event("app_mention")
+async def handle_mention(event, say, logger, body=None):
+    """봇이 멘션되었을 때 처리"""
+    try:
+        user_id = event["user"]
+        channel = event["channel"]
+        text = event["text"]
+        thread_ts = event["ts"]  # 원본 메시지의 타임스탬프 (스레드 생성용)
+        
+        # 봇 자신이 보낸 메시지는 무시
+        if event.get("bot_id") or event.get("subtype") == "bot_message":
+            return
+        
+        # 현재 봇이 멘션되었는지 확인 (봇 ID는 캐시된 값 사용, 확인 실패 시 기본 로직 수행)
+        bot_user_id = await slack_access.get_bot_user_id()
+        if bot_user_id and f"<@{bot_user_id}>" not in text:
+            return
+        
+        # 재전송되었거나 DM 메시지 이벤트로 이미 처리한 메시지는 무시
+        if not await event_deduplicator.async_claim(event_keys(event, body)):
+            return
+        
+        # 봇 멘션 제거하고 실제 메시지만 추출
+        clean_text = BOT_MENTION_PATTERN.sub('', text).strip()
+        
+        logger.info(f"멘션 처리 시작 - 사용자: {user_id}, 메시지: {clean_text}")
+        
+        if not clean_text:
+            await say(
+                text="안녕하세요! 🤖 무엇을 도와드릴까요?",
+                thread_ts=thread_ts
+            )
+            return
+        
+        # 사용자 큐에 추가 (이전 질문이 처리 중이면 순서대로 대기)
+        # 이벤트 수신 시점부터 답변까지 하나의 trace로 기록
+        traced_answer = tracer.bind(answer_mention, "slack.app_mention", user_id=user_id, channel=channel)
+        try:
+            position, waiting = request_queue.submit(
+                user_id, traced_answer, clean_text, user_id, channel, thread_ts,
+                channel=channel, kind=KIND_MENTION
+            )
+        except QueueFull:
+            await slack_access.post_message(channel=channel, text=OVERLOADED_REPLY, thread_ts=thread_ts)
+            return
+        notice = admission_notice(position, waiting)
+        if notice:
+            logger.info(f"질문 대기열 추가 - User: {user_id}, 앞선 질문: {position}개, 전체 대기: {request_queue.depth()}개")
+            await slack_access.post_message(
+                channel=channel,
+                text=notice,
+                thread_ts=thread_ts
+            )
+    
+    except Exception as e:
+        logger.error(f"멘션 처리 오류: {str(e)}")
+        await say(
+            text=f"❌ 오류가 발생했습니다: {str(e)}",
+            thread_ts=event.get("ts")
+        )
+
+@async_app.event("message")
+async def handle_direct_message(event, say, logger, body=None):
+    """DM으로 메시지가 왔을 때 처리"""
+    # 봇이 보낸 메시지나 멘션 이벤트는 제외
+    if event.get("bot_id") or event.get("subtype") == "bot_message":
+        return
+    
+    # DM 채널 확인 (채널 타입이 'im'인 경우)
+    if event.get("channel_type") != "im":
+        return
+    
+    # 재전송되었거나 멘션 이벤트로 이미 처리한 메시지는 무시
+    if not await event_deduplicator.async_claim(event_keys(event, body)):
+        return
+    
+    try:
+        user_id = event["user"]
+        text = event["text"]
+        
+        if not text.strip():
+            await say("안녕하세요! 🤖 무엇을 도와드릴까요?")
+            return
+        
+        # 사용자 큐에 추가 (이전 질문이 처리 중이면 순서대로 대기)
+        traced_answer = tracer.bind(answer_direct_message, "slack.message.im", user_id=user_id, channel=event["channel"])
+        try:
+            position, waiting = request_queue.submit(
+                user_id, traced_answer, text, user_id, event["channel"],
+                channel=event["channel"], kind=KIND_DM
+            )
+        except QueueFull:
+            await slack_access.post_message(channel=event["channel"], text=OVERLOADED_REPLY)
+            return
+        notice = admission_notice(position, waiting)
+        if notice:
+            logger.info(f"질문 대기열 추가 - User: {user_id}, 앞선 질문: {position}개, 전체 대기: {request_queue.depth()}개")
+            await slack_access.post_message(channel=event["channel"], text=notice)
+    
+    except Exception as e:
+        logger.error(f"DM 처리 오류: {str(e)}")
+        await say(f"❌ 오류가 발생했습니다: {str(e)}")
+
+async def reset_user_thread(user_id, respond):
+    """큐에서 실행되는 채팅 히스토리 리셋 (비동기 버전, 앞선 질문이 끝난 뒤 lease 안에서)"""
+    try:
+        async with user_leases.async_hold(user_id):
+            if lease_lost(user_id, "Thread 리셋"):
+                await respond(RESET_FENCED_REPLY)
+                return
+            
+            # 해당 사용자의 Thread 삭제 (서버의 Thread도 함께 삭제)
+            thread_id = await asyncio.to_thread(
+                thread_registry.pop, user_id, fence_token=user_leases.fence_token(user_id)
+            )
+            if not thread_id:
+                await respond("ℹ️ 리셋할 채팅 히스토리가 없습니다.")
+                return
+            
+            message_mirror.forget(thread_id)
+            try:
+                # 시한을 넘겨 정리 중인 Run이 있으면 끝난 뒤 삭제
+                await run_manager.wait_idle(thread_id, run_manager.deadline())
+            except RunDeadlineExceeded:
+                logger.warning(f"이전 Run이 끝나지 않은 채 Thread 삭제 - Thread: {thread_id}")
+            try:
+                await delete_remote_thread(thread_id)
+            except Exception as delete_error:
+                logger.warning(f"Thread 삭제 실패 - Thread: {thread_id}: {delete_error}")
+            await respond("🔄 채팅 히스토리가 리셋되었습니다!")
+            logger.info(f"Thread 리셋됨 - User: {user_id}")
+    
+    except Exception as e:
+        logger.error(f"리셋 명령어 오류: {str(e)}")
+        await respond(f"❌ 리셋 중 오류가 발생했습니다: {str(e)}")
+
+@async_app.command("/reset_chat")
+async def handle_reset_command(ack, respond, command):
+    """채팅 히스토리 리셋 명령어 (진행 중인 질문과 겹치지 않도록 사용자 큐에서 처리)"""
+    await ack()
+    
+    user_id = command["user_id"]
+    position, _ = request_queue.submit(
+        user_id, tracer.bind(reset_user_thread, "thread.reset", user_id=user_id), user_id, respond
+    )
+    if position:
+        await respond(f"⏳ 앞선 질문 {position}개를 처리한 뒤 채팅 히스토리를 리셋할게요.")
+
+@async_app.command("/help")
+async def handle_help_command(ack, respond):
+    """도움말 명령어"""
+    await ack()
+    
+    await respond(HELP_TEXT)
+
+@async_app.event("app_home_opened")
+async def update_home_tab(event, logger):
+    """앱 홈 탭이 열렸을 때"""
+    try:
+        await slack_access.publish_view(
+            user_id=event["user"],
+            view=build_home_view()
+        )
+    except Exception as e:
+        logger.error(f"홈 탭 업데이트 오류: {str(e)}")
+
+async def start_async_bot():
+    """Async Socket Mode로 앱 실행"""
+    # 봇 정보는 시작 시 한 번만 확인 (실패하면 첫 멘션 때 다시 확인)
+    await slack_access.get_bot_user_id()
+    
+    handler = AsyncSocketModeHandler(async_app, os.getenv("SLACK_APP_TOKEN"))
+    await handler.start_async()
+
+def run_async_bot():
+    """비동기 런타임으로 봇 실행 (이벤트 루프 하나에서 모든 질문 처리)"""
+    logger.info("⚡ 비동기 모드(AsyncApp + AsyncOpenAI)로 실행합니다")
+    asyncio.run(start_async_bot())
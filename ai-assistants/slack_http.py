@@ -0,0 +1,135 @@
+"""
+Slack Events API(HTTP) 진입점
+
+Socket Mode(웹소켓 하나, 프로세스 하나) 대신 Slack이 보내는 HTTP 요청을 FastAPI/uvicorn으로 받습니다.
+uvicorn worker를 여러 개 띄우고 로드밸런서 뒤에 두면 코어/머신 수만큼 수평 확장할 수 있습니다.
+
+- 서명 검증: Bolt가 `SLACK_SIGNING_SECRET`으로 X-Slack-Signature / X-Slack-Request-Timestamp 확인 (실패 시 401)
+- 즉시 응답: 핸들러는 질문을 사용자별 대기열에 넣기만 하고, Run 대기는 대기열 worker에서 처리
+  동기 앱의 dispatch도 이벤트 루프 밖(threadpool)에서 실행하여 다른 요청의 ack를 막지 않음
+- worker마다 봇 모듈을 따로 초기화 (Thread 매핑은 SQLite 파일을 공유, 대기열/캐시는 worker별)
+- 같은 사용자의 질문이 여러 worker에서 겹치지 않게 하려면 USER_LEASE_BACKEND=sqlite (user_lease.py)
+
+사용법:
+    python slack_http.py --port 3000 --workers 4
+    python slack_http.py --async --workers 4
+    uvicorn slack_http:create_app --factory --port 3000 --workers 4
+"""
+
+import os
+import sys
+import logging
+import argparse
+from contextlib import asynccontextmanager
+
+import uvicorn
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+# .env 파일 로드 (서명 비밀값 확인 전에)
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# HTTP 서버 설정 (환경변수로 조정 가능)
+SLACK_HTTP_HOST = os.getenv("SLACK_HTTP_HOST", "0.0.0.0")
+SLACK_HTTP_PORT = int(os.getenv("SLACK_HTTP_PORT", "3000"))
+SLACK_HTTP_WORKERS = int(os.getenv("SLACK_HTTP_WORKERS", "1"))
+SLACK_EVENTS_PATH = os.getenv("SLACK_EVENTS_PATH", "/slack/events")  # 이벤트, 슬래시 명령어, 인터랙션 공통 Request URL
+
+def prepare_worker(slack_bot):
+    """worker 시작 시 한 번 실행 (slack_bot.py __main__의 시작 작업과 같음)"""
+    try:
+        slack_bot.load_assistant_instructions()
+    except Exception as e:
+        logger.warning(f"Assistant 지침 조회 실패 (첫 Run 때 다시 조회): {e}")
+    
+    try:
+        slack_bot.slack_access.resolve_identity()
+    except Exception as e:
+        logger.warning(f"슬랙 봇 정보 확인 실패 (첫 멘션 때 다시 확인): {e}")
+    
+    slack_bot.thread_registry.start_cleanup(slack_bot.delete_remote_thread)
+
+def create_app():
+    """Slack 요청을 받는 FastAPI 앱 (uvicorn worker마다 호출되는 factory)"""
+    if not os.getenv("SLACK_SIGNING_SECRET"):
+        raise RuntimeError("SLACK_SIGNING_SECRET이 설정되지 않았습니다 (HTTP 모드는 서명 검증이 필요합니다)")
+    
+    import slack_bot
+    from metrics import CONTENT_TYPE, REGISTRY
+    from slack_bolt.adapter.starlette.handler import to_bolt_request, to_starlette_response
+    
+    async_handler = None
+    if slack_bot.ASYNC_MODE:
+        import slack_bot_async
+        from slack_bolt.adapter.fastapi.async_handler import AsyncSlackRequestHandler
+        async_handler = AsyncSlackRequestHandler(slack_bot_async.async_app)
+    
+    @asynccontextmanager
+    async def lifespan(api):
+        await run_in_threadpool(prepare_worker, slack_bot)
+        if async_handler:
+            await slack_bot_async.slack_access.get_bot_user_id()
+        logger.info(f"🚀 Slack HTTP worker 시작 (pid {os.getpid()}, {'비동기' if async_handler else '동기'} 모드)")
+        yield
+    
+    api = FastAPI(title="AI Assistant Slack bot", docs_url=None, redoc_url=None, openapi_url=None, lifespan=lifespan)
+    
+    @api.post(SLACK_EVENTS_PATH)
+    async def slack_events(request: Request):
+        if async_handler:
+            return await async_handler.handle(request)
+        
+        # 동기 앱 dispatch(미들웨어, 리스너 매칭)는 threadpool에서 실행하고 리스너가 시작되면 바로 ack
+        bolt_request = to_bolt_request(request, await request.body())
+        bolt_response = await run_in_threadpool(slack_bot.app.dispatch, bolt_request)
+        return to_starlette_response(bolt_response)
+    
+    @api.get("/healthz")
+    def healthz():
+        """로드밸런서 상태 확인"""
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "queue": slack_bot.request_queue.stats(),
+            "answer_cache": slack_bot.answer_cache.stats.as_dict(),
+            "duplicate_events": slack_bot.event_deduplicator.stats.as_dict(),
+            "user_leases": slack_bot.user_leases.stats.as_dict() if slack_bot.user_leases.enabled else None,
+            "openai": {"circuit": slack_bot.openai_scheduler.breaker.state, **slack_bot.openai_scheduler.stats.as_dict()},
+        }
+    
+    @api.get("/metrics")
+    def metrics():
+        """이 worker의 메트릭 (worker별로 따로 수집됨)"""
+        return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+    
+    return api
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Slack Events API(HTTP) 모드로 봇 실행")
+    parser.add_argument("--host", default=SLACK_HTTP_HOST)
+    parser.add_argument("--port", type=int, default=SLACK_HTTP_PORT)
+    parser.add_argument("--workers", type=int, default=SLACK_HTTP_WORKERS, help="uvicorn worker 프로세스 수")
+    parser.add_argument("--async", dest="async_mode", action="store_true", help="AsyncApp + AsyncOpenAI 런타임 사용")
+    args = parser.parse_args()
+    
+    if not os.getenv("SLACK_SIGNING_SECRET"):
+        print("❌ SLACK_SIGNING_SECRET 환경변수가 필요합니다 (Slack 앱 Basic Information > Signing Secret)")
+        sys.exit(1)
+    
+    # worker 프로세스도 같은 런타임을 쓰도록 환경변수로 전달
+    if args.async_mode:
+        os.environ["SLACK_ASYNC_MODE"] = "true"
+    
+    print(f"🚀 Slack HTTP 모드: http://{args.host}:{args.port}{SLACK_EVENTS_PATH} (worker {args.workers}개)")
+    uvicorn.run(
+        "slack_http:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+    )
@@ -6,10 +6,12 @@ OpenAI Assistant 터미널 테스트 스크립트
 """
 
 import os
-import time
 import sys
 from openai import OpenAI
 from dotenv import load_dotenv
+from run_waiter import wait_for_run
+from thread_pool import ThreadPool
+from message_mirror import MessageMirror
 
 # 환경변수 로드
 load_dotenv()
@@ -25,8 +27,14 @@ except Exception as e:
 # Assistant ID
 ASSISTANT_ID = os.getenv("ASSISTANT_ID", "asst_dhCyBhWrMBqjd83HnjEbWUY5")
 
-# 현재 Thread
-current_thread = None
+# 미리 만들어 둔 빈 Thread 풀 (/reset 시 바로 새 Thread 사용)
+thread_pool = ThreadPool(client, target_size=2, low_water=1)
+
+# Thread별 최근 메시지 미러 (Run이 만든 메시지만 증분 조회)
+message_mirror = MessageMirror()
+
+# 현재 Thread ID
+current_thread_id = None
 
 def remove_annotations(message_content):
     """OpenAI 메시지에서 annotations(주석)을 제거하는 함수"""
@@ -59,7 +67,7 @@ def remove_annotations(message_content):
 
 def initialize_assistant():
     """Assistant와 Thread 초기화"""
-    global current_thread
+    global current_thread_id
     
     try:
         print("🔄 Assistant 정보를 가져오는 중...")
@@ -69,9 +77,10 @@ def initialize_assistant():
         print(f"✅ Assistant '{assistant_info.name}' 연결됨")
         print(f"📝 설명: {assistant_info.description}")
         
-        # 새로운 Thread 생성
-        current_thread = client.beta.threads.create()
-        print(f"🆔 Thread ID: {current_thread.id}")
+        # 빈 Thread 풀 채우기 후 첫 Thread 꺼내기
+        thread_pool.prefill()
+        current_thread_id = thread_pool.acquire()
+        print(f"🆔 Thread ID: {current_thread_id}")
         
         return True
         
@@ -81,9 +90,9 @@ def initialize_assistant():
 
 def get_assistant_response(message):
     """OpenAI Assistant로부터 응답 받기"""
-    global current_thread
+    global current_thread_id
     
-    if not current_thread:
+    if not current_thread_id:
         print("❌ Thread가 초기화되지 않았습니다.")
         return None
     
@@ -91,44 +100,39 @@ def get_assistant_response(message):
         print("\n🤔 Assistant가 생각 중입니다...")
         
         # Thread에 메시지 추가
-        client.beta.threads.messages.create(
-            thread_id=current_thread.id,
+        user_message = client.beta.threads.messages.create(
+            thread_id=current_thread_id,
             role="user",
             content=message
         )
+        message_mirror.record(current_thread_id, user_message)
         
         # Run 생성 및 실행
         run = client.beta.threads.runs.create(
-            thread_id=current_thread.id,
+            thread_id=current_thread_id,
             assistant_id=ASSISTANT_ID
         )
         
         print(f"📋 Run ID: {run.id}")
         
-        # Run 완료 대기
-        max_attempts = 60  # 60초 타임아웃
-        attempts = 0
-        
-        while run.status in ['queued', 'in_progress', 'cancelling'] and attempts < max_attempts:
-            print(f"⏳ 상태: {run.status} ({attempts + 1}/{max_attempts})")
-            time.sleep(1)
-            attempts += 1
-            run = client.beta.threads.runs.retrieve(
-                thread_id=current_thread.id,
-                run_id=run.id
-            )
+        # Run 완료 대기 (적응형 polling, 60초 타임아웃)
+        run, wait_stats = wait_for_run(
+            client,
+            current_thread_id,
+            run,
+            timeout=60,
+            on_poll=lambda polled_run, stats: print(f"⏳ 상태: {polled_run.status} ({stats.polls}회 확인, {stats.slept:.1f}초)")
+        )
         
         print(f"🏁 최종 상태: {run.status}")
+        print(f"📊 확인 {wait_stats.polls}회, 대기 {wait_stats.elapsed:.2f}초, 낭비 추정 {wait_stats.wasted_wait:.2f}초")
         
         if run.status == 'completed':
-            # 최신 메시지들 가져오기
-            messages = client.beta.threads.messages.list(thread_id=current_thread.id)
-            
-            # Assistant의 응답 찾기 (가장 최근 메시지)
-            for msg in messages.data:
-                if msg.role == "assistant":
-                    clean_response = remove_annotations(msg.content[0])
-                    return clean_response
+            # 이번 Run이 만든 Assistant 응답만 가져오기
+            msg = message_mirror.fetch_run_reply(client, current_thread_id, run.id)
+            if msg:
+                print(f"📨 메시지 조회 누적 {message_mirror.stats.messages_fetched}개 ({message_mirror.stats.fetch_calls}회)")
+                return remove_annotations(msg.content[0])
                     
         elif run.status == 'failed':
             error_msg = f"❌ 처리 중 오류가 발생했습니다."
@@ -149,12 +153,12 @@ def get_assistant_response(message):
 
 def reset_conversation():
     """새로운 대화 시작"""
-    global current_thread
+    global current_thread_id
     
     try:
-        current_thread = client.beta.threads.create()
+        current_thread_id = thread_pool.acquire()
         print(f"🔄 새로운 대화가 시작되었습니다.")
-        print(f"🆔 새 Thread ID: {current_thread.id}")
+        print(f"🆔 새 Thread ID: {current_thread_id}")
         return True
     except Exception as e:
         print(f"❌ 새 대화 생성 오류: {str(e)}")
@@ -184,7 +188,8 @@ def show_status():
 📊 현재 상태:
 • OpenAI API 키: {'✅ 설정됨' if os.getenv('OPENAI_API_KEY') else '❌ 설정되지 않음'}
 • Assistant ID: {ASSISTANT_ID}
-• Thread ID: {current_thread.id if current_thread else '❌ 없음'}
+• Thread ID: {current_thread_id or '❌ 없음'}
+• Thread 풀: {thread_pool.size()}개 대기 중 (고갈 {thread_pool.stats()['exhausted']}회)
 """)
 
 def get_multiline_input(prompt):
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 테스트 대상 모듈은 ai-assistants/ 바로 아래의 평평한 모듈
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,113 @@
+import time
+
+from answer_cache import AnswerCache, is_follow_up_question, normalize_question
+from answer_store import AnswerStore, load_answer_store, write_store
+from metrics import ANSWER_CACHE_LOOKUPS
+
+def test_normalize_ignores_spacing_symbols_and_endings():
+    assert normalize_question("출결 규정이 어떻게 되나요?") == normalize_question("출결규정이 어떻게되나요")
+    assert normalize_question("<@U123ABC> 데일리 미션 마감 알려주세요!!") == normalize_question("데일리미션 마감")
+    assert normalize_question("LMS 사용법") == "lms사용법"
+
+def test_normalize_keeps_short_text_with_ending():
+    # 어미를 떼면 한 글자만 남는 경우는 그대로 둠
+    assert normalize_question("뭐요") == "뭐요"
+
+def test_follow_up_questions_are_detected():
+    assert is_follow_up_question("그럼 지각은요?")
+    assert is_follow_up_question("아까 말한 거 다시 설명해줘")
+    assert is_follow_up_question("왜?")
+    assert not is_follow_up_question("지각 기준 시간이 몇 시인가요?")
+
+def test_exact_and_similar_hits():
+    cache = AnswerCache(ttl_seconds=60, max_entries=10, similarity_threshold=0.8, enabled=True)
+    cache.put("데일리 미션 제출 마감 시간이 언제인가요?", "밤 10시입니다.")
+    
+    assert cache.get("데일리미션 제출 마감 시간이 언제인가요") == "밤 10시입니다."
+    assert cache.get("데일리 미션 제출 마감 시간은 언제인가요?") == "밤 10시입니다."
+    assert cache.get("캡스톤 프로젝트 팀 구성") is None
+    
+    stats = cache.stats.as_dict()
+    assert (stats["exact_hits"], stats["similar_hits"], stats["misses"]) == (1, 1, 1)
+
+def test_follow_up_question_bypasses_cache():
+    cache = AnswerCache(enabled=True)
+    cache.put("그럼 지각은요?", "저장되면 안 됨")
+    assert len(cache) == 0
+    before = ANSWER_CACHE_LOOKUPS.value(result="bypassed")
+    assert cache.get("그럼 지각은요?") is None
+    assert cache.stats.bypassed == 1
+    assert ANSWER_CACHE_LOOKUPS.value(result="bypassed") == before + 1
+
+def test_expired_answer_is_kept_for_stale_fallback():
+    cache = AnswerCache(ttl_seconds=0.01, enabled=True)
+    cache.put("수료 기준 점수가 몇 점인가요?", "80점")
+    time.sleep(0.02)
+    
+    assert cache.get("수료 기준 점수가 몇 점인가요?") is None
+    assert cache.stats.expirations == 1
+    assert cache.get("수료 기준 점수가 몇 점인가요?", allow_stale=True) == "80점"
+
+def test_lru_eviction_keeps_recently_used():
+    cache = AnswerCache(ttl_seconds=60, max_entries=2, enabled=True)
+    cache.put("출결 체크는 어디서 하나요", "A")
+    cache.put("피어세션은 몇 시에 진행되나요", "B")
+    cache.get("출결 체크는 어디서 하나요")
+    cache.put("캡스톤 프로젝트 팀은 어떻게 정하나요", "C")
+    
+    assert len(cache) == 2
+    assert cache.stats.evictions == 1
+    assert cache.get("피어세션은 몇 시에 진행되나요") is None
+    assert cache.get("출결 체크는 어디서 하나요") == "A"
+
+def test_invalidate_removes_similar_question():
+    cache = AnswerCache(enabled=True)
+    cache.put("외출은 몇 시간까지 가능한가요?", "2시간")
+    assert cache.invalidate("외출은 몇 시간까지 가능한가요") == 1
+    assert cache.get("외출은 몇 시간까지 가능한가요?") is None
+    
+    cache.put("외출은 몇 시간까지 가능한가요?", "2시간")
+    assert cache.invalidate() == 1
+    assert len(cache) == 0
+
+def test_disabled_cache_returns_nothing():
+    cache = AnswerCache(enabled=False)
+    cache.put("출결 체크는 어디서 하나요", "A")
+    assert cache.get("출결 체크는 어디서 하나요") is None
+
+def test_precomputed_store_answers_memory_misses(tmp_path):
+    path = str(tmp_path / "answer_store.bin")
+    write_store(path, [("지각 기준 시간이 몇 시인가요?", "오전 9시 10분입니다.", 0.0)],
+                kb_version="kb1", prompt_version="strict_mode.v1")
+    store = AnswerStore.open(path)
+    try:
+        assert store.mismatch(prompt_version="strict_mode.v1", kb_version="kb1") is None
+        assert store.mismatch(prompt_version="strict_mode.v2") is not None
+        
+        cache = AnswerCache(enabled=True, store=store)
+        assert cache.get("지각 기준 시간이 몇 시 인가요") == "오전 9시 10분입니다."
+        assert cache.stats.store_hits == 1
+        assert cache.get("출결 정정 신청 방법") is None
+        assert cache.stats.misses == 1
+    finally:
+        store.close()
+
+def test_store_without_checkable_kb_version_is_not_loaded(tmp_path):
+    path = str(tmp_path / "answer_store.bin")
+    write_store(path, [("지각 기준 시간이 몇 시인가요?", "오전 9시 10분입니다.", 0.0)],
+                kb_version="kb1", prompt_version="strict_mode.v1")
+    
+    # 현재 지식 베이스 버전을 알 수 없으면 (또는 계산에 실패하면) 사용하지 않음
+    assert load_answer_store("strict_mode.v1", path=path, kb_version=None, enabled=True) is None
+    
+    def unavailable():
+        raise RuntimeError("assistants.retrieve 실패")
+    
+    assert load_answer_store("strict_mode.v1", path=path, kb_version=unavailable, enabled=True) is None
+    assert load_answer_store("strict_mode.v1", path=path, kb_version=lambda: "kb2", enabled=True) is None
+    
+    store = load_answer_store("strict_mode.v1", path=path, kb_version=lambda: "kb1", enabled=True)
+    try:
+        assert store is not None and store.kb_version == "kb1"
+    finally:
+        store.close()
@@ -0,0 +1,94 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from event_dedup import EventDeduplicator, event_keys
+from metrics import DUPLICATE_EVENTS
+
+MENTION = {"type": "app_mention", "client_msg_id": "m1", "channel": "D1", "ts": "1700000000.000100"}
+DIRECT_MESSAGE = {"type": "message", "client_msg_id": "m1", "channel": "D1", "ts": "1700000000.000100"}
+
+@pytest.fixture(params=["memory", "sqlite"])
+def deduplicator(request, tmp_path):
+    db_path = str(tmp_path / "events.db") if request.param == "sqlite" else None
+    dedup = EventDeduplicator(ttl_seconds=60, db_path=db_path)
+    yield dedup
+    dedup.close()
+
+def test_event_keys():
+    assert event_keys(MENTION, {"event_id": "Ev1"}) == ["event:Ev1", "msg:m1", "ts:D1:1700000000.000100"]
+    assert event_keys({"channel": "C1"}) == []
+
+def test_retry_of_same_event_is_suppressed(deduplicator):
+    retries = DUPLICATE_EVENTS.value(reason="retry")
+    assert deduplicator.claim(event_keys(MENTION, {"event_id": "Ev1"}))
+    assert not deduplicator.claim(event_keys(MENTION, {"event_id": "Ev1"}))
+    assert deduplicator.stats.suppressed_retries == 1
+    assert DUPLICATE_EVENTS.value(reason="retry") == retries + 1
+
+def test_same_message_delivered_as_mention_and_dm_is_suppressed(deduplicator):
+    assert deduplicator.claim(event_keys(MENTION, {"event_id": "Ev1"}))
+    # 다른 event_id로 도착한 같은 메시지 (client_msg_id, ts가 같음)
+    assert not deduplicator.claim(event_keys(DIRECT_MESSAGE, {"event_id": "Ev2"}))
+    assert deduplicator.stats.suppressed_deliveries == 1
+    assert deduplicator.stats.claimed == 1
+
+def test_different_messages_are_claimed(deduplicator):
+    assert deduplicator.claim(["event:Ev1", "ts:C1:1"])
+    assert deduplicator.claim(["event:Ev2", "ts:C1:2"])
+    # 키가 없으면 확인하지 않고 처리
+    assert deduplicator.claim([])
+    assert deduplicator.size() == 4
+
+def test_keys_expire_after_ttl(tmp_path):
+    for db_path in (None, str(tmp_path / "events.db")):
+        dedup = EventDeduplicator(ttl_seconds=0.05, db_path=db_path)
+        assert dedup.claim(["event:Ev1"])
+        time.sleep(0.1)
+        assert dedup.claim(["event:Ev1"])
+        dedup.close()
+
+def test_memory_backend_keeps_max_entries():
+    dedup = EventDeduplicator(ttl_seconds=60, max_entries=2)
+    for index in range(3):
+        assert dedup.claim([f"event:Ev{index}"])
+    assert dedup.size() == 2
+    # 가장 오래된 키는 LRU에서 밀려나 다시 선점 가능
+    assert dedup.claim(["event:Ev0"])
+
+def test_concurrent_claims_admit_only_one(deduplicator):
+    results = []
+    barrier = threading.Barrier(8)
+    
+    def claim():
+        barrier.wait()
+        results.append(deduplicator.claim(["event:Ev1"]))
+    
+    workers = [threading.Thread(target=claim) for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert results.count(True) == 1
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    db_path = str(tmp_path / "events.db")
+    first = EventDeduplicator(ttl_seconds=60, db_path=db_path)
+    second = EventDeduplicator(ttl_seconds=60, db_path=db_path)
+    assert first.claim(["event:Ev1"])
+    assert not second.claim(["event:Ev1"])
+    first.close()
+    second.close()
+
+def test_async_claim(deduplicator):
+    async def scenario():
+        return [await deduplicator.async_claim(["event:Ev1"]) for _ in range(2)]
+    
+    assert asyncio.run(scenario()) == [True, False]
+
+def test_disabled_deduplicator_claims_everything():
+    dedup = EventDeduplicator(enabled=False)
+    assert dedup.claim(["event:Ev1"])
+    assert dedup.claim(["event:Ev1"])
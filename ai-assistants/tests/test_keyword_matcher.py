@@ -0,0 +1,63 @@
+import json
+import os
+import time
+
+from keyword_matcher import KeywordConfig, KeywordMatcher
+
+CATEGORIES = {
+    "출결": ["출결", "출석", "결석"],
+    "프로젝트": ["캡스톤", "프로젝트"],
+    "english": ["LMS", "he", "she", "hers"],
+}
+
+def test_match_finds_categories_case_insensitive():
+    matcher = KeywordMatcher(CATEGORIES)
+    assert matcher.match("lms에서 출석 확인") == {"english": {"LMS"}, "출결": {"출석"}}
+    assert matcher.match("오늘 점심 메뉴") == {}
+
+def test_match_reports_overlapping_keywords():
+    matcher = KeywordMatcher(CATEGORIES)
+    # ushers 안의 she, he, hers가 겹쳐 있어도 모두 탐지
+    assert matcher.match("ushers") == {"english": {"she", "he", "hers"}}
+    assert matcher.match("결석과 출결") == {"출결": {"결석", "출결"}}
+
+def test_feed_continues_across_chunks():
+    matcher = KeywordMatcher(CATEGORIES)
+    text = "캡스톤 프로젝트 결석 규정"
+    expected = matcher.match(text)
+    
+    # 키워드가 청크 경계에서 잘려도 state로 이어서 찾음
+    for size in (1, 2, 3, 5):
+        merged = {}
+        state = 0
+        for start in range(0, len(text), size):
+            matches, state = matcher.feed(text[start:start + size], state)
+            for category, keywords in matches.items():
+                merged.setdefault(category, set()).update(keywords)
+        assert merged == expected
+
+def test_feed_reports_only_new_matches_per_chunk():
+    matcher = KeywordMatcher(CATEGORIES)
+    matches, state = matcher.feed("캡스")
+    assert matches == {}
+    matches, state = matcher.feed("톤 일정", state)
+    assert matches == {"프로젝트": {"캡스톤"}}
+    matches, _ = matcher.feed(" 안내", state)
+    assert matches == {}
+
+def test_config_reloads_changed_file(tmp_path):
+    path = tmp_path / "keywords.json"
+    path.write_text(json.dumps({"question": {"출결": ["출석"]}, "response": {"bootcamp": ["출석"]}}), encoding="utf-8")
+    config = KeywordConfig(path=str(path), check_interval=0)
+    assert config.match_question("출석 체크") == {"출결": {"출석"}}
+    
+    path.write_text(json.dumps({"question": {"과제": ["과제"]}, "response": {"bootcamp": ["과제"]}}), encoding="utf-8")
+    # 수정 시각이 같은 초로 기록되는 파일 시스템 대비
+    future = time.time() + 10
+    os.utime(path, (future, future))
+    assert config.match_question("과제 제출") == {"과제": {"과제"}}
+    
+    # 잘못된 파일은 기존 설정 유지
+    path.write_text("{", encoding="utf-8")
+    os.utime(path, (future + 10, future + 10))
+    assert config.match_question("과제 제출") == {"과제": {"과제"}}
@@ -0,0 +1,183 @@
+import time
+import asyncio
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from openai_scheduler import CircuitBreaker, OpenAICallScheduler, OpenAIUnavailable, classify_error
+
+def status_error(status_code, code=None):
+    """HTTP 응답 없이 만든 APIStatusError (상태 코드만 필요)"""
+    error = openai.APIStatusError.__new__(openai.APIStatusError)
+    error.status_code = status_code
+    error.code = code
+    error.response = None
+    return error
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() > 0
+
+def test_breaker_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_breaker_half_open_allows_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+    open_breaker(breaker)
+    
+    allowed, probe = breaker.acquire()
+    assert allowed and probe is not None
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.acquire() == (False, None)
+    
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.acquire() == (True, None)
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+    open_breaker(breaker)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened_count == 2
+
+def test_breaker_release_probe_ignores_stale_probe():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+    open_breaker(breaker)
+    _, first = breaker.acquire()
+    breaker.record_failure()
+    _, second = breaker.acquire()
+    
+    # 이전 시험 호출의 반납이 지금 진행 중인 시험 호출 슬롯을 풀지 않음
+    breaker.release_probe(first)
+    assert breaker.acquire() == (False, None)
+    breaker.release_probe(second)
+    assert breaker.acquire()[0]
+
+def test_cancelled_probe_does_not_stick_half_open():
+    scheduler = OpenAICallScheduler(rpm_limit=0, tpm_limit=0, breaker=CircuitBreaker(failure_threshold=1, cooldown=0))
+    open_breaker(scheduler.breaker)
+    
+    async def hang():
+        await asyncio.sleep(10)
+    
+    async def scenario():
+        task = asyncio.create_task(scheduler.async_call("threads.runs.retrieve", hang))
+        await asyncio.sleep(0.01)
+        assert scheduler.breaker.state == CircuitBreaker.HALF_OPEN
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    asyncio.run(scenario())
+    
+    async def ok():
+        return "ok"
+    
+    assert asyncio.run(scheduler.async_call("threads.runs.retrieve", ok)) == "ok"
+    assert scheduler.breaker.state == CircuitBreaker.CLOSED
+
+def test_interrupted_sync_probe_releases_slot():
+    scheduler = OpenAICallScheduler(rpm_limit=0, tpm_limit=0, breaker=CircuitBreaker(failure_threshold=1, cooldown=0))
+    open_breaker(scheduler.breaker)
+    
+    def interrupted():
+        raise KeyboardInterrupt
+    
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.call("threads.runs.retrieve", interrupted)
+    assert scheduler.call("threads.runs.retrieve", lambda: "ok") == "ok"
+
+def test_classify_error_transient_statuses():
+    assert classify_error(status_error(408)) == "server_error"
+    assert classify_error(status_error(500)) == "server_error"
+    assert classify_error(status_error(503)) == "server_error"
+    assert classify_error(status_error(429)) == "rate_limited"
+    assert classify_error(status_error(429, code="insufficient_quota")) is None
+    assert classify_error(status_error(409)) is None
+    assert classify_error(status_error(400)) is None
+
+def test_conflict_is_not_retried_and_does_not_trip_breaker():
+    scheduler = OpenAICallScheduler(rpm_limit=0, tpm_limit=0, backoff_base=0,
+                                    breaker=CircuitBreaker(failure_threshold=1, cooldown=60))
+    calls = []
+    
+    def conflict():
+        calls.append(1)
+        raise status_error(409)
+    
+    with pytest.raises(openai.APIStatusError):
+        scheduler.call("threads.runs.create", conflict)
+    assert len(calls) == 1
+    assert scheduler.breaker.state == CircuitBreaker.CLOSED
+
+def test_server_errors_retry_then_open_breaker():
+    scheduler = OpenAICallScheduler(rpm_limit=0, tpm_limit=0, max_retries=5, backoff_base=0,
+                                    breaker=CircuitBreaker(failure_threshold=2, cooldown=60))
+    calls = []
+    
+    def failing():
+        calls.append(time.monotonic())
+        raise status_error(502)
+    
+    with pytest.raises(OpenAIUnavailable):
+        scheduler.call("threads.runs.create", failing)
+    assert len(calls) == 2
+    with pytest.raises(OpenAIUnavailable):
+        scheduler.call("threads.runs.create", failing)
+    assert len(calls) == 2
+
+def test_run_token_reservation_settles_once_and_never_overcharges():
+    scheduler = OpenAICallScheduler(rpm_limit=0, tpm_limit=6000, run_token_estimate=3000)
+    scheduler.call("threads.runs.create", lambda: "run")
+    assert scheduler.tokens._tokens == pytest.approx(3000, abs=5)
+    
+    # 사용량이 추정치보다 많아도 추가로 차감하지 않고, 두 번째 정산은 무시
+    tokens = scheduler.run_reservation()
+    assert tokens.settle(SimpleNamespace(total_tokens=5000))
+    assert not tokens.settle()
+    assert scheduler.tokens._tokens == pytest.approx(3000, abs=5)
+    
+    # 사용량 없이 끝난 Run(취소, 실패, 스트림 오류)은 추정치 전부 환불
+    scheduler.call("threads.runs.create", lambda: "run")
+    scheduler.run_reservation().settle()
+    assert scheduler.tokens._tokens == pytest.approx(3000, abs=5)
+    
+    scheduler.call("threads.runs.create", lambda: "run")
+    scheduler.run_reservation().settle(SimpleNamespace(total_tokens=1000))
+    assert scheduler.tokens._tokens == pytest.approx(2000, abs=5)
+
+def test_failed_run_creation_refunds_token_estimate():
+    scheduler = OpenAICallScheduler(rpm_limit=0, tpm_limit=6000, run_token_estimate=3000, max_retries=2,
+                                    backoff_base=0, breaker=CircuitBreaker(failure_threshold=10, cooldown=60))
+    
+    def failing():
+        raise status_error(502)
+    
+    # 재시도마다 차감한 추정치도 Run이 만들어지지 않았으므로 모두 환불
+    with pytest.raises(openai.APIStatusError):
+        scheduler.call("threads.runs.create", failing)
+    assert scheduler.tokens._tokens == pytest.approx(6000, abs=5)
+    
+    # chat.completions는 응답의 사용량으로 바로 정산
+    scheduler.call("chat.completions.create", lambda: SimpleNamespace(usage=SimpleNamespace(total_tokens=500)))
+    assert scheduler.tokens._tokens == pytest.approx(5500, abs=5)
@@ -0,0 +1,204 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from run_manager import AsyncRunManager, Deadline, RunDeadlineExceeded, RunManager
+
+class FakeRuns:
+    """runs.cancel 후 settle_after초가 지나면 final_status로 끝나는 Run"""
+    
+    def __init__(self, final_status="cancelled", settle_after=0.1):
+        self.final_status = final_status
+        self.settle_after = settle_after
+        self.cancelled_at = None
+        self.cancel_calls = 0
+        self.list_calls = 0
+    
+    def _run(self, thread_id, run_id):
+        if self.cancelled_at is None:
+            status = "in_progress"
+        elif time.monotonic() - self.cancelled_at < self.settle_after:
+            status = "cancelling"
+        else:
+            status = self.final_status
+        return SimpleNamespace(id=run_id, thread_id=thread_id, status=status, usage=None)
+    
+    def retrieve(self, thread_id, run_id):
+        return self._run(thread_id, run_id)
+    
+    def cancel(self, thread_id, run_id):
+        self.cancel_calls += 1
+        self.cancelled_at = time.monotonic()
+    
+    def list(self, thread_id, limit=1):
+        self.list_calls += 1
+        return SimpleNamespace(data=[])
+
+class AsyncFakeRuns(FakeRuns):
+    async def retrieve(self, thread_id, run_id):
+        return self._run(thread_id, run_id)
+    
+    async def cancel(self, thread_id, run_id):
+        FakeRuns.cancel(self, thread_id, run_id)
+    
+    async def list(self, thread_id, limit=1):
+        return FakeRuns.list(self, thread_id, limit)
+
+def fake_client(runs):
+    return SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs)))
+
+def test_deadline_check():
+    deadline = Deadline(0.05)
+    deadline.check("start")
+    time.sleep(0.06)
+    assert deadline.expired()
+    with pytest.raises(RunDeadlineExceeded):
+        deadline.check("precheck")
+
+def test_wait_cancels_overrun_and_reconciles_late_completion():
+    runs = FakeRuns(final_status="completed")
+    manager = RunManager(fake_client(runs), deadline_seconds=0.3, reconcile_timeout=5)
+    late = []
+    reconciled = threading.Event()
+    
+    def on_late(run):
+        late.append(run.status)
+        reconciled.set()
+    
+    deadline = manager.deadline()
+    with manager.scope("U1", deadline) as scope:
+        scope.track("thread_1", "run_1")
+        run, _ = scope.wait(SimpleNamespace(id="run_1", status="in_progress"), on_late=on_late)
+        assert run.status == "in_progress"
+        assert scope.abandoned
+    
+    # 취소한 Run은 정리 작업이 끝날 때까지 Thread의 활성 Run으로 남음
+    assert manager.active_count() == 1
+    assert reconciled.wait(5)
+    assert late == ["completed"]
+    assert runs.cancel_calls == 1
+    assert manager.active_count() == 0
+    assert manager.stats.deadline_cancels == 1
+    assert manager.stats.late_completed == 1
+
+def test_streaming_watch_timer_cancels_and_calls_on_late():
+    runs = FakeRuns(final_status="cancelled")
+    manager = RunManager(fake_client(runs), deadline_seconds=0.2, reconcile_timeout=5)
+    late = []
+    reconciled = threading.Event()
+    
+    def on_late(run):
+        late.append(run.status)
+        reconciled.set()
+    
+    with manager.scope("U1", manager.deadline()) as scope:
+        scope.track("thread_1", "run_1", watch=True, on_late=on_late)
+        assert reconciled.wait(5)
+        assert scope.abandoned
+    
+    assert late == ["cancelled"]
+    assert runs.cancel_calls == 1
+    assert manager.active_count() == 0
+
+def test_finished_run_is_not_cancelled_by_timer():
+    runs = FakeRuns()
+    manager = RunManager(fake_client(runs), deadline_seconds=0.1)
+    with manager.scope("U1", manager.deadline()) as scope:
+        scope.track("thread_1", "run_1", watch=True)
+    time.sleep(0.2)
+    assert runs.cancel_calls == 0
+    assert manager.active_count() == 0
+
+def test_wait_idle_waits_for_previous_run_of_same_thread():
+    manager = RunManager(fake_client(FakeRuns()), deadline_seconds=5)
+    entry = manager.track("thread_1", "run_1", "U1")
+    threading.Timer(0.1, manager.finish, (entry,)).start()
+    
+    started_at = time.monotonic()
+    manager.wait_idle("thread_1", manager.deadline())
+    assert time.monotonic() - started_at >= 0.09
+    assert manager.stats.precheck_waits == 1
+    
+    manager.track("thread_1", "run_2", "U1")
+    with pytest.raises(RunDeadlineExceeded):
+        manager.wait_idle("thread_1", Deadline(0.05))
+    assert manager.stats.precheck_timeouts == 1
+
+def test_wait_conflict_checks_untracked_runs_once():
+    runs = FakeRuns()
+    manager = RunManager(fake_client(runs), deadline_seconds=5)
+    manager.wait_conflict("thread_1", manager.deadline())
+    assert runs.list_calls == 1
+    assert manager.stats.conflicts == 1
+
+def test_async_watch_timer_cancels_and_calls_on_late():
+    runs = AsyncFakeRuns(final_status="completed")
+    manager = AsyncRunManager(fake_client(runs), deadline_seconds=0.2, reconcile_timeout=5)
+    
+    async def scenario():
+        late = []
+        reconciled = asyncio.Event()
+        
+        async def on_late(run):
+            late.append(run.status)
+            reconciled.set()
+        
+        with manager.scope("U1", manager.deadline()) as scope:
+            scope.track("thread_1", "run_1", watch=True, on_late=on_late)
+            await asyncio.wait_for(reconciled.wait(), 5)
+            assert scope.abandoned
+        return late
+    
+    assert asyncio.run(scenario()) == ["completed"]
+    assert runs.cancel_calls == 1
+    assert manager.active_count() == 0
+    assert manager.stats.late_completed == 1
+
+class FakeReservation:
+    """RunTokenReservation 대신 정산 호출을 기록"""
+    
+    def __init__(self):
+        self.settled = []
+        self.done = threading.Event()
+    
+    def settle(self, usage=None):
+        self.settled.append(usage)
+        self.done.set()
+
+def test_scope_settles_tokens_with_last_run_usage():
+    manager = RunManager(fake_client(FakeRuns()), deadline_seconds=5)
+    tokens = FakeReservation()
+    usage = SimpleNamespace(total_tokens=1200)
+    with manager.scope("U1", manager.deadline(), tokens) as scope:
+        scope.track("thread_1", "run_1", watch=True)
+        scope.finished(SimpleNamespace(id="run_1", status="completed", usage=usage))
+    assert tokens.settled == [usage]
+    
+    # 스트림 오류 등으로 Run 상태를 모른 채 끝나면 사용량 없이 정산 (추정치 전부 환불)
+    tokens = FakeReservation()
+    with pytest.raises(RuntimeError):
+        with manager.scope("U1", manager.deadline(), tokens) as scope:
+            scope.track("thread_1", "run_2", watch=True)
+            raise RuntimeError("stream error")
+    assert tokens.settled == [None]
+
+def test_abandoned_run_settles_tokens_even_when_reconcile_times_out():
+    runs = FakeRuns(final_status="cancelled", settle_after=30)
+    manager = RunManager(fake_client(runs), deadline_seconds=0.1, reconcile_timeout=0.2)
+    tokens = FakeReservation()
+    late = []
+    
+    with manager.scope("U1", manager.deadline(), tokens) as scope:
+        scope.track("thread_1", "run_1")
+        scope.wait(SimpleNamespace(id="run_1", status="in_progress"), on_late=late.append)
+        assert scope.abandoned
+    # 취소한 Run은 범위를 나갈 때가 아니라 정리 작업이 끝날 때 정산
+    assert tokens.settled == []
+    
+    assert tokens.done.wait(5)
+    assert tokens.settled == [None]
+    assert late == []
+    assert manager.stats.reconcile_timeouts == 1
@@ -0,0 +1,72 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+from metrics import THREAD_POOL_ACQUIRES, THREAD_POOL_CREATE_ERRORS, THREAD_POOL_SIZE
+from thread_pool import AsyncThreadPool, ThreadPool
+
+class FakeThreads:
+    """threads.create마다 새 ID를 돌려주고, fail_after개를 만든 뒤부터는 실패"""
+    
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.created = 0
+        self._ids = itertools.count(1)
+    
+    def _create(self):
+        if self.fail_after is not None and self.created >= self.fail_after:
+            raise RuntimeError("threads.create 실패")
+        self.created += 1
+        return SimpleNamespace(id=f"thread_{next(self._ids)}")
+    
+    def create(self):
+        return self._create()
+
+class AsyncFakeThreads(FakeThreads):
+    async def create(self):
+        return self._create()
+
+def fake_client(threads):
+    return SimpleNamespace(beta=SimpleNamespace(threads=threads))
+
+def test_prefill_then_acquire_hits_pool():
+    pool = ThreadPool(fake_client(FakeThreads()), target_size=3, low_water=0)
+    pool.prefill()
+    assert pool.size() == 3
+    assert THREAD_POOL_SIZE.value() == 3
+    
+    hits = THREAD_POOL_ACQUIRES.value(result="hit")
+    assert pool.acquire() == "thread_1"
+    assert THREAD_POOL_ACQUIRES.value(result="hit") == hits + 1
+    assert THREAD_POOL_SIZE.value() == 2
+    assert pool.stats()["pool_hits"] == 1
+
+def test_acquire_without_prefill_is_exhausted():
+    pool = ThreadPool(fake_client(FakeThreads()), target_size=0)
+    exhausted = THREAD_POOL_ACQUIRES.value(result="exhausted")
+    assert pool.acquire() == "thread_1"
+    assert THREAD_POOL_ACQUIRES.value(result="exhausted") == exhausted + 1
+    assert pool.stats()["exhausted"] == 1
+
+def test_refill_failure_is_counted():
+    pool = ThreadPool(fake_client(FakeThreads(fail_after=1)), target_size=3)
+    errors = THREAD_POOL_CREATE_ERRORS.value()
+    pool.prefill()
+    assert pool.size() == 1
+    assert pool.stats()["create_errors"] == 1
+    assert THREAD_POOL_CREATE_ERRORS.value() == errors + 1
+
+def test_async_prefill_then_acquire_hits_pool():
+    async def scenario():
+        pool = AsyncThreadPool(fake_client(AsyncFakeThreads()), target_size=2, low_water=0)
+        await pool.prefill()
+        assert pool.size() == 2
+        assert await pool.acquire() == "thread_1"
+        assert await pool.acquire() == "thread_2"
+        # 풀이 비면 요청 중에 직접 생성
+        assert await pool.acquire() == "thread_3"
+        return pool.stats()
+    
+    stats = asyncio.run(scenario())
+    assert stats["pool_hits"] == 2
+    assert stats["exhausted"] == 1
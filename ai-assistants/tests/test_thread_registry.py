@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from thread_registry import KeyValueThreadRegistry, ThreadRegistry, create_thread_registry
+from user_lease import MemoryKeyValue
+
+def test_set_rejects_smaller_fence_token(tmp_path):
+    registry = ThreadRegistry(db_path=str(tmp_path / "threads.db"))
+    assert registry.set("U1", "thread_a", fence_token=2)
+    # lease를 잃은 인스턴스(더 작은 토큰)의 늦은 쓰기는 거절
+    assert not registry.set("U1", "thread_b", fence_token=1)
+    assert registry.get("U1", fresh=True) == "thread_a"
+    assert registry.set("U1", "thread_c", fence_token=3)
+    assert registry.get("U1", fresh=True) == "thread_c"
+    registry.close()
+
+def test_replace_compares_thread_and_fence_token(tmp_path):
+    registry = ThreadRegistry(db_path=str(tmp_path / "threads.db"))
+    registry.set("U1", "thread_a", fence_token=5)
+    
+    # 매핑이 이미 바뀌었으면 교체하지 않음
+    assert not registry.replace("U1", "thread_x", "thread_b", fence_token=5)
+    # 더 작은 토큰의 압축 교체는 거절
+    assert not registry.replace("U1", "thread_a", "thread_b", fence_token=4)
+    assert registry.get("U1", fresh=True) == "thread_a"
+    
+    assert registry.replace("U1", "thread_a", "thread_b", fence_token=5)
+    assert registry.get("U1", fresh=True) == "thread_b"
+    # lease 없이 실행하면(토큰 없음) 매핑만 비교
+    assert registry.replace("U1", "thread_b", "thread_c")
+    assert registry.get_usage("U1")["thread_id"] == "thread_c"
+    registry.close()
+
+@pytest.mark.parametrize("backend", ["sqlite", "kv"])
+def test_pop_rejects_smaller_fence_token(tmp_path, backend):
+    if backend == "sqlite":
+        registry = ThreadRegistry(db_path=str(tmp_path / "threads.db"))
+    else:
+        registry = KeyValueThreadRegistry(MemoryKeyValue())
+    registry.set("U1", "thread_a", fence_token=5)
+    
+    # lease를 잃은 인스턴스(더 작은 토큰)의 늦은 리셋은 매핑을 지우지 않음
+    assert registry.pop("U1", fence_token=4) is None
+    assert registry.get("U1", fresh=True) == "thread_a"
+    assert registry.pop("U1", fence_token=5) == "thread_a"
+    assert registry.pop("U1", fence_token=5) is None
+
+def kv_registry(ttl_seconds=3600):
+    return KeyValueThreadRegistry(MemoryKeyValue(), ttl_seconds=ttl_seconds)
+
+def test_kv_registry_set_get_and_fencing():
+    registry = kv_registry()
+    assert registry.get("U1") is None
+    assert registry.set("U1", "thread_a", fence_token=2)
+    assert registry.get("U1") == "thread_a"
+    assert not registry.set("U1", "thread_b", fence_token=1)
+    assert registry.get("U1") == "thread_a"
+    # 토큰 없는 쓰기(lease 미사용)는 덮어쓰되 저장된 토큰은 유지
+    assert registry.set("U1", "thread_c")
+    assert not registry.set("U1", "thread_d", fence_token=1)
+    assert "U1" in registry
+    assert len(registry) == 1
+
+def test_kv_registry_replace_and_usage():
+    registry = kv_registry()
+    registry.set("U1", "thread_a", fence_token=3)
+    registry.record_usage("U1", "thread_a", 100, 150)
+    registry.record_usage("U1", "thread_a", 120, 170)
+    # 다른 Thread의 사용량은 기록하지 않음
+    registry.record_usage("U1", "thread_x", 999, 999)
+    assert registry.get_usage("U1") == {"thread_id": "thread_a", "last_prompt_tokens": 120, "total_tokens": 320}
+    
+    assert not registry.replace("U1", "thread_x", "thread_b", fence_token=3)
+    assert not registry.replace("U1", "thread_a", "thread_b", fence_token=2)
+    assert registry.replace("U1", "thread_a", "thread_b", fence_token=3)
+    assert registry.get_usage("U1") == {"thread_id": "thread_b", "last_prompt_tokens": 0, "total_tokens": 0}
+    
+    assert registry.pop("U1") == "thread_b"
+    assert registry.pop("U1") is None
+
+def test_kv_registry_purges_expired_threads():
+    registry = kv_registry(ttl_seconds=0.05)
+    registry.set("U1", "thread_old")
+    time.sleep(0.1)
+    assert registry.get("U1") is None
+    # 만료 후 새 Thread로 교체되면 이전 Thread도 서버 삭제 대상
+    registry.set("U1", "thread_new")
+    registry.set("U2", "thread_u2")
+    time.sleep(0.1)
+    
+    deleted = []
+    assert registry.purge_expired(deleted.append) == 3
+    assert sorted(deleted) == ["thread_new", "thread_old", "thread_u2"]
+    assert len(registry) == 0
+
+def test_create_thread_registry_backends():
+    assert isinstance(create_thread_registry("memory"), KeyValueThreadRegistry)
+    with pytest.raises(ValueError):
+        create_thread_registry("unknown")
@@ -0,0 +1,116 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from user_lease import KeyValueLeaseStore, LeaseUnavailable, MemoryKeyValue, UserLeaseManager
+
+def memory_store():
+    return KeyValueLeaseStore(MemoryKeyValue())
+
+def test_acquire_is_exclusive_until_release():
+    store = memory_store()
+    lease = store.acquire("U1", "host_a", ttl=5)
+    assert lease is not None and lease.token == 1
+    assert store.acquire("U1", "host_b", ttl=5) is None
+    # 다른 사용자는 영향 없음
+    assert store.acquire("U2", "host_b", ttl=5) is not None
+    
+    store.release(lease)
+    assert not store.is_valid(lease)
+    assert store.acquire("U1", "host_b", ttl=5).token == 2
+
+def test_renew_extends_only_current_lease():
+    store = memory_store()
+    lease = store.acquire("U1", "host_a", ttl=0.1)
+    time.sleep(0.05)
+    assert store.renew(lease, ttl=0.2)
+    time.sleep(0.1)
+    # 갱신했으므로 처음 TTL이 지나도 유효
+    assert store.is_valid(lease)
+    assert store.acquire("U1", "host_b", ttl=5) is None
+
+def test_expired_lease_is_taken_over_with_larger_token():
+    store = memory_store()
+    old = store.acquire("U1", "host_a", ttl=0.05)
+    time.sleep(0.1)
+    
+    new = store.acquire("U1", "host_b", ttl=5)
+    assert new is not None
+    assert new.token > old.token
+    # 만료된 lease는 갱신/반납해도 새 lease에 영향 없음
+    assert not store.renew(old, ttl=5)
+    store.release(old)
+    assert store.is_valid(new)
+    assert not store.is_valid(old)
+
+def test_fence_tokens_increase_per_user():
+    store = memory_store()
+    tokens = []
+    for _ in range(3):
+        lease = store.acquire("U1", "host_a", ttl=5)
+        tokens.append(lease.token)
+        store.release(lease)
+    assert tokens == [1, 2, 3]
+    assert store.acquire("U2", "host_a", ttl=5).token == 1
+
+def test_manager_hold_exposes_fence_token_and_waits_for_other_owner():
+    store = memory_store()
+    first = UserLeaseManager(store, owner="host_a", ttl=5, wait_timeout=5)
+    second = UserLeaseManager(store, owner="host_b", ttl=5, wait_timeout=5)
+    entered = threading.Event()
+    order = []
+    
+    def hold_first():
+        with first.hold("U1") as lease:
+            assert first.fence_token("U1") == lease.token
+            assert first.fence_token("U2") is None
+            entered.set()
+            time.sleep(0.3)
+            order.append("first")
+    
+    worker = threading.Thread(target=hold_first)
+    worker.start()
+    assert entered.wait(5)
+    with second.hold("U1") as lease:
+        order.append("second")
+        assert lease.token == 2
+    worker.join()
+    
+    assert order == ["first", "second"]
+    assert second.stats.contended == 1
+    assert first.fence_token("U1") is None
+
+def test_manager_times_out_while_other_owner_holds():
+    store = memory_store()
+    store.acquire("U1", "host_a", ttl=5)
+    manager = UserLeaseManager(store, owner="host_b", ttl=5, wait_timeout=0.2)
+    with pytest.raises(LeaseUnavailable):
+        with manager.hold("U1"):
+            pass
+    assert manager.stats.timeouts == 1
+
+def test_manager_marks_lease_lost_after_takeover():
+    store = memory_store()
+    manager = UserLeaseManager(store, owner="host_a", ttl=0.1)
+    # 백그라운드 갱신 없이 renew_all을 직접 호출
+    manager.stop()
+    with manager.hold("U1"):
+        assert not manager.is_lost("U1")
+        time.sleep(0.15)
+        # 만료된 뒤 다른 인스턴스가 가져가면 갱신이 실패함
+        assert store.acquire("U1", "host_b", ttl=5) is not None
+        manager.renew_all()
+        assert manager.is_lost("U1")
+    assert manager.stats.lost == 1
+
+def test_async_hold_sets_fence_token():
+    manager = UserLeaseManager(memory_store(), owner="host_a", ttl=5)
+    
+    async def scenario():
+        async with manager.async_hold("U1") as lease:
+            return lease.token, manager.fence_token("U1")
+    
+    assert asyncio.run(scenario()) == (1, 1)
+    manager.stop()
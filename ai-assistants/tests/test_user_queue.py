@@ -0,0 +1,119 @@
+import asyncio
+import threading
+
+import pytest
+
+from user_queue import KIND_DM, KIND_MENTION, AsyncUserRequestQueue, FairScheduler, QueueFull, UserRequestQueue
+
+def noop():
+    pass
+
+def drain(scheduler):
+    """작업을 하나씩 꺼내 바로 끝내면서 처리 순서(user_id) 반환"""
+    order = []
+    while True:
+        item = scheduler.pop_next()
+        if item is None:
+            return order
+        user_id, job = item
+        order.append(user_id)
+        scheduler.finish(user_id)
+
+def test_same_user_runs_in_order_one_at_a_time():
+    scheduler = FairScheduler()
+    assert scheduler.push("U1", noop, ("first",), {}) == 0
+    assert scheduler.push("U1", noop, ("second",), {}) == 1
+    
+    user_id, job = scheduler.pop_next()
+    assert (user_id, job.args) == ("U1", ("first",))
+    # 실행 중인 사용자의 다음 작업은 꺼내지 않음
+    assert scheduler.pop_next() is None
+    assert scheduler.push("U1", noop, ("third",), {}) == 2
+    
+    scheduler.finish("U1")
+    assert scheduler.pop_next()[1].args == ("second",)
+    assert scheduler.depth() == 1
+    assert scheduler.active_users() == 1
+
+def test_burst_from_one_user_does_not_block_others():
+    scheduler = FairScheduler()
+    for _ in range(3):
+        scheduler.push("U1", noop, (), {}, kind=KIND_MENTION)
+    scheduler.push("U2", noop, (), {}, kind=KIND_MENTION)
+    assert drain(scheduler) == ["U1", "U2", "U1", "U1"]
+
+def test_dm_weight_gets_more_turns():
+    scheduler = FairScheduler(weights={KIND_DM: 2.0, KIND_MENTION: 1.0})
+    for _ in range(6):
+        scheduler.push("dm_user", noop, (), {}, kind=KIND_DM)
+        scheduler.push("mention_user", noop, (), {}, kind=KIND_MENTION)
+    
+    first_six = drain(scheduler)[:6]
+    assert first_six.count("dm_user") == 4
+    assert first_six.count("mention_user") == 2
+
+def test_busy_channel_does_not_block_other_channel():
+    scheduler = FairScheduler(channel_share=1.0)
+    for user_id in ("U1", "U2", "U3"):
+        scheduler.push(user_id, noop, (), {}, channel="C_busy", kind=KIND_MENTION)
+    scheduler.push("U4", noop, (), {}, channel="C_quiet", kind=KIND_MENTION)
+    
+    # 가장 늦게 들어왔지만 한가한 채널의 질문이 두 번째로 처리됨
+    assert drain(scheduler)[:2] == ["U1", "U4"]
+
+def test_queue_sheds_questions_over_max_depth():
+    queue = UserRequestQueue(max_workers=1, busy_depth=2, max_depth=3)
+    release = threading.Event()
+    done = threading.Semaphore(0)
+    
+    def job():
+        release.wait(5)
+        done.release()
+    
+    # 첫 질문은 바로 worker에 배정되고, 나머지는 대기
+    admissions = [queue.submit(f"U{index}", job, kind=KIND_MENTION) for index in range(4)]
+    assert queue.depth() == 3
+    # (같은 사용자의 앞선 질문 수, 대기 안내 기준 이상일 때 접수 시점의 전체 대기 수)
+    assert admissions == [(0, 0), (0, 0), (0, 2), (0, 3)]
+    
+    with pytest.raises(QueueFull):
+        queue.submit("U9", job, kind=KIND_DM)
+    # 내부 작업(kind 없음)은 가득 차도 받음
+    queue.submit("U9", job)
+    
+    release.set()
+    for _ in range(5):
+        assert done.acquire(timeout=5)
+    stats = queue.stats()
+    assert stats["shed"] == 1
+    assert stats["busy"] == 2
+    assert stats["enqueued"] == 5
+
+def test_async_queue_limits_concurrency_and_keeps_user_order():
+    async def scenario():
+        queue = AsyncUserRequestQueue(max_workers=2, busy_depth=0, max_depth=0)
+        running = 0
+        peak = 0
+        order = []
+        finished = asyncio.Event()
+        
+        async def job(user_id, index):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            order.append((user_id, index))
+            running -= 1
+            if len(order) == 6:
+                finished.set()
+        
+        for index in range(3):
+            queue.submit("U1", job, "U1", index, kind=KIND_DM)
+            queue.submit("U2", job, "U2", index, kind=KIND_DM)
+        await asyncio.wait_for(finished.wait(), 5)
+        return peak, order
+    
+    peak, order = asyncio.run(scenario())
+    assert peak == 2
+    assert [index for user_id, index in order if user_id == "U1"] == [0, 1, 2]
+    assert [index for user_id, index in order if user_id == "U2"] == [0, 1, 2]
@@ -0,0 +1,249 @@
+"""
+사용자 Thread 압축 모듈
+
+부트캠프 기간 내내 같은 Thread를 쓰면 Run마다 전체 대화를 다시 읽어 prompt 토큰과 응답 시간이 계속 늘어납니다.
+Run의 usage로 Thread별 토큰 사용량을 기록하고, 마지막 Run의 prompt 토큰이 예산을 넘으면
+대화를 요약해 요약만 담은 새 Thread를 만들고 사용자 매핑을 원자적으로 교체합니다.
+압축은 사용자 큐에서 다음 작업으로 실행되므로 같은 Thread에 Run이 겹치지 않습니다.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 압축 설정 (환경변수로 조정 가능)
+THREAD_COMPACTION_ENABLED = os.getenv("THREAD_COMPACTION_ENABLED", "true").lower() == "true"
+THREAD_COMPACTION_TOKEN_BUDGET = int(os.getenv("THREAD_COMPACTION_TOKEN_BUDGET", "12000"))  # 마지막 Run의 prompt 토큰 기준
+THREAD_COMPACTION_MODEL = os.getenv("THREAD_COMPACTION_MODEL", "gpt-4o-mini")  # 요약에 사용할 모델
+MAX_TRANSCRIPT_MESSAGE_LENGTH = 1500  # 요약 입력에 넣을 메시지당 최대 글자 수
+MAX_SUMMARY_TOKENS = 800
+
+SUMMARY_INSTRUCTIONS = """다음은 AI 부트캠프 FAQ 봇과 수강생의 대화 기록입니다.
+이후 대화를 이어가는 데 필요한 내용만 한국어로 간결하게 요약하세요.
+- 수강생이 물어본 주제와 봇이 안내한 핵심 규정/일정/수치
+- 아직 해결되지 않았거나 운영진 문의가 필요하다고 안내한 사항
+- 수강생의 상황(팀, 진행 중인 과제 등)이 드러난 경우 그 내용
+인사말, 반복되는 안내 문구, 봇 지침 문구는 제외하세요."""
+
+SUMMARY_SEED_PREFIX = "[이전 대화 요약]\n"
+
+def build_transcript(messages, clean_user_text=None):
+    """Message 목록(오래된 것부터)을 요약용 대화 기록 텍스트로 변환"""
+    lines = []
+    for message in messages:
+        text = "\n".join(
+            content.text.value
+            for content in message.content or []
+            if getattr(content, "text", None) is not None
+        ).strip()
+        if not text:
+            continue
+        if message.role == "user" and clean_user_text:
+            text = clean_user_text(text)
+        speaker = "수강생" if message.role == "user" else "봇"
+        lines.append(f"{speaker}: {text[:MAX_TRANSCRIPT_MESSAGE_LENGTH]}")
+    return "\n\n".join(lines)
+
+def summary_request(transcript, model):
+    """chat.completions 요청 파라미터"""
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": transcript},
+        ],
+        "max_tokens": MAX_SUMMARY_TOKENS,
+    }
+
+def seed_messages(summary):
+    """새 Thread에 넣을 요약 메시지"""
+    return [{"role": "assistant", "content": SUMMARY_SEED_PREFIX + summary}]
+
+class CompactionStats:
+    """Thread 압축 통계"""
+    
+    def __init__(self):
+        self.compactions = 0
+        self.failures = 0
+        self.lost_races = 0  # 요약 중에 매핑이 바뀌어 교체하지 않은 횟수
+        self.prompt_tokens_before = 0  # 압축 직전 prompt 토큰 합계
+        self.total_duration = 0.0
+    
+    def as_dict(self):
+        """통계를 딕셔너리로 반환"""
+        return {
+            "compactions": self.compactions,
+            "failures": self.failures,
+            "lost_races": self.lost_races,
+            "avg_prompt_tokens_before": self.prompt_tokens_before / self.compactions if self.compactions else 0.0,
+            "avg_duration": self.total_duration / self.compactions if self.compactions else 0.0,
+        }
+
+class ThreadCompactor:
+    """토큰 예산을 넘은 사용자 Thread를 요약된 새 Thread로 교체"""
+    
+    def __init__(self, client, registry, delete_remote=None, clean_user_text=None, leases=None,
+                 token_budget=THREAD_COMPACTION_TOKEN_BUDGET, model=THREAD_COMPACTION_MODEL,
+                 enabled=THREAD_COMPACTION_ENABLED):
+        """
+        Args:
+            client: OpenAI 클라이언트
+            registry: ThreadRegistry
+            delete_remote: 교체된 이전 Thread를 서버에서 삭제하는 함수 (thread_id)
+            clean_user_text: 요약 전에 사용자 메시지에서 지침 문구를 걷어내는 함수
+            leases: UserLeaseManager (주면 lease를 잃은 압축은 매핑을 교체하지 않고, 교체에 fencing 토큰 사용)
+        """
+        self.client = client
+        self.registry = registry
+        self.leases = leases
+        self.delete_remote = delete_remote
+        self.clean_user_text = clean_user_text
+        self.token_budget = token_budget
+        self.model = model
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._scheduled = set()  # 압축 작업이 예약된 사용자
+        self.stats = CompactionStats()
+    
+    def record_usage(self, user_id, thread_id, usage):
+        """Run의 usage(prompt_tokens, total_tokens) 기록"""
+        if usage is None or not thread_id:
+            return
+        self.registry.record_usage(user_id, thread_id, usage.prompt_tokens, usage.total_tokens)
+    
+    def needs_compaction(self, user_id):
+        """마지막 Run의 prompt 토큰이 예산을 넘었는지 여부"""
+        if not self.enabled:
+            return False
+        usage = self.registry.get_usage(user_id)
+        return bool(usage) and usage["last_prompt_tokens"] >= self.token_budget
+    
+    def try_schedule(self, user_id):
+        """압축이 필요하고 아직 예약되지 않았으면 예약 표시 후 True"""
+        if not self.needs_compaction(user_id):
+            return False
+        with self._lock:
+            if user_id in self._scheduled:
+                return False
+            self._scheduled.add(user_id)
+        return True
+    
+    def compact(self, user_id):
+        """사용자 Thread 압축 (요약 → 새 Thread 생성 → 매핑 교체 → 이전 Thread 삭제)
+        
+        Returns:
+            새 Thread ID (압축하지 않았으면 None)
+        """
+        try:
+            usage = self.registry.get_usage(user_id)
+            if not usage or usage["last_prompt_tokens"] < self.token_budget:
+                return None
+            
+            started_at = time.monotonic()
+            old_thread_id = usage["thread_id"]
+            messages = list(self.client.beta.threads.messages.list(thread_id=old_thread_id, order="asc", limit=100))
+            transcript = build_transcript(messages, self.clean_user_text)
+            completion = self.client.chat.completions.create(**summary_request(transcript, self.model))
+            summary = completion.choices[0].message.content.strip()
+            new_thread = self.client.beta.threads.create(messages=seed_messages(summary))
+            
+            if not self._replace(user_id, old_thread_id, new_thread.id):
+                # 요약하는 동안 /reset_chat 등으로 매핑이 바뀌었거나 lease를 잃은 경우 새 Thread는 버림
+                self.stats.lost_races += 1
+                self._delete(new_thread.id)
+                return None
+            
+            self._record_compaction(user_id, old_thread_id, new_thread.id, usage, started_at)
+            self._delete(old_thread_id)
+            return new_thread.id
+        except Exception as e:
+            self.stats.failures += 1
+            logger.error(f"Thread 압축 오류 - User: {user_id}: {str(e)}")
+            return None
+        finally:
+            with self._lock:
+                self._scheduled.discard(user_id)
+    
+    def _replace(self, user_id, old_thread_id, new_thread_id):
+        """사용자 매핑을 새 Thread로 교체 (lease를 잃었거나 fencing으로 거절되면 False)"""
+        if self.leases is None:
+            return self.registry.replace(user_id, old_thread_id, new_thread_id)
+        if self.leases.is_lost(user_id):
+            self.leases.record_fenced(user_id, "Thread 압축 교체")
+            return False
+        return self.registry.replace(
+            user_id, old_thread_id, new_thread_id, fence_token=self.leases.fence_token(user_id)
+        )
+    
+    def _record_compaction(self, user_id, old_thread_id, new_thread_id, usage, started_at):
+        """압축 완료 통계 및 로그 기록"""
+        duration = time.monotonic() - started_at
+        self.stats.compactions += 1
+        self.stats.prompt_tokens_before += usage["last_prompt_tokens"]
+        self.stats.total_duration += duration
+        logger.info(
+            f"Thread 압축 완료 - User: {user_id}, {old_thread_id} -> {new_thread_id}, "
+            f"prompt 토큰 {usage['last_prompt_tokens']}, 누적 {usage['total_tokens']}, {duration:.2f}초"
+        )
+    
+    def _delete(self, thread_id):
+        """서버 Thread 삭제 (실패해도 무시)"""
+        if not self.delete_remote:
+            return
+        try:
+            self.delete_remote(thread_id)
+        except Exception as e:
+            logger.warning(f"Thread 삭제 실패 - Thread: {thread_id}: {e}")
+
+class AsyncThreadCompactor(ThreadCompactor):
+    """ThreadCompactor의 비동기 버전 (AsyncOpenAI 사용, delete_remote는 코루틴 함수)
+    
+    Thread 저장소 접근(SQLite 등)은 이벤트 루프를 막지 않도록 스레드에서 실행합니다.
+    """
+    
+    async def compact(self, user_id):
+        """사용자 Thread 압축 (비동기 버전)"""
+        try:
+            usage = await asyncio.to_thread(self.registry.get_usage, user_id)
+            if not usage or usage["last_prompt_tokens"] < self.token_budget:
+                return None
+            
+            started_at = time.monotonic()
+            old_thread_id = usage["thread_id"]
+            messages = [
+                message
+                async for message in self.client.beta.threads.messages.list(thread_id=old_thread_id, order="asc", limit=100)
+            ]
+            transcript = build_transcript(messages, self.clean_user_text)
+            completion = await self.client.chat.completions.create(**summary_request(transcript, self.model))
+            summary = completion.choices[0].message.content.strip()
+            new_thread = await self.client.beta.threads.create(messages=seed_messages(summary))
+            
+            if not await asyncio.to_thread(self._replace, user_id, old_thread_id, new_thread.id):
+                self.stats.lost_races += 1
+                await self._delete(new_thread.id)
+                return None
+            
+            self._record_compaction(user_id, old_thread_id, new_thread.id, usage, started_at)
+            await self._delete(old_thread_id)
+            return new_thread.id
+        except Exception as e:
+            self.stats.failures += 1
+            logger.error(f"Thread 압축 오류 - User: {user_id}: {str(e)}")
+            return None
+        finally:
+            with self._lock:
+                self._scheduled.discard(user_id)
+    
+    async def _delete(self, thread_id):
+        """서버 Thread 삭제 (실패해도 무시)"""
+        if not self.delete_remote:
+            return
+        try:
+            await self.delete_remote(thread_id)
+        except Exception as e:
+            logger.warning(f"Thread 삭제 실패 - Thread: {thread_id}: {e}")
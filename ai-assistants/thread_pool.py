@@ -0,0 +1,256 @@
+"""
+미리 만들어 둔 빈 OpenAI Thread 풀 모듈
+
+새 대화("🔄 새 대화", 첫 질문)를 시작할 때 threads.create 왕복을 기다리지 않도록
+빈 Thread를 목표 개수만큼 미리 만들어 두고, 남은 개수가 기준 이하로 떨어지면 백그라운드에서 채웁니다.
+질문이 이미 있는 경우에는 create_and_run으로 Thread 생성 + 메시지 추가 + Run 시작을 한 번에 처리합니다.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+
+from metrics import THREAD_POOL_ACQUIRES, THREAD_POOL_ACQUIRE_SECONDS, THREAD_POOL_CREATE_ERRORS, THREAD_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+# 풀 설정 (환경변수로 조정 가능)
+THREAD_POOL_TARGET_SIZE = int(os.getenv("THREAD_POOL_TARGET_SIZE", "5"))  # 미리 만들어 둘 Thread 수
+THREAD_POOL_LOW_WATER = int(os.getenv("THREAD_POOL_LOW_WATER", "2"))  # 이 개수 이하가 되면 다시 채움
+
+class ThreadPoolStats:
+    """Thread 획득 지연 시간 및 풀 고갈 통계"""
+    
+    def __init__(self):
+        self.acquired = 0
+        self.pool_hits = 0
+        self.exhausted = 0  # 풀이 비어 요청 중에 직접 Thread를 만든 횟수
+        self.created = 0
+        self.create_errors = 0
+        self.create_and_run_calls = 0
+        self.total_acquire_latency = 0.0
+        self.max_acquire_latency = 0.0
+        self.total_create_and_run_latency = 0.0
+    
+    def record_acquire(self, latency, hit):
+        """Thread 획득 기록"""
+        self.acquired += 1
+        if hit:
+            self.pool_hits += 1
+        else:
+            self.exhausted += 1
+        self.total_acquire_latency += latency
+        self.max_acquire_latency = max(self.max_acquire_latency, latency)
+        THREAD_POOL_ACQUIRES.inc(result="hit" if hit else "exhausted")
+        THREAD_POOL_ACQUIRE_SECONDS.observe(latency)
+    
+    def record_create_error(self):
+        """보충 중 Thread 생성 실패 기록"""
+        self.create_errors += 1
+        THREAD_POOL_CREATE_ERRORS.inc()
+    
+    def as_dict(self):
+        """통계를 딕셔너리로 반환"""
+        return {
+            "acquired": self.acquired,
+            "pool_hits": self.pool_hits,
+            "exhausted": self.exhausted,
+            "created": self.created,
+            "create_errors": self.create_errors,
+            "create_and_run_calls": self.create_and_run_calls,
+            "avg_acquire_latency": self.total_acquire_latency / self.acquired if self.acquired else 0.0,
+            "max_acquire_latency": self.max_acquire_latency,
+            "avg_create_and_run_latency": (
+                self.total_create_and_run_latency / self.create_and_run_calls if self.create_and_run_calls else 0.0
+            ),
+        }
+
+def _thread_payload(message):
+    """create_and_run에 넘길 thread 파라미터 (첫 사용자 메시지 포함)"""
+    return {"messages": [{"role": "user", "content": message}]}
+
+class ThreadPool:
+    """빈 Thread 풀 (백그라운드 스레드로 보충)"""
+    
+    def __init__(self, client, target_size=THREAD_POOL_TARGET_SIZE, low_water=THREAD_POOL_LOW_WATER):
+        self.client = client
+        self.target_size = target_size
+        self.low_water = min(low_water, target_size)
+        self._lock = threading.Lock()
+        self._threads = deque()
+        self._refilling = False
+        self._stats = ThreadPoolStats()
+    
+    def prefill(self):
+        """풀을 목표 개수까지 바로 채우기 (시작 시 호출)"""
+        self._refill()
+    
+    def acquire(self):
+        """빈 Thread ID 하나 꺼내기 (풀이 비었으면 직접 생성)"""
+        started_at = time.monotonic()
+        with self._lock:
+            thread_id = self._threads.popleft() if self._threads else None
+            THREAD_POOL_SIZE.set(len(self._threads))
+        
+        hit = thread_id is not None
+        if not hit:
+            logger.warning("Thread 풀이 비어 있어 직접 생성합니다")
+            thread_id = self._create()
+        
+        latency = time.monotonic() - started_at
+        with self._lock:
+            self._stats.record_acquire(latency, hit)
+        
+        self._maybe_refill()
+        return thread_id
+    
+    def create_and_run(self, assistant_id, message, **run_kwargs):
+        """Thread 생성 + 첫 메시지 추가 + Run 시작을 한 번의 요청으로 처리
+        
+        Returns:
+            Run 객체 (stream=True면 이벤트 스트림)
+        """
+        started_at = time.monotonic()
+        result = self.client.beta.threads.create_and_run(
+            assistant_id=assistant_id,
+            thread=_thread_payload(message),
+            **run_kwargs
+        )
+        with self._lock:
+            self._stats.create_and_run_calls += 1
+            self._stats.total_create_and_run_latency += time.monotonic() - started_at
+        return result
+    
+    def _create(self):
+        """서버에 빈 Thread 생성"""
+        thread = self.client.beta.threads.create()
+        with self._lock:
+            self._stats.created += 1
+        return thread.id
+    
+    def _maybe_refill(self):
+        """남은 개수가 기준 이하이면 백그라운드 보충 시작"""
+        with self._lock:
+            if self._refilling or len(self._threads) > self.low_water or self.target_size <= 0:
+                return
+            self._refilling = True
+        
+        threading.Thread(target=self._refill, name="thread-pool-refill", daemon=True).start()
+    
+    def _refill(self):
+        """목표 개수까지 Thread 생성 (실패하면 다음 획득 때 다시 시도)"""
+        try:
+            while True:
+                with self._lock:
+                    if len(self._threads) >= self.target_size:
+                        break
+                try:
+                    thread_id = self._create()
+                except Exception as e:
+                    with self._lock:
+                        self._stats.record_create_error()
+                    logger.warning(f"Thread 풀 보충 실패: {str(e)}")
+                    break
+                with self._lock:
+                    self._threads.append(thread_id)
+                    THREAD_POOL_SIZE.set(len(self._threads))
+        finally:
+            with self._lock:
+                self._refilling = False
+    
+    def size(self):
+        """풀에 남은 Thread 수"""
+        with self._lock:
+            return len(self._threads)
+    
+    def stats(self):
+        """풀 크기, 획득 지연 시간, 고갈 횟수 통계"""
+        with self._lock:
+            stats = self._stats.as_dict()
+            stats["size"] = len(self._threads)
+            stats["target_size"] = self.target_size
+            stats["low_water"] = self.low_water
+        return stats
+
+class AsyncThreadPool:
+    """ThreadPool의 asyncio 버전 (AsyncOpenAI 사용, 보충은 이벤트 루프 task로 수행)"""
+    
+    def __init__(self, client, target_size=THREAD_POOL_TARGET_SIZE, low_water=THREAD_POOL_LOW_WATER):
+        self.client = client
+        self.target_size = target_size
+        self.low_water = min(low_water, target_size)
+        self._threads = deque()
+        self._refill_task = None
+        self._stats = ThreadPoolStats()
+    
+    async def prefill(self):
+        """풀을 목표 개수까지 바로 채우기"""
+        await self._refill()
+    
+    async def acquire(self):
+        """빈 Thread ID 하나 꺼내기 (풀이 비었으면 직접 생성)"""
+        started_at = time.monotonic()
+        thread_id = self._threads.popleft() if self._threads else None
+        THREAD_POOL_SIZE.set(len(self._threads))
+        
+        hit = thread_id is not None
+        if not hit:
+            logger.warning("Thread 풀이 비어 있어 직접 생성합니다")
+            thread_id = await self._create()
+        
+        self._stats.record_acquire(time.monotonic() - started_at, hit)
+        self._maybe_refill()
+        return thread_id
+    
+    async def create_and_run(self, assistant_id, message, **run_kwargs):
+        """Thread 생성 + 첫 메시지 추가 + Run 시작을 한 번의 요청으로 처리"""
+        started_at = time.monotonic()
+        result = await self.client.beta.threads.create_and_run(
+            assistant_id=assistant_id,
+            thread=_thread_payload(message),
+            **run_kwargs
+        )
+        self._stats.create_and_run_calls += 1
+        self._stats.total_create_and_run_latency += time.monotonic() - started_at
+        return result
+    
+    async def _create(self):
+        """서버에 빈 Thread 생성"""
+        thread = await self.client.beta.threads.create()
+        self._stats.created += 1
+        return thread.id
+    
+    def _maybe_refill(self):
+        """남은 개수가 기준 이하이면 백그라운드 보충 task 시작"""
+        if self._refill_task and not self._refill_task.done():
+            return
+        if len(self._threads) > self.low_water or self.target_size <= 0:
+            return
+        self._refill_task = asyncio.create_task(self._refill())
+    
+    async def _refill(self):
+        """목표 개수까지 Thread 생성 (실패하면 다음 획득 때 다시 시도)"""
+        while len(self._threads) < self.target_size:
+            try:
+                thread_id = await self._create()
+            except Exception as e:
+                self._stats.record_create_error()
+                logger.warning(f"Thread 풀 보충 실패: {str(e)}")
+                break
+            self._threads.append(thread_id)
+            THREAD_POOL_SIZE.set(len(self._threads))
+    
+    def size(self):
+        """풀에 남은 Thread 수"""
+        return len(self._threads)
+    
+    def stats(self):
+        """풀 크기, 획득 지연 시간, 고갈 횟수 통계"""
+        stats = self._stats.as_dict()
+        stats["size"] = len(self._threads)
+        stats["target_size"] = self.target_size
+        stats["low_water"] = self.low_water
+        return stats
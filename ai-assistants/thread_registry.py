@@ -0,0 +1,496 @@
+"""
+사용자별 OpenAI Thread 저장소 모듈
+
+사용자 ID -> Thread ID 매핑을 로컬 SQLite(WAL 모드)에 저장하고,
+자주 쓰는 항목은 메모리 LRU 캐시에 올려 두어 재시작 후에도 같은 Thread를 이어 쓸 수 있게 합니다.
+일정 기간 사용하지 않은 Thread는 만료 처리하고, 백그라운드 작업이 서버의 Thread도 삭제합니다.
+
+- 저장소 (THREAD_STORE_BACKEND):
+  - sqlite: 서버 한 대의 로컬 파일 (기본값)
+  - kv: 사용자 lease와 같은 네트워크 key-value 저장소 (여러 서버가 같은 매핑을 공유)
+  - memory: kv 저장소의 프로세스 내 대체 구현 (로컬 실행, 테스트용)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+from user_lease import USER_LEASE_KV_URL, MemoryKeyValue, RedisKeyValue
+
+logger = logging.getLogger(__name__)
+
+# 저장소 설정 (환경변수로 조정 가능)
+THREAD_STORE_BACKEND = os.getenv("THREAD_STORE_BACKEND", "sqlite").lower()  # sqlite, kv, memory
+THREAD_STORE_KV_URL = os.getenv("THREAD_STORE_KV_URL") or USER_LEASE_KV_URL
+THREAD_DB_PATH = os.getenv("THREAD_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "thread_registry.db"))
+THREAD_CACHE_SIZE = int(os.getenv("THREAD_CACHE_SIZE", "1000"))  # 메모리 LRU 최대 항목 수
+THREAD_TTL_SECONDS = float(os.getenv("THREAD_TTL_DAYS", "7")) * 24 * 60 * 60  # 미사용 Thread 만료 기간
+THREAD_CLEANUP_INTERVAL = float(os.getenv("THREAD_CLEANUP_INTERVAL", "3600"))  # 만료 Thread 정리 주기(초)
+TOUCH_PERSIST_INTERVAL = 300  # 마지막 사용 시각을 DB에 반영하는 최소 간격(초)
+
+class ThreadRegistryBase:
+    """Thread 저장소 공통 동작 (만료 Thread 정리 스레드)"""
+    
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+    
+    def start_cleanup(self, delete_remote, interval=THREAD_CLEANUP_INTERVAL):
+        """만료 Thread를 주기적으로 정리하는 백그라운드 스레드 시작"""
+        if self._cleanup_thread and self._cleanup_thread.is_alive():
+            return
+        
+        def cleanup_loop():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.purge_expired(delete_remote)
+                except Exception as e:
+                    logger.error(f"Thread 정리 작업 오류: {str(e)}")
+        
+        self._cleanup_thread = threading.Thread(target=cleanup_loop, name="thread-registry-cleanup", daemon=True)
+        self._cleanup_thread.start()
+    
+    def _delete_expired(self, expired_thread_ids, delete_remote):
+        """만료/교체된 서버 Thread 삭제 후 개수 반환"""
+        for thread_id in expired_thread_ids:
+            if delete_remote:
+                try:
+                    delete_remote(thread_id)
+                except Exception as e:
+                    logger.warning(f"만료 Thread 삭제 실패 - Thread: {thread_id}: {e}")
+        
+        if expired_thread_ids:
+            logger.info(f"만료된 Thread {len(expired_thread_ids)}개 정리")
+        return len(expired_thread_ids)
+
+class ThreadRegistry(ThreadRegistryBase):
+    """SQLite + 메모리 LRU 기반 사용자별 Thread 저장소"""
+    
+    def __init__(self, db_path=THREAD_DB_PATH, cache_size=THREAD_CACHE_SIZE, ttl_seconds=THREAD_TTL_SECONDS):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()  # user_id -> [thread_id, last_used_at, persisted_at]
+        self._retired = []  # 만료 후 새 Thread로 교체되어 서버 삭제를 기다리는 Thread ID
+        self._cleanup_thread = None
+        self._stop_event = threading.Event()
+        
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS user_threads (
+                user_id TEXT PRIMARY KEY,
+                thread_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_user_threads_last_used ON user_threads(last_used_at)")
+        
+        # 토큰 사용량 컬럼 (이전 버전 DB에는 없으므로 추가)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(user_threads)")}
+        # fence_token: 매핑을 마지막으로 저장한 사용자 lease 토큰 (user_lease.py)
+        for column in ("last_prompt_tokens", "total_tokens", "fence_token"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE user_threads ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+        self._conn.commit()
+        
+        self.warm()
+    
+    def warm(self):
+        """최근 사용한 Thread들을 메모리 캐시에 미리 올리기 (재시작 직후에도 캐시 hit)"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, thread_id, last_used_at FROM user_threads "
+                "WHERE last_used_at >= ? ORDER BY last_used_at DESC LIMIT ?",
+                (cutoff, self.cache_size)
+            ).fetchall()
+            
+            # 오래된 것부터 넣어야 LRU 순서가 유지됨
+            for user_id, thread_id, last_used_at in reversed(rows):
+                self._cache[user_id] = [thread_id, last_used_at, last_used_at]
+        
+        if rows:
+            logger.info(f"Thread 저장소 warm-up: {len(rows)}개 로드")
+    
+    def get(self, user_id, fresh=False):
+        """사용자의 Thread ID 반환 (없거나 만료되었으면 None)
+        
+        fresh면 메모리 캐시 대신 DB에서 읽음 (다른 프로세스가 매핑을 바꿨을 수 있을 때)
+        """
+        now = time.time()
+        with self._lock:
+            entry = None if fresh else self._cache.get(user_id)
+            if entry is None:
+                row = self._conn.execute(
+                    "SELECT thread_id, last_used_at FROM user_threads WHERE user_id = ?",
+                    (user_id,)
+                ).fetchone()
+                if row is None:
+                    self._cache.pop(user_id, None)
+                    return None
+                cached = self._cache.get(user_id)
+                if cached and cached[0] == row[0]:
+                    row = (row[0], max(row[1], cached[1]))
+                entry = [row[0], row[1], row[1]]
+                self._cache[user_id] = entry
+                self._evict()
+            
+            if now - entry[1] > self.ttl_seconds:
+                # 만료된 Thread는 새로 만들도록 None 반환 (서버 삭제는 정리 작업에서 수행)
+                return None
+            
+            self._cache.move_to_end(user_id)
+            entry[1] = now
+            if now - entry[2] >= TOUCH_PERSIST_INTERVAL:
+                self._conn.execute(
+                    "UPDATE user_threads SET last_used_at = ? WHERE user_id = ?",
+                    (now, user_id)
+                )
+                self._conn.commit()
+                entry[2] = now
+            
+            return entry[0]
+    
+    def set(self, user_id, thread_id, fence_token=None):
+        """사용자의 Thread ID 저장 (기존 값은 덮어씀)
+        
+        fence_token을 주면 더 큰 토큰으로 저장된 매핑은 덮어쓰지 않음 (lease를 잃은 인스턴스의 늦은 쓰기)
+        
+        Returns:
+            저장했으면 True (fencing으로 거절되었으면 False)
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT thread_id, last_used_at FROM user_threads WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+            
+            # 토큰 비교와 저장을 한 문장으로 처리 (다른 프로세스의 쓰기와 섞이지 않음)
+            cursor = self._conn.execute(
+                "INSERT INTO user_threads (user_id, thread_id, created_at, last_used_at, fence_token) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET thread_id = excluded.thread_id, "
+                "created_at = excluded.created_at, last_used_at = excluded.last_used_at, "
+                "last_prompt_tokens = 0, total_tokens = 0, "
+                "fence_token = MAX(user_threads.fence_token, excluded.fence_token) "
+                "WHERE user_threads.fence_token <= excluded.fence_token OR ? IS NULL",
+                (user_id, thread_id, now, now, fence_token or 0, fence_token)
+            )
+            self._conn.commit()
+            if cursor.rowcount == 0:
+                return False
+            
+            if row and row[0] != thread_id and now - row[1] > self.ttl_seconds:
+                self._retired.append(row[0])
+            self._cache[user_id] = [thread_id, now, now]
+            self._cache.move_to_end(user_id)
+            self._evict()
+            return True
+    
+    def replace(self, user_id, old_thread_id, new_thread_id, fence_token=None):
+        """현재 매핑이 old_thread_id일 때만 new_thread_id로 교체 (Thread 압축 시 원자적 교체)
+        
+        fence_token을 주면 set과 같이 더 큰 토큰으로 저장된 매핑은 교체하지 않음
+        
+        Returns:
+            교체했으면 True (그 사이 리셋 등으로 매핑이 바뀌었거나 fencing으로 거절되었으면 False)
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE user_threads SET thread_id = ?, created_at = ?, last_used_at = ?, "
+                "last_prompt_tokens = 0, total_tokens = 0, fence_token = MAX(fence_token, ?) "
+                "WHERE user_id = ? AND thread_id = ? AND (fence_token <= ? OR ? IS NULL)",
+                (new_thread_id, now, now, fence_token or 0, user_id, old_thread_id, fence_token, fence_token)
+            )
+            self._conn.commit()
+            if cursor.rowcount == 0:
+                return False
+            
+            self._cache[user_id] = [new_thread_id, now, now]
+            self._cache.move_to_end(user_id)
+            self._evict()
+            return True
+    
+    def record_usage(self, user_id, thread_id, prompt_tokens, total_tokens):
+        """Run 토큰 사용량 기록 (마지막 Run의 prompt 토큰, 누적 토큰)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE user_threads SET last_prompt_tokens = ?, total_tokens = total_tokens + ? "
+                "WHERE user_id = ? AND thread_id = ?",
+                (prompt_tokens, total_tokens, user_id, thread_id)
+            )
+            self._conn.commit()
+    
+    def get_usage(self, user_id):
+        """사용자 Thread의 토큰 사용량 ({thread_id, last_prompt_tokens, total_tokens}, 없으면 None)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT thread_id, last_prompt_tokens, total_tokens FROM user_threads WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"thread_id": row[0], "last_prompt_tokens": row[1], "total_tokens": row[2]}
+    
+    def pop(self, user_id, fence_token=None):
+        """사용자의 Thread 매핑 삭제 후 Thread ID 반환 (없으면 None)
+        
+        fence_token을 주면 set과 같이 더 큰 토큰으로 저장된 매핑은 삭제하지 않음 (None 반환)
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT thread_id FROM user_threads WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+            cursor = self._conn.execute(
+                "DELETE FROM user_threads WHERE user_id = ? AND (fence_token <= ? OR ? IS NULL)",
+                (user_id, fence_token, fence_token)
+            )
+            self._conn.commit()
+            if row and cursor.rowcount == 0:
+                return None
+            entry = self._cache.pop(user_id, None)
+        
+        if row:
+            return row[0]
+        return entry[0] if entry else None
+    
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM user_threads").fetchone()[0]
+    
+    def _evict(self):
+        """LRU 크기를 넘으면 가장 오래 사용하지 않은 항목부터 메모리에서 제거 (DB에는 유지)"""
+        while len(self._cache) > self.cache_size:
+            user_id, (_, last_used_at, persisted_at) = self._cache.popitem(last=False)
+            if last_used_at > persisted_at:
+                self._conn.execute(
+                    "UPDATE user_threads SET last_used_at = ? WHERE user_id = ?",
+                    (last_used_at, user_id)
+                )
+                self._conn.commit()
+    
+    def _flush_touches(self):
+        """메모리에만 있는 마지막 사용 시각을 DB에 반영"""
+        with self._lock:
+            updates = [
+                (entry[1], user_id)
+                for user_id, entry in self._cache.items()
+                if entry[1] > entry[2]
+            ]
+            if updates:
+                self._conn.executemany("UPDATE user_threads SET last_used_at = ? WHERE user_id = ?", updates)
+                self._conn.commit()
+                for _, user_id in updates:
+                    self._cache[user_id][2] = self._cache[user_id][1]
+    
+    def purge_expired(self, delete_remote=None):
+        """만료된 Thread 매핑 삭제 (delete_remote가 있으면 서버 Thread도 삭제)
+        
+        Returns:
+            삭제한 Thread 수
+        """
+        self._flush_touches()
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = self._conn.execute(
+                "SELECT user_id, thread_id FROM user_threads WHERE last_used_at < ?",
+                (cutoff,)
+            ).fetchall()
+            self._conn.execute("DELETE FROM user_threads WHERE last_used_at < ?", (cutoff,))
+            self._conn.commit()
+            for user_id, _ in expired:
+                self._cache.pop(user_id, None)
+            retired, self._retired = self._retired, []
+        
+        return self._delete_expired([thread_id for _, thread_id in expired] + retired, delete_remote)
+    
+    def close(self):
+        """정리 작업 중지 및 DB 연결 종료"""
+        self._stop_event.set()
+        self._flush_touches()
+        with self._lock:
+            self._conn.close()
+
+class KeyValueThreadRegistry(ThreadRegistryBase):
+    """key-value 저장소 기반 사용자별 Thread 저장소 (여러 서버가 같은 매핑을 공유)
+    
+    사용자별 키에 매핑 레코드(JSON)를 저장하고, 모든 변경은 읽은 값이 그대로일 때만 쓰는
+    compare-and-set으로 처리합니다 (fencing 토큰 비교와 저장이 다른 서버의 쓰기와 섞이지 않음).
+    다른 서버의 변경을 바로 보도록 메모리 캐시는 두지 않습니다.
+    """
+    
+    KEY_PREFIX = "user_thread:"
+    
+    def __init__(self, kv, ttl_seconds=THREAD_TTL_SECONDS):
+        self.kv = kv
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._retired = []  # 만료 후 새 Thread로 교체되어 서버 삭제를 기다리는 Thread ID
+        self._cleanup_thread = None
+        self._stop_event = threading.Event()
+    
+    def _key(self, user_id):
+        return f"{self.KEY_PREFIX}{user_id}"
+    
+    def _load(self, key):
+        """(저장된 원본 값, 레코드) 반환 (없으면 (None, None))"""
+        raw = self.kv.get(key)
+        return raw, json.loads(raw) if raw is not None else None
+    
+    def _update(self, user_id, change):
+        """레코드 변경 (다른 쓰기와 겹치면 다시 읽어 재시도)
+        
+        change(레코드 또는 None)가 None을 반환하면 저장하지 않음
+        
+        Returns:
+            저장했으면 (이전 레코드, True), 아니면 (현재 레코드, False)
+        """
+        key = self._key(user_id)
+        while True:
+            raw, record = self._load(key)
+            updated = change(record)
+            if updated is None:
+                return record, False
+            if self.kv.compare_and_set(key, raw, json.dumps(updated)):
+                return record, True
+    
+    def get(self, user_id, fresh=False):
+        """사용자의 Thread ID 반환 (없거나 만료되었으면 None, 항상 저장소에서 읽으므로 fresh는 무시)"""
+        key = self._key(user_id)
+        raw, record = self._load(key)
+        if record is None:
+            return None
+        
+        now = time.time()
+        if now - record["last_used_at"] > self.ttl_seconds:
+            return None
+        if now - record["last_used_at"] >= TOUCH_PERSIST_INTERVAL:
+            # 마지막 사용 시각 반영 (다른 쓰기와 겹치면 건너뜀)
+            self.kv.compare_and_set(key, raw, json.dumps(dict(record, last_used_at=now)))
+        return record["thread_id"]
+    
+    def set(self, user_id, thread_id, fence_token=None):
+        """사용자의 Thread ID 저장 (fence_token을 주면 더 큰 토큰으로 저장된 매핑은 덮어쓰지 않음)
+        
+        Returns:
+            저장했으면 True (fencing으로 거절되었으면 False)
+        """
+        now = time.time()
+        
+        def change(record):
+            stored_token = record["fence_token"] if record else 0
+            if fence_token is not None and stored_token > fence_token:
+                return None
+            return _thread_record(thread_id, now, max(stored_token, fence_token or 0))
+        
+        previous, saved = self._update(user_id, change)
+        if not saved:
+            return False
+        if previous and previous["thread_id"] != thread_id and now - previous["last_used_at"] > self.ttl_seconds:
+            with self._lock:
+                self._retired.append(previous["thread_id"])
+        return True
+    
+    def replace(self, user_id, old_thread_id, new_thread_id, fence_token=None):
+        """현재 매핑이 old_thread_id일 때만 new_thread_id로 교체 (fence_token은 set과 같이 비교)
+        
+        Returns:
+            교체했으면 True (그 사이 매핑이 바뀌었거나 fencing으로 거절되었으면 False)
+        """
+        now = time.time()
+        
+        def change(record):
+            if not record or record["thread_id"] != old_thread_id:
+                return None
+            if fence_token is not None and record["fence_token"] > fence_token:
+                return None
+            return _thread_record(new_thread_id, now, max(record["fence_token"], fence_token or 0))
+        
+        return self._update(user_id, change)[1]
+    
+    def record_usage(self, user_id, thread_id, prompt_tokens, total_tokens):
+        """Run 토큰 사용량 기록 (마지막 Run의 prompt 토큰, 누적 토큰)"""
+        def change(record):
+            if not record or record["thread_id"] != thread_id:
+                return None
+            return dict(record, last_prompt_tokens=prompt_tokens, total_tokens=record["total_tokens"] + total_tokens)
+        
+        self._update(user_id, change)
+    
+    def get_usage(self, user_id):
+        """사용자 Thread의 토큰 사용량 ({thread_id, last_prompt_tokens, total_tokens}, 없으면 None)"""
+        record = self._load(self._key(user_id))[1]
+        if record is None:
+            return None
+        return {
+            "thread_id": record["thread_id"],
+            "last_prompt_tokens": record["last_prompt_tokens"],
+            "total_tokens": record["total_tokens"],
+        }
+    
+    def pop(self, user_id, fence_token=None):
+        """사용자의 Thread 매핑 삭제 후 Thread ID 반환 (없으면 None, fence_token은 set과 같이 비교)"""
+        key = self._key(user_id)
+        while True:
+            raw, record = self._load(key)
+            if record is None:
+                return None
+            if fence_token is not None and record["fence_token"] > fence_token:
+                return None
+            if self.kv.delete_if_equals(key, raw):
+                return record["thread_id"]
+    
+    def __len__(self):
+        return len(self.kv.scan(self.KEY_PREFIX))
+    
+    def purge_expired(self, delete_remote=None):
+        """만료된 Thread 매핑 삭제 (delete_remote가 있으면 서버 Thread도 삭제)
+        
+        Returns:
+            삭제한 Thread 수
+        """
+        cutoff = time.time() - self.ttl_seconds
+        expired_thread_ids = []
+        for key in self.kv.scan(self.KEY_PREFIX):
+            raw, record = self._load(key)
+            # 읽은 뒤 다른 서버가 사용했으면 지우지 않음
+            if record and record["last_used_at"] < cutoff and self.kv.delete_if_equals(key, raw):
+                expired_thread_ids.append(record["thread_id"])
+        
+        with self._lock:
+            retired, self._retired = self._retired, []
+        return self._delete_expired(expired_thread_ids + retired, delete_remote)
+    
+    def close(self):
+        """정리 작업 중지"""
+        self._stop_event.set()
+
+def _thread_record(thread_id, now, fence_token):
+    """KeyValueThreadRegistry에 저장할 새 매핑 레코드 (토큰 사용량은 0부터)"""
+    return {
+        "thread_id": thread_id,
+        "created_at": now,
+        "last_used_at": now,
+        "last_prompt_tokens": 0,
+        "total_tokens": 0,
+        "fence_token": fence_token,
+    }
+
+def create_thread_registry(backend=THREAD_STORE_BACKEND):
+    """설정된 Thread 매핑 저장소 생성"""
+    if backend == "sqlite":
+        return ThreadRegistry()
+    if backend == "kv":
+        return KeyValueThreadRegistry(RedisKeyValue(THREAD_STORE_KV_URL))
+    if backend == "memory":
+        return KeyValueThreadRegistry(MemoryKeyValue())
+    raise ValueError(f"알 수 없는 THREAD_STORE_BACKEND: {backend}")
@@ -0,0 +1,133 @@
+"""
+Run별 토큰 사용량 기록 모듈
+
+답변 하나(Run)마다 prompt / completion / total 토큰과 Run 소요 시간을
+사용자, Thread, 프롬프트 버전, 지침 전달 방식과 함께 로컬 SQLite에 남깁니다.
+프롬프트 버전이나 전달 방식(run 지침 / 메시지 본문)을 바꿨을 때 토큰과 지연 시간 변화를 비교할 수 있습니다.
+
+사용법:
+    python token_ledger.py            # 프롬프트 버전별 요약
+    python token_ledger.py --users    # 사용자별 요약
+    python token_ledger.py --threads  # Thread별 요약
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 기록 설정 (환경변수로 조정 가능)
+TOKEN_LEDGER_DB_PATH = os.getenv("TOKEN_LEDGER_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "token_ledger.db"))
+TOKEN_LEDGER_ENABLED = os.getenv("TOKEN_LEDGER_ENABLED", "true").lower() == "true"
+
+_SUMMARY_COLUMNS = {
+    "prompt": "prompt_version, delivery",
+    "user": "user_id",
+    "thread": "thread_id",
+}
+
+class TokenLedger:
+    """SQLite 기반 Run별 토큰 사용량 기록"""
+    
+    def __init__(self, db_path=TOKEN_LEDGER_DB_PATH, enabled=TOKEN_LEDGER_ENABLED):
+        self.db_path = db_path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS run_usage (
+                run_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                thread_id TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                delivery TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                total_tokens INTEGER NOT NULL,
+                run_seconds REAL,
+                recorded_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_run_usage_prompt ON run_usage(prompt_version, delivery)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_run_usage_user ON run_usage(user_id)")
+        self._conn.commit()
+    
+    def record(self, user_id, thread_id, run, prompt_version, delivery):
+        """완료된 Run의 usage 기록 (usage가 없으면 무시)"""
+        usage = getattr(run, "usage", None)
+        if not self.enabled or usage is None or not thread_id:
+            return
+        
+        # Run 소요 시간 (생성 ~ 완료, 초 단위 타임스탬프)
+        created_at = getattr(run, "created_at", None)
+        completed_at = getattr(run, "completed_at", None)
+        run_seconds = completed_at - created_at if created_at and completed_at else None
+        
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO run_usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run.id, user_id, thread_id, prompt_version, delivery,
+                     usage.prompt_tokens, usage.completion_tokens, usage.total_tokens,
+                     run_seconds, time.time())
+                )
+                self._conn.commit()
+        except Exception as e:
+            logger.warning(f"토큰 사용량 기록 실패 - Run: {run.id}: {e}")
+    
+    def summary(self, by="prompt", since=None):
+        """그룹별 Run 수, 평균 토큰, 평균 Run 소요 시간
+        
+        Args:
+            by: "prompt"(프롬프트 버전 + 전달 방식), "user", "thread"
+            since: 이 시각(epoch) 이후 기록만 집계
+        """
+        group_columns = _SUMMARY_COLUMNS[by]
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT {group_columns}, COUNT(*), AVG(prompt_tokens), AVG(completion_tokens), "
+                f"AVG(total_tokens), SUM(total_tokens), AVG(run_seconds) "
+                f"FROM run_usage WHERE recorded_at >= ? GROUP BY {group_columns} ORDER BY SUM(total_tokens) DESC",
+                (since or 0,)
+            )
+            names = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+        
+        keys = names[:-6] + ["runs", "avg_prompt_tokens", "avg_completion_tokens",
+                             "avg_total_tokens", "sum_total_tokens", "avg_run_seconds"]
+        return [dict(zip(keys, row)) for row in rows]
+    
+    def close(self):
+        """DB 연결 종료"""
+        with self._lock:
+            self._conn.close()
+
+def print_summary(ledger, by):
+    """집계 결과 출력"""
+    rows = ledger.summary(by=by)
+    if not rows:
+        print("기록된 Run이 없습니다.")
+        return
+    
+    for row in rows:
+        name = " / ".join(str(row[key]) for key in _SUMMARY_COLUMNS[by].split(", "))
+        run_seconds = f"{row['avg_run_seconds']:.2f}초" if row["avg_run_seconds"] is not None else "-"
+        print(
+            f"{name}: Run {row['runs']}회, 평균 prompt {row['avg_prompt_tokens']:.0f} / "
+            f"completion {row['avg_completion_tokens']:.0f} / total {row['avg_total_tokens']:.0f} 토큰, "
+            f"누적 {row['sum_total_tokens']} 토큰, 평균 Run {run_seconds}"
+        )
+
+if __name__ == "__main__":
+    by = "user" if "--users" in sys.argv else "thread" if "--threads" in sys.argv else "prompt"
+    ledger = TokenLedger()
+    print(f"📊 토큰 사용량 ({by}별) - {ledger.db_path}")
+    print_summary(ledger, by)
+    ledger.close()
@@ -0,0 +1,354 @@
+"""
+요청 단위 트레이싱 모듈
+
+Slack 이벤트 하나를 trace 하나로 묶고, 그 안의 OpenAI / Slack 호출을 span으로 기록합니다.
+span에는 시작 시각, 소요 시간, 상태와 Run ID, polling 횟수 같은 속성이 남으며
+로컬 JSONL 파일(크기 기준 회전)에 쓰고, 설정하면 OTLP/HTTP(JSON)로 로컬 collector에도 보냅니다.
+현재 span은 contextvars로 전달하므로 같은 스레드/코루틴 안에서는 별도 인자 없이 이어집니다.
+
+사용법:
+    python tracing.py slowest [개수]     # 가장 느린 trace 목록
+    python tracing.py show <trace_id>   # trace 하나의 waterfall
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import secrets
+import inspect
+import logging
+import threading
+import contextvars
+import urllib.request
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+logger = logging.getLogger(__name__)
+
+# 트레이싱 설정 (환경변수로 조정 가능)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_FILE_PATH = os.getenv("TRACE_FILE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces.jsonl"))
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_FILE_BACKUP_COUNT = int(os.getenv("TRACE_FILE_BACKUP_COUNT", "3"))
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")  # 예: http://localhost:4318 (비어 있으면 사용 안 함)
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "ai-assistant-slack-bot")
+OTLP_FLUSH_INTERVAL = 5.0  # OTLP 전송 주기(초)
+OTLP_MAX_BATCH = 512
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """작업 구간 하나"""
+    
+    def __init__(self, name, trace_id, parent_id=None, attributes=None, start=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start = start if start is not None else time.time()
+        self.duration = None
+        self.status = "ok"
+        self.attributes = dict(attributes or {})
+    
+    def set_attributes(self, **attributes):
+        """속성 추가 (Run ID, polling 횟수 등)"""
+        self.attributes.update(attributes)
+    
+    def set_status(self, status):
+        """상태 지정 (기본값 ok, 예외 발생 시 error)"""
+        self.status = status
+    
+    def end(self, end=None):
+        """종료 시각 기록"""
+        self.duration = max((end if end is not None else time.time()) - self.start, 0.0)
+    
+    def as_dict(self):
+        """JSONL 기록용 딕셔너리"""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+class JsonlSpanExporter:
+    """span을 한 줄씩 JSONL 파일에 기록 (크기 기준 회전)"""
+    
+    def __init__(self, path=TRACE_FILE_PATH, max_bytes=TRACE_FILE_MAX_BYTES, backup_count=TRACE_FILE_BACKUP_COUNT):
+        self.path = path
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self._lock = threading.Lock()
+    
+    def export(self, span):
+        """span 하나 기록"""
+        line = json.dumps(span.as_dict(), ensure_ascii=False, default=str)
+        record = logging.LogRecord("tracing", logging.INFO, __file__, 0, line, None, None)
+        with self._lock:
+            self._handler.emit(record)
+
+def _otlp_value(value):
+    """OTLP AnyValue 변환"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_span(span):
+    """OTLP/JSON span 변환"""
+    end = span.start + (span.duration or 0.0)
+    otlp = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(int(span.start * 1e9)),
+        "endTimeUnixNano": str(int(end * 1e9)),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+        "status": {"code": 2 if span.status == "error" else 1},
+    }
+    if span.parent_id:
+        otlp["parentSpanId"] = span.parent_id
+    return otlp
+
+class OtlpSpanExporter:
+    """OTLP/HTTP(JSON)로 span 전송 (백그라운드 스레드에서 일정 주기로 묶어서 전송)"""
+    
+    def __init__(self, endpoint=TRACE_OTLP_ENDPOINT, service_name=TRACE_SERVICE_NAME, flush_interval=OTLP_FLUSH_INTERVAL):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=OTLP_MAX_BATCH * 10)
+        self.dropped = 0
+        threading.Thread(target=self._run, name="otlp-exporter", daemon=True).start()
+    
+    def export(self, span):
+        """전송 대기열에 추가 (가득 차면 버림)"""
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+    
+    def _run(self):
+        """주기적으로 모아서 전송"""
+        while True:
+            time.sleep(self.flush_interval)
+            batch = []
+            while len(batch) < OTLP_MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                self._send(batch)
+    
+    def _send(self, spans):
+        """OTLP 요청 전송 (실패하면 버림)"""
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": "ai-assistants"}, "spans": [_otlp_span(span) for span in spans]}],
+            }]
+        }
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=5):
+                pass
+        except Exception as e:
+            logger.warning(f"OTLP span 전송 실패 ({len(spans)}개): {e}")
+
+class Tracer:
+    """trace/span 생성 및 exporter 호출"""
+    
+    def __init__(self, exporters=(), enabled=TRACING_ENABLED):
+        self.exporters = list(exporters)
+        self.enabled = enabled
+    
+    def current_span(self):
+        """현재 span (없으면 None)"""
+        return _current_span.get()
+    
+    def current_trace_id(self):
+        """현재 trace ID (없으면 None)"""
+        span = _current_span.get()
+        return span.trace_id if span else None
+    
+    def annotate(self, **attributes):
+        """현재 span에 속성 추가 (현재 span이 없으면 무시)"""
+        span = _current_span.get()
+        if span is not None:
+            span.set_attributes(**attributes)
+    
+    def _export(self, span):
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.warning(f"span 기록 실패 ({span.name}): {e}")
+    
+    @contextmanager
+    def span(self, name, **attributes):
+        """현재 span의 자식 span (현재 trace가 없으면 새 trace 시작)"""
+        if not self.enabled:
+            yield Span(name, None, attributes=attributes)
+            return
+        
+        parent = _current_span.get()
+        span = Span(name, parent.trace_id if parent else secrets.token_hex(16), parent.span_id if parent else None, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_status("error")
+            span.set_attributes(error=str(e)[:200])
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+            self._export(span)
+    
+    def bind(self, func, name, **attributes):
+        """큐에 넣을 작업을 새 trace로 감싸기
+        
+        trace는 감싸는 시점(이벤트 수신)에 시작하고, 실제 실행까지 기다린 시간은 queue.wait span으로 남깁니다.
+        코루틴 함수면 코루틴 함수를 반환합니다.
+        """
+        if not self.enabled:
+            return func
+        
+        root = Span(name, secrets.token_hex(16), attributes=attributes)
+        
+        def enter():
+            wait = Span("queue.wait", root.trace_id, root.span_id, start=root.start)
+            wait.end()
+            self._export(wait)
+            return _current_span.set(root)
+        
+        def leave(token, error=None):
+            _current_span.reset(token)
+            if error is not None:
+                root.set_status("error")
+                root.set_attributes(error=str(error)[:200])
+            root.end()
+            self._export(root)
+        
+        if inspect.iscoroutinefunction(func):
+            async def run_traced_async(*args, **kwargs):
+                token = enter()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException as e:
+                    leave(token, e)
+                    raise
+                leave(token)
+                return result
+            return run_traced_async
+        
+        def run_traced(*args, **kwargs):
+            token = enter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                leave(token, e)
+                raise
+            leave(token)
+            return result
+        return run_traced
+
+def create_tracer():
+    """환경변수 설정으로 Tracer 생성"""
+    if not TRACING_ENABLED:
+        return Tracer(enabled=False)
+    
+    exporters = [JsonlSpanExporter()]
+    if TRACE_OTLP_ENDPOINT:
+        exporters.append(OtlpSpanExporter())
+        logger.info(f"OTLP trace 전송: {TRACE_OTLP_ENDPOINT}")
+    return Tracer(exporters)
+
+tracer = create_tracer()
+
+def load_traces(path=TRACE_FILE_PATH):
+    """JSONL 파일(회전된 파일 포함)에서 trace ID별 span 목록 읽기"""
+    traces = {}
+    paths = [f"{path}.{index}" for index in range(TRACE_FILE_BACKUP_COUNT, 0, -1)] + [path]
+    for file_path in paths:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    continue
+                traces.setdefault(span["trace_id"], []).append(span)
+    return traces
+
+def trace_bounds(spans):
+    """trace 시작 시각과 전체 소요 시간"""
+    start = min(span["start"] for span in spans)
+    end = max(span["start"] + (span["duration"] or 0.0) for span in spans)
+    return start, end - start
+
+def print_slowest(traces, limit=10):
+    """가장 느린 trace 목록 출력"""
+    rows = []
+    for trace_id, spans in traces.items():
+        start, duration = trace_bounds(spans)
+        root = next((span for span in spans if not span["parent_id"]), spans[0])
+        rows.append((duration, trace_id, start, root))
+    
+    for duration, trace_id, start, root in sorted(rows, key=lambda row: row[0], reverse=True)[:limit]:
+        user = root["attributes"].get("user_id", "-")
+        started = time.strftime("%m-%d %H:%M:%S", time.localtime(start))
+        print(f"{duration:7.2f}초  {trace_id}  {started}  {root['name']} (user {user}, span {len(traces[trace_id])}개)")
+
+def print_waterfall(spans, width=40):
+    """trace 하나의 span을 시작 순서대로 막대 그래프로 출력"""
+    start, total = trace_bounds(spans)
+    by_id = {span["span_id"]: span for span in spans}
+    
+    def depth(span):
+        level = 0
+        while span["parent_id"] in by_id:
+            span = by_id[span["parent_id"]]
+            level += 1
+        return level
+    
+    for span in sorted(spans, key=lambda span: span["start"]):
+        duration = span["duration"] or 0.0
+        offset = int((span["start"] - start) / total * width) if total else 0
+        length = max(int(duration / total * width) if total else 0, 1)
+        bar = " " * offset + "█" * min(length, width - offset)
+        extras = ", ".join(
+            f"{key}={span['attributes'][key]}"
+            for key in ("run_id", "run_status", "polls", "error")
+            if key in span["attributes"]
+        )
+        label = ("  " * depth(span) + span["name"])[:36]
+        print(f"{label:<36} |{bar:<{width}}| {duration * 1000:8.0f}ms {span['status']}" + (f"  {extras}" if extras else ""))
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "show":
+        spans = load_traces().get(sys.argv[2])
+        if not spans:
+            print(f"trace를 찾을 수 없습니다: {sys.argv[2]}")
+            sys.exit(1)
+        print_waterfall(spans)
+    elif len(sys.argv) >= 2 and sys.argv[1] == "slowest":
+        print_slowest(load_traces(), int(sys.argv[2]) if len(sys.argv) >= 3 else 10)
+    else:
+        print(__doc__)
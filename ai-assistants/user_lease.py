@@ -0,0 +1,508 @@
+"""
+사용자별 처리 lease 모듈
+
+봇 인스턴스(HTTP worker, 여러 서버)를 여러 개 띄우면 프로세스 안의 사용자별 대기열만으로는
+같은 사용자의 질문이 두 인스턴스에서 동시에 처리되어 같은 Thread에 Run이 겹칠 수 있습니다.
+질문을 처리하는 동안 사용자별 lease를 공유 저장소에 잡아 두고, 다른 인스턴스는 lease가 풀릴 때까지 기다립니다.
+
+- lease 만료: 프로세스가 죽어도 USER_LEASE_TTL 뒤에는 다른 인스턴스가 가져감 (처리 중에는 백그라운드에서 갱신)
+- fencing: lease를 잡을 때마다 사용자별로 증가하는 토큰을 발급하고, Thread 매핑 저장 시 더 작은 토큰의 쓰기는 거절
+  (lease가 만료된 뒤 늦게 끝난 인스턴스가 새 매핑을 덮어쓰지 않음)
+- 저장소:
+  - sqlite: 같은 서버의 여러 프로세스 (SQLite 파일 잠금, 기본 경로는 Thread 저장소 DB)
+  - kv: 네트워크 key-value 저장소 (SET NX + TTL, INCR, compare-and-delete를 지원하는 redis 등)
+  - memory: kv 저장소의 프로세스 내 대체 구현 (로컬 실행, 테스트용)
+- key-value 저장소(RedisKeyValue, MemoryKeyValue)는 Thread 매핑 저장소(thread_registry.py)도 함께 사용
+"""
+
+import os
+import time
+import socket
+import sqlite3
+import asyncio
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager, asynccontextmanager
+
+from metrics import USER_LEASES
+
+logger = logging.getLogger(__name__)
+
+# lease 설정 (환경변수로 조정 가능)
+USER_LEASE_BACKEND = os.getenv("USER_LEASE_BACKEND", "none").lower()  # none, sqlite, kv, memory
+USER_LEASE_DB_PATH = os.getenv("USER_LEASE_DB_PATH") or os.getenv(
+    "THREAD_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "thread_registry.db")
+)
+USER_LEASE_KV_URL = os.getenv("USER_LEASE_KV_URL", "redis://localhost:6379/0")
+USER_LEASE_TTL = float(os.getenv("USER_LEASE_TTL", "60"))  # 갱신이 끊긴 lease가 만료되는 시간(초)
+USER_LEASE_WAIT_TIMEOUT = float(os.getenv("USER_LEASE_WAIT_TIMEOUT", "90"))  # 다른 인스턴스의 lease를 기다리는 최대 시간(초)
+LEASE_POLL_INTERVAL = 0.5  # lease 재시도 간격(초)
+
+class LeaseUnavailable(Exception):
+    """다른 인스턴스가 lease를 오래 잡고 있어 처리를 시작하지 못함"""
+
+class Lease:
+    """사용자 lease (token은 사용자별로 계속 증가하는 fencing 토큰)"""
+    
+    __slots__ = ("user_id", "owner", "token", "expires_at")
+    
+    def __init__(self, user_id, owner, token, expires_at):
+        self.user_id = user_id
+        self.owner = owner
+        self.token = token
+        self.expires_at = expires_at
+    
+    def __repr__(self):
+        return f"Lease(user_id={self.user_id!r}, owner={self.owner!r}, token={self.token})"
+
+class LeaseStore:
+    """lease 저장소 인터페이스"""
+    
+    def acquire(self, user_id, owner, ttl):
+        """lease가 비어 있거나 만료되었으면 새 토큰으로 잡고 Lease 반환 (다른 owner가 잡고 있으면 None)"""
+        raise NotImplementedError
+    
+    def renew(self, lease, ttl):
+        """아직 유효한 lease의 만료 시각 연장 (이미 잃었으면 False)"""
+        raise NotImplementedError
+    
+    def release(self, lease):
+        """lease 반납 (다른 인스턴스가 이미 가져갔으면 아무것도 하지 않음)"""
+        raise NotImplementedError
+    
+    def is_valid(self, lease):
+        """lease가 아직 이 owner의 것인지"""
+        raise NotImplementedError
+
+class SqliteLeaseStore(LeaseStore):
+    """SQLite 파일 기반 lease 저장소 (같은 서버의 여러 프로세스)
+    
+    반납해도 행을 지우지 않고 만료 처리만 하므로 사용자별 토큰은 계속 증가합니다.
+    """
+    
+    def __init__(self, db_path=USER_LEASE_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # 다른 프로세스가 쓰는 중이면 잠시 기다림 (autocommit 모드에서 BEGIN IMMEDIATE로 직접 트랜잭션 관리)
+        self._conn = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS user_leases (
+                user_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                token INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            )"""
+        )
+    
+    def acquire(self, user_id, owner, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT owner, token, expires_at FROM user_leases WHERE user_id = ?",
+                    (user_id,)
+                ).fetchone()
+                if row and row[2] > now:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                
+                token = (row[1] if row else 0) + 1
+                self._conn.execute(
+                    "INSERT INTO user_leases (user_id, owner, token, expires_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET owner = excluded.owner, token = excluded.token, "
+                    "expires_at = excluded.expires_at",
+                    (user_id, owner, token, now + ttl)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return Lease(user_id, owner, token, now + ttl)
+    
+    def renew(self, lease, ttl):
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE user_leases SET expires_at = ? WHERE user_id = ? AND token = ? AND expires_at > ?",
+                (now + ttl, lease.user_id, lease.token, now)
+            )
+        if cursor.rowcount == 0:
+            return False
+        lease.expires_at = now + ttl
+        return True
+    
+    def release(self, lease):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE user_leases SET expires_at = 0 WHERE user_id = ? AND token = ?",
+                (lease.user_id, lease.token)
+            )
+    
+    def is_valid(self, lease):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT token, expires_at FROM user_leases WHERE user_id = ?",
+                (lease.user_id,)
+            ).fetchone()
+        return bool(row) and row[0] == lease.token and row[1] > time.time()
+
+class MemoryKeyValue:
+    """네트워크 key-value 저장소의 프로세스 내 대체 구현 (KeyValueLeaseStore, KeyValueThreadRegistry가 요구하는 연산만 제공)"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}  # key -> (value, expires_at 또는 None)
+    
+    def _live(self, key, now):
+        item = self._values.get(key)
+        if item and item[1] is not None and item[1] <= now:
+            del self._values[key]
+            return None
+        return item
+    
+    def get(self, key):
+        with self._lock:
+            item = self._live(key, time.time())
+        return item[0] if item else None
+    
+    def set_if_absent(self, key, value, ttl):
+        """키가 없을 때만 TTL과 함께 저장 (SET NX PX)"""
+        now = time.time()
+        with self._lock:
+            if self._live(key, now):
+                return False
+            self._values[key] = (value, now + ttl)
+        return True
+    
+    def incr(self, key):
+        """정수 값 1 증가 후 반환 (INCR)"""
+        with self._lock:
+            item = self._live(key, time.time())
+            value = int(item[0]) + 1 if item else 1
+            self._values[key] = (value, None)
+        return value
+    
+    def expire_if_equals(self, key, expected, ttl):
+        """값이 expected일 때만 TTL 연장"""
+        now = time.time()
+        with self._lock:
+            item = self._live(key, now)
+            if not item or item[0] != expected:
+                return False
+            self._values[key] = (expected, now + ttl)
+        return True
+    
+    def delete_if_equals(self, key, expected):
+        """값이 expected일 때만 삭제"""
+        with self._lock:
+            item = self._live(key, time.time())
+            if not item or item[0] != expected:
+                return False
+            del self._values[key]
+        return True
+    
+    def compare_and_set(self, key, expected, value):
+        """현재 값이 expected일 때만 value로 저장 (expected가 None이면 키가 없을 때만, TTL 없음)"""
+        with self._lock:
+            item = self._live(key, time.time())
+            if (item[0] if item else None) != expected:
+                return False
+            self._values[key] = (value, None)
+        return True
+    
+    def scan(self, prefix):
+        """prefix로 시작하는 키 목록"""
+        now = time.time()
+        with self._lock:
+            return [key for key in list(self._values) if key.startswith(prefix) and self._live(key, now)]
+
+class RedisKeyValue:
+    """redis 기반 key-value 저장소 (redis 패키지 필요)"""
+    
+    # 값 비교와 변경을 서버에서 한 번에 처리
+    EXPIRE_IF_EQUALS = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    DELETE_IF_EQUALS = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+    # ARGV[1]이 빈 문자열이면 키가 없을 때만 저장
+    COMPARE_AND_SET = (
+        "local current = redis.call('get', KEYS[1]) "
+        "if (current == false and ARGV[1] == '') or current == ARGV[1] then redis.call('set', KEYS[1], ARGV[2]) return 1 "
+        "else return 0 end"
+    )
+    
+    def __init__(self, url=USER_LEASE_KV_URL):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("kv 저장소에는 redis 패키지가 필요합니다 (pip install redis)") from e
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._expire_if_equals = self._client.register_script(self.EXPIRE_IF_EQUALS)
+        self._delete_if_equals = self._client.register_script(self.DELETE_IF_EQUALS)
+        self._compare_and_set = self._client.register_script(self.COMPARE_AND_SET)
+    
+    def get(self, key):
+        return self._client.get(key)
+    
+    def set_if_absent(self, key, value, ttl):
+        return bool(self._client.set(key, value, nx=True, px=int(ttl * 1000)))
+    
+    def incr(self, key):
+        return self._client.incr(key)
+    
+    def expire_if_equals(self, key, expected, ttl):
+        return bool(self._expire_if_equals(keys=[key], args=[expected, int(ttl * 1000)]))
+    
+    def delete_if_equals(self, key, expected):
+        return bool(self._delete_if_equals(keys=[key], args=[expected]))
+    
+    def compare_and_set(self, key, expected, value):
+        return bool(self._compare_and_set(keys=[key], args=[expected if expected is not None else "", value]))
+    
+    def scan(self, prefix):
+        return list(self._client.scan_iter(match=f"{prefix}*", count=500))
+
+class KeyValueLeaseStore(LeaseStore):
+    """key-value 저장소 기반 lease (여러 서버가 같은 저장소를 공유)
+    
+    lease 키에는 "owner:token" 값을 TTL과 함께 저장하고, 토큰은 사용자별 카운터 키로 발급합니다.
+    """
+    
+    def __init__(self, kv):
+        self.kv = kv
+    
+    @staticmethod
+    def _keys(user_id):
+        return f"user_lease:{user_id}", f"user_lease_token:{user_id}"
+    
+    def acquire(self, user_id, owner, ttl):
+        lease_key, token_key = self._keys(user_id)
+        if self.kv.get(lease_key) is not None:
+            return None
+        
+        token = int(self.kv.incr(token_key))
+        if not self.kv.set_if_absent(lease_key, f"{owner}:{token}", ttl):
+            return None
+        return Lease(user_id, owner, token, time.time() + ttl)
+    
+    def renew(self, lease, ttl):
+        if not self.kv.expire_if_equals(self._keys(lease.user_id)[0], f"{lease.owner}:{lease.token}", ttl):
+            return False
+        lease.expires_at = time.time() + ttl
+        return True
+    
+    def release(self, lease):
+        self.kv.delete_if_equals(self._keys(lease.user_id)[0], f"{lease.owner}:{lease.token}")
+    
+    def is_valid(self, lease):
+        return self.kv.get(self._keys(lease.user_id)[0]) == f"{lease.owner}:{lease.token}"
+
+def create_lease_store(backend=USER_LEASE_BACKEND):
+    """설정된 lease 저장소 생성 (none이면 None)"""
+    if backend in ("", "none"):
+        return None
+    if backend == "sqlite":
+        return SqliteLeaseStore()
+    if backend == "kv":
+        return KeyValueLeaseStore(RedisKeyValue())
+    if backend == "memory":
+        return KeyValueLeaseStore(MemoryKeyValue())
+    raise ValueError(f"알 수 없는 USER_LEASE_BACKEND: {backend}")
+
+class LeaseStats:
+    """lease 통계"""
+    
+    def __init__(self):
+        self.acquired = 0
+        self.contended = 0  # 다른 인스턴스의 lease가 풀리길 기다린 횟수
+        self.timeouts = 0
+        self.lost = 0  # 갱신 실패로 처리 중에 lease를 잃은 횟수
+        self.fenced = 0  # 잃은 lease로 시도한 Thread 매핑 저장이 거절된 횟수
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def as_dict(self):
+        """통계를 딕셔너리로 반환"""
+        return {
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "timeouts": self.timeouts,
+            "lost": self.lost,
+            "fenced": self.fenced,
+            "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+class UserLeaseManager:
+    """질문 처리 동안 사용자 lease를 잡고 갱신 (저장소가 없으면 아무것도 하지 않음)"""
+    
+    def __init__(self, store=None, owner=None, ttl=USER_LEASE_TTL, wait_timeout=USER_LEASE_WAIT_TIMEOUT):
+        self.store = store
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.stats = LeaseStats()
+        self._lock = threading.Lock()
+        self._held = {}  # id(lease) -> Lease (갱신 대상)
+        self._lost = set()  # 갱신에 실패한 lease의 id
+        self._current = contextvars.ContextVar("user_lease", default=None)
+        self._renew_thread = None
+        self._stop_event = threading.Event()
+    
+    @property
+    def enabled(self):
+        return self.store is not None
+    
+    def _try_acquire(self, user_id):
+        try:
+            return self.store.acquire(user_id, self.owner, self.ttl)
+        except sqlite3.OperationalError as e:
+            # 다른 프로세스가 잠금을 오래 잡고 있으면 다음 재시도에서 다시 시도
+            logger.warning(f"lease 확인 실패 - User: {user_id}: {e}")
+            return None
+    
+    def _on_acquired(self, lease, started_at, waited):
+        wait_seconds = time.monotonic() - started_at
+        with self._lock:
+            self.stats.acquired += 1
+            self.stats.total_wait += wait_seconds
+            self.stats.max_wait = max(self.stats.max_wait, wait_seconds)
+            self._held[id(lease)] = lease
+        USER_LEASES.inc(result="acquired")
+        if waited:
+            logger.info(f"lease 대기 {wait_seconds:.2f}초 후 처리 시작 - User: {lease.user_id}, token {lease.token}")
+        self._ensure_renewer()
+    
+    def _on_contended(self, user_id):
+        with self._lock:
+            self.stats.contended += 1
+        USER_LEASES.inc(result="contended")
+        logger.info(f"다른 인스턴스가 처리 중인 사용자, lease 대기 - User: {user_id}")
+    
+    def _on_timeout(self, user_id):
+        with self._lock:
+            self.stats.timeouts += 1
+        USER_LEASES.inc(result="timeout")
+        return LeaseUnavailable(f"다른 인스턴스에서 이전 질문을 처리 중입니다 ({self.wait_timeout:.0f}초 대기 초과)")
+    
+    def _on_released(self, lease):
+        with self._lock:
+            self._held.pop(id(lease), None)
+            self._lost.discard(id(lease))
+        try:
+            self.store.release(lease)
+        except Exception as e:
+            logger.warning(f"lease 반납 실패 (TTL 후 만료) - User: {lease.user_id}: {e}")
+    
+    @contextmanager
+    def hold(self, user_id):
+        """사용자 lease를 잡은 상태로 블록 실행 (다른 인스턴스가 잡고 있으면 풀릴 때까지 대기)"""
+        if not self.enabled:
+            yield None
+            return
+        
+        started_at = time.monotonic()
+        lease = self._try_acquire(user_id)
+        if lease is None:
+            self._on_contended(user_id)
+            while lease is None:
+                if time.monotonic() - started_at >= self.wait_timeout:
+                    raise self._on_timeout(user_id)
+                time.sleep(LEASE_POLL_INTERVAL)
+                lease = self._try_acquire(user_id)
+        self._on_acquired(lease, started_at, waited=time.monotonic() - started_at >= LEASE_POLL_INTERVAL)
+        
+        context_token = self._current.set(lease)
+        try:
+            yield lease
+        finally:
+            self._current.reset(context_token)
+            self._on_released(lease)
+    
+    @asynccontextmanager
+    async def async_hold(self, user_id):
+        """hold의 비동기 버전 (저장소 접근은 스레드에서 실행)"""
+        if not self.enabled:
+            yield None
+            return
+        
+        started_at = time.monotonic()
+        lease = await asyncio.to_thread(self._try_acquire, user_id)
+        if lease is None:
+            self._on_contended(user_id)
+            while lease is None:
+                if time.monotonic() - started_at >= self.wait_timeout:
+                    raise self._on_timeout(user_id)
+                await asyncio.sleep(LEASE_POLL_INTERVAL)
+                lease = await asyncio.to_thread(self._try_acquire, user_id)
+        self._on_acquired(lease, started_at, waited=time.monotonic() - started_at >= LEASE_POLL_INTERVAL)
+        
+        context_token = self._current.set(lease)
+        try:
+            yield lease
+        finally:
+            self._current.reset(context_token)
+            await asyncio.to_thread(self._on_released, lease)
+    
+    def fence_token(self, user_id):
+        """지금 실행 중인 작업이 잡은 lease의 fencing 토큰 (lease 없이 실행 중이면 None)"""
+        lease = self._current.get()
+        if lease is None or lease.user_id != user_id:
+            return None
+        return lease.token
+    
+    def record_fenced(self, user_id, action="Thread 매핑 저장"):
+        """잃은 lease로 시도한 쓰기가 거절됨"""
+        with self._lock:
+            self.stats.fenced += 1
+        USER_LEASES.inc(result="fenced")
+        logger.warning(f"lease를 잃은 뒤의 {action} 거절 - User: {user_id}")
+    
+    def is_lost(self, user_id):
+        """지금 실행 중인 작업이 잡은 lease를 잃었는지 (갱신 실패 또는 만료, lease 없이 실행 중이면 False)
+        
+        lease를 잃은 뒤에는 다른 인스턴스가 같은 사용자를 처리하고 있을 수 있으므로
+        Thread 매핑 저장, Slack 답변 게시 같은 부수 효과 전에 확인합니다.
+        """
+        lease = self._current.get()
+        if lease is None or lease.user_id != user_id:
+            return False
+        with self._lock:
+            return id(lease) in self._lost or lease.expires_at <= time.time()
+    
+    def renew_all(self):
+        """잡고 있는 lease 전부 갱신 (갱신 스레드에서 주기적으로 호출)"""
+        with self._lock:
+            leases = [lease for key, lease in self._held.items() if key not in self._lost]
+        
+        for lease in leases:
+            try:
+                renewed = self.store.renew(lease, self.ttl)
+            except Exception as e:
+                logger.warning(f"lease 갱신 실패 (다음 주기에 재시도) - User: {lease.user_id}: {e}")
+                continue
+            if not renewed:
+                with self._lock:
+                    self._lost.add(id(lease))
+                    self.stats.lost += 1
+                USER_LEASES.inc(result="lost")
+                logger.warning(f"처리 중 lease를 잃음 - User: {lease.user_id}, token {lease.token}")
+    
+    def _ensure_renewer(self):
+        """lease 갱신 백그라운드 스레드 시작 (TTL의 1/3마다 갱신)"""
+        with self._lock:
+            if self._renew_thread and self._renew_thread.is_alive():
+                return
+            
+            def renew_loop():
+                while not self._stop_event.wait(self.ttl / 3):
+                    self.renew_all()
+            
+            self._renew_thread = threading.Thread(target=renew_loop, name="user-lease-renewer", daemon=True)
+            self._renew_thread.start()
+    
+    def stop(self):
+        """갱신 스레드 종료"""
+        self._stop_event.set()
@@ -0,0 +1,362 @@
+"""
+사용자별 순차 처리 큐 모듈
+
+사용자마다 FIFO 큐를 두고, 전체 동시 처리 수는 고정된 worker pool로 제한합니다.
+같은 사용자의 질문은 들어온 순서대로 하나씩 처리되고(같은 Thread에 Run이 겹치지 않음),
+여러 사용자의 질문은 worker 수만큼 동시에 처리됩니다.
+
+worker가 비면 가중 공정 큐(start-time fair queuing)로 다음 사용자를 고릅니다.
+- 사용자마다, 채널마다 가상 시각(virtual time)을 두고 가장 이른 사용자의 질문부터 처리
+- 질문 하나를 처리할 때마다 사용자 시각은 1/가중치, 채널 시각은 1/(가중치 × QUEUE_CHANNEL_SHARE)만큼 진행
+  → 질문을 몰아서 보내는 사용자나 한 채널의 멘션 폭주가 다른 사용자/채널의 차례를 막지 못함
+- 가중치는 요청 종류별로 지정 (DM `QUEUE_DM_WEIGHT`, 채널 멘션 `QUEUE_MENTION_WEIGHT`)
+- 전체 대기 수가 QUEUE_MAX_DEPTH 이상이면 새 질문은 받지 않고 QueueFull로 바로 거절 (load shedding)
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import QUEUE_ADMISSIONS, QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+# 동시에 처리할 최대 질문 수
+QUEUE_MAX_WORKERS = int(os.getenv("QUEUE_MAX_WORKERS", "8"))
+
+# 공정 큐 가중치 (클수록 자주 차례가 옴)
+QUEUE_DM_WEIGHT = float(os.getenv("QUEUE_DM_WEIGHT", "2"))
+QUEUE_MENTION_WEIGHT = float(os.getenv("QUEUE_MENTION_WEIGHT", "1"))
+QUEUE_CHANNEL_SHARE = float(os.getenv("QUEUE_CHANNEL_SHARE", "4"))  # 한 채널이 사용자 한 명 몫의 몇 배까지 처리될 수 있는지
+
+# 부하 제어 (전체 대기 질문 수 기준, 0이면 사용하지 않음)
+QUEUE_BUSY_DEPTH = int(os.getenv("QUEUE_BUSY_DEPTH", "16"))  # 이 이상이면 대기 질문 수 안내
+QUEUE_MAX_DEPTH = int(os.getenv("QUEUE_MAX_DEPTH", "200"))  # 이 이상이면 새 질문 거절
+
+KIND_DM = "dm"
+KIND_MENTION = "mention"
+KIND_WEIGHTS = {KIND_DM: QUEUE_DM_WEIGHT, KIND_MENTION: QUEUE_MENTION_WEIGHT}
+SHEDDABLE_KINDS = (KIND_DM, KIND_MENTION)  # 거절할 수 있는 요청 (Thread 압축 같은 내부 작업은 항상 받음)
+
+VIRTUAL_TIME_PRUNE_SIZE = 4096  # 가상 시각 기록이 이만큼 쌓이면 지난 기록 정리
+
+class QueueFull(Exception):
+    """대기 질문이 너무 많아 새 질문을 받지 않음"""
+    
+    def __init__(self, depth):
+        super().__init__(f"request queue is full ({depth} waiting)")
+        self.depth = depth
+
+class QueueStats:
+    """큐 대기 시간 및 처리량 통계"""
+    
+    def __init__(self):
+        self.enqueued = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy = 0  # 대기 질문 수 안내와 함께 받은 질문 수
+        self.shed = 0  # 대기열이 가득 차 거절한 질문 수
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+    
+    def record_start(self, wait_seconds):
+        """작업 시작 시 대기 시간 기록"""
+        self.total_wait += wait_seconds
+        self.max_wait = max(self.max_wait, wait_seconds)
+        self.last_wait = wait_seconds
+    
+    def as_dict(self):
+        """통계를 딕셔너리로 반환"""
+        started = self.completed + self.failed
+        return {
+            "enqueued": self.enqueued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "busy": self.busy,
+            "shed": self.shed,
+            "avg_wait": self.total_wait / started if started else 0.0,
+            "max_wait": self.max_wait,
+            "last_wait": self.last_wait,
+        }
+
+class QueuedJob:
+    """대기 중인 작업 하나"""
+    
+    __slots__ = ("seq", "enqueued_at", "func", "args", "kwargs", "channel", "kind")
+    
+    def __init__(self, seq, func, args, kwargs, channel=None, kind=None):
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.channel = channel
+        self.kind = kind
+
+class FairScheduler:
+    """사용자별 FIFO + 사용자/채널 가상 시각 기반 가중 공정 선택 (잠금은 호출하는 쪽에서)"""
+    
+    def __init__(self, weights=None, channel_share=QUEUE_CHANNEL_SHARE):
+        self.weights = KIND_WEIGHTS if weights is None else weights
+        self.channel_share = channel_share
+        self.waiting = 0  # 전체 대기 작업 수
+        self._queues = {}  # user_id -> deque[QueuedJob]
+        self._running = set()  # 작업이 실행 중인 사용자 (사용자당 하나만 실행)
+        self._user_finish = {}  # user_id -> 다음 차례의 가상 시각
+        self._channel_finish = {}  # channel -> 다음 차례의 가상 시각
+        self._virtual_time = 0.0
+        self._seq = 0
+    
+    def push(self, user_id, func, args, kwargs, channel=None, kind=None):
+        """사용자 큐 끝에 추가하고 앞에 있는 같은 사용자의 작업 수 반환"""
+        user_queue = self._queues.setdefault(user_id, deque())
+        position = len(user_queue) + (1 if user_id in self._running else 0)
+        self._seq += 1
+        user_queue.append(QueuedJob(self._seq, func, args, kwargs, channel, kind))
+        self.waiting += 1
+        return position
+    
+    def _start_tag(self, user_id, job):
+        """작업을 지금 시작한다면 받을 가상 시각"""
+        return max(
+            self._virtual_time,
+            self._user_finish.get(user_id, 0.0),
+            self._channel_finish.get(job.channel, 0.0) if job.channel else 0.0,
+        )
+    
+    def pop_next(self):
+        """실행 중이 아닌 사용자 중 가상 시각이 가장 이른 사용자의 첫 작업을 꺼냄
+        
+        Returns:
+            (user_id, QueuedJob) 또는 꺼낼 작업이 없으면 None
+        """
+        best = None
+        for user_id, user_queue in self._queues.items():
+            if user_id in self._running or not user_queue:
+                continue
+            job = user_queue[0]
+            key = (self._start_tag(user_id, job), job.seq)
+            if best is None or key < best[0]:
+                best = (key, user_id)
+        if best is None:
+            return None
+        
+        (start_tag, _), user_id = best
+        job = self._queues[user_id].popleft()
+        weight = self.weights.get(job.kind, 1.0)
+        self._virtual_time = start_tag
+        self._user_finish[user_id] = start_tag + 1.0 / weight
+        if job.channel:
+            self._channel_finish[job.channel] = start_tag + 1.0 / (weight * self.channel_share)
+        self._running.add(user_id)
+        self.waiting -= 1
+        
+        if len(self._user_finish) + len(self._channel_finish) > VIRTUAL_TIME_PRUNE_SIZE:
+            self._prune()
+        return user_id, job
+    
+    def finish(self, user_id):
+        """사용자의 실행 중인 작업이 끝났을 때 호출"""
+        self._running.discard(user_id)
+        if not self._queues.get(user_id):
+            self._queues.pop(user_id, None)
+    
+    def _prune(self):
+        """현재 가상 시각보다 이전인 기록 삭제 (어차피 현재 시각이 적용됨)"""
+        for finish_times in (self._user_finish, self._channel_finish):
+            for key in [key for key, finish in finish_times.items() if finish <= self._virtual_time]:
+                del finish_times[key]
+    
+    def depth(self, user_id=None):
+        """대기 중인 작업 수 (user_id를 주면 해당 사용자만)"""
+        if user_id is not None:
+            return len(self._queues.get(user_id, ()))
+        return self.waiting
+    
+    def active_users(self):
+        """작업이 실행 중인 사용자 수"""
+        return len(self._running)
+
+def _check_admission(scheduler, stats, kind, max_depth):
+    """대기열이 가득 찼으면 QueueFull (두 큐 공용)"""
+    if kind in SHEDDABLE_KINDS and max_depth and scheduler.waiting >= max_depth:
+        stats.shed += 1
+        QUEUE_ADMISSIONS.inc(kind=kind, result="shed")
+        logger.warning(f"대기열 초과로 질문 거절 - 전체 대기: {scheduler.waiting}개")
+        raise QueueFull(scheduler.waiting)
+
+def _record_admission(scheduler, stats, kind, busy_depth):
+    """작업을 넣고 worker 배정까지 끝난 뒤 결과 기록 (두 큐 공용)
+    
+    Returns:
+        대기 안내가 필요하면 지금 전체 대기 수, 아니면 0
+    """
+    QUEUE_DEPTH.set(scheduler.waiting)
+    if kind is None:
+        return 0
+    if busy_depth and scheduler.waiting >= busy_depth:
+        stats.busy += 1
+        QUEUE_ADMISSIONS.inc(kind=kind, result="busy")
+        return scheduler.waiting
+    QUEUE_ADMISSIONS.inc(kind=kind, result="accepted")
+    return 0
+
+class UserRequestQueue:
+    """사용자별 FIFO 큐 + 가중 공정 선택 + 고정 크기 스레드 worker pool"""
+    
+    def __init__(self, max_workers=QUEUE_MAX_WORKERS, busy_depth=QUEUE_BUSY_DEPTH, max_depth=QUEUE_MAX_DEPTH):
+        self.max_workers = max_workers
+        self.busy_depth = busy_depth
+        self.max_depth = max_depth
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="assistant-worker")
+        self._lock = threading.Lock()
+        self._scheduler = FairScheduler()
+        self._active = 0  # worker에 배정된 작업 수
+        self._stats = QueueStats()
+    
+    def submit(self, user_id, func, *args, channel=None, kind=None, **kwargs):
+        """작업을 사용자 큐에 추가
+        
+        Args:
+            channel: 채널 단위 공정성에 쓰는 채널 ID (없으면 사용자 단위만)
+            kind: 요청 종류 (KIND_DM, KIND_MENTION - 가중치와 거절 대상 결정, None이면 내부 작업)
+        
+        Returns:
+            (앞에 대기 중인 같은 사용자의 작업 수 - 0이면 worker가 비는 대로 처리 시작,
+             대기 안내가 필요하면 추가한 시점의 전체 대기 수 - 아니면 0)
+            가중 공정 큐에서는 전체 대기 수가 실제 차례와 다르므로 순번이 아닌 대기 수로만 안내합니다.
+        
+        Raises:
+            QueueFull: 전체 대기 수가 max_depth 이상일 때 (내부 작업은 제외)
+        """
+        with self._lock:
+            _check_admission(self._scheduler, self._stats, kind, self.max_depth)
+            position = self._scheduler.push(user_id, func, args, kwargs, channel, kind)
+            self._stats.enqueued += 1
+            self._dispatch()
+            waiting = _record_admission(self._scheduler, self._stats, kind, self.busy_depth)
+        
+        return position, waiting
+    
+    def _dispatch(self):
+        """빈 worker만큼 다음 작업 배정 (잠금 안에서 호출)"""
+        while self._active < self.max_workers:
+            item = self._scheduler.pop_next()
+            if item is None:
+                break
+            self._active += 1
+            self._executor.submit(self._run, *item)
+    
+    def _run(self, user_id, job):
+        """작업 하나를 실행하고, 끝나면 다음 작업 배정"""
+        wait_seconds = time.monotonic() - job.enqueued_at
+        with self._lock:
+            self._stats.record_start(wait_seconds)
+        
+        if wait_seconds >= 1:
+            logger.info(f"큐 대기 {wait_seconds:.2f}초 후 처리 시작 - User: {user_id}")
+        
+        try:
+            job.func(*job.args, **job.kwargs)
+            with self._lock:
+                self._stats.completed += 1
+        except Exception as e:
+            logger.error(f"큐 작업 처리 오류 - User: {user_id}: {str(e)}")
+            with self._lock:
+                self._stats.failed += 1
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._scheduler.finish(user_id)
+                self._dispatch()
+                QUEUE_DEPTH.set(self._scheduler.waiting)
+    
+    def depth(self, user_id=None):
+        """대기 중인 작업 수 (user_id를 주면 해당 사용자만)"""
+        with self._lock:
+            return self._scheduler.depth(user_id)
+    
+    def stats(self):
+        """큐 깊이, 활성 사용자 수, 대기 시간 통계"""
+        with self._lock:
+            stats = self._stats.as_dict()
+            stats["depth"] = self._scheduler.waiting
+            stats["active_users"] = self._scheduler.active_users()
+            stats["max_workers"] = self.max_workers
+        return stats
+
+class AsyncUserRequestQueue:
+    """UserRequestQueue의 asyncio 버전 (worker 대신 동시 실행 task 수로 제한)"""
+    
+    def __init__(self, max_workers=QUEUE_MAX_WORKERS, busy_depth=QUEUE_BUSY_DEPTH, max_depth=QUEUE_MAX_DEPTH):
+        self.max_workers = max_workers
+        self.busy_depth = busy_depth
+        self.max_depth = max_depth
+        self._scheduler = FairScheduler()
+        self._active = 0
+        self._tasks = set()
+        self._stats = QueueStats()
+    
+    def submit(self, user_id, coro_func, *args, channel=None, kind=None, **kwargs):
+        """코루틴 작업을 사용자 큐에 추가 (이벤트 루프 안에서 호출, 인자는 UserRequestQueue.submit과 같음)
+        
+        Returns:
+            (앞에 대기 중인 같은 사용자의 작업 수, 대기 안내가 필요하면 전체 대기 수 - 아니면 0)
+        
+        Raises:
+            QueueFull: 전체 대기 수가 max_depth 이상일 때 (내부 작업은 제외)
+        """
+        _check_admission(self._scheduler, self._stats, kind, self.max_depth)
+        position = self._scheduler.push(user_id, coro_func, args, kwargs, channel, kind)
+        self._stats.enqueued += 1
+        self._dispatch()
+        waiting = _record_admission(self._scheduler, self._stats, kind, self.busy_depth)
+        return position, waiting
+    
+    def _dispatch(self):
+        """빈 자리만큼 다음 작업을 task로 시작"""
+        while self._active < self.max_workers:
+            item = self._scheduler.pop_next()
+            if item is None:
+                break
+            self._active += 1
+            task = asyncio.create_task(self._run(*item))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, user_id, job):
+        """작업 하나를 실행하고, 끝나면 다음 작업 시작"""
+        wait_seconds = time.monotonic() - job.enqueued_at
+        self._stats.record_start(wait_seconds)
+        
+        if wait_seconds >= 1:
+            logger.info(f"큐 대기 {wait_seconds:.2f}초 후 처리 시작 - User: {user_id}")
+        
+        try:
+            await job.func(*job.args, **job.kwargs)
+            self._stats.completed += 1
+        except Exception as e:
+            logger.error(f"큐 작업 처리 오류 - User: {user_id}: {str(e)}")
+            self._stats.failed += 1
+        finally:
+            self._active -= 1
+            self._scheduler.finish(user_id)
+            self._dispatch()
+            QUEUE_DEPTH.set(self._scheduler.waiting)
+    
+    def depth(self, user_id=None):
+        """대기 중인 작업 수 (user_id를 주면 해당 사용자만)"""
+        return self._scheduler.depth(user_id)
+    
+    def stats(self):
+        """큐 깊이, 활성 사용자 수, 대기 시간 통계"""
+        stats = self._stats.as_dict()
+        stats["depth"] = self._scheduler.waiting
+        stats["active_users"] = self._scheduler.active_users()
+        stats["max_workers"] = self.max_workers
+        return stats